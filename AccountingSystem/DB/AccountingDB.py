@@ -14,6 +14,7 @@ from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 from DIRAC.Core.Utilities import List, ThreadSafe, Time, DEncode
 from DIRAC.Core.Utilities.Plotting.TypeLoader import TypeLoader
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
+from DIRAC.AccountingSystem.private.KeyValueCache import KeyValueCache
 
 gSynchro = ThreadSafe.Synchronizer()
 
@@ -33,7 +34,7 @@ class AccountingDB(DB):
     self.__queuedRecordsToInsert = []
     self.dbCatalog = {}
     self.dbBucketsLength = {}
-    self.__keysCache = {}
+    self.__keysCache = KeyValueCache()
     maxParallelInsertions = self.getCSOption("ParallelRecordInsertions", 10)
     self.__threadPool = ThreadPool(1, maxParallelInsertions)
     self.__threadPool.daemonize()
@@ -76,6 +77,7 @@ class AccountingDB(DB):
     self.__lastCompactionEpoch = Time.toEpoch(lcd)
 
     self.__registerTypes()
+    self.__prefetchKeyValues()
 
   def __loadTablesCreated(self):
     result = self._query("show tables")
@@ -245,6 +247,7 @@ class AccountingDB(DB):
         self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable,
                                                 args=(recordsToProcess, ))
     self.log.info("[PENDING] Got %s records requests for all types" % pending)
+    self.log.info("[PENDING] Key values cache", str(self.__keysCache.getStatistics()))
     self.__doingPendingLockTime = 0
     return S_OK()
 
@@ -477,64 +480,97 @@ class AccountingDB(DB):
       return retVal
     retVal = self._update("DELETE FROM `%s` WHERE name='%s'" % (_getTableName("catalog", "Types"), typeName))
     del self.dbCatalog[typeName]
+    self.__keysCache.clear(typeName)
     return S_OK()
 
-  def __getIdForKeyValue(self, typeName, keyName, keyValue, conn=False):
+  def __prefetchKeyValues(self):
     """
-      Finds id number for value in a key table
+      Load the values of all the key tables in the cache
     """
-    retVal = self._escapeString(keyValue)
+    for typeName in self.dbCatalog:
+      for keyName in self.dbCatalog[typeName]['keys']:
+        retVal = self._query("SELECT `value`, `id` FROM `%s`" % _getTableName("key", typeName, keyName))
+        if not retVal['OK']:
+          self.log.error("Can't load the key values", "of %s for %s: %s" % (keyName, typeName, retVal['Message']))
+          continue
+        self.__keysCache.add(typeName, keyName, ((_normalizeKeyValue(value), keyID)
+                                                 for value, keyID in retVal['Value']))
+    self.log.info("Key values cache loaded", str(self.__keysCache.getStatistics()))
+
+  def getKeyValuesCacheStatistics(self):
+    """
+      Number of cached key values, and cache hits and misses since the start
+    """
+    return S_OK(self.__keysCache.getStatistics())
+
+  def __getIdsForKeyValues(self, typeName, keyName, keyValues):
+    """
+      Finds id numbers for values in a key table, with one query
+
+      :return: S_OK( { value : id } ) for the values found
+    """
+    retVal = self._escapeValues(keyValues)
     if not retVal['OK']:
       return retVal
-    keyValue = retVal['Value']
-    retVal = self._query("SELECT `id` FROM `%s` WHERE `value`=%s" % (_getTableName("key", typeName, keyName),
-                                                                     keyValue), conn=conn)
+    retVal = self._query("SELECT `value`, `id` FROM `%s` WHERE `value` IN (%s)" % (
+        _getTableName("key", typeName, keyName), ", ".join(retVal['Value'])))
     if not retVal['OK']:
       return retVal
-    if len(retVal['Value']) > 0:
-      return S_OK(retVal['Value'][0][0])
-    return S_ERROR("Key id %s for value %s does not exist although it shoud" % (keyName, keyValue))
+    foundIDs = dict((_normalizeKeyValue(value), keyID) for value, keyID in retVal['Value'])
+    # MySQL may also have matched values differing by their case or trailing spaces
+    looseIDs = dict((_looseKeyValue(value), keyID) for value, keyID in foundIDs.iteritems())
+    valueIDs = {}
+    for keyValue in keyValues:
+      keyID = foundIDs.get(keyValue, looseIDs.get(_looseKeyValue(keyValue)))
+      if keyID is not None:
+        valueIDs[keyValue] = keyID
+    return S_OK(valueIDs)
 
-  def __addKeyValue(self, typeName, keyName, keyValue):
-    """
-      Adds a key value to a key table if not existant
+  def __getKeyValueIds(self, typeName, keyName, keyValues):
     """
-    # Cast to string just in case
-    if not isinstance(keyValue, basestring):
-      keyValue = str(keyValue)
-    # No more than 64 chars for keys
-    if len(keyValue) > 64:
-      keyValue = keyValue[:64]
+      Ids of values of a key, adding the values to the key table if not existant
 
+      :param list keyValues: values of the key
+      :return: S_OK( { value : id } ), the values being cast to strings of at most 64 chars
+    """
+    keyValues = set(_normalizeKeyValue(keyValue) for keyValue in keyValues)
     # Look into the cache
-    if typeName not in self.__keysCache:
-      self.__keysCache[typeName] = {}
-    typeCache = self.__keysCache[typeName]
-    if keyName not in typeCache:
-      typeCache[keyName] = {}
-    keyCache = typeCache[keyName]
-    if keyValue in keyCache:
-      return S_OK(keyCache[keyValue])
-    # Retrieve key
-    keyTable = _getTableName("key", typeName, keyName)
-    retVal = self.__getIdForKeyValue(typeName, keyName, keyValue)
-    if retVal['OK']:
-      keyCache[keyValue] = retVal['Value']
-      return retVal
-    # Key is not in there
-    retVal = self._getConnection()
+    valueIDs, missing = self.__keysCache.getIDs(typeName, keyName, keyValues)
+    if not missing:
+      return S_OK(valueIDs)
+    # Retrieve keys
+    retVal = self.__getIdsForKeyValues(typeName, keyName, missing)
     if not retVal['OK']:
       return retVal
-    connection = retVal['Value']
-    self.log.info("Value %s for key %s didn't exist, inserting" % (keyValue, keyName))
-    retVal = self.insertFields(keyTable, ['id', 'value'], [0, keyValue], connection)
-    if not retVal['OK'] and retVal['Message'].find("Duplicate key") == -1:
+    newIDs = retVal['Value']
+    missing = [keyValue for keyValue in missing if keyValue not in newIDs]
+    if missing:
+      # Keys are not in there, they may be inserted at the same time by another thread or service
+      keyTable = _getTableName("key", typeName, keyName)
+      for keyValue in missing:
+        self.log.info("Value %s for key %s didn't exist, inserting" % (keyValue, keyName))
+        retVal = self.insertFields(keyTable, ['id', 'value'], [0, keyValue])
+        if not retVal['OK'] and retVal['Message'].find("Duplicate key") == -1:
+          return retVal
+      retVal = self.__getIdsForKeyValues(typeName, keyName, missing)
+      if not retVal['OK']:
+        return retVal
+      newIDs.update(retVal['Value'])
+      missing = [keyValue for keyValue in missing if keyValue not in newIDs]
+      if missing:
+        return S_ERROR("Key id %s for values %s do not exist although they should" % (keyName, ", ".join(missing)))
+    self.__keysCache.add(typeName, keyName, newIDs.iteritems())
+    valueIDs.update(newIDs)
+    return S_OK(valueIDs)
+
+  def __addKeyValue(self, typeName, keyName, keyValue):
+    """
+      Adds a key value to a key table if not existant
+    """
+    retVal = self.__getKeyValueIds(typeName, keyName, [keyValue])
+    if not retVal['OK']:
       return retVal
-    result = self.__getIdForKeyValue(typeName, keyName, keyValue, connection)
-    if not result['OK']:
-      return result
-    keyCache[keyValue] = result['Value']
-    return result
+    return S_OK(retVal['Value'].values()[0])
 
   def calculateBucketLengthForTime(self, typeName, now, when):
     """
@@ -631,67 +667,147 @@ class AccountingDB(DB):
     Do the real insert and delete from the in buffer table
     """
     self.log.verbose("Received bundle to process", "of %s elements" % len(recordTuples))
+    recordsByType = {}
     for record in recordTuples:
-      iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
-      result = self.insertRecordDirectly(typeName, startTime, endTime, valuesList)
-      if not result['OK']:
-        self._update("UPDATE `%s` SET taken=0 WHERE id=%s" % (_getTableName("in", typeName), iD))
-        self.log.error("Can't insert row", result['Message'])
+      recordsByType.setdefault(record[1], []).append(record)
+    for typeName, typeRecords in recordsByType.iteritems():
+      inTableName = _getTableName("in", typeName)
+      result = self.insertRecordsDirectly(typeName, [record[2:5] for record in typeRecords])
+      if result['OK']:
+        idList = [str(record[0]) for record in typeRecords]
+        result = self._update("DELETE FROM `%s` WHERE id in (%s)" % (inTableName, ", ".join(idList)))
+        if not result['OK']:
+          self.log.error("Can't delete rows from the IN table", result['Message'])
+        for record in typeRecords:
+          gMonitor.addMark("insertiontime", Time.toEpoch() - record[5])
         continue
-      result = self._update("DELETE FROM `%s` WHERE id=%s" % (_getTableName("in", typeName), iD))
-      if not result['OK']:
-        self.log.error("Can't delete row from the IN table", result['Message'])
-      gMonitor.addMark("insertiontime", Time.toEpoch() - insertionEpoch)
+      # Insert the records one by one, so that a bad record doesn't block the others
+      self.log.warn("Can't insert bundle, inserting records one by one",
+                    "for %s: %s" % (typeName, result['Message']))
+      for record in typeRecords:
+        iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
+        result = self.insertRecordDirectly(typeName, startTime, endTime, valuesList)
+        if not result['OK']:
+          self._update("UPDATE `%s` SET taken=0 WHERE id=%s" % (inTableName, iD))
+          self.log.error("Can't insert row", result['Message'])
+          continue
+        result = self._update("DELETE FROM `%s` WHERE id=%s" % (inTableName, iD))
+        if not result['OK']:
+          self.log.error("Can't delete row from the IN table", result['Message'])
+        gMonitor.addMark("insertiontime", Time.toEpoch() - insertionEpoch)
 
   def insertRecordDirectly(self, typeName, startTime, endTime, valuesList):
     """
     Add an entry to the type contents
     """
-    if self.__readOnly:
-      return S_ERROR("ReadOnly mode enabled. No modification allowed")
-    gMonitor.addMark("registeradded", 1)
-    gMonitor.addMark("registeradded:%s" % typeName, 1)
     self.log.info("Adding record", "for type %s\n [%s -> %s]" %
                   (typeName, Time.fromEpoch(startTime), Time.fromEpoch(endTime)))
+    return self.insertRecordsDirectly(typeName, [(startTime, endTime, valuesList)])
+
+  def insertRecordsDirectly(self, typeName, records):
+    """
+    Add entries to the type contents: the raw records are inserted with one bulk insert,
+    and their buckets are aggregated in memory and written with one bulk upsert, in the
+    same transaction
+
+    :param str typeName: type of the records
+    :param list records: ( startTime, endTime, valuesList ) tuples
+    """
+    if self.__readOnly:
+      return S_ERROR("ReadOnly mode enabled. No modification allowed")
     if typeName not in self.dbCatalog:
       return S_ERROR("Type %s has not been defined in the db" % typeName)
-    # Discover key indexes
-    for keyPos in range(len(self.dbCatalog[typeName]['keys'])):
+    if not records:
+      return S_OK()
+    gMonitor.addMark("registeradded", len(records))
+    gMonitor.addMark("registeradded:%s" % typeName, len(records))
+    self.log.verbose("Adding records", "%d for type %s" % (len(records), typeName))
+    numKeys = len(self.dbCatalog[typeName]['keys'])
+    numFields = len(self.dbCatalog[typeName]['typeFields']) - 2
+    rawRows = []
+    for startTime, endTime, valuesList in records:
+      if len(valuesList) != numFields:
+        return S_ERROR("Fields mismatch for record %s. %s fields and %s expected" % (typeName,
+                                                                                     len(valuesList) + 2,
+                                                                                     numFields + 2))
+      rawRows.append(list(valuesList) + [startTime, endTime])
+    # Discover key indexes, for all the values of a key at once
+    for keyPos in range(numKeys):
       keyName = self.dbCatalog[typeName]['keys'][keyPos]
-      keyValue = valuesList[keyPos]
-      retVal = self.__addKeyValue(typeName, keyName, keyValue)
+      retVal = self.__getKeyValueIds(typeName, keyName, [row[keyPos] for row in rawRows])
       if not retVal['OK']:
         return retVal
-      self.log.verbose("Value %s for key %s has id %s" % (keyValue, keyName, retVal['Value']))
-      valuesList[keyPos] = retVal['Value']
-    insertList = list(valuesList)
-    insertList.append(startTime)
-    insertList.append(endTime)
-    retVal = self._getConnection()
+      valueIDs = retVal['Value']
+      for row in rawRows:
+        row[keyPos] = valueIDs[_normalizeKeyValue(row[keyPos])]
+    retVal = self.__aggregateInBuckets(typeName, rawRows)
     if not retVal['OK']:
       return retVal
-    connObj = retVal['Value']
-    try:
-      retVal = self.insertFields(
-          _getTableName("type", typeName),
-          self.dbCatalog[typeName]['typeFields'],
-          insertList,
-          conn=connObj
-      )
-      if not retVal['OK']:
-        return retVal
-      # HACK: One more record to split in the buckets to be able to count total entries
-      valuesList.append(1)
-      retVal = self.__startTransaction(connObj)
+    bucketFields, bucketRows = retVal['Value']
+
+    for _i in range(max(1, self.__deadLockRetries)):
+      retVal = self._getConnection()
       if not retVal['OK']:
         return retVal
-      retVal = self.__splitInBuckets(typeName, startTime, endTime, valuesList, connObj=connObj)
-      if not retVal['OK']:
+      connObj = retVal['Value']
+      try:
+        retVal = self.__startTransaction(connObj)
+        if not retVal['OK']:
+          return retVal
+        retVal = self.insertFieldsBulk(_getTableName("type", typeName),
+                                       self.dbCatalog[typeName]['typeFields'],
+                                       rawRows,
+                                       conn=connObj)
+        if retVal['OK']:
+          retVal = self.upsertFieldsBulk(_getTableName("bucket", typeName),
+                                         bucketFields,
+                                         bucketRows,
+                                         conn=connObj,
+                                         incrementFields=bucketFields[numKeys + 2:])
+        if retVal['OK']:
+          retVal = self.__commitTransaction(connObj)
+          if retVal['OK']:
+            return S_OK()
         self.__rollbackTransaction(connObj)
+      finally:
+        connObj.close()
+      # If failed because of dead lock try restarting the whole transaction
+      if retVal['Message'].find("try restarting transaction") == -1:
         return retVal
-      return self.__commitTransaction(connObj)
-    finally:
-      connObj.close()
+    return S_ERROR("Cannot insert records: %s" % retVal['Message'])
+
+  def __aggregateInBuckets(self, typeName, rawRows):
+    """
+    Merge the buckets of raw records, with their key values replaced by their ids,
+    into one accumulator per bucket and key values
+
+    :return: S_OK( ( bucket fields, bucket rows ) )
+    """
+    numKeys = len(self.dbCatalog[typeName]['keys'])
+    numValues = len(self.dbCatalog[typeName]['values'])
+    nowEpoch = int(Time.toEpoch(Time.dateTime()))
+    # ( bucket start, bucket length, key ids ) -> [ value sums..., entries ]
+    accumulators = {}
+    for row in rawRows:
+      try:
+        values = [float(value) for value in row[numKeys:numKeys + numValues]]
+      except (TypeError, ValueError) as e:
+        return S_ERROR("Invalid value in record for %s: %s" % (typeName, repr(e)))
+      keyIDs = tuple(row[:numKeys])
+      for bucketStart, proportion, bucketLength in self.calculateBuckets(typeName, row[-2], row[-1], nowEpoch):
+        accumulator = accumulators.get((bucketStart, bucketLength, keyIDs))
+        if accumulator is None:
+          accumulator = [0.] * (numValues + 1)
+          accumulators[(bucketStart, bucketLength, keyIDs)] = accumulator
+        for valPos in range(numValues):
+          accumulator[valPos] += values[valPos] * proportion
+        accumulator[-1] += proportion
+    self.log.verbose("Aggregated records", "%d records in %d buckets" % (len(rawRows), len(accumulators)))
+    bucketFields = ['startTime', 'bucketLength'] + self.dbCatalog[typeName]['keys'] + \
+        self.dbCatalog[typeName]['values'] + ['entriesInBucket']
+    bucketRows = [[bucketStart, bucketLength] + list(keyIDs) + accumulator
+                  for (bucketStart, bucketLength, keyIDs), accumulator in sorted(accumulators.iteritems())]
+    return S_OK((bucketFields, bucketRows))
 
   def deleteRecord(self, typeName, startTime, endTime, valuesList):
     """
@@ -1540,6 +1656,23 @@ class AccountingDB(DB):
     return self._query("ROLLBACK", conn=connObj)
 
 
+def _normalizeKeyValue(keyValue):
+  """
+  Value of a key as stored in its key table: a string of no more than 64 chars
+  """
+  # Cast to string just in case
+  if not isinstance(keyValue, basestring):
+    keyValue = str(keyValue)
+  return keyValue[:64]
+
+
+def _looseKeyValue(keyValue):
+  """
+  Key value as compared by the default MySQL collations
+  """
+  return keyValue.lower().rstrip(' ')
+
+
 def _bucketizeDataField(dataField, bucketLength):
   return "%s - ( %s %% %s )" % (dataField, dataField, bucketLength)
 
@@ -4,9 +4,12 @@
 # pylint: disable=protected-access
 
 # imports
+import time
 import unittest
 from mock import MagicMock
 
+from DIRAC import S_OK, S_ERROR
+
 import DIRAC.AccountingSystem.DB.AccountingDB as moduleTested
 
 
@@ -390,6 +393,114 @@ ORDER BY startTime" % (expectedStartTime, expectedEndTime)
     self.assertTrue(retVal)
     self.assertEqual(retVal, expectedQuery)
 
+class InsertRecords(TestCase):
+  """ testing the bundled insertion of records
+  """
+
+  def setUp(self):
+    super(InsertRecords, self).setUp()
+    self.typeName = "Test_Job"
+    self.module = self.testClass()
+    self.module.dbCatalog = {self.typeName: {'keys': ['User', 'Site'],
+                                             'values': ['CPUTime', 'Jobs'],
+                                             'typeFields': ['User', 'Site', 'CPUTime', 'Jobs', 'startTime', 'endTime'],
+                                             'dataTimespan': 0}}
+    self.module.dbBucketsLength[self.typeName] = [(86400 * 30, 3600)]
+    keyIDs = {'u1': 1, 'u2': 2, 's1': 7}
+    self.module._AccountingDB__getKeyValueIds = MagicMock(side_effect=lambda _t, _k, values:
+                                                          S_OK(dict((value, keyIDs[value]) for value in values)))
+    self.module._getConnection = MagicMock(return_value=S_OK(MagicMock()))
+    self.module._query = MagicMock(return_value=S_OK())
+    self.module.insertFieldsBulk = MagicMock(return_value=S_OK([3]))
+    self.module.upsertFieldsBulk = MagicMock(return_value=S_OK([3]))
+    now = int(time.time())
+    self.start = now - now % 3600 - 86400
+
+  def test_aggregation(self):
+    """ one bulk insert of the raw records and one bulk upsert of the aggregated buckets """
+    start = self.start
+    result = self.module.insertRecordsDirectly(self.typeName, [(start, start, ['u1', 's1', 10, 1]),
+                                                               (start + 100, start + 100, ['u1', 's1', 20, 1]),
+                                                               (start, start + 7200, ['u2', 's1', 100, 2])])
+    self.assertTrue(result['OK'], result.get('Message'))
+
+    args, kwargs = self.module.insertFieldsBulk.call_args
+    self.assertEqual(args[0], "ac_type_Test_Job")
+    self.assertEqual(args[2], [[1, 7, 10, 1, start, start],
+                               [1, 7, 20, 1, start + 100, start + 100],
+                               [2, 7, 100, 2, start, start + 7200]])
+
+    self.assertEqual(self.module.upsertFieldsBulk.call_count, 1)
+    args, kwargs = self.module.upsertFieldsBulk.call_args
+    self.assertEqual(args[0], "ac_bucket_Test_Job")
+    self.assertEqual(args[1], ['startTime', 'bucketLength', 'User', 'Site', 'CPUTime', 'Jobs', 'entriesInBucket'])
+    self.assertEqual(args[2], [[start, 3600, 1, 7, 30., 2., 2.],
+                               [start, 3600, 2, 7, 50., 1., .5],
+                               [start + 3600, 3600, 2, 7, 50., 1., .5]])
+    self.assertEqual(kwargs['incrementFields'], ['CPUTime', 'Jobs', 'entriesInBucket'])
+    self.assertEqual([call[0][0] for call in self.module._query.call_args_list], ["START TRANSACTION", "COMMIT"])
+
+  def test_deadlock(self):
+    """ the whole transaction is retried after a dead lock """
+    self.module.upsertFieldsBulk.side_effect = [S_ERROR("Deadlock found when trying to get lock; "
+                                                        "try restarting transaction"), S_OK([1])]
+    result = self.module.insertRecordsDirectly(self.typeName, [(self.start, self.start, ['u1', 's1', 10, 1])])
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(self.module.insertFieldsBulk.call_count, 2)
+    self.assertEqual([call[0][0] for call in self.module._query.call_args_list],
+                     ["START TRANSACTION", "ROLLBACK", "START TRANSACTION", "COMMIT"])
+
+  def test_mismatch(self):
+    result = self.module.insertRecordsDirectly(self.typeName, [(self.start, self.start, ['u1', 's1', 10])])
+    self.assertFalse(result['OK'])
+    self.assertFalse(self.module.insertFieldsBulk.called)
+
+
+class KeyValues(TestCase):
+  """ testing the resolution of the key values ids
+  """
+
+  def setUp(self):
+    super(KeyValues, self).setUp()
+    self.module = self.testClass()
+    # Key table of the Site key
+    self.keyTable = {'LCG.CERN.cern': 1, 'LCG.CNAF.it': 2}
+    self.module._escapeValues = MagicMock(side_effect=lambda values: S_OK(["'%s'" % value for value in values]))
+    self.module._query = MagicMock(side_effect=self.query)
+    self.module.insertFields = MagicMock(side_effect=self.insertFields)
+
+  def query(self, cmd, conn=False):  # pylint: disable=unused-argument
+    """ SELECT value, id FROM key table WHERE value IN (...) """
+    values = [value.strip("'") for value in cmd.split("IN (")[1].rstrip(")").split(", ")]
+    return S_OK(tuple((value, keyID) for value, keyID in self.keyTable.iteritems()
+                      if value.lower() in [v.lower() for v in values]))
+
+  def insertFields(self, _tableName, _fields, values):
+    self.keyTable[values[1]] = len(self.keyTable) + 1
+    return S_OK(1)
+
+  def test_bulkResolution(self):
+    getKeyValueIds = self.module._AccountingDB__getKeyValueIds  # pylint: disable=no-member
+    result = getKeyValueIds("Test_Job", "Site", ['LCG.CERN.cern', 'LCG.CNAF.it', 'LCG.CERN.cern', 'lcg.cnaf.it'])
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(result['Value'], {'LCG.CERN.cern': 1, 'LCG.CNAF.it': 2, 'lcg.cnaf.it': 2})
+    # One query for all the values
+    self.assertEqual(self.module._query.call_count, 1)
+    self.assertFalse(self.module.insertFields.called)
+
+    # Cached values don't need any query, new ones are inserted
+    result = getKeyValueIds("Test_Job", "Site", ['LCG.CERN.cern', 'LCG.PIC.es', 123])
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(result['Value'], {'LCG.CERN.cern': 1, 'LCG.PIC.es': self.keyTable['LCG.PIC.es'],
+                                       '123': self.keyTable['123']})
+    self.assertEqual(sorted(self.keyTable.values()), [1, 2, 3, 4])
+    self.assertEqual(self.module._query.call_count, 3)
+    self.assertEqual(self.module.insertFields.call_count, 2)
+
+    statistics = self.module.getKeyValuesCacheStatistics()['Value']
+    self.assertEqual(statistics, {'Entries': 5, 'Hits': 1, 'Misses': 5})
+
+
 #############################################################################
 # Test Suite run
 #############################################################################
@@ -398,4 +509,6 @@ ORDER BY startTime" % (expectedStartTime, expectedEndTime)
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MakeQuery))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(InsertRecords))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(KeyValues))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,83 @@
+""" In-process cache of the ids of the key values of the accounting types
+
+    The values of the key fields of the accounting types (sites, users, job groups...) are stored
+    in key tables and referred to by their ids. They are few and rarely change, so that the id of
+    a value, once known, can be kept for the lifetime of the process.
+"""
+
+import threading
+
+__RCSID__ = "$Id$"
+
+
+class KeyValueCache(object):
+  """ Bidirectional key value <-> id cache, per type and key field
+  """
+
+  def __init__(self):
+    self.__lock = threading.Lock()
+    # ( typeName, keyName ) -> { value : id }
+    self.__ids = {}
+    # ( typeName, keyName ) -> { id : value }
+    self.__values = {}
+    self.__hits = 0
+    self.__misses = 0
+
+  def add(self, typeName, keyName, valueIDs):
+    """ Add key values to the cache
+
+    :param str typeName: accounting type
+    :param str keyName: key field
+    :param valueIDs: iterable of ( value, id ) tuples
+    """
+    with self.__lock:
+      ids = self.__ids.setdefault((typeName, keyName), {})
+      values = self.__values.setdefault((typeName, keyName), {})
+      for value, keyID in valueIDs:
+        ids[value] = keyID
+        values[keyID] = value
+
+  def getIDs(self, typeName, keyName, values):
+    """ Ids of key values
+
+    :param str typeName: accounting type
+    :param str keyName: key field
+    :param values: iterable of values
+    :return: ( { value : id } of the cached values, list of the values not in the cache )
+    """
+    found = {}
+    missing = []
+    with self.__lock:
+      ids = self.__ids.get((typeName, keyName), {})
+      for value in values:
+        keyID = ids.get(value)
+        if keyID is None:
+          missing.append(value)
+        else:
+          found[value] = keyID
+      self.__hits += len(found)
+      self.__misses += len(missing)
+    return found, missing
+
+  def getValue(self, typeName, keyName, keyID):
+    """ Value of a key id, None if not cached
+    """
+    with self.__lock:
+      return self.__values.get((typeName, keyName), {}).get(keyID)
+
+  def clear(self, typeName=None):
+    """ Forget the values of a type, or of all the types
+    """
+    with self.__lock:
+      for cacheKey in list(self.__ids):
+        if typeName is None or cacheKey[0] == typeName:
+          del self.__ids[cacheKey]
+          del self.__values[cacheKey]
+
+  def getStatistics(self):
+    """ Numbers of cached values, hits and misses since the start
+    """
+    with self.__lock:
+      return {'Entries': sum(len(ids) for ids in self.__ids.itervalues()),
+              'Hits': self.__hits,
+              'Misses': self.__misses}
@@ -87,7 +87,7 @@ class Operations(object):
   """
 
   __cache = {}
-  __cacheVersion = 0
+  __cacheCFG = None
   __cacheLock = LockRing.LockRing().getLock()
 
   def __init__(self, vo=False, group=False, setup=False):
@@ -127,25 +127,34 @@ class Operations(object):
       self.__setup = CSGlobals.getSetup()
 
   def __getCache(self):
+    """ Get the index of the Operations sections merged for the vo and setup.
+
+        The cache is emptied when gConfigurationData has a new merged CFG, and
+        it is read without taking the lock when the entry exists
+    """
+    currentCFG = gConfigurationData.mergedCFG
+    cacheKey = (self.__vo, self.__setup)
+    if Operations.__cacheCFG is currentCFG:
+      cfgIndex = Operations.__cache.get(cacheKey)
+      if cfgIndex is not None:
+        return cfgIndex
+
     Operations.__cacheLock.acquire()
     try:
-      currentVersion = gConfigurationData.getVersion()
-      if currentVersion != Operations.__cacheVersion:
+      if Operations.__cacheCFG is not currentCFG:
         Operations.__cache = {}
-        Operations.__cacheVersion = currentVersion
-
-      cacheKey = (self.__vo, self.__setup)
-      if cacheKey in Operations.__cache:
+        Operations.__cacheCFG = currentCFG
+      elif cacheKey in Operations.__cache:
         return Operations.__cache[cacheKey]
 
       mergedCFG = CFG.CFG()
 
       for path in self.__getSearchPaths():
-        pathCFG = gConfigurationData.mergedCFG[path]
+        pathCFG = currentCFG[path]
         if pathCFG:
           mergedCFG = mergedCFG.mergeWith(pathCFG)
 
-      Operations.__cache[cacheKey] = mergedCFG
+      Operations.__cache[cacheKey] = CFG.CFGIndex(mergedCFG)
 
       return Operations.__cache[cacheKey]
     finally:
@@ -190,7 +199,7 @@ class Operations(object):
     return self.__getCache().getOption(optionPath, defaultValue)
 
   def __getCFG(self, sectionPath):
-    cacheCFG = self.__getCache()
+    cacheCFG = self.__getCache().cfg
     section = cacheCFG.getRecursive(sectionPath)
     if not section:
       return S_ERROR("%s in Operations does not exist" % sectionPath)
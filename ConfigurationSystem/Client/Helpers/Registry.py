@@ -1,9 +1,14 @@
 """ Helper for /Registry section
 """
 
+import threading
+
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities import List
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import getVO
+from DIRAC.ConfigurationSystem.private.Refresher import gRefresher
 
 __RCSID__ = "$Id$"
 
@@ -11,21 +16,106 @@ __RCSID__ = "$Id$"
 
 gBaseRegistrySection = "/Registry"
 
+# Reverse indexes of the Registry, built from the merged CFG they are stored with.
+# gConfigurationData replaces its merged CFG each time the configuration changes,
+# so the indexes are rebuilt at most once per configuration version
+gRegistryIndex = ( None, None )
+gRegistryIndexLock = threading.Lock()
+
+def __getRegistrySection( cfg, sectionName ):
+  result = cfg.getRecursive( "%s/%s" % ( gBaseRegistrySection, sectionName ) )
+  if not result or isinstance( result[ 'value' ], basestring ):
+    return None
+  return result[ 'value' ]
+
+def __getListOption( cfg, optionName ):
+  if not cfg.isOption( optionName ):
+    return None
+  return List.fromChar( cfg[ optionName ], ',' )
+
+def __buildRegistryIndex( cfg ):
+  """ Build the reverse indexes of the /Registry section of the given CFG
+  """
+  index = { 'UserDNs' : {},
+            'DNUsers' : {},
+            'HostDNs' : {},
+            'DNHosts' : {},
+            'HostProperties' : {},
+            'GroupOptions' : {},
+            'GroupsWithAttr' : { 'Users' : {}, 'VO' : {}, 'Properties' : {} } }
+
+  usersCFG = __getRegistrySection( cfg, "Users" )
+  if usersCFG:
+    for username in usersCFG.listSections():
+      dnList = __getListOption( usersCFG[ username ], 'DN' )
+      if dnList is None:
+        continue
+      index[ 'UserDNs' ][ username ] = dnList
+      for dn in dnList:
+        index[ 'DNUsers' ].setdefault( dn, [] ).append( username )
+
+  hostsCFG = __getRegistrySection( cfg, "Hosts" )
+  if hostsCFG:
+    for hostname in hostsCFG.listSections():
+      hostCFG = hostsCFG[ hostname ]
+      dnList = __getListOption( hostCFG, 'DN' )
+      if dnList is not None:
+        index[ 'HostDNs' ][ hostname ] = dnList
+        for dn in dnList:
+          index[ 'DNHosts' ].setdefault( dn, hostname )
+      properties = __getListOption( hostCFG, 'Properties' )
+      if properties is not None:
+        index[ 'HostProperties' ][ hostname ] = properties
+
+  groupsCFG = __getRegistrySection( cfg, "Groups" )
+  if groupsCFG:
+    for group in groupsCFG.listSections():
+      groupCFG = groupsCFG[ group ]
+      groupOptions = {}
+      for attrName, groupsWithAttr in index[ 'GroupsWithAttr' ].items():
+        values = __getListOption( groupCFG, attrName )
+        if values is None:
+          continue
+        groupOptions[ attrName ] = values
+        for value in set( values ):
+          groupsWithAttr.setdefault( value, [] ).append( group )
+      index[ 'GroupOptions' ][ group ] = groupOptions
+    for groupsWithAttr in index[ 'GroupsWithAttr' ].values():
+      for groups in groupsWithAttr.values():
+        groups.sort()
+
+  return index
+
+def __getRegistryIndex():
+  """ Get the Registry indexes for the current configuration, rebuilding them if it changed
+  """
+  global gRegistryIndex
+  gRefresher.refreshConfigurationIfNeeded()
+  cfg = gConfigurationData.mergedCFG
+  indexCFG, index = gRegistryIndex
+  if indexCFG is cfg:
+    return index
+  with gRegistryIndexLock:
+    indexCFG, index = gRegistryIndex
+    if indexCFG is not cfg:
+      index = __buildRegistryIndex( cfg )
+      gRegistryIndex = ( cfg, index )
+  return index
+
 def getUsernameForDN( dn, usersList = False ):
-  if not usersList:
-    retVal = gConfig.getSections( "%s/Users" % gBaseRegistrySection )
-    if not retVal[ 'OK' ]:
-      return retVal
-    usersList = retVal[ 'Value' ]
-  for username in usersList:
-    if dn in gConfig.getValue( "%s/Users/%s/DN" % ( gBaseRegistrySection, username ), [] ):
-      return S_OK( username )
+  index = __getRegistryIndex()
+  if usersList:
+    for username in usersList:
+      if dn in index[ 'UserDNs' ].get( username, [] ):
+        return S_OK( username )
+  elif dn in index[ 'DNUsers' ]:
+    return S_OK( index[ 'DNUsers' ][ dn ][0] )
   return S_ERROR( "No username found for dn %s" % dn )
 
 def getDNForUsername( username ):
-  dnList = gConfig.getValue( "%s/Users/%s/DN" % ( gBaseRegistrySection, username ), [] )
+  dnList = __getRegistryIndex()[ 'UserDNs' ].get( username )
   if dnList:
-    return S_OK( dnList )
+    return S_OK( list( dnList ) )
   return S_ERROR( "No DN found for user %s" % username )
 
 def getDNForHost( host ):
@@ -41,18 +131,10 @@ def getGroupsForDN( dn ):
   return getGroupsForUser( retVal[ 'Value' ] )
 
 def __getGroupsWithAttr( attrName, value ):
-  retVal = gConfig.getSections( "%s/Groups" % gBaseRegistrySection )
-  if not retVal[ 'OK' ]:
-    return retVal
-  groupsList = retVal[ 'Value' ]
-  groups = []
-  for group in groupsList:
-    if value in gConfig.getValue( "%s/Groups/%s/%s" % ( gBaseRegistrySection, group, attrName ), [] ):
-      groups.append( group )
+  groups = __getRegistryIndex()[ 'GroupsWithAttr' ][ attrName ].get( value )
   if not groups:
     return S_ERROR( "No groups found for %s=%s" % ( attrName,value ) )
-  groups.sort()
-  return S_OK( groups )
+  return S_OK( list( groups ) )
 
 def getGroupsForUser( username ):
   return __getGroupsWithAttr( 'Users', username )
@@ -66,13 +148,9 @@ def getGroupsWithProperty( propName ):
   return __getGroupsWithAttr( "Properties", propName )
 
 def getHostnameForDN( dn ):
-  retVal = gConfig.getSections( "%s/Hosts" % gBaseRegistrySection )
-  if not retVal[ 'OK' ]:
-    return retVal
-  hostList = retVal[ 'Value' ]
-  for hostname in hostList:
-    if dn in gConfig.getValue( "%s/Hosts/%s/DN" % ( gBaseRegistrySection, hostname ), [] ):
-      return S_OK( hostname )
+  hostname = __getRegistryIndex()[ 'DNHosts' ].get( dn )
+  if hostname:
+    return S_OK( hostname )
   return S_ERROR( "No hostname found for dn %s" % dn )
 
 def getDefaultUserGroup():
@@ -110,11 +188,16 @@ def getAllGroups():
     return []
   return retVal[ 'Value' ]
 
+def __getGroupListOption( groupName, optName, defaultValue ):
+  values = __getRegistryIndex()[ 'GroupOptions' ].get( groupName, {} ).get( optName )
+  if values is None:
+    return defaultValue
+  return list( values )
+
 def getUsersInGroup( groupName, defaultValue = None ):
   if defaultValue is None:
     defaultValue = []
-  option = "%s/Groups/%s/Users" % ( gBaseRegistrySection, groupName )
-  return gConfig.getValue( option, defaultValue )
+  return __getGroupListOption( groupName, 'Users', defaultValue )
 
 def getUsersInVO( vo, defaultValue = None ):
   if defaultValue is None:
@@ -150,14 +233,15 @@ def getDNsInGroup( groupName ):
 def getPropertiesForGroup( groupName, defaultValue = None ):
   if defaultValue is None:
     defaultValue = []
-  option = "%s/Groups/%s/Properties" % ( gBaseRegistrySection, groupName )
-  return gConfig.getValue( option, defaultValue )
+  return __getGroupListOption( groupName, 'Properties', defaultValue )
 
 def getPropertiesForHost( hostName, defaultValue = None ):
   if defaultValue is None:
     defaultValue = []
-  option = "%s/Hosts/%s/Properties" % ( gBaseRegistrySection, hostName )
-  return gConfig.getValue( option, defaultValue )
+  properties = __getRegistryIndex()[ 'HostProperties' ].get( hostName )
+  if properties is None:
+    return defaultValue
+  return list( properties )
 
 def getPropertiesForEntity( group, name = "", dn = "", defaultValue = None ):
   if defaultValue is None:
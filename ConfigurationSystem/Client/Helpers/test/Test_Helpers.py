@@ -2,6 +2,9 @@ import unittest
 import importlib
 from mock import Mock
 
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.Resources import getDIRACPlatform, getCompatiblePlatforms
 
 class HelpersTestCase( unittest.TestCase ):
@@ -78,10 +81,112 @@ class ResourcesSuccess( HelpersTestCase ):
     self.assertEqual( res['Value'], ['plat1', 'xOS1', 'xOS2', 'xOS3'] )
 
 
+class RegistrySuccess( unittest.TestCase ):
+
+  registryCFG = """
+  Registry
+  {
+    DefaultGroup = dirac_user
+    Users
+    {
+      alice
+      {
+        DN = /DC=org/CN=alice, /DC=org/CN=alice2
+      }
+      bob
+      {
+        DN = /DC=org/CN=bob
+      }
+      bobclone
+      {
+        DN = /DC=org/CN=bob
+        DefaultGroup = dirac_prod
+      }
+    }
+    Hosts
+    {
+      host1
+      {
+        DN = /DC=org/CN=host1
+        Properties = TrustedHost, CSAdministrator
+      }
+    }
+    Groups
+    {
+      dirac_user
+      {
+        Users = alice, bob
+        Properties = NormalUser
+        VO = vo1
+      }
+      dirac_prod
+      {
+        Users = bob, bobclone
+        Properties = NormalUser, JobSharing
+        VO = vo1
+      }
+      dirac_admin
+      {
+        Users = alice
+      }
+    }
+  }
+  """
+
+  def setUp( self ):
+    cfg = CFG()
+    cfg.loadFromBuffer( self.registryCFG )
+    gConfigurationData.localCFG = cfg
+    gConfigurationData.sync()
+
+  def tearDown( self ):
+    gConfigurationData.localCFG = CFG()
+    gConfigurationData.remoteCFG = CFG()
+    gConfigurationData.mergedCFG = CFG()
+    gConfigurationData.generateNewVersion()
+
+  def test_users( self ):
+    self.assertEqual( Registry.getUsernameForDN( '/DC=org/CN=alice2' )['Value'], 'alice' )
+    self.assertEqual( Registry.getUsernameForDN( '/DC=org/CN=bob' )['Value'], 'bob' )
+    self.assertEqual( Registry.getUsernameForDN( '/DC=org/CN=bob', [ 'alice', 'bobclone', 'bob' ] )['Value'],
+                      'bobclone' )
+    self.assertFalse( Registry.getUsernameForDN( '/DC=org/CN=bob', [ 'alice' ] )['OK'] )
+    self.assertFalse( Registry.getUsernameForDN( '/DC=org/CN=nobody' )['OK'] )
+    self.assertEqual( Registry.getDNForUsername( 'alice' )['Value'], [ '/DC=org/CN=alice', '/DC=org/CN=alice2' ] )
+    self.assertFalse( Registry.getDNForUsername( 'nobody' )['OK'] )
+
+  def test_groups( self ):
+    self.assertEqual( Registry.getGroupsForUser( 'bob' )['Value'], [ 'dirac_prod', 'dirac_user' ] )
+    self.assertEqual( Registry.getGroupsForVO( 'vo1' )['Value'], [ 'dirac_prod', 'dirac_user' ] )
+    self.assertEqual( Registry.getGroupsWithProperty( 'JobSharing' )['Value'], [ 'dirac_prod' ] )
+    self.assertFalse( Registry.getGroupsForUser( 'nobody' )['OK'] )
+    self.assertEqual( Registry.findDefaultGroupForDN( '/DC=org/CN=alice' )['Value'], 'dirac_user' )
+    self.assertEqual( Registry.findDefaultGroupForUser( 'bobclone' )['Value'], 'dirac_prod' )
+    self.assertEqual( Registry.getUsersInGroup( 'dirac_prod' ), [ 'bob', 'bobclone' ] )
+    self.assertEqual( Registry.getPropertiesForGroup( 'dirac_admin' ), [] )
+    self.assertEqual( Registry.getPropertiesForGroup( 'nogroup', [ 'Default' ] ), [ 'Default' ] )
+    # Results can be modified without altering the configuration
+    Registry.getUsersInGroup( 'dirac_prod' ).append( 'alice' )
+    self.assertEqual( Registry.getUsersInGroup( 'dirac_prod' ), [ 'bob', 'bobclone' ] )
+
+  def test_hosts( self ):
+    self.assertEqual( Registry.getHostnameForDN( '/DC=org/CN=host1' )['Value'], 'host1' )
+    self.assertFalse( Registry.getHostnameForDN( '/DC=org/CN=alice' )['OK'] )
+    self.assertEqual( Registry.getPropertiesForHost( 'host1' ), [ 'TrustedHost', 'CSAdministrator' ] )
+    self.assertEqual( Registry.getPropertiesForHost( 'host2' ), [] )
+
+  def test_configurationChange( self ):
+    self.assertFalse( Registry.getUsernameForDN( '/DC=org/CN=carol' )['OK'] )
+    gConfigurationData.setOptionInCFG( '/Registry/Users/carol/DN', '/DC=org/CN=carol' )
+    gConfigurationData.setOptionInCFG( '/Registry/Groups/dirac_user/Users', 'alice, bob, carol' )
+    self.assertEqual( Registry.getUsernameForDN( '/DC=org/CN=carol' )['Value'], 'carol' )
+    self.assertEqual( Registry.getGroupsForUser( 'carol' )['Value'], [ 'dirac_user' ] )
+
 
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase( HelpersTestCase )
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( ResourcesSuccess ) )
+  suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( RegistrySuccess ) )
   testResult = unittest.TextTestRunner( verbosity = 2 ).run( suite )
 
 # EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#
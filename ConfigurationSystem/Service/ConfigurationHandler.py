@@ -42,6 +42,22 @@ class ConfigurationHandler(RequestHandler):
       retDict['data'] = gServiceInterface.getCompressedConfigurationData()
     return S_OK(retDict)
 
+  types_getCompressedModificationsIfNewer = [basestring]
+
+  def export_getCompressedModificationsIfNewer(self, sClientVersion):
+    """ Like getCompressedDataIfNewer, but sending the modifications from the client version
+        when they are available, with the digest of the resulting configuration
+    """
+    sVersion = gServiceInterface.getVersion()
+    retDict = {'newestVersion': sVersion}
+    if sClientVersion < sVersion:
+      result = gServiceInterface.getCompressedModifications(sClientVersion)
+      if result['OK']:
+        retDict.update(result['Value'])
+      else:
+        retDict['data'] = gServiceInterface.getCompressedConfigurationData()
+    return S_OK(retDict)
+
   types_publishSlaveServer = [basestring]
 
   def export_publishSlaveServer(self, sURL):
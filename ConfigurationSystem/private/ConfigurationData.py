@@ -3,15 +3,16 @@
 
 import os.path
 import zlib
+import hashlib
 import zipfile
 import thread
 import time
 import DIRAC
 
 from DIRAC.Core.Utilities.File import mkDir
-from DIRAC.Core.Utilities import List, Time
+from DIRAC.Core.Utilities import List, Time, DEncode
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
-from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.Core.Utilities.CFG import CFG, CFGIndex
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
@@ -26,12 +27,16 @@ class ConfigurationData( object ):
     self.threadingLock = lr.getLock()
     self.runningThreadsNumber = 0
     self.__compressedConfigurationData = None
+    # ( version, CFG, digest ) of the last remote CFGs served, and modifications computed from them
+    self.__remoteCFGHistory = []
+    self.__compressedModifications = {}
     self.configurationPath = "/DIRAC/Configuration"
     self.backupsDir = os.path.join( DIRAC.rootPath, "etc", "csbackup" )
     self._isService = False
     self.localCFG = CFG()
     self.remoteCFG = CFG()
     self.mergedCFG = CFG()
+    self.__mergedCFGIndex = None
     self.remoteServerList = []
     if loadDefaultCFG:
       defaultCFGFile = os.path.join( DIRAC.rootPath, "etc", "dirac.cfg" )
@@ -92,6 +97,29 @@ class ConfigurationData( object ):
     self.unlock()
     self.sync()
 
+  def loadRemoteCFGFromCompressedModifications( self, data, digest ):
+    """
+    Update the remote CFG with the modifications sent by a configuration server
+
+    :param str data: compressed modifications, as returned by getCompressedModifications
+    :param str digest: digest of the server remote CFG, to check the result against
+    """
+    try:
+      modList = DEncode.decode( zlib.decompress( data ) )[0]
+    except Exception as e:
+      return S_ERROR( "Cannot decode configuration modifications: %s" % str( e ) )
+    newRemoteCFG = self.remoteCFG.clone()
+    result = newRemoteCFG.applyModifications( modList )
+    if not result[ 'OK' ]:
+      return result
+    if self.__getCFGDigest( newRemoteCFG ) != digest:
+      return S_ERROR( "Configuration differs from the server one after applying the modifications" )
+    self.lock()
+    self.remoteCFG = newRemoteCFG
+    self.unlock()
+    self.sync()
+    return S_OK()
+
   def loadConfigurationData( self, fileName = False ):
     name = self.getName()
     self.lock()
@@ -145,9 +173,22 @@ class ConfigurationData( object ):
       pass
     return self.dangerZoneEnd( None )
 
+  def getMergedCFGIndex( self ):
+    """
+    Get the index of the options of the merged CFG. sync replaces the merged CFG instead
+    of modifying it, so the index is built once for each new merged CFG, and can be
+    used without entering the danger zone
+    """
+    cfgIndex = self.__mergedCFGIndex
+    mergedCFG = self.mergedCFG
+    if cfgIndex is None or cfgIndex.cfg is not mergedCFG:
+      cfgIndex = CFGIndex( mergedCFG )
+      self.__mergedCFGIndex = cfgIndex
+    return cfgIndex
+
   def extractOptionFromCFG( self, path, cfg = False, disableDangerZones = False ):
     if not cfg:
-      cfg = self.mergedCFG
+      return self.getMergedCFGIndex().getValue( path )
     if not disableDangerZones:
       self.dangerZoneStart()
     try:
@@ -269,11 +310,76 @@ class ConfigurationData( object ):
     self.setOptionInCFG( "%s/MasterServer" % self.configurationPath, sURL, self.remoteCFG )
     self.sync()
 
+  def getHistorySize( self ):
+    try:
+      return int( self.extractOptionFromCFG( "%s/HistorySize" % self.configurationPath, self.mergedCFG ) )
+    except:
+      return 5
+
   def getCompressedData( self ):
     if self.__compressedConfigurationData is None:
-      self.__compressedConfigurationData = zlib.compress( str( self.remoteCFG ), 9 )
+      sData = str( self.remoteCFG )
+      if self._isService:
+        self.__addToRemoteCFGHistory( self.getVersion(), sData )
+      self.__compressedConfigurationData = zlib.compress( sData, 9 )
     return self.__compressedConfigurationData
 
+  @staticmethod
+  def __getCFGDigest( cfg ):
+    return hashlib.md5( str( cfg ) ).hexdigest()
+
+  def __addToRemoteCFGHistory( self, version, sData ):
+    """
+    Keep the remote CFG as clients get it from the served data, to compute the
+    modifications from this version later on
+    """
+    servedCFG = CFG().loadFromBuffer( sData )
+    history = [ entry for entry in self.__remoteCFGHistory if entry[0] != version ]
+    history.append( ( version, servedCFG, self.__getCFGDigest( servedCFG ) ) )
+    self.__remoteCFGHistory = history[ -max( 1, self.getHistorySize() ): ]
+    self.__compressedModifications = {}
+
+  def getCompressedModifications( self, fromVersion ):
+    """
+    Get the modifications to apply to the remote CFG of version fromVersion to get the current one
+
+    :param str fromVersion: version the client has
+    :return: S_OK( { 'newestVersion', 'modifications' (compressed), 'digest' } ), S_ERROR if the
+             version is not in the history or if the modifications are not worth sending
+    """
+    self.getCompressedData()
+    history = self.__remoteCFGHistory
+    if not history:
+      return S_ERROR( "No configuration history" )
+    newestVersion, newestCFG, newestDigest = history[-1]
+    cacheKey = ( fromVersion, newestVersion )
+    result = self.__compressedModifications.get( cacheKey )
+    if result is not None:
+      return result
+
+    for version, oldCFG, _digest in history[:-1]:
+      if version == fromVersion:
+        break
+    else:
+      return S_ERROR( "Version %s is not in the configuration history" % fromVersion )
+
+    modList = oldCFG.getModifications( newestCFG )
+    # Only send modifications that rebuild exactly the current configuration
+    rebuiltCFG = oldCFG.clone()
+    result = rebuiltCFG.applyModifications( modList )
+    if not result[ 'OK' ]:
+      result = S_ERROR( "Cannot apply modifications from version %s: %s" % ( fromVersion, result[ 'Message' ] ) )
+    elif self.__getCFGDigest( rebuiltCFG ) != newestDigest:
+      result = S_ERROR( "Modifications from version %s do not rebuild the configuration" % fromVersion )
+    else:
+      data = zlib.compress( DEncode.encode( modList ), 9 )
+      if len( data ) >= len( self.getCompressedData() ):
+        result = S_ERROR( "Modifications from version %s are bigger than the configuration" % fromVersion )
+      else:
+        result = S_OK( { 'newestVersion' : newestVersion, 'modifications' : data, 'digest' : newestDigest } )
+    self.__compressedModifications[ cacheKey ] = result
+    return result
+
   def isMaster( self ):
     value = self.extractOptionFromCFG( "%s/Master" % self.configurationPath, self.localCFG )
     if value and value.lower() in ( "yes", "true", "y" ):
@@ -19,12 +19,26 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 def _updateFromRemoteLocation(serviceClient):
   gLogger.debug("", "Trying to refresh from %s" % serviceClient.serviceURL)
   localVersion = gConfigurationData.getVersion()
-  retVal = serviceClient.getCompressedDataIfNewer(localVersion)
+  retVal = serviceClient.getCompressedModificationsIfNewer(localVersion)
+  if not retVal['OK'] and "Unknown method" in retVal['Message']:
+    # Server not sending modifications yet
+    retVal = serviceClient.getCompressedDataIfNewer(localVersion)
   if retVal['OK']:
     dataDict = retVal['Value']
     if localVersion < dataDict['newestVersion']:
       gLogger.debug("New version available", "Updating to version %s..." % dataDict['newestVersion'])
-      gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict['data'])
+      if 'modifications' in dataDict:
+        result = gConfigurationData.loadRemoteCFGFromCompressedModifications(dataDict['modifications'],
+                                                                             dataDict['digest'])
+        if not result['OK']:
+          gLogger.verbose("Cannot apply configuration modifications, getting the whole configuration",
+                          result['Message'])
+          retVal = serviceClient.getCompressedData()
+          if not retVal['OK']:
+            return retVal
+          gConfigurationData.loadRemoteCFGFromCompressedMem(retVal['Value'])
+      else:
+        gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict['data'])
       gLogger.debug("Updated to version %s" % gConfigurationData.getVersion())
       gEventDispatcher.triggerEvent("CSNewVersion", dataDict['newestVersion'], threaded=True)
     return S_OK()
@@ -0,0 +1,82 @@
+""" Unit tests for the configuration refresh with modifications
+"""
+
+import unittest
+
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+
+__RCSID__ = "$Id$"
+
+cfgContent = """
+DIRAC
+{
+  # Setup of the tests
+  Setup = Production
+  Configuration
+  {
+    Name = Test
+    Version = 2018-01-01 00:00:00.000000
+  }
+}
+Registry
+{
+  Users
+  {
+%s
+  }
+}
+""" % "\n".join("    user%d\n    {\n      DN = /DC=org/CN=user%d\n    }" % (i, i) for i in range(100))
+
+
+class ConfigurationModificationsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.server = ConfigurationData(False)
+    self.server.setAsService()
+    self.server.loadRemoteCFGFromMem(cfgContent)
+    self.client = ConfigurationData(False)
+    self.client.loadRemoteCFGFromCompressedMem(self.server.getCompressedData())
+    self.clientVersion = self.client.getVersion()
+
+  def __modifyServer(self):
+    self.server.setOptionInCFG("/Registry/Users/user5/DN", "/DC=org/CN=changed", self.server.remoteCFG)
+    self.server.deleteOptionInCFG("/Registry/Users/user7/DN", self.server.remoteCFG)
+    self.server.setOptionInCFG("/Registry/Users/newuser/DN", "/DC=org/CN=newuser", self.server.remoteCFG)
+    self.server.generateNewVersion()
+
+  def test_applyModifications(self):
+    self.__modifyServer()
+    result = self.server.getCompressedModifications(self.clientVersion)
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(result['Value']['newestVersion'], self.server.getVersion())
+    self.assertLess(len(result['Value']['modifications']), len(self.server.getCompressedData()))
+
+    result = self.client.loadRemoteCFGFromCompressedModifications(result['Value']['modifications'],
+                                                                   result['Value']['digest'])
+    self.assertTrue(result['OK'], result.get('Message'))
+    self.assertEqual(self.client.getVersion(), self.server.getVersion())
+    self.assertEqual(self.client.extractOptionFromCFG("/Registry/Users/user5/DN"), "/DC=org/CN=changed")
+    self.assertEqual(self.client.extractOptionFromCFG("/Registry/Users/user7/DN"), None)
+    self.assertEqual(self.client.extractOptionFromCFG("/Registry/Users/newuser/DN"), "/DC=org/CN=newuser")
+    self.assertEqual(str(self.client.remoteCFG), str(CFG().loadFromBuffer(str(self.server.remoteCFG))))
+
+  def test_unknownVersion(self):
+    self.__modifyServer()
+    self.assertFalse(self.server.getCompressedModifications("2000-01-01 00:00:00.000000")['OK'])
+    self.assertFalse(self.server.getCompressedModifications(self.server.getVersion())['OK'])
+
+  def test_wrongDigest(self):
+    self.__modifyServer()
+    result = self.server.getCompressedModifications(self.clientVersion)
+    self.assertTrue(result['OK'], result.get('Message'))
+    result = self.client.loadRemoteCFGFromCompressedModifications(result['Value']['modifications'], "wrong")
+    self.assertFalse(result['OK'])
+    # The client configuration is left untouched
+    self.assertEqual(self.client.getVersion(), self.clientVersion)
+    self.assertEqual(self.client.extractOptionFromCFG("/Registry/Users/user5/DN"), "/DC=org/CN=user5")
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(ConfigurationModificationsTestCase)
+  testResult = unittest.TextTestRunner(verbosity=2).run(suite)
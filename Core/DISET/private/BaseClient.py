@@ -6,15 +6,17 @@ __RCSID__ = "$Id$"
 
 import time
 import thread
+from hashlib import md5
 import DIRAC
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Utilities import List, Network
+from DIRAC.Core.Utilities import List, Network, BDEncode
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServiceFailoverURL
 from DIRAC.Core.Security import CS
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ClientConnectionPool import getGlobalClientConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -38,6 +40,8 @@ class BaseClient(object):
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_KEEP_ALIVE_RPC = "keepAliveRPC"
+  KW_KEEP_ALIVE_RPC_MAX_IDLE = "keepAliveRPCMaxIdle"
 
   __threadConfig = ThreadConfig()
 
@@ -57,6 +61,8 @@ class BaseClient(object):
       :param proxyChain: Specify the proxy chain
       :param skipCACheck: Do not check the CA
       :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+      :param keepAliveRPC: Reuse the connection for successive RPCs if the service allows it
+      :param keepAliveRPCMaxIdle: Maximum number of idle connections kept per URL and credentials
     """
 
     if not isinstance(serviceName, basestring):
@@ -80,10 +86,12 @@ class BaseClient(object):
     self.__nbOfRetry = 3  # by default we try try times
     self.__retryCounter = 1
     self.__bannedUrls = []
+    self.__keepAliveRPC = False
+    self.__keepAliveRPCMaxIdle = 4
     for initFunc in (self.__discoverSetup, self.__discoverVO, self.__discoverTimeout,
                      self.__discoverURL, self.__discoverCredentialsToUse,
                      self.__checkTransportSanity,
-                     self.__setKeepAliveLapse):
+                     self.__setKeepAliveLapse, self.__discoverKeepAliveRPC):
       result = initFunc()
       if not result['OK'] and self.__initStatus['OK']:
         self.__initStatus = result
@@ -208,6 +216,24 @@ class BaseClient(object):
         return S_ERROR("Invalid proxy chain specified on instantiation")
     return S_OK()
 
+  def __discoverKeepAliveRPC(self):
+    """ Discover whether RPC connections should be kept alive and reused.
+        It can be set in the kwargs of the constructor (see KW_KEEP_ALIVE_RPC),
+        or for a given host in the CS /DIRAC/ConnConf/<host>:<port>/keepAliveRPC.
+        The number of idle connections kept per URL and credentials is taken
+        from KW_KEEP_ALIVE_RPC_MAX_IDLE (default 4).
+    """
+    keepAlive = self.kwargs.get(self.KW_KEEP_ALIVE_RPC, False)
+    if isinstance(keepAlive, basestring):
+      keepAlive = keepAlive.lower() in ("y", "yes", "true", "1")
+    self.__keepAliveRPC = bool(keepAlive)
+    try:
+      self.__keepAliveRPCMaxIdle = max(1, int(self.kwargs.get(self.KW_KEEP_ALIVE_RPC_MAX_IDLE,
+                                                              self.__keepAliveRPCMaxIdle)))
+    except (TypeError, ValueError):
+      pass
+    return S_OK()
+
   def __discoverExtraCredentials(self):
     """ Add extra credentials informations.
         * self.__extraCredentials
@@ -417,23 +443,9 @@ and this is thread %s
         We stop after trying self.__nbOfRetry * self.__nbOfUrls
 
     """
-    # Check if the useServerCertificate configuration changed
-    # Note: I am not really sure that  all this block makes
-    # any sense at all since all these variables are
-    # evaluated in __discoverCredentialsToUse
-    if gConfig.useServerCertificate() != self.__useCertificates:
-      if self.__forceUseCertificates is None:
-        self.__useCertificates = gConfig.useServerCertificate()
-        self.kwargs[self.KW_USE_CERTIFICATES] = self.__useCertificates
-        # The server certificate use context changed, rechecking the transport sanity
-        result = self.__checkTransportSanity()
-        if not result['OK']:
-          return result
-
-    # Take all the extra credentials
-    self.__discoverExtraCredentials()
-    if not self.__initStatus['OK']:
-      return self.__initStatus
+    result = self.__refreshCredentials()
+    if not result['OK']:
+      return result
     if self.__enableThreadCheck:
       self.__checkThreadID()
 
@@ -484,6 +496,74 @@ and this is thread %s
 
     return S_OK((trid, transport))
 
+  def __refreshCredentials(self):
+    """ Check if the server certificate use changed and take the extra credentials
+        before connecting or reusing a connection
+    """
+    # Check if the useServerCertificate configuration changed
+    # Note: I am not really sure that  all this block makes
+    # any sense at all since all these variables are
+    # evaluated in __discoverCredentialsToUse
+    if gConfig.useServerCertificate() != self.__useCertificates:
+      if self.__forceUseCertificates is None:
+        self.__useCertificates = gConfig.useServerCertificate()
+        self.kwargs[self.KW_USE_CERTIFICATES] = self.__useCertificates
+        # The server certificate use context changed, rechecking the transport sanity
+        result = self.__checkTransportSanity()
+        if not result['OK']:
+          return result
+
+    # Take all the extra credentials
+    self.__discoverExtraCredentials()
+    return self.__initStatus
+
+  def __getConnectionPoolKey(self):
+    """ Key identifying a connection in the client connection pool:
+        the URL and everything that defines the credentials presented to the server
+    """
+    proxyString = self.kwargs.get(self.KW_PROXY_STRING)
+    if proxyString:
+      proxyString = md5(proxyString).hexdigest()
+    return (self.serviceURL,
+            bool(self.kwargs.get(self.KW_USE_CERTIFICATES)),
+            self.kwargs.get(self.KW_PROXY_LOCATION),
+            proxyString,
+            bool(self.kwargs.get(self.KW_SKIP_CA_CHECK)),
+            str(self.__extraCredentials))
+
+  def _getPooledConnection(self):
+    """ Get a connection kept alive from a previous RPC with the same URL and credentials.
+
+        :return: (trid, transport) or None if keep alive is disabled or there is no idle connection
+    """
+    if not self.__keepAliveRPC:
+      return None
+    if not self.__refreshCredentials()['OK']:
+      return None
+    transport = getGlobalClientConnectionPool().get(self.__getConnectionPoolKey())
+    if not transport:
+      return None
+    gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+    return (getGlobalTransportPool().add(transport), transport)
+
+  def _releaseConnection(self, trid, keepAliveTimeout=0):
+    """ Give the connection back to the client connection pool if the server agreed
+        to keep it alive, disconnect otherwise.
+
+        :param trid: Transport ID in the transportPool
+        :param keepAliveTimeout: seconds the server keeps the connection open, 0 to disconnect
+    """
+    if not keepAliveTimeout or not self.__keepAliveRPC:
+      return self._disconnect(trid)
+    transportPool = getGlobalTransportPool()
+    transport = transportPool.get(trid)
+    if not transport:
+      return
+    # Idle connections are not in the transport pool so no keep alive is sent through them
+    transportPool.remove(trid)
+    getGlobalClientConnectionPool().put(self.__getConnectionPoolKey(), transport,
+                                        keepAliveTimeout, self.__keepAliveRPCMaxIdle)
+
   def _disconnect(self, trid):
     """ Disconnect the connection.
 
@@ -499,6 +579,7 @@ and this is thread %s
           * VO
           * action
           * extraCredentials
+        * options: wire codecs supported, and keep alive request for RPCs
 
         It is kind of a handshake.
 
@@ -515,9 +596,15 @@ and this is thread %s
     """
     if not self.__initStatus['OK']:
       return self.__initStatus
+    # Old services ignore the options, so they neither keep the connection alive
+    # nor switch to another codec than DEncode
+    options = {'codecs': [BDEncode.CODEC_NAME]}
+    if self.__keepAliveRPC and action[0] == "RPC":
+      options['keepAliveRPC'] = True
     stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo),
                         action,
-                        self.__extraCredentials)
+                        self.__extraCredentials,
+                        options)
 
     # Send the connection info and get the answer back
     retVal = transport.sendData(S_OK(stConnectionInfo))
@@ -532,6 +619,9 @@ and this is thread %s
       if 'delegate' in serverRequirements:
         gLogger.debug("A delegation is requested")
         serverReturn = self.__delegateCredentials(transport, serverRequirements['delegate'])
+    # The service accepted one of our codecs for the rest of the exchange
+    if serverReturn['OK'] and serverReturn.get('codec'):
+      transport.setWireCodec(serverReturn['codec'])
     return serverReturn
 
   def __delegateCredentials(self, transport, delegationRequest):
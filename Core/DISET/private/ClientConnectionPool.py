@@ -0,0 +1,145 @@
+""" Client side pool of established connections used by kept alive RPCs.
+
+    Connections are stored by key, the key identifying the service URL and the
+    credentials used to connect to it, so that a connection is only reused by a
+    client that would have established exactly the same one.
+    Each pooled connection is handed out to a single client at a time.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import select
+import socket
+import threading
+
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+
+class ClientConnectionPool(object):
+  """ Keeps idle authenticated transports until they expire
+  """
+
+  # Seconds removed from the server idle timeout so that we never reuse
+  # a connection the server is about to close
+  expiryMargin = 5
+
+  def __init__(self):
+    self.__lock = threading.Lock()
+    # key -> list of ( transport, expiration time )
+    self.__connections = {}
+    self.__stats = {'hits': 0, 'misses': 0, 'expired': 0}
+    result = gThreadScheduler.addPeriodicTask(10, self.__purgeExpired)
+    if not result['OK']:
+      gLogger.fatal("Cannot add task to thread scheduler", result['Message'])
+
+  def get(self, key):
+    """ Get an idle connection for the given key. The connection is removed from the pool.
+
+        :param key: pool key, see BaseClient
+        :return: transport or None if there is no usable connection
+    """
+    now = time.time()
+    while True:
+      self.__lock.acquire()
+      try:
+        idleList = self.__connections.get(key)
+        if not idleList:
+          self.__stats['misses'] += 1
+          return None
+        transport, expiration = idleList.pop()
+        if not idleList:
+          del self.__connections[key]
+      finally:
+        self.__lock.release()
+      alive = expiration > now and self.__isAlive(transport)
+      self.__lock.acquire()
+      try:
+        self.__stats['hits' if alive else 'expired'] += 1
+      finally:
+        self.__lock.release()
+      if alive:
+        return transport
+      self.__close(transport)
+
+  def put(self, key, transport, idleTimeout, maxIdle):
+    """ Give back a connection after a successful RPC
+
+        :param key: pool key, see BaseClient
+        :param transport: established transport
+        :param idleTimeout: seconds the server keeps the connection open
+        :param maxIdle: maximum number of idle connections kept for this key
+    """
+    expiration = time.time() + idleTimeout - self.expiryMargin
+    if expiration <= time.time():
+      self.__close(transport)
+      return
+    self.__lock.acquire()
+    try:
+      idleList = self.__connections.setdefault(key, [])
+      if len(idleList) < maxIdle:
+        idleList.append((transport, expiration))
+        transport = None
+    finally:
+      self.__lock.release()
+    if transport:
+      self.__close(transport)
+
+  def getStats(self):
+    """ Hits, misses and expired connections counters as well as the number of idle connections
+    """
+    self.__lock.acquire()
+    try:
+      stats = dict(self.__stats)
+      stats['idle'] = sum([len(idleList) for idleList in self.__connections.values()])
+    finally:
+      self.__lock.release()
+    return stats
+
+  def __isAlive(self, transport):
+    """ An idle connection must not have anything to read. If it has, the server
+        closed it (or the stream is not usable anymore).
+    """
+    if transport.byteStream:
+      return False
+    try:
+      inList, _outList, _exList = select.select([transport.getSocket()], [], [], 0)
+    except (socket.error, select.error):
+      return False
+    return not inList
+
+  def __close(self, transport):
+    try:
+      transport.close()
+    except Exception:  # pylint: disable=broad-except
+      pass
+
+  def __purgeExpired(self):
+    now = time.time()
+    expired = []
+    self.__lock.acquire()
+    try:
+      for key in list(self.__connections):
+        idleList = self.__connections[key]
+        expired.extend([conn[0] for conn in idleList if conn[1] <= now])
+        idleList = [conn for conn in idleList if conn[1] > now]
+        if idleList:
+          self.__connections[key] = idleList
+        else:
+          del self.__connections[key]
+      self.__stats['expired'] += len(expired)
+    finally:
+      self.__lock.release()
+    for transport in expired:
+      self.__close(transport)
+
+
+gClientConnectionPool = None
+
+
+def getGlobalClientConnectionPool():
+  global gClientConnectionPool
+  if not gClientConnectionPool:
+    gClientConnectionPool = ClientConnectionPool()
+  return gClientConnectionPool
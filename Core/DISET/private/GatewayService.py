@@ -42,6 +42,9 @@ class GatewayService( Service ):
   """
 
   GATEWAY_NAME = "Framework/Gateway"
+  # Connections are not parked after the action (see _processInThread),
+  # so RPC keep alive is never granted whatever the KeepAliveRPC option says
+  SVC_ALLOW_KEEP_ALIVE_RPC = False
 
   def __init__( self ):
     """ Initialize like a real service
@@ -238,8 +241,8 @@ class GatewayService( Service ):
 
   def __forwardRPCCall( self, targetService, clientInitArgs, method, params ):
     if targetService == "Configuration/Server":
-      if method == "getCompressedDataIfNewer":
-        #Relay CS data directly
+      if method in ( "getCompressedDataIfNewer", "getCompressedModificationsIfNewer" ):
+        #Relay CS data directly, the gateway does not keep the history to send modifications
         serviceVersion = gConfigurationData.getVersion()
         retDict = { 'newestVersion' : serviceVersion }
         clientVersion = params[0]
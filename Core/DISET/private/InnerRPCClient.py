@@ -16,6 +16,10 @@ class InnerRPCClient( BaseClient ):
         * sends the method parameters
         * retrieve the result
         * disconnect
+
+      If keep alive RPC is enabled (see BaseClient), the connection is taken from
+      and given back to the client connection pool instead, as long as the service
+      agrees to keep it open.
   """
 
   # Number of times we retry the call.
@@ -33,7 +37,11 @@ class InnerRPCClient( BaseClient ):
 
 
     """
-    retVal = self._connect()
+    pooledConnection = self._getPooledConnection()
+    if pooledConnection:
+      retVal = S_OK( pooledConnection )
+    else:
+      retVal = self._connect()
 
     # Generate the stub which contains all the connection and call options
     stub = ( self._getBaseStub(), functionName, args )
@@ -42,6 +50,7 @@ class InnerRPCClient( BaseClient ):
       return retVal
     # Get the transport connection ID as well as the Transport object
     trid, transport = retVal[ 'Value' ]
+    keepAliveTimeout = 0
     try:
       # Handshake to perform the RPC call for functionName
       retVal = self._proposeAction( transport, ( "RPC", functionName ) )
@@ -49,6 +58,8 @@ class InnerRPCClient( BaseClient ):
         if cmpError( retVal, ENOAUTH ):  # This query is unauthorized
           retVal[ 'rpcStub' ] = stub
           return retVal
+        elif pooledConnection:  # the service closed the kept alive connection, get a new one
+          return self.executeRPC( functionName, args )
         else:  # we have network problem or the service is not responding
           if self.__retry < 3:
             self.__retry += 1
@@ -56,6 +67,7 @@ class InnerRPCClient( BaseClient ):
           else:
             retVal[ 'rpcStub' ] = stub
             return retVal
+      serverKeepAlive = retVal.get( 'keepAliveRPC', 0 )
 
       # Send the arguments to the function
       retVal = transport.sendData( S_OK( args ) )
@@ -65,7 +77,10 @@ class InnerRPCClient( BaseClient ):
       # Get the result of the call and append the stub to it
       receivedData = transport.receiveData()
       if isinstance( receivedData, dict ):
+        # Only reuse a connection after a complete and successful exchange
+        if receivedData.get( 'OK' ):
+          keepAliveTimeout = serverKeepAlive
         receivedData[ 'rpcStub' ] = stub
       return receivedData
     finally:
-      self._disconnect( trid )
+      self._releaseConnection( trid, keepAliveTimeout )
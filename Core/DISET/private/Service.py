@@ -10,11 +10,14 @@
 
 import os
 import time
+import select
+import socket
 import threading
 
 import DIRAC
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities.DErrno import ENOAUTH
+from DIRAC.Core.Utilities import BDEncode
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 from DIRAC.Core.Utilities import Time, MemStat
 from DIRAC.Core.DISET.private.LockManager import LockManager
@@ -38,6 +41,10 @@ class Service( object ):
                         'Message' : 'msg',
                         'Connection' : 'Message' }
   SVC_SECLOG_CLIENT = SecurityLogClient()
+  # Wire codecs the service can switch to, by order of preference
+  SVC_WIRE_CODECS = ( BDEncode.CODEC_NAME, )
+  # Whether RPC connections can be kept alive (see KeepAliveRPC option)
+  SVC_ALLOW_KEEP_ALIVE_RPC = True
 
   def __init__( self, serviceData ):
     """
@@ -70,6 +77,10 @@ class Service( object ):
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    # Kept alive RPC connections: trid -> [ idle since timestamp or False if being served, handshake credentials ]
+    self.__keepAliveConns = {}
+    self.__keepAliveLock = threading.Lock()
+    self.__keepAliveListening = False
 
   def setCloneProcessId( self, cloneId ):
     self.__cloneId = cloneId
@@ -336,31 +347,196 @@ class Service( object ):
       trid = self._transportPool.add( clientTransport )
       if not trid:
         return
-      #Receive and check proposal
-      result = self._receiveAndCheckProposal( trid )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      proposalTuple = result[ 'Value' ]
-      #Instantiate handler
-      result = self._instantiateHandler( trid, proposalTuple )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
+      return self._serveProposal( trid, dict( clientTransport.getConnectingCredentials() ) )
+    finally:
+      self._lockManager.unlockGlobal()
+      if monReport:
+        self.__endReportToMonitoring( *monReport )
+
+  def _processKeepAliveInThread( self, trid, handshakeCreds ):
+    """
+    Serve the next proposal arriving on a kept alive RPC connection.
+    The handshake has already been done, so the credentials are just reset
+    to what was extracted from it before processing the new proposal.
+
+    :param trid: transport id of the kept alive connection
+    :param handshakeCreds: credentials dictionary as it was after the handshake
+    """
+    self._lockManager.lockGlobal()
+    try:
+      monReport = self.__startReportToMonitoring()
+    except Exception:
+      monReport = False
+    try:
+      clientTransport = self._transportPool.get( trid )
+      if not clientTransport:
+        self.__dropKeepAlive( trid )
         return
-      handlerObj = result[ 'Value' ]
-      #Execute the action
-      result = self._processProposal( trid, proposalTuple, handlerObj )
-      #Close the connection if required
-      if result[ 'closeTransport' ] or not result[ 'OK' ]:
-        if not result[ 'OK' ]:
-          gLogger.error( "Error processing proposal", result[ 'Message' ] )
-        self._transportPool.close( trid )
-      return result
+      credDict = clientTransport.getConnectingCredentials()
+      credDict.clear()
+      credDict.update( handshakeCreds )
+      return self._serveProposal( trid, handshakeCreds )
     finally:
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring( *monReport )
 
+  def _serveProposal( self, trid, handshakeCreds ):
+    """
+    Receive, authorize and execute one action proposal on an established connection
+
+    :param trid: transport id of the connection
+    :param handshakeCreds: credentials dictionary as it was after the handshake
+
+    :return: S_OK/S_ERROR of the executed action, None if the proposal was rejected
+    """
+    #Receive and check proposal
+    result = self._receiveAndCheckProposal( trid )
+    if not result[ 'OK' ]:
+      self.__dropKeepAlive( trid )
+      self._transportPool.sendAndClose( trid, result )
+      return
+    proposalTuple = result[ 'Value' ]
+    #Instantiate handler
+    result = self._instantiateHandler( trid, proposalTuple )
+    if not result[ 'OK' ]:
+      self.__dropKeepAlive( trid )
+      self._transportPool.sendAndClose( trid, result )
+      return
+    handlerObj = result[ 'Value' ]
+    #Execute the action
+    result = self._processProposal( trid, proposalTuple, handlerObj )
+    #Close the connection if required
+    if result.get( 'closeTransport' ) or not result[ 'OK' ]:
+      if not result[ 'OK' ]:
+        gLogger.error( "Error processing proposal", result[ 'Message' ] )
+      self.__dropKeepAlive( trid )
+      self._transportPool.close( trid )
+    elif result.get( 'keepAliveRPC' ):
+      #Wait for the next proposal of the client without holding a thread
+      self.__parkKeepAlive( trid, handshakeCreds )
+    return result
+
+  #Kept alive RPC connections
+
+  def __grantKeepAlive( self, trid, proposalTuple ):
+    """
+    Decide whether the connection will be kept open after the RPC to serve
+    further proposals. The client asks for it in the optional fourth element
+    of the proposal, old clients never do.
+    """
+    if proposalTuple[1][0] != 'RPC' or not self.SVC_ALLOW_KEEP_ALIVE_RPC or not self._cfg.getKeepAliveRPC() or \
+       not self.__getProposalOptions( proposalTuple ).get( 'keepAliveRPC' ):
+      #A kept alive connection used for anything else is not kept alive anymore
+      self.__dropKeepAlive( trid )
+      return False
+    self.__keepAliveLock.acquire()
+    try:
+      if trid in self.__keepAliveConns:
+        self.__keepAliveConns[ trid ][0] = False
+        return True
+      if len( self.__keepAliveConns ) >= self._cfg.getMaxKeepAliveConnections():
+        return False
+      self.__keepAliveConns[ trid ] = [ False, {} ]
+      return True
+    finally:
+      self.__keepAliveLock.release()
+
+  def __getProposalOptions( self, proposalTuple ):
+    """ Options sent by the client in the optional fourth element of the proposal
+    """
+    if len( proposalTuple ) < 4 or not isinstance( proposalTuple[3], dict ):
+      return {}
+    return proposalTuple[3]
+
+  def __selectWireCodec( self, proposalTuple ):
+    """ Select a codec offered by the client to encode the rest of the exchange.
+        Old clients don't offer any, so DEncode is kept.
+    """
+    clientCodecs = self.__getProposalOptions( proposalTuple ).get( 'codecs', [] )
+    for codec in self.SVC_WIRE_CODECS:
+      if codec in clientCodecs:
+        return codec
+    return None
+
+  def __dropKeepAlive( self, trid ):
+    self.__keepAliveLock.acquire()
+    try:
+      self.__keepAliveConns.pop( trid, None )
+    finally:
+      self.__keepAliveLock.release()
+
+  def __parkKeepAlive( self, trid, handshakeCreds ):
+    self.__keepAliveLock.acquire()
+    try:
+      self.__keepAliveConns[ trid ] = [ time.time(), handshakeCreds ]
+      if not self.__keepAliveListening:
+        self.__keepAliveListening = True
+        listenThread = threading.Thread( target = self.__listenKeepAliveConnections )
+        listenThread.setDaemon( True )
+        listenThread.start()
+    finally:
+      self.__keepAliveLock.release()
+
+  def __listenKeepAliveConnections( self ):
+    """
+    Watch the idle kept alive connections. When a new proposal arrives it is
+    queued in the thread pool, connections idle for too long are closed.
+    """
+    while True:
+      idleTimeout = self._cfg.getKeepAliveIdleTimeout()
+      now = time.time()
+      expired = []
+      idleConns = {}
+      self.__keepAliveLock.acquire()
+      try:
+        if not self.__keepAliveConns:
+          self.__keepAliveListening = False
+          return
+        for trid, ( idleSince, _creds ) in self.__keepAliveConns.items():
+          if idleSince is False:
+            continue
+          if now - idleSince > idleTimeout:
+            expired.append( trid )
+            del self.__keepAliveConns[ trid ]
+          else:
+            idleConns[ trid ] = self._transportPool.get( trid )
+      finally:
+        self.__keepAliveLock.release()
+      for trid in expired:
+        gLogger.debug( "Closing idle kept alive connection", trid )
+        self._transportPool.close( trid )
+      readyList = []
+      sockets = {}
+      for trid, transport in idleConns.items():
+        if not transport:
+          self.__dropKeepAlive( trid )
+        elif transport.byteStream:
+          readyList.append( trid )
+        else:
+          sockets[ transport.getSocket() ] = trid
+      if not readyList:
+        if not sockets:
+          time.sleep( 1 )
+          continue
+        try:
+          inList, _outList, _exList = select.select( sockets.keys(), [], [], 1 )
+        except ( socket.error, select.error ):
+          time.sleep( 0.001 )
+          continue
+        readyList = [ sockets[ sock ] for sock in inList ]
+      for trid in readyList:
+        self.__keepAliveLock.acquire()
+        try:
+          if trid not in self.__keepAliveConns:
+            continue
+          self.__keepAliveConns[ trid ][0] = False
+          handshakeCreds = self.__keepAliveConns[ trid ][1]
+        finally:
+          self.__keepAliveLock.release()
+        self._stats[ 'queries' ] += 1
+        self._threadPool.generateJobAndQueueIt( self._processKeepAliveInThread,
+                                                args = ( trid, handshakeCreds ) )
 
   def _createIdentityString( self, credDict, clientTransport = None ):
     if 'username' in credDict:
@@ -488,9 +664,19 @@ class Service( object ):
 
   def _processProposal( self, trid, proposalTuple, handlerObj ):
     #Notify the client we're ready to execute the action
-    retVal = self._transportPool.send( trid, S_OK() )
+    #and whether the connection will be kept alive afterwards
+    keepAlive = self.__grantKeepAlive( trid, proposalTuple )
+    acceptance = S_OK()
+    if keepAlive:
+      acceptance[ 'keepAliveRPC' ] = self._cfg.getKeepAliveIdleTimeout()
+    codec = self.__selectWireCodec( proposalTuple )
+    if codec:
+      acceptance[ 'codec' ] = codec
+    retVal = self._transportPool.send( trid, acceptance )
     if not retVal[ 'OK' ]:
       return retVal
+    if codec:
+      self._transportPool.get( trid ).setWireCodec( codec )
 
     messageConnection = False
     if proposalTuple[1] == ( 'Connection', 'new' ):
@@ -516,7 +702,8 @@ class Service( object ):
       if not result[ 'OK' ]:
         self._msgBroker.removeTransport( trid )
 
-    result[ 'closeTransport' ] = not messageConnection or not result[ 'OK' ]
+    result[ 'closeTransport' ] = not ( messageConnection or keepAlive ) or not result[ 'OK' ]
+    result[ 'keepAliveRPC' ] = keepAlive
     return result
 
   def _mbConnect( self, trid, handlerObj = None ):
@@ -74,6 +74,24 @@ class ServiceConfiguration:
     except:
       return 20
 
+  def getKeepAliveRPC( self ):
+    optionValue = self.getOption( "KeepAliveRPC" )
+    if optionValue:
+      return optionValue.lower() in ( "y", "yes", "true", "1" )
+    return False
+
+  def getMaxKeepAliveConnections( self ):
+    try:
+      return int( self.getOption( "MaxKeepAliveConnections" ) )
+    except:
+      return 100
+
+  def getKeepAliveIdleTimeout( self ):
+    try:
+      return int( self.getOption( "KeepAliveIdleTimeout" ) )
+    except:
+      return 30
+
   def getMaxThreadsForMethod( self, actionType, method ):
     try:
       return int( self.getOption( "ThreadLimit/%s/%s" % ( actionType, method ) ) )
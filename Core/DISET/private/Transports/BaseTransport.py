@@ -22,12 +22,11 @@ __RCSID__ = "$Id$"
 
 import time
 import select
-import cStringIO
 from hashlib import md5
 
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Utilities import DEncode
+from DIRAC.Core.Utilities import DEncode, BDEncode
 
 class BaseTransport( object ):
   """ Invokes DEncode for marshaling/unmarshaling of data calls in transit
@@ -61,6 +60,8 @@ class BaseTransport( object ):
         pass
     self.__lastActionTimestamp = time.time()
     self.__lastServerRenewTimestamp = self.__lastActionTimestamp
+    self.__wireCodec = None
+    self.__encode = DEncode.encode
 
   def __updateLastActionTimestamp( self ):
     self.__lastActionTimestamp = time.time()
@@ -71,6 +72,22 @@ class BaseTransport( object ):
   def getKeepAliveLapse( self ):
     return self.__keepAliveLapse
 
+  def setWireCodec( self, codecName ):
+    """ Encode the data sent from now on with the codec agreed with the peer.
+        Received data is decoded with whatever codec it was encoded with.
+
+        :param codecName: BDEncode.CODEC_NAME, or None for DEncode
+    """
+    if codecName == BDEncode.CODEC_NAME:
+      self.__encode = BDEncode.encode
+    else:
+      codecName = None
+      self.__encode = DEncode.encode
+    self.__wireCodec = codecName
+
+  def getWireCodec( self ):
+    return self.__wireCodec
+
   def handshake( self ):
     """ This method is overwritten by SSLTransport if we use a secured transport.
     """
@@ -152,32 +169,58 @@ class BaseTransport( object ):
   def _write( self, buffer ):
     return S_OK( self.oSocket.send( buffer ) )
 
+  def _readInto( self, view, skipReadyCheck = False ):
+    """ Read into a writable buffer (a memoryview on a bytearray).
+        Transports that can't receive in place read at most one packet and copy it.
+
+        :return: S_OK( number of bytes read ) / S_ERROR
+    """
+    retVal = self._read( min( len( view ), self.packetSize ), skipReadyCheck = skipReadyCheck )
+    if not retVal[ 'OK' ]:
+      return retVal
+    rcvData = retVal[ 'Value' ]
+    view[ :len( rcvData ) ] = rcvData
+    return S_OK( len( rcvData ) )
+
+  def __sendBuffer( self, dataToSend ):
+    bytesToSend = len( dataToSend )
+    packSentBytes = 0
+    while packSentBytes < bytesToSend:
+      try:
+        if packSentBytes:
+          result = self._write( buffer( dataToSend, packSentBytes ) )
+        else:
+          result = self._write( dataToSend )
+        if not result[ 'OK' ]:
+          return result
+        sentBytes = result[ 'Value' ]
+      except Exception as e:
+        return S_ERROR( "Exception while sending data: %s" % e )
+      if sentBytes == 0:
+        return S_ERROR( "Connection closed by peer" )
+      packSentBytes += sentBytes
+    return S_OK()
+
   def sendData( self, uData, prefix = False ):
     self.__updateLastActionTimestamp()
-    sCodedData = DEncode.encode( uData )
+    sCodedData = self.__encode( uData )
     if prefix:
-      dataToSend = "%s%s:%s" % ( prefix, len( sCodedData ), sCodedData )
+      header = "%s%s:" % ( prefix, len( sCodedData ) )
     else:
-      dataToSend = "%s:%s" % ( len( sCodedData ), sCodedData )
-    for index in range( 0, len( dataToSend ), self.packetSize ):
-      bytesToSend = min( self.packetSize, len( dataToSend ) - index )
-      packSentBytes = 0
-      while packSentBytes < bytesToSend:
-        try:
-          result = self._write( dataToSend[ index + packSentBytes : index + bytesToSend ] )
-          if not result[ 'OK' ]:
-            return result
-          sentBytes = result[ 'Value' ]
-        except Exception as e:
-          return S_ERROR( "Exception while sending data: %s" % e )
-        if sentBytes == 0:
-          return S_ERROR( "Connection closed by peer" )
-        packSentBytes += sentBytes
-    del sCodedData
-    sCodedData=None
+      header = "%s:" % len( sCodedData )
+    #The header goes with the first packet, so small messages are sent in a single write.
+    #The rest of the payload is sent packet by packet from buffers pointing into the
+    #encoded data, so it is never copied
+    firstPacketSize = max( self.packetSize - len( header ), 0 )
+    result = self.__sendBuffer( header + sCodedData[ :firstPacketSize ] )
+    if not result[ 'OK' ]:
+      return result
+    for index in xrange( firstPacketSize, len( sCodedData ), self.packetSize ):
+      result = self.__sendBuffer( buffer( sCodedData, index, self.packetSize ) )
+      if not result[ 'OK' ]:
+        return result
     return S_OK()
 
-
   def receiveData( self, maxBufferSize = 0, blockAfterKeepAlive = True, idleReceive = False ):
     self.__updateLastActionTimestamp()
     if self.receivedMessages:
@@ -215,38 +258,44 @@ class BaseTransport( object ):
       #From here it must be a real message!
       #Process the size and remove the msg length from the bytestream
       pkgSize = int( self.byteStream[ :iSeparatorPosition ] )
-      pkgData = self.byteStream[ iSeparatorPosition + 1: ]
-      readSize = len( pkgData )
+      pkgStart = iSeparatorPosition + 1
+      readSize = len( self.byteStream ) - pkgStart
       if readSize >= pkgSize:
         #If we already have all the data we need
-        data = pkgData[ :pkgSize ]
-        self.byteStream = pkgData[ pkgSize: ]
+        data = self.byteStream[ pkgStart : pkgStart + pkgSize ]
+        self.byteStream = self.byteStream[ pkgStart + pkgSize: ]
       else:
-        #If we still need to read stuff
-        pkgMem = cStringIO.StringIO()
-        pkgMem.write( pkgData )
+        if maxBufferSize and pkgSize > maxBufferSize:
+          return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
+        #The message is received in place in a buffer. We never read past the end of
+        #the message, so nothing is left in the bytestream. The size comes from the peer,
+        #so the buffer starts at one packet and grows as the data arrives: announcing a
+        #huge message doesn't make us allocate it
+        data = bytearray( min( pkgSize, max( self.packetSize, readSize ) ) )
+        data[ :readSize ] = buffer( self.byteStream, pkgStart )
+        self.byteStream = ""
         #Receive while there's still data to be received
         while readSize < pkgSize:
-          retVal = self._read( pkgSize - readSize, skipReadyCheck = True )
+          if readSize == len( data ):
+            #Doubling the buffer, it is copied a few times only
+            data.extend( bytearray( min( pkgSize, 2 * len( data ) ) - len( data ) ) )
+          dataView = memoryview( data )
+          retVal = self._readInto( dataView[ readSize: ], skipReadyCheck = True )
+          #The buffer can't be resized while a view on it exists
+          del dataView
           if not retVal[ 'OK' ]:
             return retVal
           if not retVal[ 'Value' ]:
             return S_ERROR( "Peer closed connection" )
-          rcvData = retVal[ 'Value' ]
-          readSize += len( rcvData )
-          pkgMem.write( rcvData )
-          if maxBufferSize and readSize > maxBufferSize:
-            return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
-        #Data is here! take it out from the bytestream, dencode and return
-        if readSize == pkgSize:
-          data = pkgMem.getvalue()
-          self.byteStream = ""
-        else: #readSize > pkgSize:
-          pkgMem.seek( 0, 0 )
-          data = pkgMem.read( pkgSize )
-          self.byteStream = pkgMem.read()
+          readSize += retVal[ 'Value' ]
+      #Data is here! dencode and return
       try:
-        data = DEncode.decode( data )[0]
+        if BDEncode.isEncoded( data ):
+          data = BDEncode.decode( data )[0]
+        else:
+          if isinstance( data, bytearray ):
+            data = str( data )
+          data = DEncode.decode( data )[0]
       except Exception as e:
         return S_ERROR( "Could not decode received data: %s" % str( e ) )
       if idleReceive:
@@ -87,19 +87,39 @@ class PlainTransport( BaseTransport ):
       except Exception as e:
         return S_ERROR( "Exception while reading from peer: %s" % str( e ) )
 
-  def _write( self, buffer ):
+  def _readInto( self, view, skipReadyCheck = False ):
+    start = time.time()
+    timeout = False
+    if 'timeout' in self.extraArgsDict:
+      timeout = self.extraArgsDict[ 'timeout' ]
+    while True:
+      if timeout:
+        if time.time() - start > timeout:
+          return S_ERROR( "Socket read timeout exceeded" )
+      try:
+        return S_OK( self.oSocket.recv_into( view ) )
+      except socket.error as e:
+        if e[0] == 11:
+          time.sleep( 0.001 )
+        else:
+          return S_ERROR( "Exception while reading from peer: %s" % str( e ) )
+      except Exception as e:
+        return S_ERROR( "Exception while reading from peer: %s" % str( e ) )
+
+  def _write( self, dataToSend ):
     sentBytes = 0
     timeout = False
     if 'timeout' in self.extraArgsDict:
       timeout = self.extraArgsDict[ 'timeout' ]
     if timeout:
       start = time.time()
-    while sentBytes < len( buffer ):
+    while sentBytes < len( dataToSend ):
       try:
         if timeout:
           if time.time() - start > timeout:
             return S_ERROR( "Socket write timeout exceeded" )
-        sent = self.oSocket.send( buffer[ sentBytes: ] )
+        #buffer avoids copying what is left to send
+        sent = self.oSocket.send( buffer( dataToSend, sentBytes ) )
         if sent == 0:
           return S_ERROR( "Connection closed by peer" )
         if sent > 0:
@@ -4,6 +4,8 @@ __RCSID__ = "$Id$"
 import time
 import copy
 import os.path
+import hashlib
+from collections import OrderedDict
 import GSI
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
 from DIRAC.Core.Utilities.Network import checkHostsMatch
@@ -19,6 +21,16 @@ class SocketInfo:
   __cachedCAsCRLs = False
   __cachedCAsCRLsLastLoaded = 0
   __cachedCAsCRLsLoadLock = LockRing().getLock()
+  # Incremented each time the CAs and CRLs are reloaded
+  __cachedCAsCRLsGeneration = 0
+
+  # Client contexts ready to be used, by credentials, options and CA generation.
+  # Least recently used first, with at most __maxCachedContexts entries
+  __cachedContexts = OrderedDict()
+  __cachedContextsGeneration = 0
+  __maxCachedContexts = 100
+  __cachedContextsLock = LockRing().getLock()
+  __cachedContextsStats = { 'hits' : 0, 'misses' : 0 }
 
 
   def __init__( self, infoDict, sslContext = None ):
@@ -28,12 +40,7 @@ class SocketInfo:
       self.sslContext = sslContext
     else:
       if self.infoDict[ 'clientMode' ]:
-        if 'useCertificates' in self.infoDict and self.infoDict[ 'useCertificates' ]:
-          retVal = self.__generateContextWithCerts()
-        elif 'proxyString' in self.infoDict:
-          retVal = self.__generateContextWithProxyString()
-        else:
-          retVal = self.__generateContextWithProxy()
+        retVal = self.__getClientContext()
       else:
         retVal = self.__generateServerContext()
       if not retVal[ 'OK' ]:
@@ -127,7 +134,110 @@ class SocketInfo:
   def _serverCallback( self, conn, cert, errnum, depth, ok ):
     return ok
 
-  def __getCAStore( self ):
+  @classmethod
+  def getContextCacheStats( cls ):
+    """ Hits and misses of the client context cache, and number of cached contexts
+    """
+    stats = dict( cls.__cachedContextsStats )
+    stats[ 'contexts' ] = len( cls.__cachedContexts )
+    stats[ 'caGeneration' ] = cls.__cachedCAsCRLsGeneration
+    return stats
+
+  def __getCredentialsKey( self ):
+    """ Identify the credentials the client context is built with. Files are
+        identified by path and modification time so that a renewed proxy gets a new context
+
+        :return: tuple, or None if the credentials can't be found
+    """
+    if self.__getValue( 'useCertificates', False ):
+      certKeyTuple = Locations.getHostCertificateAndKeyLocation()
+      if not certKeyTuple:
+        return None
+      files = certKeyTuple
+    elif 'proxyString' in self.infoDict:
+      return ( 'proxyString', hashlib.md5( self.infoDict[ 'proxyString' ] ).hexdigest() )
+    else:
+      proxyPath = self.__getValue( 'proxyLocation', None ) or Locations.getProxyLocation()
+      if not proxyPath:
+        return None
+      files = ( proxyPath, )
+    credKey = []
+    for filePath in files:
+      try:
+        fileStat = os.stat( filePath )
+      except OSError:
+        return None
+      credKey.append( ( filePath, fileStat.st_mtime, fileStat.st_size ) )
+    return tuple( credKey )
+
+  def __getClientContext( self ):
+    """ Get a client context from the cache, or generate it. The key includes the
+        CA store generation, so contexts are regenerated when the CAs are reloaded.
+    """
+    credKey = self.__getCredentialsKey()
+    if credKey is None:
+      # Let the generation report the problem
+      return self.__generateClientContext()
+    skipCACheck = self.__getValue( 'skipCACheck', False )
+    generation = None
+    if not skipCACheck:
+      result = self.__loadCAsCRLs()
+      if not result[ 'OK' ]:
+        return result
+      generation = result[ 'Value' ]
+    contextKey = ( credKey,
+                   bool( skipCACheck ),
+                   bool( self.__getValue( 'gsiEnable', False ) ),
+                   bool( self.__getValue( 'IgnoreCRLs', False ) ),
+                   self.__getValue( 'sslMethod', None ),
+                   self.__getValue( 'sslCiphers', None ),
+                   generation )
+    SocketInfo.__cachedContextsLock.acquire()
+    try:
+      cached = SocketInfo.__cachedContexts.pop( contextKey, None )
+      if cached:
+        SocketInfo.__cachedContexts[ contextKey ] = cached
+        SocketInfo.__cachedContextsStats[ 'hits' ] += 1
+      else:
+        SocketInfo.__cachedContextsStats[ 'misses' ] += 1
+    finally:
+      SocketInfo.__cachedContextsLock.release()
+    if cached:
+      self.sslContext, localCredentialsLocation = cached
+      self.setLocalCredentialsLocation( localCredentialsLocation )
+      return S_OK()
+    result = self.__generateClientContext()
+    if not result[ 'OK' ]:
+      return result
+    # The context is shared once cached, so it can't be changed by each connection
+    self.sslContext.set_session_id( str( hash( contextKey ) ) )
+    SocketInfo.__cachedContextsLock.acquire()
+    try:
+      # When the CAs are reloaded, drop the contexts of older generations and the ones
+      # without CA check, so that credentials that are not used any more are released
+      if generation is not None and generation != SocketInfo.__cachedContextsGeneration:
+        for key in [ key for key in SocketInfo.__cachedContexts if key[-1] != generation ]:
+          del SocketInfo.__cachedContexts[ key ]
+        SocketInfo.__cachedContextsGeneration = generation
+      SocketInfo.__cachedContexts[ contextKey ] = ( self.sslContext, self.getLocalCredentialsLocation() )
+      while len( SocketInfo.__cachedContexts ) > SocketInfo.__maxCachedContexts:
+        SocketInfo.__cachedContexts.popitem( last = False )
+    finally:
+      SocketInfo.__cachedContextsLock.release()
+    return S_OK()
+
+  def __generateClientContext( self ):
+    if 'useCertificates' in self.infoDict and self.infoDict[ 'useCertificates' ]:
+      return self.__generateContextWithCerts()
+    elif 'proxyString' in self.infoDict:
+      return self.__generateContextWithProxyString()
+    return self.__generateContextWithProxy()
+
+  def __loadCAsCRLs( self ):
+    """ Load the CAs and CRLs if they are not cached or the cache is older than 900 seconds
+
+        :return: S_OK( generation of the cached CAs and CRLs )
+    """
     SocketInfo.__cachedCAsCRLsLoadLock.acquire()
     try:
       if not SocketInfo.__cachedCAsCRLs or time.time() - SocketInfo.__cachedCAsCRLsLastLoaded > 900:
@@ -140,7 +250,6 @@ class SocketInfo:
         gLogger.debug( "CAs location is %s" % casPath )
         casFound = 0
         crlsFound = 0
-        SocketInfo.__caStore = GSI.crypto.X509Store()
         for fileName in os.listdir( casPath ):
           filePath = os.path.join( casPath, fileName )
           if not os.path.isfile( filePath ):
@@ -183,10 +292,17 @@ class SocketInfo:
         SocketInfo.__cachedCAsCRLs = ( [ casDict[k][1] for k in casDict ],
                                        [ crlsDict[k] for k in crlsDict ] )
         SocketInfo.__cachedCAsCRLsLastLoaded = time.time()
+        SocketInfo.__cachedCAsCRLsGeneration += 1
     except:
       gLogger.exception( "Failed to init CA store" )
     finally:
       SocketInfo.__cachedCAsCRLsLoadLock.release()
+    return S_OK( SocketInfo.__cachedCAsCRLsGeneration )
+
+  def __getCAStore( self ):
+    result = self.__loadCAsCRLs()
+    if not result[ 'OK' ]:
+      return result
     #Generate CA Store
     caStore = GSI.crypto.X509Store()
     caList = SocketInfo.__cachedCAsCRLs[0]
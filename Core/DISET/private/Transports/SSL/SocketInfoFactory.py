@@ -109,7 +109,6 @@ class SocketInfoFactory(object):
     if 'proxyChain' in socketInfo.infoDict:
       sessionHash.update( "|%s" % socketInfo.infoDict[ 'proxyChain' ].dumpAllToString()[ 'Value' ] )
     sessionId = sessionHash.hexdigest()
-    socketInfo.sslContext.set_session_id( str( hash( sessionId ) ) )
     socketInfo.setSSLSocket( sslSocket )
     if gSessionManager.isValid( sessionId ):
       sslSocket.set_session( gSessionManager.get( sessionId ) )
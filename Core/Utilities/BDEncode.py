@@ -0,0 +1,310 @@
+"""
+Binary encoding and decoding for DISET.
+
+It supports the same types as :mod:`~DIRAC.Core.Utilities.DEncode`, but numbers and
+lengths are packed in binary form, and containers carry their number of elements:
+
+ i -> int (signed 64 bits)
+ I -> long (length and decimal representation)
+ f -> float (IEEE 754 double, so no precision is lost)
+ b -> bool
+ s -> string (length and bytes)
+ u -> unicode (length and utf-8 bytes)
+ z -> datetime, date (d) or time (t)
+ n -> none
+ l -> list
+ t -> tuple
+ d -> dictionary
+
+The encoded data starts with a header containing the format version, which allows to
+tell it apart from DEncode data. Encoding is done in one pass into a single bytearray,
+and decoding reads the numbers in place with the struct module (implemented in C)
+instead of slicing the data. Decoding works on str, and on bytearray or buffer without
+copying the data.
+
+The codec is only used on a connection when both ends agreed on it (see BaseClient and Service),
+so old clients and services keep using DEncode.
+"""
+
+__RCSID__ = "$Id$"
+
+import types
+import struct
+import datetime
+
+# Name negotiated in the action proposal, and header of the encoded data
+CODEC_NAME = "bdenc1"
+HEADER = "\xdb\x01"
+
+_tagInt = struct.Struct("<cq")
+_tagLen = struct.Struct("<cI")
+_tagFloat = struct.Struct("<cd")
+_int = struct.Struct("<q")
+_len = struct.Struct("<I")
+_float = struct.Struct("<d")
+_dateTime = struct.Struct("<HBBBBBI")
+_date = struct.Struct("<HBB")
+_time = struct.Struct("<BBBI")
+
+_dateTimeType = datetime.datetime
+_dateType = datetime.date
+_timeType = datetime.time
+
+g_bEncodeFunctions = {}
+g_bDecodeFunctions = {}
+
+
+def _encodeInt(iValue, buf):
+  """ Encoding ints """
+  buf += _tagInt.pack("i", iValue)
+
+
+def _decodeInt(data, i):
+  """ Decoding ints """
+  return (_int.unpack_from(data, i)[0], i + 8)
+
+
+g_bEncodeFunctions[types.IntType] = _encodeInt
+g_bDecodeFunctions["i"] = _decodeInt
+
+
+def _encodeLong(iValue, buf):
+  """ Encoding longs """
+  sValue = str(iValue)
+  buf += _tagLen.pack("I", len(sValue))
+  buf += sValue
+
+
+def _decodeLong(data, i):
+  """ Decoding longs """
+  end = i + 4 + _len.unpack_from(data, i)[0]
+  return (long(data[i + 4:end]), end)
+
+
+g_bEncodeFunctions[types.LongType] = _encodeLong
+g_bDecodeFunctions["I"] = _decodeLong
+
+
+def _encodeFloat(fValue, buf):
+  """ Encoding floats """
+  buf += _tagFloat.pack("f", fValue)
+
+
+def _decodeFloat(data, i):
+  """ Decoding floats """
+  return (_float.unpack_from(data, i)[0], i + 8)
+
+
+g_bEncodeFunctions[types.FloatType] = _encodeFloat
+g_bDecodeFunctions["f"] = _decodeFloat
+
+
+def _encodeBool(bValue, buf):
+  """ Encoding booleans """
+  buf += "b1" if bValue else "b0"
+
+
+def _decodeBool(data, i):
+  """ Decoding booleans """
+  return (data[i] == "1", i + 1)
+
+
+g_bEncodeFunctions[types.BooleanType] = _encodeBool
+g_bDecodeFunctions["b"] = _decodeBool
+
+
+def _encodeString(sValue, buf):
+  """ Encoding strings """
+  buf += _tagLen.pack("s", len(sValue))
+  buf += sValue
+
+
+def _decodeString(data, i):
+  """ Decoding strings """
+  end = i + 4 + _len.unpack_from(data, i)[0]
+  return (data[i + 4:end], end)
+
+
+g_bEncodeFunctions[types.StringType] = _encodeString
+g_bDecodeFunctions["s"] = _decodeString
+
+
+def _encodeUnicode(uValue, buf):
+  """ Encoding unicode strings """
+  sValue = uValue.encode("utf-8")
+  buf += _tagLen.pack("u", len(sValue))
+  buf += sValue
+
+
+def _decodeUnicode(data, i):
+  """ Decoding unicode strings """
+  end = i + 4 + _len.unpack_from(data, i)[0]
+  return (unicode(data[i + 4:end], "utf-8"), end)
+
+
+g_bEncodeFunctions[types.UnicodeType] = _encodeUnicode
+g_bDecodeFunctions["u"] = _decodeUnicode
+
+
+def _encodeDateTime(oValue, buf):
+  """ Encoding datetime, date and time. Only naive objects can be encoded """
+  if isinstance(oValue, _dateTimeType):
+    if oValue.tzinfo is not None:
+      raise TypeError("Can't encode datetime with tzinfo")
+    buf += "za"
+    buf += _dateTime.pack(oValue.year, oValue.month, oValue.day,
+                          oValue.hour, oValue.minute, oValue.second, oValue.microsecond)
+  elif isinstance(oValue, _dateType):
+    buf += "zd"
+    buf += _date.pack(oValue.year, oValue.month, oValue.day)
+  elif isinstance(oValue, _timeType):
+    if oValue.tzinfo is not None:
+      raise TypeError("Can't encode time with tzinfo")
+    buf += "zt"
+    buf += _time.pack(oValue.hour, oValue.minute, oValue.second, oValue.microsecond)
+  else:
+    raise TypeError("Unexpected type %s while encoding a datetime object" % str(type(oValue)))
+
+
+def _decodeDateTime(data, i):
+  """ Decoding datetime, date and time """
+  dataType = data[i]
+  i += 1
+  if dataType == "a":
+    return (datetime.datetime(*_dateTime.unpack_from(data, i)), i + _dateTime.size)
+  elif dataType == "d":
+    return (datetime.date(*_date.unpack_from(data, i)), i + _date.size)
+  elif dataType == "t":
+    return (datetime.time(*_time.unpack_from(data, i)), i + _time.size)
+  raise ValueError("Unexpected type %s while decoding a datetime object" % dataType)
+
+
+g_bEncodeFunctions[_dateTimeType] = _encodeDateTime
+g_bEncodeFunctions[_dateType] = _encodeDateTime
+g_bEncodeFunctions[_timeType] = _encodeDateTime
+g_bDecodeFunctions["z"] = _decodeDateTime
+
+
+def _encodeNone(_oValue, buf):
+  """ Encoding None """
+  buf += "n"
+
+
+def _decodeNone(_data, i):
+  """ Decoding None """
+  return (None, i)
+
+
+g_bEncodeFunctions[types.NoneType] = _encodeNone
+g_bDecodeFunctions["n"] = _decodeNone
+
+
+def _encodeList(lValue, buf, tag="l"):
+  """ Encoding lists """
+  buf += _tagLen.pack(tag, len(lValue))
+  encFuncs = g_bEncodeFunctions
+  for uObject in lValue:
+    encFuncs[type(uObject)](uObject, buf)
+
+
+def _checkCount(count, data, i):
+  """ Check that the number of elements of a container, read from the data, is possible:
+      each element takes at least one byte. Otherwise a few bytes could make the decoding
+      allocate gigabytes.
+  """
+  if count > len(data) - i:
+    raise ValueError("Container of %d elements is larger than the data left" % count)
+
+
+def _decodeList(data, i):
+  """ Decoding lists """
+  count = _len.unpack_from(data, i)[0]
+  i += 4
+  _checkCount(count, data, i)
+  oL = [None] * count
+  decFuncs = g_bDecodeFunctions
+  for pos in xrange(count):
+    oL[pos], i = decFuncs[data[i]](data, i + 1)
+  return (oL, i)
+
+
+g_bEncodeFunctions[types.ListType] = _encodeList
+g_bDecodeFunctions["l"] = _decodeList
+
+
+def _encodeTuple(tValue, buf):
+  """ Encoding tuples """
+  _encodeList(tValue, buf, "t")
+
+
+def _decodeTuple(data, i):
+  """ Decoding tuples """
+  oL, i = _decodeList(data, i)
+  return (tuple(oL), i)
+
+
+g_bEncodeFunctions[types.TupleType] = _encodeTuple
+g_bDecodeFunctions["t"] = _decodeTuple
+
+
+def _encodeDict(dValue, buf):
+  """ Encoding dictionaries """
+  buf += _tagLen.pack("d", len(dValue))
+  encFuncs = g_bEncodeFunctions
+  for key, value in dValue.iteritems():
+    encFuncs[type(key)](key, buf)
+    encFuncs[type(value)](value, buf)
+
+
+def _decodeDict(data, i):
+  """ Decoding dictionaries """
+  count = _len.unpack_from(data, i)[0]
+  i += 4
+  _checkCount(count, data, i)
+  oD = {}
+  decFuncs = g_bDecodeFunctions
+  for _pos in xrange(count):
+    key, i = decFuncs[data[i]](data, i + 1)
+    oD[key], i = decFuncs[data[i]](data, i + 1)
+  return (oD, i)
+
+
+g_bEncodeFunctions[types.DictType] = _encodeDict
+g_bDecodeFunctions["d"] = _decodeDict
+
+
+def isEncoded(data):
+  """ Check whether the data has been encoded with this module
+
+      :param data: str, bytearray or buffer
+      :return: bool
+  """
+  return data[:2] == HEADER
+
+
+def encode(uObject):
+  """ Encode an object
+
+      :param uObject: object made of the supported types
+      :return: str
+  """
+  buf = bytearray(HEADER)
+  try:
+    g_bEncodeFunctions[type(uObject)](uObject, buf)
+  except KeyError as e:
+    raise TypeError("Can't encode object of type %s" % e)
+  return str(buf)
+
+
+def decode(data):
+  """ Decode data produced by encode
+
+      :param data: str, bytearray or buffer
+      :return: tuple (decoded object, number of bytes used)
+  """
+  # Slicing or indexing a buffer gives str, as for str, without copying the whole data
+  if isinstance(data, bytearray):
+    data = buffer(data)
+  if not isEncoded(data):
+    raise ValueError("Data is not binary encoded")
+  return g_bDecodeFunctions[data[2]](data, 3)
@@ -404,10 +404,20 @@ class CFG( object ):
       dataD = dataV
 
     if not isinstance( dataV, basestring ):
-      optionValue = defaultValue
-    else:
-      optionValue = dataV
+      return defaultValue
+    return self.castOptionValue( dataV, defaultValue )
+
+  @staticmethod
+  def castOptionValue( optionValue, defaultValue = None ):
+    """
+    Cast the value of an option like getOption does
 
+    :type optionValue: string
+    :param optionValue: Value of the option
+    :type defaultValue: optional (any python type)
+    :param defaultValue: Value or type to cast the option value to
+    :return: Value of the option casted to defaultValue type
+    """
     #Return value if existing, defaultValue if not
     if optionValue == defaultValue:
       if defaultValue == None or type( defaultValue ) == types.TypeType:
@@ -478,6 +488,24 @@ class CFG( object ):
       resVal[ sec ] = self[ sec ].getAsDict()
     return resVal
 
+  @gCFGSynchro
+  def getFlatOptions( self, parentPath = "" ):
+    """
+    Get all the options below this CFG with their full path
+
+    :type parentPath: string
+    :param parentPath: Path to prepend to the option names
+    :return: Dictionary containing the option values, keyed by "<parentPath>/<section>/.../<option>"
+    """
+    flatDict = {}
+    for key, value in self.__dataDict.iteritems():
+      keyPath = "%s/%s" % ( parentPath, key )
+      if isinstance( value, basestring ):
+        flatDict[ keyPath ] = value
+      else:
+        flatDict.update( value.getFlatOptions( keyPath ) )
+    return flatDict
+
   @gCFGSynchro
   def appendToOption( self, optionName, value ):
     """
@@ -984,3 +1012,49 @@ class CFG( object ):
       return True
     except Exception:
       return False
+
+
+class CFGIndex( object ):
+  """
+  Read only view of the options of a CFG, indexed by their full path. Lookups do not
+  walk the sections nor take the CFG lock, so the indexed CFG must not be modified
+  """
+
+  def __init__( self, cfg ):
+    """
+    Constructor
+
+    :type cfg: CFG
+    :param cfg: CFG to index
+    """
+    self.cfg = cfg
+    self.__options = cfg.getFlatOptions()
+
+  def getValue( self, optionPath ):
+    """
+    Get the value of an option
+
+    :type optionPath: string
+    :param optionPath: Path to the option, like "/Section/option" or "Section/option"
+    :return: String with the value of the option, or None if it is not defined
+    """
+    value = self.__options.get( optionPath )
+    if value is None:
+      levels = [ level.strip() for level in optionPath.split( "/" ) if level.strip() ]
+      value = self.__options.get( "/%s" % "/".join( levels ) )
+    return value
+
+  def getOption( self, optionPath, defaultValue = None ):
+    """
+    Get option value with default applied, like CFG.getOption
+
+    :type optionPath: string
+    :param optionPath: Path to the option
+    :type defaultValue: optional (any python type)
+    :param defaultValue: Default value for the option if the option is not defined
+    :return: Value of the option casted to defaultValue type, or defaultValue
+    """
+    value = self.getValue( optionPath )
+    if value is None:
+      return defaultValue
+    return CFG.castOptionValue( value, defaultValue )
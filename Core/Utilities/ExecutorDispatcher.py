@@ -1,9 +1,13 @@
 """ Used by the executors for dispatching events (IIUC)
 """
 
+import heapq
+import itertools
 import threading
 import time
 
+from collections import deque
+
 from DIRAC import S_OK, S_ERROR, gLogger
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
@@ -140,6 +144,11 @@ class ExecutorState(object):
 
 
 class ExecutorQueues:
+  """ Waiting queues of the tasks, per executor type
+
+      The queues are deques of ( taskId, queue token ) entries. Deleting a task only forgets its token,
+      its entry being dropped when it reaches the head of the queue, so that all the operations are O(1).
+  """
 
   def __init__(self, log=False):
     if log:
@@ -148,38 +157,56 @@ class ExecutorQueues:
       self.__log = gLogger
     self.__lock = threading.Lock()
     self.__queues = {}
+    self.__queueLengths = {}
     self.__lastUse = {}
+    # taskId -> ( eType, queue token )
     self.__taskInQueue = {}
+    self.__tokens = itertools.count()
 
   def _internals(self):
-    return {'queues': dict(self.__queues),
+    return {'queues': self.getState(),
             'lastUse': dict(self.__lastUse),
-            'taskInQueue': dict(self.__taskInQueue),
+            'taskInQueue': dict((taskId, inQueue[0]) for taskId, inQueue in self.__taskInQueue.items()),
             'locked': self.__lock.locked()}  # pylint: disable=no-member
 
   def getExecutorList(self):
     return [eType for eType in self.__queues]
 
+  def __isQueued(self, eType, taskId, token):
+    """ Whether a queue entry is still valid, or its task has been deleted since
+    """
+    return self.__taskInQueue.get(taskId) == (eType, token)
+
+  def __compact(self, eType):
+    """ Drop the entries of the deleted tasks, when they outnumber the waiting tasks
+    """
+    queue = self.__queues[eType]
+    if len(queue) > 2 * self.__queueLengths[eType] + 100:
+      self.__queues[eType] = deque(entry for entry in queue if self.__isQueued(eType, *entry))
+
   def pushTask(self, eType, taskId, ahead=False):
-    self.__log.verbose("Pushing task %s into waiting queue for executor %s" % (taskId, eType))
+    self.__log.verbose("Pushing task %s into waiting queue for executor %s", "", taskId, eType)
     self.__lock.acquire()
     try:
       if taskId in self.__taskInQueue:
-        if self.__taskInQueue[taskId] != eType:
+        if self.__taskInQueue[taskId][0] != eType:
           errMsg = "Task %s cannot be queued because it's already queued for %s" % (taskId,
-                                                                                    self.__taskInQueue[taskId])
+                                                                                    self.__taskInQueue[taskId][0])
           self.__log.fatal(errMsg)
           return 0
-        return len(self.__queues[eType])
+        return self.__queueLengths[eType]
       if eType not in self.__queues:
-        self.__queues[eType] = []
+        self.__queues[eType] = deque()
+        self.__queueLengths[eType] = 0
       self.__lastUse[eType] = time.time()
+      entry = (taskId, next(self.__tokens))
       if ahead:
-        self.__queues[eType].insert(0, taskId)
+        self.__queues[eType].appendleft(entry)
       else:
-        self.__queues[eType].append(taskId)
-      self.__taskInQueue[taskId] = eType
-      return len(self.__queues[eType])
+        self.__queues[eType].append(entry)
+      self.__taskInQueue[taskId] = (eType, entry[1])
+      self.__queueLengths[eType] += 1
+      return self.__queueLengths[eType]
     finally:
       self.__lock.release()
 
@@ -187,21 +214,27 @@ class ExecutorQueues:
     if not isinstance(eTypes, (list, tuple)):
       eTypes = [eTypes]
     self.__lock.acquire()
+    try:
+      pData = self.__popFirstTask(eTypes)
+    finally:
+      self.__lock.release()
+    if pData:
+      self.__log.verbose("Popped task %s from executor %s waiting queue", "", *pData)
+    return pData
+
+  def __popFirstTask(self, eTypes):
+    """ Pop the first task waiting for one of the executor types, the lock being held
+    """
     for eType in eTypes:
-      try:
-        taskId = self.__queues[eType].pop(0)
+      queue = self.__queues.get(eType)
+      while queue:
+        taskId, token = queue.popleft()
+        if not self.__isQueued(eType, taskId, token):
+          continue
         del self.__taskInQueue[taskId]
-        # Found! release and return!
-        self.__lock.release()
+        self.__queueLengths[eType] -= 1
         self.__lastUse[eType] = time.time()
-        self.__log.verbose("Popped task %s from executor %s waiting queue" % (taskId, eType))
         return (taskId, eType)
-      except IndexError:
-        continue
-      except KeyError:
-        continue
-    self.__lock.release()
-    # Not found. release and return None
     return None
 
   def getState(self):
@@ -209,26 +242,22 @@ class ExecutorQueues:
     try:
       qInfo = {}
       for qName in self.__queues:
-        qInfo[qName] = list(self.__queues[qName])
+        qInfo[qName] = [entry[0] for entry in self.__queues[qName] if self.__isQueued(qName, *entry)]
     finally:
       self.__lock.release()
     return qInfo
 
   def deleteTask(self, taskId):
-    self.__log.verbose("Deleting task %s from waiting queues" % taskId)
+    self.__log.verbose("Deleting task %s from waiting queues", "", taskId)
     self.__lock.acquire()
     try:
       try:
-        eType = self.__taskInQueue[taskId]
-        del self.__taskInQueue[taskId]
-        self.__lastUse[eType] = time.time()
+        eType = self.__taskInQueue.pop(taskId)[0]
       except KeyError:
         return False
-      try:
-        iPos = self.__queues[eType].index(taskId)
-      except ValueError:
-        return False
-      del self.__queues[eType][iPos]
+      self.__lastUse[eType] = time.time()
+      self.__queueLengths[eType] -= 1
+      self.__compact(eType)
       return True
     finally:
       self.__lock.release()
@@ -237,7 +266,7 @@ class ExecutorQueues:
     self.__lock.acquire()
     try:
       try:
-        return len(self.__queues[eType])
+        return self.__queueLengths[eType]
       except KeyError:
         return 0
     finally:
@@ -298,7 +327,11 @@ class ExecutorDispatcher:
     self.__freezerLock = threading.Lock()
     self.__tasks = {}
     self.__log = gLogger.getSubLogger("ExecMind")
-    self.__taskFreezer = []
+    # eType -> heap of ( thaw time, freezer token, taskId ) of the tasks frozen for the type
+    self.__taskFreezer = {}
+    # taskId -> freezer token of its entry in the freezer
+    self.__frozenTasks = {}
+    self.__freezerTokens = itertools.count()
     self.__queues = ExecutorQueues(self.__log)
     self.__states = ExecutorState(self.__log)
     self.__cbHolder = ExecutorDispatcherCallbacks()
@@ -331,7 +364,7 @@ class ExecutorDispatcher:
     return {'idMap': dict(self.__idMap),
             'execTypes': dict(self.__execTypes),
             'tasks': sorted(self.__tasks),
-            'freezer': list(self.__taskFreezer),
+            'freezer': sorted(self.__frozenTasks),
             'queues': self.__queues._internals(),
             'states': self.__states._internals(),
             'locked': {'exec': self.__executorsLock.locked(),  # pylint: disable=no-member
@@ -386,7 +419,7 @@ class ExecutorDispatcher:
       self.__fillExecutors(eType)
 
   def removeExecutor(self, eId):
-    self.__log.verbose("Removing executor %s" % eId)
+    self.__log.verbose("Removing executor %s", "", eId)
     self.__executorsLock.acquire()
     try:
       if eId not in self.__idMap:
@@ -415,10 +448,10 @@ class ExecutorDispatcher:
       self.__fillExecutors(eType)
 
   def __freezeTask(self, taskId, errMsg, eType=False, freezeTime=60):
-    self.__log.verbose("Freezing task %s" % taskId)
+    self.__log.verbose("Freezing task %s", "", taskId)
     self.__freezerLock.acquire()
     try:
-      if taskId in self.__taskFreezer:
+      if taskId in self.__frozenTasks:
         return False
       try:
         eTask = self.__tasks[taskId]
@@ -431,7 +464,9 @@ class ExecutorDispatcher:
       eTask.eType = eType
       isFrozen = False
       if eTask.frozenCount < 10:
-        self.__taskFreezer.append(taskId)
+        token = next(self.__freezerTokens)
+        heapq.heappush(self.__taskFreezer.setdefault(eType, []), (eTask.frozenSince + freezeTime, token, taskId))
+        self.__frozenTasks[taskId] = token
         isFrozen = True
     finally:
       self.__freezerLock.release()
@@ -443,16 +478,14 @@ class ExecutorDispatcher:
     return True
 
   def __isFrozen(self, taskId):
-    return taskId in self.__taskFreezer
+    return taskId in self.__frozenTasks
 
   def __removeFromFreezer(self, taskId):
     self.__freezerLock.acquire()
     try:
-      try:
-        iP = self.__taskFreezer.index(taskId)
-      except ValueError:
+      # The entry left in the heap is dropped when it is thawed
+      if self.__frozenTasks.pop(taskId, None) is None:
         return False
-      self.__taskFreezer.pop(iP)
       try:
         eTask = self.__tasks[taskId]
       except KeyError:
@@ -463,43 +496,58 @@ class ExecutorDispatcher:
     return True
 
   def __unfreezeTasks(self, eType=False):
-    iP = 0
-    while iP < len(self.__taskFreezer):
-      self.__freezerLock.acquire()
-      try:
-        try:
-          taskId = self.__taskFreezer[iP]
-        except IndexError:
-          return
-        try:
-          eTask = self.__tasks[taskId]
-        except KeyError:
-          self.__log.notice("Removing task %s from the freezer. Somebody has removed the task" % taskId)
-          self.__taskFreezer.pop(iP)
-          continue
-        # Current taskId/eTask is the one to defrost
-        if eType and eType != eTask.eType:
-          iP += 1
-          continue
-        if time.time() - eTask.frozenSince < eTask.freezeTime:
-          iP += 1
-          continue
-        self.__taskFreezer.pop(iP)
-      finally:
-        self.__freezerLock.release()
-      # Out of the lock zone to minimize zone of exclusion
+    """ Dispatch the frozen tasks whose freezing time is over, for one executor type or for all of them
+    """
+    now = time.time()
+    thawedTasks = []
+    self.__freezerLock.acquire()
+    try:
+      eTypes = [eType] if eType else list(self.__taskFreezer)
+      for frozenType in eTypes:
+        heap = self.__taskFreezer.get(frozenType)
+        while heap and heap[0][0] <= now:
+          _thawTime, token, taskId = heapq.heappop(heap)
+          if self.__frozenTasks.get(taskId) != token:
+            # Removed from the freezer since
+            continue
+          del self.__frozenTasks[taskId]
+          try:
+            thawedTasks.append(self.__tasks[taskId])
+          except KeyError:
+            self.__log.notice("Removing task %s from the freezer. Somebody has removed the task" % taskId)
+        if not heap and frozenType in self.__taskFreezer:
+          del self.__taskFreezer[frozenType]
+      self.__compactFreezer()
+    finally:
+      self.__freezerLock.release()
+    # Out of the lock zone to minimize zone of exclusion
+    for eTask in thawedTasks:
       eTask.frozenTime += time.time() - eTask.frozenSince
-      self.__log.verbose("Unfreezed task %s" % taskId)
-      self.__dispatchTask(taskId, defrozeIfNeeded=False)
+      self.__log.verbose("Unfreezed task %s", "", eTask.taskId)
+      self.__dispatchTask(eTask.taskId, defrozeIfNeeded=False)
+
+  def __compactFreezer(self):
+    """ Drop the entries of the tasks removed from the freezer, when they outnumber the frozen tasks.
+        The freezer lock must be held.
+    """
+    if sum(len(heap) for heap in self.__taskFreezer.itervalues()) <= 2 * len(self.__frozenTasks) + 100:
+      return
+    for frozenType, heap in self.__taskFreezer.items():
+      heap = [entry for entry in heap if self.__frozenTasks.get(entry[2]) == entry[1]]
+      if heap:
+        heapq.heapify(heap)
+        self.__taskFreezer[frozenType] = heap
+      else:
+        del self.__taskFreezer[frozenType]
 
   def __addTaskIfNew(self, taskId, taskObj):
     self.__tasksLock.acquire()
     try:
       if taskId in self.__tasks:
-        self.__log.verbose("Task %s was already known" % taskId)
+        self.__log.verbose("Task %s was already known", "", taskId)
         return False
       self.__tasks[taskId] = ExecutorDispatcher.ETask(taskId, taskObj)
-      self.__log.verbose("Added task %s" % taskId)
+      self.__log.verbose("Added task %s", "", taskId)
       return True
     finally:
       self.__tasksLock.release()
@@ -511,7 +559,7 @@ class ExecutorDispatcher:
       return None
 
   def __dispatchTask(self, taskId, defrozeIfNeeded=True):
-    self.__log.verbose("Dispatching task %s" % taskId)
+    self.__log.verbose("Dispatching task %s", "", taskId)
     # If task already in executor skip
     if self.__states.getExecutorOfTask(taskId):
       return S_OK()
@@ -532,17 +580,17 @@ class ExecutorDispatcher:
 
     eType = result['Value']
     if not eType:
-      self.__log.verbose("No more executors for task %s" % taskId)
+      self.__log.verbose("No more executors for task %s", "", taskId)
       return self.removeTask(taskId)
 
-    self.__log.verbose("Next executor type is %s for task %s" % (eType, taskId))
+    self.__log.verbose("Next executor type is %s for task %s", "", eType, taskId)
     if eType not in self.__execTypes:
       if self.__freezeOnUnknownExecutor:
-        self.__log.verbose("Executor type %s has not connected. Freezing task %s" % (eType, taskId))
+        self.__log.verbose("Executor type %s has not connected. Freezing task %s", "", eType, taskId)
         self.__freezeTask(taskId, "Unknown executor %s type" % eType,
                           eType=eType, freezeTime=0)
         return S_OK()
-      self.__log.verbose("Executor type %s has not connected. Forgetting task %s" % (eType, taskId))
+      self.__log.verbose("Executor type %s has not connected. Forgetting task %s", "", eType, taskId)
       return self.removeTask(taskId)
 
     self.__queues.pushTask(eType, taskId)
@@ -580,7 +628,7 @@ class ExecutorDispatcher:
   def __getNextExecutor(self, taskId):
     try:
       eTask = self.__tasks[taskId]
-    except IndexError:
+    except KeyError:
       msg = "Task %s was deleted prematurely while being dispatched" % taskId
       self.__log.error("Task was deleted prematurely while being dispatched", "%s" % taskId)
       return S_ERROR(msg)
@@ -617,20 +665,15 @@ class ExecutorDispatcher:
     try:
       self.__tasks.pop(taskId)
     except KeyError:
-      self.__log.verbose("Task %s is already removed" % taskId)
+      self.__log.verbose("Task %s is already removed", "", taskId)
       return S_OK()
-    self.__log.verbose("Removing task %s" % taskId)
+    self.__log.verbose("Removing task %s", "", taskId)
     eId = self.__states.getExecutorOfTask(taskId)
     self.__queues.deleteTask(taskId)
     self.__states.removeTask(taskId)
     self.__freezerLock.acquire()
     try:
-      try:
-        self.__taskFreezer.pop(self.__taskFreezer.index(taskId))
-      except KeyError:
-        pass
-      except ValueError:
-        pass
+      self.__frozenTasks.pop(taskId, None)
     finally:
       self.__freezerLock.release()
     if eId:
@@ -718,7 +761,7 @@ class ExecutorDispatcher:
       self.__log.error("Task seems to have been removed while being processed!", "%s" % taskId)
       self.__sendTaskToExecutor(eId, eType)
       return S_OK()
-    self.__log.verbose("Executor %s processed task %s" % (eId, taskId))
+    self.__log.verbose("Executor %s processed task %s", "", eId, taskId)
     result = self.__dispatchTask(taskId)
     self.__sendTaskToExecutor(eId, eType)
     return result
@@ -732,7 +775,7 @@ class ExecutorDispatcher:
       self.__log.info("Executor %s says it's processed task %s but it didn't have it" % (eId, taskId))
       self.__sendTaskToExecutor(eId)
       return S_OK()
-    self.__log.verbose("Executor %s did NOT process task %s, retrying" % (eId, taskId))
+    self.__log.verbose("Executor %s did NOT process task %s, retrying", "", eId, taskId)
     try:
       self.__tasks[taskId].retries += 1
     except KeyError:
@@ -742,9 +785,9 @@ class ExecutorDispatcher:
 
   def __fillExecutors(self, eType, defrozeIfNeeded=True):
     if defrozeIfNeeded:
-      self.__log.verbose("Unfreezing tasks for %s" % eType)
+      self.__log.verbose("Unfreezing tasks for %s", "", eType)
       self.__unfreezeTasks(eType)
-    self.__log.verbose("Filling %s executors" % eType)
+    self.__log.verbose("Filling %s executors", "", eType)
     eId = self.__states.getIdleExecutor(eType)
     while eId:
       result = self.__sendTaskToExecutor(eId, eType)
@@ -754,9 +797,9 @@ class ExecutorDispatcher:
         if not result['Value']:
           # No more tasks for eType
           break
-        self.__log.verbose("Task %s was sent to %s" % (result['Value'], eId))
+        self.__log.verbose("Task %s was sent to %s", "", result['Value'], eId)
       eId = self.__states.getIdleExecutor(eType)
-    self.__log.verbose("No more idle executors for %s" % eType)
+    self.__log.verbose("No more idle executors for %s", "", eType)
 
   def __sendTaskToExecutor(self, eId, eTypes=False, checkIdle=False):
     if checkIdle and self.__states.freeSlots(eId) == 0:
@@ -764,7 +807,7 @@ class ExecutorDispatcher:
     try:
       searchTypes = list(reversed(self.__idMap[eId]))
     except KeyError:
-      self.__log.verbose("Executor %s invalid/disconnected" % eId)
+      self.__log.verbose("Executor %s invalid/disconnected", "", eId)
       return S_ERROR("Invalid executor")
     if eTypes:
       if not isinstance(eTypes, (list, tuple)):
@@ -777,10 +820,10 @@ class ExecutorDispatcher:
         searchTypes.append(eType)
     pData = self.__queues.popTask(searchTypes)
     if pData is None:
-      self.__log.verbose("No more tasks for %s" % eTypes)
+      self.__log.verbose("No more tasks for %s", "", eTypes)
       return S_OK()
     taskId, eType = pData
-    self.__log.verbose("Sending task %s to %s=%s" % (taskId, eType, eId))
+    self.__log.verbose("Sending task %s to %s=%s", "", taskId, eType, eId)
     self.__states.addTask(eId, taskId)
     result = self.__msgTaskToExecutor(taskId, eId, eType)
     if not result['OK']:
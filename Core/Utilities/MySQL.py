@@ -29,17 +29,28 @@
     Returns S_OK or S_ERROR.
 
 
-    _query( cmd, [conn] )
+    _query( cmd, [conn], [params] )
 
     Executes SQL command "cmd".
     Gets a connection from the Queue (or open a new one if none is available),
     the used connection is  back into the Queue.
     If a connection to the the DB is passed as second argument this connection
     is used and is not  in the Queue.
+    If "params" is given, "cmd" is a parameterized statement with a %s placeholder
+    for each of the values in "params", which are escaped by MySQLdb in the client.
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
-    _update( cmd, [conn] )
+    _queryIter( cmd, [batchSize] )
+
+    Executes SQL command "cmd" with a server side cursor.
+    Returns S_OK with a generator in Value, yielding the rows in tuples of at most
+    "batchSize" rows as they are sent by the server, or S_ERROR upon failure.
+    The connection of the calling thread is used until the generator is exhausted
+    or closed, in the meantime the thread can not execute any other command.
+
+
+    _update( cmd, [conn], [params] )
 
     Executes SQL command "cmd" and issue a commit
     Gets a connection from the Queue (or open a new one if none is available),
@@ -90,6 +101,22 @@
       String type values will be appropriately escaped.
 
 
+    insertFieldsBulk( self, tableName, inFields = None, inValues = None, conn = None, inDict = None ):
+
+      Insert many rows in "tableName" with multi-row INSERT statements, each of them
+      below the max_allowed_packet of the server. "inValues" is a list of rows, each of
+      them a list of values for "inFields". Alternatively inDict gives the list of values
+      of each field.
+      Returns S_OK( list of number of inserted rows for each statement )
+
+
+    upsertFieldsBulk( self, tableName, inFields = None, inValues = None, conn = None, inDict = None,
+                      updateFields = None ):
+
+      Same as insertFieldsBulk, the rows with an existing key are updated with the
+      given values of "updateFields" (by default all the fields) instead.
+
+
     updateFields( self, tableName, updateFields = None, updateValues = None,
                   condDict = None,
                   limit = False, conn = None,
@@ -132,6 +159,15 @@
       for compatibility with other methods condDict keyed argument is added
 
 
+    getFieldsIter( self, tableName, outFields = None,
+                   condDict = None,
+                   limit = False,
+                   older = None, newer = None,
+                   timeStamp = None, orderAttribute = None, batchSize = 1000 ):
+
+      Same as getFields, but the rows are streamed with _queryIter
+
+
     getCounters( self, table, attrList, condDict = None, older = None,
                  newer = None, timeStamp = None, connection = False ):
 
@@ -151,6 +187,7 @@ import collections
 import time
 import threading
 import MySQLdb
+import MySQLdb.cursors
 
 from DIRAC import gLogger
 from DIRAC import S_OK, S_ERROR
@@ -207,6 +244,24 @@ def _quotedList( fieldList = None ):
   return ', '.join( quotedFields )
 
 
+class _LoggedCommand( object ):
+  """
+    Command to be logged, the password being hidden and the command truncated
+    only if the message is actually displayed
+  """
+
+  def __init__( self, command, password, maxLength = None ):
+    self.command = command
+    self.password = password
+    self.maxLength = maxLength
+
+  def __str__( self ):
+    command = self.command.replace( self.password, '**********' )
+    if self.maxLength is not None:
+      command = command[:min( len( self.command ), self.maxLength )]
+    return command
+
+
 class MySQL( object ):
   """
   Basic multithreaded DIRAC MySQL Client Class
@@ -331,6 +386,26 @@ class MySQL( object ):
       except KeyError:
         pass
 
+    def getForEscaping( self, dbName ):
+      """ Get the connection of the current thread for escaping strings. Escaping
+          does not talk to the server, so unlike get the connection is not pinged
+      """
+      try:
+        data = self.__assigned[ self.__thid ]
+      except KeyError:
+        return self.get( dbName )
+      data[2] = time.time()
+      return S_OK( data[0] )
+
+    def touch( self ):
+      """ Flag the connection assigned to the current thread as in use,
+          so that it is not taken back by clean while it is held for a long time
+      """
+      try:
+        self.__assigned[ self.__thid ][2] = time.time()
+      except KeyError:
+        pass
+
     def clean( self, now = False ):
       if not now:
         now = time.time()
@@ -401,6 +476,7 @@ class MySQL( object ):
     self.__passwd = str( passwd )
     self.__dbName = str( dbName )
     self.__port = port
+    self.__maxStatementSize = 0
     cKey = ( self.__hostName, self.__userName, self.__passwd, self.__port )
     if cKey not in MySQL.__connectionPools:
       MySQL.__connectionPools[ cKey ] = MySQL.ConnectionPool( *cKey )
@@ -455,17 +531,18 @@ class MySQL( object ):
       return False
 
 
-  def __escapeString( self, myString ):
+  def __escapeString( self, myString, connection = None ):
     """
     To be used for escaping any MySQL string before passing it to the DB
     this should prevent passing non-MySQL accepted characters to the DB
     It also includes quotation marks " around the given string
     """
 
-    retDict = self._getConnection()
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
+    if not connection:
+      retDict = self.__getEscapeConnection()
+      if not retDict['OK']:
+        return retDict
+      connection = retDict['Value']
 
     try:
       myString = str( myString )
@@ -520,6 +597,16 @@ class MySQL( object ):
     return S_OK()
 
 
+  def __getEscapeConnection( self ):
+    """ Connection used for escaping, without round trip to the server if the thread has one
+    """
+    if not self.__initialized:
+      error = 'DB not properly initialized'
+      gLogger.error( error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    return self.__connectionPool.getForEscaping( self.__dbName )
+
   def _escapeString( self, myString, conn = None ):
     """
       Wrapper around the internal method __escapeString
@@ -540,16 +627,21 @@ class MySQL( object ):
     if not inValues:
       return S_OK( inEscapeValues )
 
+    retDict = self.__getEscapeConnection()
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
     for value in inValues:
       if isinstance( value, basestring ):
-        retDict = self.__escapeString( value )
+        retDict = self.__escapeString( value, connection )
         if not retDict['OK']:
           return retDict
         inEscapeValues.append( retDict['Value'] )
       elif isinstance( value, ( tuple, list )):
         tupleValues = []
         for v in list( value ):
-          retDict = self.__escapeString( v )
+          retDict = self.__escapeString( v, connection )
           if not retDict['OK']:
             return retDict
           tupleValues.append( retDict['Value'] )
@@ -557,7 +649,7 @@ class MySQL( object ):
       elif isinstance( value, bool ):
         inEscapeValues = [str( value )]
       else:
-        retDict = self.__escapeString( str( value ) )
+        retDict = self.__escapeString( str( value ), connection )
         if not retDict['OK']:
           return retDict
         inEscapeValues.append( retDict['Value'] )
@@ -596,20 +688,22 @@ class MySQL( object ):
       return self._except( '_connect', x, 'Could not connect to DB.' )
 
 
-  def _query( self, cmd, conn = None, debug = False ):
+  def _query( self, cmd, conn = None, debug = False, params = None ):
     """
     execute MySQL query command
+    if params is given, cmd has a %s placeholder for each of its values, which
+    are escaped in the client (a literal % in cmd must then be written %%)
     return S_OK structure with fetchall result as tuple
     it returns an empty tuple if no matching rows are found
     return S_ERROR upon error
     """
     if debug:
-      self.logger.debug( '_query: %s' % self._safeCmd( cmd ) )
+      self.logger.debug( '_query: %s', '', _LoggedCommand( cmd, self.__passwd ) )
     else:
-      if self.logger.getLevel() == 'DEBUG':
-        self.logger.verbose( '_query: %s' % self._safeCmd( cmd ) )
-      else:
-        self.logger.verbose( '_query: %s' % self._safeCmd( cmd )[:min( len( cmd ) , 512 )] )
+      maxLength = None if self.logger.getLevel() == 'DEBUG' else 512
+      self.logger.verbose( '_query: %s', '', _LoggedCommand( cmd, self.__passwd, maxLength ) )
+    if params is not None:
+      self.logger.debug( '_query: parameters %s', '', params )
 
     if gDebugFile:
       start = time.time()
@@ -621,7 +715,7 @@ class MySQL( object ):
 
     try:
       cursor = connection.cursor()
-      if cursor.execute( cmd ):
+      if cursor.execute( cmd, params ):
         res = cursor.fetchall()
       else:
         res = ()
@@ -635,10 +729,10 @@ class MySQL( object ):
       else:
         if debug:
           self.logger.debug( '_query: Total %d records returned' % len( res ) )
-          self.logger.debug( '_query: %s ...' % str( res[:10] ) )
+          self.logger.debug( '_query: %s ...', '', res[:10] )
         else:
           self.logger.verbose( '_query: Total %d records returned' % len( res ) )
-          self.logger.verbose( '_query: %s ...' % str( res[:10] ) )
+          self.logger.verbose( '_query: %s ...', '', res[:10] )
 
       retDict = S_OK( res )
     except BaseException as x:
@@ -657,18 +751,77 @@ class MySQL( object ):
     return retDict
 
 
-  def _update( self, cmd, conn = None, debug = False ):
+  def _queryIter( self, cmd, batchSize = 1000, conn = None, debug = False, params = None ):
+    """
+    execute MySQL query command with a server side cursor, the rows are not
+    fetched all at once but sent by the server while they are consumed
+    return S_OK structure with a generator yielding tuples of at most batchSize rows
+    return S_ERROR upon error while executing the command
+    params can be given as for _query
+
+    The connection of the calling thread is held until the generator is exhausted
+    or closed (or garbage collected), and the thread can not execute any other
+    command with it in the meantime. MySQLdb.Error is raised by the generator
+    if the connection breaks while fetching the rows.
+    """
+    if debug:
+      self.logger.debug( '_queryIter: %s', '', _LoggedCommand( cmd, self.__passwd ) )
+    else:
+      self.logger.verbose( '_queryIter: %s', '', _LoggedCommand( cmd, self.__passwd, 512 ) )
+
+    retDict = self._getConnection()
+    if not retDict['OK']:
+      return retDict
+    connection = retDict[ 'Value' ]
+
+    cursor = None
+    try:
+      cursor = connection.cursor( MySQLdb.cursors.SSCursor )
+      cursor.execute( cmd, params )
+    except BaseException as x:
+      self.log.warn( '_queryIter: %s' % self._safeCmd( cmd ) )
+      retDict = self._except( '_queryIter', x, 'Execution failed.' )
+      try:
+        cursor.close()
+      except BaseException:
+        pass
+      return retDict
+
+    return S_OK( self.__iterRows( cursor, max( 1, batchSize ) ) )
+
+  def __iterRows( self, cursor, batchSize ):
+    """ Generator fetching the rows of an executed server side cursor
+        Closing the cursor reads whatever rows are left, so that the connection can be used again
+    """
+    totalRows = 0
+    try:
+      while True:
+        rows = cursor.fetchmany( batchSize )
+        if not rows:
+          break
+        totalRows += len( rows )
+        self.__connectionPool.touch()
+        yield rows
+    finally:
+      self.logger.verbose( '_queryIter: Total %d records returned' % totalRows )
+      try:
+        cursor.close()
+      except BaseException:
+        pass
+
+  def _update( self, cmd, conn = None, debug = False, params = None ):
     """ execute MySQL update command
+        if params is given, cmd has a %s placeholder for each of its values, see _query
         return S_OK with number of updated registers upon success
         return S_ERROR upon error
     """
     if debug:
-      self.logger.debug( '_update: %s' % self._safeCmd( cmd ) )
+      self.logger.debug( '_update: %s', '', _LoggedCommand( cmd, self.__passwd ) )
     else:
-      if self.logger.getLevel() == 'DEBUG':
-        self.logger.verbose( '_update: %s' % self._safeCmd( cmd ) )
-      else:
-        self.logger.verbose( '_update: %s' % self._safeCmd( cmd )[:min( len( cmd ) , 512 )] )
+      maxLength = None if self.logger.getLevel() == 'DEBUG' else 512
+      self.logger.verbose( '_update: %s', '', _LoggedCommand( cmd, self.__passwd, maxLength ) )
+    if params is not None:
+      self.logger.debug( '_update: parameters %s', '', params )
 
     if gDebugFile:
       start = time.time()
@@ -680,7 +833,7 @@ class MySQL( object ):
 
     try:
       cursor = connection.cursor()
-      res = cursor.execute( cmd )
+      res = cursor.execute( cmd, params )
       # connection.commit()
       if debug:
         self.log.debug( '_update:', res )
@@ -1272,24 +1425,15 @@ class MySQL( object ):
     return condition
 
 #############################################################################
-  def getFields( self, tableName, outFields = None,
-                 condDict = None,
-                 limit = False, conn = None,
-                 older = None, newer = None,
-                 timeStamp = None, orderAttribute = None,
-                 greater = None, smaller = None ):
+  def __getFieldsCmd( self, methodName, tableName, outFields, condDict, limit,
+                      older, newer, timeStamp, orderAttribute, greater, smaller ):
     """
-      Select "outFields" from "tableName" with condDict
-      N records can match the condition
-      return S_OK( tuple(Field,Value) )
-      if outFields is None all fields in "tableName" are returned
-      if limit is not False, the given limit is set
-      inValues are properly escaped using the _escape_string method, they can be single values or lists of values.
+      Build the SELECT command of getFields and getFieldsIter
     """
     table = _quotedList( [tableName] )
     if not table:
       error = 'Invalid tableName argument'
-      self.log.warn( 'getFields:', error )
+      self.log.warn( '%s:' % methodName, error )
       return S_ERROR( DErrno.EMYSQL, error )
 
     quotedOutFields = '*'
@@ -1297,10 +1441,10 @@ class MySQL( object ):
       quotedOutFields = _quotedList( outFields )
       if quotedOutFields is None:
         error = 'Invalid outFields arguments'
-        self.log.warn( 'getFields:', error )
+        self.log.warn( '%s:' % methodName, error )
         return S_ERROR( DErrno.EMYSQL, error )
 
-    self.log.verbose( 'getFields:', 'selecting fields %s from table %s.' % ( quotedOutFields, table ) )
+    self.log.verbose( '%s:' % methodName, 'selecting fields %s from table %s.' % ( quotedOutFields, table ) )
 
     if condDict is None:
       condDict = {}
@@ -1318,8 +1462,45 @@ class MySQL( object ):
     except Exception as x:
       return S_ERROR( DErrno.EMYSQL, x )
 
-    return self._query( 'SELECT %s FROM %s %s' %
-                        ( quotedOutFields, table, condition ), conn, debug = True )
+    return S_OK( 'SELECT %s FROM %s %s' % ( quotedOutFields, table, condition ) )
+
+  def getFields( self, tableName, outFields = None,
+                 condDict = None,
+                 limit = False, conn = None,
+                 older = None, newer = None,
+                 timeStamp = None, orderAttribute = None,
+                 greater = None, smaller = None ):
+    """
+      Select "outFields" from "tableName" with condDict
+      N records can match the condition
+      return S_OK( tuple(Field,Value) )
+      if outFields is None all fields in "tableName" are returned
+      if limit is not False, the given limit is set
+      inValues are properly escaped using the _escape_string method, they can be single values or lists of values.
+    """
+    result = self.__getFieldsCmd( 'getFields', tableName, outFields, condDict, limit,
+                                  older, newer, timeStamp, orderAttribute, greater, smaller )
+    if not result['OK']:
+      return result
+
+    return self._query( result['Value'], conn, debug = True )
+
+  def getFieldsIter( self, tableName, outFields = None,
+                     condDict = None,
+                     limit = False,
+                     older = None, newer = None,
+                     timeStamp = None, orderAttribute = None,
+                     greater = None, smaller = None, batchSize = 1000 ):
+    """
+      Same as getFields, but the selected rows are streamed:
+      return S_OK( generator ) yielding tuples of at most batchSize rows, see _queryIter
+    """
+    result = self.__getFieldsCmd( 'getFieldsIter', tableName, outFields, condDict, limit,
+                                  older, newer, timeStamp, orderAttribute, greater, smaller )
+    if not result['OK']:
+      return result
+
+    return self._queryIter( result['Value'], batchSize = batchSize, debug = True )
 
 #############################################################################
   def deleteEntries( self, tableName,
@@ -1479,6 +1660,157 @@ class MySQL( object ):
                          ( table, inFieldString, inValueString ), conn, debug = True )
 
 
+  def _getMaxStatementSize( self ):
+    """
+      Size in bytes that SQL statements should not exceed, derived from
+      the max_allowed_packet of the server
+    """
+    if not self.__maxStatementSize:
+      maxPacket = 1048576
+      result = self._query( 'SELECT @@max_allowed_packet' )
+      if result['OK'] and result['Value']:
+        maxPacket = int( result['Value'][0][0] )
+      # Keep a margin for the packet header and the statement keywords
+      self.__maxStatementSize = max( maxPacket - 1024, 1024 )
+    return self.__maxStatementSize
+
+  def __escapeBulkValue( self, value, connection ):
+    """
+      Escape one value of insertFieldsBulk with the given connection
+    """
+    if value is None:
+      return S_OK( 'NULL' )
+    if isinstance( value, bool ):
+      return S_OK( str( value ) )
+    if isinstance( value, ( int, long ) ):
+      return S_OK( str( value ) )
+    if isinstance( value, float ):
+      return S_OK( repr( value ) )
+    return self.__escapeString( value, connection )
+
+  def __insertBulk( self, methodName, tableName, inFields, inValues, inDict, updateFields, conn,
+                    incrementFields = None ):
+    """
+      Common implementation of insertFieldsBulk and upsertFieldsBulk
+    """
+    table = _quotedList( [tableName] )
+    if not table:
+      error = 'Invalid tableName argument'
+      self.log.warn( '%s:' % methodName, error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    if inDict:
+      if not isinstance( inDict, dict ):
+        error = 'inDict must be a of Type DictType'
+        self.log.warn( '%s:' % methodName, error )
+        return S_ERROR( DErrno.EMYSQL, error )
+      inFields = list( inFields or [] ) + inDict.keys()
+      columns = [ inDict[field] for field in inDict ]
+      if inValues:
+        columns = zip( *inValues ) + columns
+      if len( set( len( column ) for column in columns ) ) > 1:
+        error = 'All the inDict values must have the same length'
+        self.log.warn( '%s:' % methodName, error )
+        return S_ERROR( DErrno.EMYSQL, error )
+      inValues = zip( *columns )
+
+    inFieldString = _quotedList( inFields )
+    if inFieldString is None:
+      error = 'Invalid inFields arguments'
+      self.log.warn( '%s:' % methodName, error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    if not inValues:
+      return S_OK( [] )
+
+    suffix = ''
+    if updateFields is not None:
+      incrementFields = incrementFields or []
+      if not updateFields and not incrementFields:
+        updateFields = inFields
+      quotedUpdateFields = [ _quotedList( [field] ) for field in updateFields ]
+      quotedIncrementFields = [ _quotedList( [field] ) for field in incrementFields ]
+      if None in quotedUpdateFields or None in quotedIncrementFields:
+        error = 'Invalid updateFields arguments'
+        self.log.warn( '%s:' % methodName, error )
+        return S_ERROR( DErrno.EMYSQL, error )
+      updates = [ '%s = VALUES(%s)' % ( field, field ) for field in quotedUpdateFields ]
+      updates += [ '%s = %s + VALUES(%s)' % ( field, field, field ) for field in quotedIncrementFields ]
+      suffix = ' ON DUPLICATE KEY UPDATE %s' % ', '.join( updates )
+
+    retDict = self.__getEscapeConnection()
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    prefix = 'INSERT INTO %s ( %s ) VALUES ' % ( table, inFieldString )
+    maxRowsSize = self._getMaxStatementSize() - len( prefix ) - len( suffix )
+    nFields = len( inFields )
+
+    self.log.verbose( '%s:' % methodName, 'inserting %d rows of ( %s ) into table %s'
+                      % ( len( inValues ), inFieldString, table ) )
+
+    # Escape the rows and send them as soon as the statement is big enough
+    affectedRows = []
+    rowStrings = []
+    rowsSize = 0
+    for row in inValues:
+      if len( row ) != nFields:
+        return S_ERROR( DErrno.EMYSQL, 'Mismatch between inFields and inValues.' )
+      escapedRow = []
+      for value in row:
+        retDict = self.__escapeBulkValue( value, connection )
+        if not retDict['OK']:
+          self.log.warn( '%s:' % methodName, retDict['Message'] )
+          return retDict
+        escapedRow.append( retDict['Value'] )
+      rowString = '(%s)' % ','.join( escapedRow )
+      if rowStrings and rowsSize + len( rowString ) + 1 > maxRowsSize:
+        result = self._update( prefix + ','.join( rowStrings ) + suffix, conn )
+        if not result['OK']:
+          return result
+        affectedRows.append( result['Value'] )
+        rowStrings = []
+        rowsSize = 0
+      rowStrings.append( rowString )
+      rowsSize += len( rowString ) + 1
+
+    result = self._update( prefix + ','.join( rowStrings ) + suffix, conn )
+    if not result['OK']:
+      return result
+    affectedRows.append( result['Value'] )
+    return S_OK( affectedRows )
+
+  def insertFieldsBulk( self, tableName, inFields = None, inValues = None, conn = None, inDict = None ):
+    """
+      Insert many rows in "tableName" with as few multi-row INSERT statements as possible,
+      the size of each of them being limited by the max_allowed_packet of the server.
+
+      :param str tableName: table name
+      :param list inFields: names of the fields
+      :param list inValues: list of rows, each one being a list of values for inFields
+      :param dict inDict: alternatively (or in addition), list of values for each field name
+      :return: S_OK( list with the number of inserted rows for each statement ) / S_ERROR
+               If a statement fails, the rows of the previous statements stay inserted
+
+      String type values will be appropriately escaped, None values are inserted as NULL.
+    """
+    return self.__insertBulk( 'insertFieldsBulk', tableName, inFields, inValues, inDict, None, conn )
+
+  def upsertFieldsBulk( self, tableName, inFields = None, inValues = None, conn = None, inDict = None,
+                        updateFields = None, incrementFields = None ):
+    """
+      Same as insertFieldsBulk, but using INSERT ... ON DUPLICATE KEY UPDATE: the rows
+      clashing with an existing unique key update the "updateFields" of the existing row
+      with their values, and add their values to the "incrementFields" of the existing row.
+      By default, if none of them is given, all the fields are updated.
+
+      :return: S_OK( list with the affected rows for each statement ) / S_ERROR
+               (as counted by MySQL: 1 for each inserted row, 2 for each updated one)
+    """
+    return self.__insertBulk( 'upsertFieldsBulk', tableName, inFields, inValues, inDict,
+                              updateFields or [], conn, incrementFields = incrementFields )
+
   def executeStoredProcedure( self, packageName, parameters, outputIds ):
     conDict = self._getConnection()
     if not conDict['OK']:
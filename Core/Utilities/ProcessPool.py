@@ -44,6 +44,14 @@ or alternatively by using ProcessTask instance:::
 
   pool.queueTask( task )
 
+Many small tasks can also be queued at once:::
+
+  pool.queueTasks( [ task1, task2, ... ] )
+
+in which case they are sent to the workers in chunks (of at most :prefetchLimit: tasks, a
+ProcessPool c'tor argument), and their results are sent back in chunks too, which saves most of
+the inter-process communication overhead when the tasks are short.
+
 where parameters are:
 
   :param funcDef: callable by object definition (function, lambda, class with __call__ slot defined
@@ -66,6 +74,11 @@ and process their result call::
 
 This function will block until all requests are finished and their result values have been processed.
 
+Statistics about the queuing latency and execution time of the tasks whose results have been
+processed are available with::
+
+  pool.getStatistics()
+
 It is also possible to set the ProcessPool in daemon mode, in which all results are automatically
 processed as soon they are available, just after finalization of task execution. To enable this mode one
 has to call::
@@ -107,6 +120,8 @@ import os
 import signal
 import Queue
 import errno
+import shutil
+import tempfile
 from types import FunctionType, TypeType, ClassType
 
 try:
@@ -131,14 +146,27 @@ except ImportError:
     return {'OK': False, 'Message': mess}
 
 
+# # upper limits (in seconds) of the task run time histogram bins
+RUNTIME_BINS = (0.1, 1, 10, 60, 600)
+
+
+def getSharedMemoryDir():
+  """ directory used to pass the large task results between processes, memory backed if possible
+  """
+  if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+    return "/dev/shm"
+  return None
+
+
 class WorkingProcess(multiprocessing.Process):
   """
   .. class:: WorkingProcess
 
   WorkingProcess is a class that represents activity that runs in a separate process.
 
-  It is running main thread (process) in daemon mode, reading tasks from :pendingQueue:, executing
-  them and pushing back tasks with results to the :resultsQueue:. If task has got a timeout value
+  It is running main thread (process) in daemon mode, reading tasks (or chunks of tasks) from :pendingQueue:,
+  executing them and pushing back tasks with results to the :resultsQueue:, the results of a chunk of tasks being
+  sent back at once. If task has got a timeout value
   defined a separate threading.Timer thread is started killing execution (and destroying worker)
   after :ProcessTask.__timeOut: seconds.
 
@@ -147,11 +175,15 @@ class WorkingProcess(multiprocessing.Process):
     * on every failed read attempt (from empty  :pendingQueue:), the  idle loop counter is increased,
       worker is terminated when counter is reaching a value of 10;
     * when stopEvent is set (so ProcessPool is in draining mode),
-    * when parent process PID is set to 1 (init process, parent process with ProcessPool is dead).
+    * when parent process PID is set to 1 (init process, parent process with ProcessPool is dead),
+    * when :maxTasks: tasks have been processed, if set, so that the ProcessPool replaces it with a fresh one.
+
+  When a task times out, the tasks of its chunk which are not processed yet are put back to the :pendingQueue:.
 
   """
 
-  def __init__(self, pendingQueue, resultsQueue, stopEvent, keepRunning):
+  def __init__(self, pendingQueue, resultsQueue, stopEvent, keepRunning, maxTasks=0, largeResultSize=0,
+               resultsDir=None):
     """ c'tor
 
     :param self: self reference
@@ -161,6 +193,10 @@ class WorkingProcess(multiprocessing.Process):
     :type resultsQueue: multiprocessing.Queue
     :param stopEvent: event to stop processing
     :type stopEvent: multiprocessing.Event
+    :param int maxTasks: number of tasks to process before exiting (default = 0, no limit)
+    :param int largeResultSize: size in bytes above which string results are passed through
+                                a temporary file rather than the results queue (default = 0, never)
+    :param str resultsDir: directory of the temporary files (default = system temporary directory)
     """
     multiprocessing.Process.__init__(self)
     # # daemonize
@@ -177,6 +213,11 @@ class WorkingProcess(multiprocessing.Process):
     self.__stopEvent = stopEvent
     # # keep process running until stop event
     self.__keepRunning = keepRunning
+    # # number of tasks to process before exiting
+    self.__maxTasks = maxTasks
+    # # results passed through temporary files
+    self.__largeResultSize = largeResultSize
+    self.__resultsDir = resultsDir
     # # placeholder for watchdog thread
     self.__watchdogThread = None
     # # placeholder for process thread
@@ -230,6 +271,57 @@ class WorkingProcess(multiprocessing.Process):
     if self.task:
       self.task.process()
 
+  def __sendResults(self, results, chunked):
+    """
+    Put processed tasks to the results queue, at once if they come from a chunk
+
+    :param self: self reference
+    :param list results: processed tasks
+    :param bool chunked: results of a chunk of tasks
+    """
+    if not results:
+      return
+    if chunked:
+      self.__resultsQueue.put(results)
+    else:
+      self.__resultsQueue.put(results[0])
+
+  def __flushResults(self, results, timeout=5):
+    """
+    Wait for the results put to the results queue to be written before the worker is killed.
+    If they can't be written in time, their temporary files are removed as nobody would read them.
+
+    :param self: self reference
+    :param list results: processed tasks put to the results queue
+    :param int timeout: seconds to wait
+    """
+    self.__resultsQueue.close()
+    flushThread = threading.Thread(target=self.__resultsQueue.join_thread)
+    flushThread.daemon = True
+    flushThread.start()
+    flushThread.join(timeout)
+    if flushThread.is_alive():
+      for task in results:
+        task.removeResultsFile()
+
+  def __requeueTasks(self, tasks):
+    """
+    Put back to the pending queue tasks that won't be processed by this worker
+
+    :param self: self reference
+    :param list tasks: tasks to requeue
+    :return: list of the tasks that could not be requeued, set with an error result
+    """
+    if not tasks:
+      return []
+    try:
+      self.__pendingQueue.put(tasks, block=True, timeout=5)
+      return []
+    except Queue.Full:
+      for task in tasks:
+        task.setResult(S_ERROR("Task not processed"))
+      return [task for task in tasks if task.hasCallback() or task.hasPoolCallback()]
+
   def run(self):
     """
     Task execution
@@ -268,7 +360,7 @@ class WorkingProcess(multiprocessing.Process):
 
       # # read from queue
       try:
-        task = self.__pendingQueue.get(block=True, timeout=10)
+        queued = self.__pendingQueue.get(block=True, timeout=10)
       except Queue.Empty:
         # # idle loop?
         idleLoopCount += 1
@@ -279,48 +371,64 @@ class WorkingProcess(multiprocessing.Process):
 
       # # toggle __working flag
       self.__working.value = 1
-      # # save task
-      self.task = task
       # # reset idle loop counter
       idleLoopCount = 0
 
-      # # process task in a separate thread
-      self.__processThread = threading.Thread(target=self.__processTask)
-      self.__processThread.start()
-
-      timeout = False
-      noResults = False
-      # # join processThread with or without timeout
-      if self.task.getTimeOut():
-        self.__processThread.join(self.task.getTimeOut() + 10)
-      else:
-        self.__processThread.join()
-
-      # # processThread is still alive? stop it!
-      if self.__processThread.is_alive():
-        self.__processThread._Thread__stop()
-        self.task.setResult(S_ERROR(errno.ETIME, "Timed out"))
-        timeout = True
-      # if the task finished with no results, something bad happened, e.g.
-      # undetected timeout
-      if not self.task.taskResults() and not self.task.taskException():
-        self.task.setResult(S_ERROR("Task produced no results"))
-        noResults = True
-
-      # # check results and callbacks presence, put task to results queue
-      if self.task.hasCallback() or self.task.hasPoolCallback():
-        self.__resultsQueue.put(task)
-      if timeout or noResults:
-        # The task execution timed out, stop the process to prevent it from running
-        # in the background
-        time.sleep(1)
-        os.kill(self.pid, signal.SIGKILL)
-        return
-      # # increase task counter
-      taskCounter += 1
-      self.__taskCounter = taskCounter
+      # # a single task or a chunk of tasks
+      chunked = isinstance(queued, list)
+      tasks = queued if chunked else [queued]
+      results = []
+      for taskIndex, task in enumerate(tasks):
+        # # save task
+        self.task = task
+
+        # # process task in a separate thread
+        self.__processThread = threading.Thread(target=self.__processTask)
+        self.__processThread.start()
+
+        timeout = False
+        noResults = False
+        # # join processThread with or without timeout
+        if self.task.getTimeOut():
+          self.__processThread.join(self.task.getTimeOut() + 10)
+        else:
+          self.__processThread.join()
+
+        # # processThread is still alive? stop it!
+        if self.__processThread.is_alive():
+          self.__processThread._Thread__stop()
+          self.task.setResult(S_ERROR(errno.ETIME, "Timed out"))
+          timeout = True
+        # if the task finished with no results, something bad happened, e.g.
+        # undetected timeout
+        if not self.task.taskResults() and not self.task.taskException():
+          self.task.setResult(S_ERROR("Task produced no results"))
+          noResults = True
+
+        # # check results and callbacks presence, keep task for the results queue
+        if self.task.hasCallback() or self.task.hasPoolCallback():
+          if self.__largeResultSize:
+            self.task.offloadResults(self.__largeResultSize, self.__resultsDir)
+          results.append(task)
+        if timeout or noResults:
+          # The task execution timed out, stop the process to prevent it from running
+          # in the background, the rest of the chunk goes to another worker
+          results += self.__requeueTasks(tasks[taskIndex + 1:])
+          self.__sendResults(results, chunked)
+          self.__flushResults(results)
+          os.kill(self.pid, signal.SIGKILL)
+          return
+        # # increase task counter
+        taskCounter += 1
+        self.__taskCounter = taskCounter
+
+      # # put tasks to results queue
+      self.__sendResults(results, chunked)
       # # toggle __working flag
       self.__working.value = 0
+      # # enough tasks processed, leave the place to a new worker
+      if self.__maxTasks and taskCounter >= self.__maxTasks:
+        return
 
 
 class ProcessTask(object):
@@ -383,6 +491,12 @@ class ProcessTask(object):
     self.__taskException = None
     self.__taskResult = None
     self.__usePoolCallbacks = usePoolCallbacks
+    # # temporary file holding the task results
+    self.__resultFile = None
+    # # time stamps of queuing, start and end of the execution
+    self.__queueTime = None
+    self.__startTime = None
+    self.__endTime = None
 
   def taskResults(self):
     """
@@ -506,6 +620,101 @@ class ProcessTask(object):
     """
     self.__taskResult = result
 
+  def setQueueTime(self):
+    """
+    Record the time the task is queued
+
+    :param self: self reference
+    """
+    self.__queueTime = time.time()
+
+  def getQueueLatency(self):
+    """
+    Time spent by the task waiting for a worker, None if unknown
+
+    :param self: self reference
+    """
+    if self.__queueTime is None or self.__startTime is None:
+      return None
+    return max(0., self.__startTime - self.__queueTime)
+
+  def getRunTime(self):
+    """
+    Time spent executing the task, None if it has not completed
+
+    :param self: self reference
+    """
+    if self.__startTime is None or self.__endTime is None:
+      return None
+    return self.__endTime - self.__startTime
+
+  def offloadResults(self, minSize, tmpDir=None):
+    """
+    Move string results of at least :minSize: bytes to a temporary file, so that they don't
+    have to be pickled and sent through the results queue
+
+    :param self: self reference
+    :param int minSize: minimal size in bytes of the results to move
+    :param str tmpDir: directory of the temporary file (default = system temporary directory)
+    """
+    result = self.__taskResult
+    isDict = isinstance(result, dict) and result.get('OK') and 'Value' in result
+    value = result['Value'] if isDict else result
+    if not isinstance(value, str) or len(value) < minSize:
+      return
+    try:
+      fd, fileName = tempfile.mkstemp(prefix="ProcessTask_", dir=tmpDir)
+      with os.fdopen(fd, "wb") as resultFile:
+        resultFile.write(value)
+    except (IOError, OSError):
+      return
+    self.__resultFile = fileName
+    if isDict:
+      self.__taskResult = dict(result)
+      self.__taskResult['Value'] = None
+    else:
+      self.__taskResult = None
+
+  def reloadResults(self):
+    """
+    Get back results moved to a temporary file by :offloadResults:
+
+    :param self: self reference
+    """
+    if not self.__resultFile:
+      return
+    fileName, self.__resultFile = self.__resultFile, None
+    try:
+      with open(fileName, "rb") as resultFile:
+        value = resultFile.read()
+    except (IOError, OSError) as error:
+      self.__taskResult = S_ERROR("Cannot read task results: %s" % str(error))
+      return
+    finally:
+      try:
+        os.unlink(fileName)
+      except OSError:
+        pass
+    if isinstance(self.__taskResult, dict):
+      self.__taskResult['Value'] = value
+    else:
+      self.__taskResult = value
+
+  def removeResultsFile(self):
+    """
+    Remove the temporary file of results moved by :offloadResults: which won't be reloaded
+
+    :param self: self reference
+    """
+    if not self.__resultFile:
+      return
+    fileName, self.__resultFile = self.__resultFile, None
+    try:
+      os.unlink(fileName)
+    except OSError:
+      pass
+    self.__taskResult = S_ERROR("Task results lost")
+
   def process(self):
     """
     Execute task
@@ -513,6 +722,7 @@ class ProcessTask(object):
     :param self: self reference
     """
     self.__done = True
+    self.__startTime = time.time()
     try:
       # # it's a function?
       if isinstance(self.__taskFunction, FunctionType):
@@ -535,6 +745,7 @@ class ProcessTask(object):
         retDict['Value'] = str(x)
         retDict['Exc_info'] = sys.exc_info()[1]
         self.__taskException = retDict
+    self.__endTime = time.time()
 
 
 class ProcessPool(object):
@@ -585,11 +796,22 @@ class ProcessPool(object):
   :warn: Be carefull and choose wisely :timeout: argument to :ProcessPool.finalize:. Too short time period can
          cause that all workers will be killed.
 
+  Batches
+
+  Tasks queued together with :ProcessPool.queueTasks: are put into the :pendingQueue: as chunks of at most
+  :prefetchLimit: tasks, spread over the available workers. A worker processes the tasks of a chunk one
+  after the other and puts all their results at once to the :resultsQueue:.
+
+  Statistics
+
+  The queuing latency and execution time of the tasks coming back through the :resultsQueue: are accumulated
+  by :ProcessPool.processResults: and returned by :ProcessPool.getStatistics:.
+
   """
 
   def __init__(self, minSize=2, maxSize=0, maxQueuedRequests=10,
                strictLimits=True, poolCallback=None, poolExceptionCallback=None,
-               keepProcessesRunning=True):
+               keepProcessesRunning=True, maxTasksPerWorker=0, prefetchLimit=10, largeResultSize=0):
     """ c'tor
 
     :param self: self reference
@@ -599,6 +821,10 @@ class ProcessPool(object):
     :param bool strictLimits: flag to workers overcommitment
     :param callable poolCallbak: results callback
     :param callable poolExceptionCallback: exception callback
+    :param int maxTasksPerWorker: number of tasks after which a worker is replaced (default = 0, never)
+    :param int prefetchLimit: maximal number of tasks taken at once by a worker from a batch (default = 10)
+    :param int largeResultSize: size in bytes above which string results are passed through a temporary
+                                file (in /dev/shm if available) instead of the results queue (default = 0, never)
     """
     # # min workers
     self.__minSize = max(1, minSize)
@@ -622,9 +848,28 @@ class ProcessPool(object):
     self.__stopEvent = multiprocessing.Event()
     # # keep processes running flag
     self.__keepRunning = keepProcessesRunning
+    # # tasks per worker
+    self.__maxTasksPerWorker = maxTasksPerWorker
+    # # max tasks per chunk
+    self.__prefetchLimit = max(1, prefetchLimit)
+    # # results passed through temporary files, in a directory of the pool
+    # # so that the ones of killed workers can be removed
+    self.__largeResultSize = largeResultSize
+    self.__resultsDir = None
     # # lock
     self.__prListLock = threading.Lock()
 
+    # # tasks statistics
+    self.__statsLock = threading.Lock()
+    self.__stats = {"QueuedTasks": 0,
+                    "ProcessedTasks": 0,
+                    "QueueLatencySum": 0.,
+                    "QueueLatencyCount": 0,
+                    "MaxQueueLatency": 0.,
+                    "RunTimeSum": 0.,
+                    "RunTimeCount": 0,
+                    "RunTimeHistogram": [0] * (len(RUNTIME_BINS) + 1)}
+
     # # workers dict
     self.__workersDict = {}
 
@@ -733,13 +978,39 @@ class ProcessPool(object):
     """
     self.__prListLock.acquire()
     try:
-      worker = WorkingProcess(self.__pendingQueue, self.__resultsQueue, self.__stopEvent, self.__keepRunning)
+      worker = WorkingProcess(self.__pendingQueue, self.__resultsQueue, self.__stopEvent, self.__keepRunning,
+                              self.__maxTasksPerWorker, self.__largeResultSize, self.__getResultsDir())
       while worker.pid is None:
         time.sleep(0.1)
       self.__workersDict[worker.pid] = worker
     finally:
       self.__prListLock.release()
 
+  def __getResultsDir(self):
+    """
+    Directory of the temporary files of large results, created if needed
+
+    :param self: self reference
+    :return: directory path, None if large results are not offloaded or the directory can't be created
+    """
+    if self.__largeResultSize and not self.__resultsDir:
+      try:
+        self.__resultsDir = tempfile.mkdtemp(prefix="ProcessPool_", dir=getSharedMemoryDir())
+      except (IOError, OSError):
+        self.__resultsDir = None
+    return self.__resultsDir
+
+  def __removeResultsDir(self):
+    """
+    Remove the temporary files of results that will never be processed, e.g. the ones of
+    killed or timed out workers
+
+    :param self: self reference
+    """
+    if self.__resultsDir:
+      shutil.rmtree(self.__resultsDir, ignore_errors=True)
+      self.__resultsDir = None
+
   def __cleanDeadProcesses(self):
     """
     Delete references of dead workingProcesses from ProcessPool.__workingProcessList
@@ -792,6 +1063,7 @@ class ProcessPool(object):
     if usePoolCallbacks and (self.__poolCallback or self.__poolExceptionCallback):
       task.enablePoolCallbacks()
 
+    task.setQueueTime()
     self.__prListLock.acquire()
     try:
       self.__pendingQueue.put(task, block=blocking)
@@ -800,12 +1072,53 @@ class ProcessPool(object):
       return S_ERROR("Queue is full")
     finally:
       self.__prListLock.release()
+    self.__countQueued(1)
 
     self.__spawnNeededWorkingProcesses()
     # # throttle a bit to allow task state propagation
     time.sleep(0.1)
     return S_OK()
 
+  def queueTasks(self, tasks, blocking=True, usePoolCallbacks=False):
+    """
+    Enqueue several tasks at once, in chunks spread over the workers
+
+    Each chunk holds at most :prefetchLimit: tasks and is sent to a worker as a single message.
+
+    :param self: self reference
+    :param list tasks: ProcessTask instances to execute
+    :param bool blocking: flag to block if necessary and new empty slot is available (default = block)
+    :param bool usePoolCallbacks: flag to trigger execution of pool callbacks (default = don't execute)
+    :return: S_OK with the number of queued tasks, S_ERROR if none could be queued
+    """
+    for task in tasks:
+      if not isinstance(task, ProcessTask):
+        raise TypeError("Tasks added to the process pool must be ProcessTask instances")
+      if usePoolCallbacks and (self.__poolCallback or self.__poolExceptionCallback):
+        task.enablePoolCallbacks()
+
+    # # enough chunks to keep all the workers busy, but no more than prefetchLimit tasks each
+    chunkSize = min(self.__prefetchLimit, max(1, -(-len(tasks) // self.__maxSize)))
+    queued = 0
+    for start in xrange(0, len(tasks), chunkSize):
+      chunk = tasks[start:start + chunkSize]
+      for task in chunk:
+        task.setQueueTime()
+      self.__prListLock.acquire()
+      try:
+        self.__pendingQueue.put(chunk, block=blocking)
+      except Queue.Full:
+        break
+      finally:
+        self.__prListLock.release()
+      queued += len(chunk)
+      self.__spawnNeededWorkingProcesses()
+    self.__countQueued(queued)
+
+    if tasks and not queued:
+      return S_ERROR("Queue is full")
+    return S_OK(queued)
+
   def createAndQueueTask(self,
                          taskFunction,
                          args=None,
@@ -896,30 +1209,91 @@ class ProcessPool(object):
         if processed == 0:
           log.verbose("Process results, but queue is empty...")
         break
-      # # get task
-      task = self.__resultsQueue.get()
+      # # get task or chunk of tasks
+      tasks = self.__resultsQueue.get()
       log.debug("__resultsQueue.get", 't=%.2f' % (time.time() - start))
-      # # execute callbacks
-      try:
-        task.doExceptionCallback()
-        task.doCallback()
-        log.debug("doCallback", 't=%.2f' % (time.time() - start))
-        if task.usePoolCallbacks():
-          if self.__poolExceptionCallback and task.exceptionRaised():
-            self.__poolExceptionCallback(task.getTaskID(), task.taskException())
-          if self.__poolCallback and task.taskResults():
-            self.__poolCallback(task.getTaskID(), task.taskResults())
-            log.debug("__poolCallback", 't=%.2f' % (time.time() - start))
-      except Exception as error:
-        log.exception("Exception in callback", lException=error)
-        pass
-      processed += 1
+      if not isinstance(tasks, list):
+        tasks = [tasks]
+      for task in tasks:
+        task.reloadResults()
+        self.__countProcessed(task)
+        # # execute callbacks
+        try:
+          task.doExceptionCallback()
+          task.doCallback()
+          log.debug("doCallback", 't=%.2f' % (time.time() - start))
+          if task.usePoolCallbacks():
+            if self.__poolExceptionCallback and task.exceptionRaised():
+              self.__poolExceptionCallback(task.getTaskID(), task.taskException())
+            if self.__poolCallback and task.taskResults():
+              self.__poolCallback(task.getTaskID(), task.taskResults())
+              log.debug("__poolCallback", 't=%.2f' % (time.time() - start))
+        except Exception as error:
+          log.exception("Exception in callback", lException=error)
+          pass
+        processed += 1
     if processed:
       log.info("Processed %d results" % processed)
     else:
       log.debug("No results processed")
     return processed
 
+  def __countQueued(self, nTasks):
+    """
+    Account for queued tasks
+
+    :param self: self reference
+    :param int nTasks: number of tasks queued
+    """
+    with self.__statsLock:
+      self.__stats["QueuedTasks"] += nTasks
+
+  def __countProcessed(self, task):
+    """
+    Account for a task coming back from a worker
+
+    :param self: self reference
+    :param ProcessTask task: processed task
+    """
+    latency = task.getQueueLatency()
+    runTime = task.getRunTime()
+    with self.__statsLock:
+      self.__stats["ProcessedTasks"] += 1
+      if latency is not None:
+        self.__stats["QueueLatencySum"] += latency
+        self.__stats["QueueLatencyCount"] += 1
+        self.__stats["MaxQueueLatency"] = max(self.__stats["MaxQueueLatency"], latency)
+      if runTime is not None:
+        self.__stats["RunTimeSum"] += runTime
+        self.__stats["RunTimeCount"] += 1
+        binIndex = 0
+        while binIndex < len(RUNTIME_BINS) and runTime >= RUNTIME_BINS[binIndex]:
+          binIndex += 1
+        self.__stats["RunTimeHistogram"][binIndex] += 1
+
+  def getStatistics(self):
+    """
+    Statistics of the tasks processed so far
+
+    Only the tasks with callbacks come back from the workers, so they are the only ones
+    with a queuing latency and an execution time.
+
+    :param self: self reference
+    :return: dict with the number of queued and processed tasks, the mean and max queuing
+             latency and the mean execution time in seconds, and the execution time histogram
+             as a dict { "<10s" : nTasks, ... }
+    """
+    with self.__statsLock:
+      stats = dict(self.__stats)
+      histogram = list(self.__stats["RunTimeHistogram"])
+    labels = ["<%ss" % limit for limit in RUNTIME_BINS] + [">=%ss" % RUNTIME_BINS[-1]]
+    return {"QueuedTasks": stats["QueuedTasks"],
+            "ProcessedTasks": stats["ProcessedTasks"],
+            "MeanQueueLatency": stats["QueueLatencySum"] / max(1, stats["QueueLatencyCount"]),
+            "MaxQueueLatency": stats["MaxQueueLatency"],
+            "MeanRunTime": stats["RunTimeSum"] / max(1, stats["RunTimeCount"]),
+            "RunTimeHistogram": dict(zip(labels, histogram))}
+
   def processAllResults(self, timeout=10):
     """
     Process all enqueued tasks at once
@@ -976,6 +1350,8 @@ class ProcessPool(object):
       log.debug("After terminating processes, %d workers still active, timeout = %d, kill them" %
                 (len(self.__workersDict), timeout))
     self.__filicide()
+    # # results left in the queue won't be processed anymore
+    self.__removeResultsDir()
 
   def __filicide(self):
     """
@@ -0,0 +1,80 @@
+""" Unit tests for the CFG options index
+"""
+
+import unittest
+
+from DIRAC.Core.Utilities.CFG import CFG, CFGIndex
+
+__RCSID__ = "$Id$"
+
+cfgContent = """
+DIRAC
+{
+  Setup = Production
+  Flag = yes
+  Configuration
+  {
+    Servers = dips://server1:9135/Configuration/Server, dips://server2:9135/Configuration/Server
+    RefreshTime = 600
+  }
+}
+Operations
+{
+  Defaults
+  {
+    Transformations
+    {
+      DataProcessing = MCSimulation, DataReconstruction
+    }
+  }
+}
+"""
+
+
+class CFGIndexTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.cfg = CFG()
+    self.cfg.loadFromBuffer(cfgContent)
+    self.cfgIndex = CFGIndex(self.cfg)
+
+  def test_getFlatOptions(self):
+    flatOptions = self.cfg.getFlatOptions()
+    self.assertEqual(len(flatOptions), 5)
+    self.assertEqual(flatOptions['/DIRAC/Setup'], 'Production')
+    self.assertEqual(flatOptions['/Operations/Defaults/Transformations/DataProcessing'],
+                     'MCSimulation, DataReconstruction')
+
+  def test_getValue(self):
+    self.assertEqual(self.cfgIndex.getValue('/DIRAC/Setup'), 'Production')
+    self.assertEqual(self.cfgIndex.getValue('DIRAC/Configuration/RefreshTime'), '600')
+    self.assertEqual(self.cfgIndex.getValue('/DIRAC//Configuration/ RefreshTime/'), '600')
+    self.assertEqual(self.cfgIndex.getValue('/DIRAC/Configuration'), None)
+    self.assertEqual(self.cfgIndex.getValue('/DIRAC/Missing'), None)
+    self.assertEqual(self.cfgIndex.getValue('/'), None)
+
+  def test_getOption(self):
+    """ The index gives the same results as CFG.getOption
+    """
+    for path, defaultValue in [('/DIRAC/Setup', None),
+                               ('/DIRAC/Setup', 'Certification'),
+                               ('/DIRAC/Flag', False),
+                               ('/DIRAC/Flag', bool),
+                               ('/DIRAC/Configuration/RefreshTime', 300),
+                               ('/DIRAC/Configuration/RefreshTime', 'NotAnInt'),
+                               ('/DIRAC/Configuration/Servers', []),
+                               ('/DIRAC/Configuration/Servers', list),
+                               ('/DIRAC/Setup', 0),
+                               ('/DIRAC/Configuration', 'Default'),
+                               ('/DIRAC/Missing', []),
+                               ('/DIRAC/Missing', None),
+                               ('Operations/Defaults/Transformations/DataProcessing', [])]:
+      self.assertEqual(self.cfgIndex.getOption(path, defaultValue), self.cfg.getOption(path, defaultValue))
+    self.assertEqual(self.cfgIndex.getOption('/DIRAC/Configuration/RefreshTime', 300), 600)
+    self.assertEqual(self.cfgIndex.getOption('/DIRAC/Configuration/Servers', [])[1],
+                     'dips://server2:9135/Configuration/Server')
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(CFGIndexTestCase)
+  testResult = unittest.TextTestRunner(verbosity=2).run(suite)
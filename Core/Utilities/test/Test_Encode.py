@@ -10,11 +10,13 @@ On the other hand, it can serialize some objects, while DISET cannot.
 
 from string import printable
 import datetime
+import struct
 import sys
 
 
 from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
+from DIRAC.Core.Utilities.BDEncode import encode as binaryEncode, decode as binaryDecode, HEADER as binaryHeader
 
 from hypothesis import given
 from hypothesis.strategies import integers, lists, recursive, floats, text,\
@@ -31,8 +33,9 @@ parametrize = mark.parametrize
 
 disetTuple = (disetEncode, disetDecode)
 jsonTuple = (jsonEncode, jsonDecode)
+binaryTuple = (binaryEncode, binaryDecode)
 
-enc_dec_imp = (disetTuple, jsonTuple)
+enc_dec_imp = (disetTuple, jsonTuple, binaryTuple)
 
 
 # We define a custom datetime strategy in order
@@ -128,7 +131,7 @@ def test_BaseType_DateTime(enc_dec, data):
 
 
 # Json does not serialize keys as integers but as string
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=dictionaries(integers(), integers()))
 def test_BaseType_Dict(enc_dec, data):
   """ Test for basic dict"""
@@ -185,7 +188,7 @@ def test_BaseType_String(enc_dec, data):
 
 
 # Tuple are not serialized in JSON
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=tuples(integers()))
 def test_BaseType_Tuple(enc_dec, data):
   """ Test basic tuple """
@@ -200,7 +203,7 @@ def test_BaseType_Unicode(enc_dec, data):
 
 
 # Json will not pass this because of tuples and integers as dict keys
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=nestedStrategy)
 def test_nestedStructure(enc_dec, data):
   """ Test nested structure """
@@ -224,6 +227,30 @@ def test_NonSerializable(enc_dec):
     agnosticTestFunction(enc_dec, data)
 
 
+@given(data=nestedStrategy)
+def test_binaryDecodeFromBuffer(data):
+  """ Test that the binary encoding can be decoded from a bytearray or a buffer
+  """
+  encodedData = binaryEncode(data)
+  for buf in (bytearray(encodedData), buffer(encodedData)):
+    decodedData, lenData = binaryDecode(buf)
+    assert data == decodedData
+    assert lenData == len(encodedData)
+
+
+@parametrize("tag", ["l", "t", "d"])
+def test_binaryDecodeOversizedCount(tag):
+  """ Test that a container announcing more elements than the data can hold is rejected
+      before anything is allocated for it
+  """
+  with raises(ValueError):
+    binaryDecode(binaryHeader + struct.pack("<cI", tag, 2 ** 32 - 1))
+  # Truncated container: the count fits the data left, but the elements are missing
+  truncatedData = binaryEncode({'a': [1, 2, 3]})[:-9]
+  with raises((ValueError, IndexError, struct.error)):
+    binaryDecode(truncatedData)
+
+
 class Serializable(JSerializable):
   """ Dummy class inheriting from JSerializable"""
 
@@ -6,7 +6,9 @@
 __RCSID__ = "$Id$"
 
 
-from DIRAC.Core.Utilities.ExecutorDispatcher import ExecutorState, ExecutorQueues
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.ExecutorDispatcher import ExecutorState, ExecutorQueues, ExecutorDispatcher, \
+    ExecutorDispatcherCallbacks
 
 
 execState = ExecutorState()
@@ -51,3 +53,67 @@ def test_execQueues():
   for i in xrange(3):
     assert eQ.popTask("type1")[0] == "t1%s" % i
   assert eQ._internals()
+
+
+def test_execQueuesDeletion():
+  """ test of the deletion of tasks from the ExecutorQueues
+  """
+  queues = ExecutorQueues()
+  for i in xrange(4):
+    assert queues.pushTask("type0", "t%s" % i) == i + 1
+  assert queues.deleteTask("t1")
+  assert not queues.deleteTask("t1")
+  assert queues.waitingTasks("type0") == 3
+  # A deleted task queued again is only popped once, at its new position
+  assert queues.pushTask("type0", "t1") == 4
+  assert queues.deleteTask("t2")
+  assert queues.pushTask("type0", "t2", ahead=True) == 4
+  assert queues.getState() == {"type0": ["t2", "t0", "t3", "t1"]}
+  assert [queues.popTask(["type1", "type0"])[0] for _ in xrange(4)] == ["t2", "t0", "t3", "t1"]
+  assert queues.popTask("type0") is None
+  assert queues.waitingTasks("type0") == 0
+
+
+class DispatcherCallbacks(ExecutorDispatcherCallbacks):
+  """ Tasks going through type1 executors only, sent ones recorded
+  """
+
+  def __init__(self):
+    self.sent = []
+
+  def cbDispatch(self, taskId, taskObj, pathExecuted):
+    return S_OK(None if pathExecuted else "type1")
+
+  def cbSendTask(self, taskId, taskObj, eId, eType):
+    self.sent.append(taskId)
+    return S_OK()
+
+
+def test_dispatcherFreezer():
+  """ test of the freezing of tasks in the ExecutorDispatcher
+  """
+  callbacks = DispatcherCallbacks()
+  eDispatch = ExecutorDispatcher()
+  eDispatch.setCallbacks(callbacks)
+  eDispatch.addExecutor("e1", ["type1"], 1)
+
+  assert eDispatch.addTask("t1", {})['OK']
+  assert eDispatch.addTask("t2", {})['OK']
+  assert callbacks.sent == ["t1"]
+  # Frozen for one hour, t2 takes its place
+  assert eDispatch.freezeTask("e1", "t1", 3600)['OK']
+  assert callbacks.sent == ["t1", "t2"]
+  assert eDispatch._internals()['freezer'] == ["t1"]
+  # Frozen for no time, t2 is thawed and queued again at the next dispatch
+  assert eDispatch.freezeTask("e1", "t2", 0)['OK']
+  assert eDispatch._internals()['freezer'] == ["t1", "t2"]
+  assert eDispatch.addTask("t3", {})['OK']
+  assert callbacks.sent == ["t1", "t2", "t3"]
+  assert eDispatch._internals()['freezer'] == ["t1"]
+  assert eDispatch._internals()['queues']['queues'] == {"type1": ["t2"]}
+
+  assert eDispatch.removeTask("t1")['OK']
+  assert eDispatch._internals()['freezer'] == []
+  assert eDispatch.taskProcessed("e1", "t3")['OK']
+  assert callbacks.sent == ["t1", "t2", "t3", "t2"]
+  assert sorted(eDispatch.getTaskIds()) == ["t2"]
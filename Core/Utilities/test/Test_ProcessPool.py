@@ -21,6 +21,7 @@ __RCSID__ = "$Id $"
 
 ## imports 
 import os
+import glob
 import unittest
 import random
 import time
@@ -31,7 +32,7 @@ import threading
 # Script.parseCommandLine()
 from DIRAC import gLogger
 ## SUT
-from DIRAC.Core.Utilities.ProcessPool import ProcessPool
+from DIRAC.Core.Utilities.ProcessPool import ProcessPool, ProcessTask
 
 def ResultCallback( task, taskResult ):
   """ dummy result callback """
@@ -49,6 +50,14 @@ def CallableFunc( taskID, timeWait, raiseException = False ):
     raise Exception( "testException" )
   return timeWait
 
+def PidFunc():
+  """ global function returning the pid of the process executing it """
+  return os.getpid()
+
+def BytesFunc( size ):
+  """ global function returning a string of :size: bytes """
+  return { "OK" : True, "Value" : "x" * size }
+
 class CallableClass( object ):
   """ callable class to be executed in task """
 
@@ -340,6 +349,142 @@ class TaskTimeOutTests( unittest.TestCase ):
     gLock.release()
 
 
+########################################################################
+class WorkerRecyclingTests( unittest.TestCase ):
+  """
+  .. class:: WorkerRecyclingTests
+
+  test case for ProcessPool with a limited number of tasks per worker
+  """
+
+  def setUp( self ):
+    """c'tor
+
+    :param self: self reference
+    """
+    self.pids = []
+    self.processPool = ProcessPool( 1, 1, 8,
+                                    poolCallback = self.poolCallback,
+                                    maxTasksPerWorker = 2 )
+
+  def poolCallback( self, taskID, taskResult ):
+    self.pids.append( taskResult )
+
+  def testMaxTasksPerWorker( self ):
+    """ workers are replaced after maxTasksPerWorker tasks """
+    for i in range( 6 ):
+      result = self.processPool.createAndQueueTask( PidFunc,
+                                                    taskID = i,
+                                                    usePoolCallbacks = True,
+                                                    blocking = True )
+      self.assertTrue( result["OK"] )
+    self.processPool.processAllResults( 30 )
+    self.processPool.finalize( 2 )
+    self.assertEqual( len( self.pids ), 6 )
+    self.assertEqual( len( set( self.pids ) ), 3 )
+    self.assertFalse( os.getpid() in self.pids )
+
+
+########################################################################
+class BatchTests( unittest.TestCase ):
+  """
+  .. class:: BatchTests
+
+  test case for tasks queued in batches
+  """
+
+  def setUp( self ):
+    """c'tor
+
+    :param self: self reference
+    """
+    self.results = {}
+    self.processPool = ProcessPool( 2, 2, 8,
+                                    poolCallback = self.poolCallback,
+                                    prefetchLimit = 4,
+                                    largeResultSize = 1024 )
+
+  def tearDown( self ):
+    """ stop the pool if a test did not """
+    self.processPool.finalize( 2 )
+
+  def poolCallback( self, taskID, taskResult ):
+    self.results[taskID] = taskResult
+
+  def testQueueTasks( self ):
+    """ batch of tasks, results and statistics """
+    tasks = [ ProcessTask( PidFunc, taskID = i ) for i in range( 20 ) ]
+    result = self.processPool.queueTasks( tasks, usePoolCallbacks = True )
+    self.assertTrue( result["OK"] )
+    self.assertEqual( result["Value"], 20 )
+    self.processPool.processAllResults( 30 )
+    self.processPool.finalize( 2 )
+    self.assertEqual( sorted( self.results ), range( 20 ) )
+    stats = self.processPool.getStatistics()
+    self.assertEqual( stats["QueuedTasks"], 20 )
+    self.assertEqual( stats["ProcessedTasks"], 20 )
+    self.assertEqual( sum( stats["RunTimeHistogram"].values() ), 20 )
+    self.assertEqual( stats["RunTimeHistogram"]["<0.1s"], 20 )
+
+  def testLargeResults( self ):
+    """ results bigger than largeResultSize """
+    tmpFiles = set( glob.glob( "/dev/shm/ProcessTask_*" ) + glob.glob( "/tmp/ProcessTask_*" ) )
+    tasks = [ ProcessTask( BytesFunc, args = ( size, ), taskID = size ) for size in ( 10, 10 * 1024 * 1024 ) ]
+    result = self.processPool.queueTasks( tasks, usePoolCallbacks = True )
+    self.assertTrue( result["OK"] )
+    resultsDir = self.processPool._ProcessPool__resultsDir
+    self.processPool.processAllResults( 30 )
+    self.processPool.finalize( 2 )
+    self.assertFalse( os.path.exists( resultsDir ) )
+    self.assertEqual( self.results[10]["Value"], "x" * 10 )
+    self.assertEqual( len( self.results[10 * 1024 * 1024]["Value"] ), 10 * 1024 * 1024 )
+    self.assertEqual( set( glob.glob( "/dev/shm/ProcessTask_*" ) + glob.glob( "/tmp/ProcessTask_*" ) ), tmpFiles )
+
+  def testLargeResultsTimeOut( self ):
+    """ large results of a chunk interrupted by a timed out task """
+    processPool = ProcessPool( 1, 1, 8,
+                               poolCallback = self.poolCallback,
+                               prefetchLimit = 4,
+                               largeResultSize = 1024 )
+    tasks = [ ProcessTask( BytesFunc, args = ( 1024 * 1024, ), taskID = 0 ),
+              ProcessTask( CallableFunc, args = ( 1, 30 ), taskID = 1, timeOut = 1 ) ]
+    result = processPool.queueTasks( tasks, usePoolCallbacks = True )
+    self.assertTrue( result["OK"] )
+    resultsDir = processPool._ProcessPool__resultsDir
+    start = time.time()
+    while len( self.results ) < 2 and time.time() - start < 60:
+      processPool.processResults()
+      time.sleep( 1 )
+    self.assertEqual( len( self.results[0]["Value"] ), 1024 * 1024 )
+    self.assertFalse( self.results[1]["OK"] )
+    self.assertEqual( os.listdir( resultsDir ), [] )
+    processPool.finalize( 2 )
+    self.assertFalse( os.path.exists( resultsDir ) )
+
+  def testLargeResultsCleanup( self ):
+    """ temporary files of results never processed are removed by finalize """
+    resultsDir = self.processPool._ProcessPool__resultsDir
+    self.assertTrue( os.path.isdir( resultsDir ) )
+    # results offloaded by a worker killed before sending them back
+    task = ProcessTask( BytesFunc, args = ( 2048, ) )
+    task.process()
+    task.offloadResults( 1024, resultsDir )
+    self.assertEqual( len( os.listdir( resultsDir ) ), 1 )
+    self.processPool.finalize( 2 )
+    self.assertFalse( os.path.exists( resultsDir ) )
+
+  def testRemoveResultsFile( self ):
+    """ offloaded results that won't be reloaded """
+    task = ProcessTask( BytesFunc, args = ( 2048, ) )
+    task.process()
+    task.offloadResults( 1024 )
+    resultFile = task._ProcessTask__resultFile
+    self.assertTrue( os.path.isfile( resultFile ) )
+    task.removeResultsFile()
+    self.assertFalse( os.path.exists( resultFile ) )
+    self.assertFalse( task.taskResults()["OK"] )
+
+
 ## SUT suite execution
 if __name__ == "__main__":
 
@@ -347,6 +492,8 @@ if __name__ == "__main__":
   suitePPCT = testLoader.loadTestsFromTestCase( ProcessPoolCallbacksTests )  
   suiteTCT = testLoader.loadTestsFromTestCase( TaskCallbacksTests )
   suiteTTOT = testLoader.loadTestsFromTestCase( TaskTimeOutTests )
-  suite = unittest.TestSuite( [ suitePPCT, suiteTCT, suiteTTOT ] )
+  suiteWRT = testLoader.loadTestsFromTestCase( WorkerRecyclingTests )
+  suiteBT = testLoader.loadTestsFromTestCase( BatchTests )
+  suite = unittest.TestSuite( [ suitePPCT, suiteTCT, suiteTTOT, suiteWRT, suiteBT ] )
   unittest.TextTestRunner(verbosity=3).run(suite)
 
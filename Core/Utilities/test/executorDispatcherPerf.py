@@ -0,0 +1,136 @@
+""" Stress benchmark of the ExecutorDispatcher with a mocked set of executors
+
+    Usage: python executorDispatcherPerf.py [number of tasks] [number of tasks for the legacy queue]
+
+    All the tasks are added at once, as when the OptimizationMind starts with a backlog of jobs,
+    and go through 3 executor types of 10 executors each, the executors answering straight away.
+    One task in 10 is frozen, for no time, by the first executor it reaches, and thawed by the periodic pass
+    of the dispatcher if no other task is dispatched to the executor type.
+    It prints the dispatch throughput, then compares the waiting queues with the former list based ones
+    for the deletion of waiting tasks.
+"""
+
+__RCSID__ = "$Id$"
+
+import sys
+import time
+from collections import deque
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.ExecutorDispatcher import ExecutorDispatcher, ExecutorDispatcherCallbacks, ExecutorQueues
+
+EXECUTOR_TYPES = ['Optimizers/JobPath', 'Optimizers/JobSanity', 'Optimizers/InputData']
+EXECUTORS_PER_TYPE = 10
+TASKS_PER_EXECUTOR = 5
+
+
+class MockedExecutors(ExecutorDispatcherCallbacks):
+  """ Executors receiving the tasks, and answering in order when process() is called
+  """
+
+  def __init__(self):
+    self.sent = deque()
+    self.frozen = set()
+
+  def cbDispatch(self, taskId, taskObj, pathExecuted):
+    if len(pathExecuted) == len(EXECUTOR_TYPES):
+      return S_OK(None)
+    return S_OK(EXECUTOR_TYPES[len(pathExecuted)])
+
+  def cbSendTask(self, taskId, taskObj, eId, eType):
+    self.sent.append((taskId, eId))
+    return S_OK()
+
+  def process(self, eDispatch):
+    """ Answer to the dispatcher until all the tasks are done
+    """
+    answers = 0
+    while True:
+      while self.sent:
+        taskId, eId = self.sent.popleft()
+        if taskId % 10 == 0 and taskId not in self.frozen:
+          self.frozen.add(taskId)
+          eDispatch.freezeTask(eId, taskId, 0)
+        else:
+          eDispatch.taskProcessed(eId, taskId)
+        answers += 1
+      if not eDispatch.getTaskIds():
+        return answers
+      # The tasks left are frozen for a type no longer dispatched to: thaw them as the periodic pass would
+      eDispatch._ExecutorDispatcher__doPeriodicStuff()  # pylint: disable=protected-access,no-member
+
+
+class LegacyQueue(object):
+  """ The list based waiting queue of a type, as it was """
+
+  def __init__(self):
+    self.queue = []
+
+  def pushTask(self, taskId):
+    self.queue.append(taskId)
+
+  def popTask(self):
+    return self.queue.pop(0)
+
+  def deleteTask(self, taskId):
+    del self.queue[self.queue.index(taskId)]
+
+
+def timeIt(func):
+  start = time.time()
+  result = func()
+  return time.time() - start, result
+
+
+def benchmarkDispatch(nTasks):
+  executors = MockedExecutors()
+  eDispatch = ExecutorDispatcher()
+  eDispatch.setCallbacks(executors)
+  for iType, eType in enumerate(EXECUTOR_TYPES):
+    for iExec in xrange(EXECUTORS_PER_TYPE):
+      eDispatch.addExecutor('executor%d.%d' % (iType, iExec), [eType], TASKS_PER_EXECUTOR)
+
+  addTime, _ = timeIt(lambda: [eDispatch.addTask(taskId, {}) for taskId in xrange(nTasks)])
+  processTime, answers = timeIt(lambda: executors.process(eDispatch))
+  assert not eDispatch.getTaskIds()
+  print "%10d tasks: added in %.2f s (%d tasks/s), %d executor answers in %.2f s (%d answers/s)" % \
+      (nTasks, addTime, nTasks / addTime, answers, processTime, answers / processTime)
+
+
+def benchmarkQueues(nTasks, maxLegacyTasks):
+  """ Delete half of the waiting tasks, then pop the others
+  """
+  def run(push, pop, delete):
+    for taskId in xrange(nTasks):
+      push(taskId)
+    for taskId in xrange(0, nTasks, 2):
+      delete(taskId)
+    for _ in xrange(nTasks / 2):
+      pop()
+
+  queues = ExecutorQueues()
+  queuesTime, _ = timeIt(lambda: run(lambda taskId: queues.pushTask('type', taskId),
+                                     lambda: queues.popTask('type'),
+                                     queues.deleteTask))
+  legacyTime = None
+  if nTasks <= maxLegacyTasks:
+    legacy = LegacyQueue()
+    legacyTime, _ = timeIt(lambda: run(legacy.pushTask, legacy.popTask, legacy.deleteTask))
+  print "%10d waiting tasks: %.2f s, legacy queue %s" % (nTasks, queuesTime,
+                                                          '%.2f s' % legacyTime if legacyTime is not None else '-')
+
+
+def main(maxTasks, maxLegacyTasks):
+  nTasks = 1000
+  while nTasks <= maxTasks:
+    benchmarkDispatch(nTasks)
+    nTasks *= 10
+  nTasks = 1000
+  while nTasks <= maxTasks:
+    benchmarkQueues(nTasks, maxLegacyTasks)
+    nTasks *= 10
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+       int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
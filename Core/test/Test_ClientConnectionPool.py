@@ -0,0 +1,120 @@
+""" Unit tests for the pool of kept alive client connections
+"""
+
+# pylint: disable=protected-access
+
+import time
+import socket
+import threading
+
+import pytest
+from mock import MagicMock
+
+from DIRAC.Core.DISET.private.ClientConnectionPool import ClientConnectionPool
+
+__RCSID__ = "$Id$"
+
+KEY = ('dips://server:9135/Framework/Service', 'proxy')
+
+
+@pytest.fixture
+def pool(mocker):
+  mocker.patch('DIRAC.Core.DISET.private.ClientConnectionPool.gThreadScheduler')
+  return ClientConnectionPool()
+
+
+@pytest.fixture
+def transport():
+  """ Transport on a connected socket with nothing to read
+  """
+  localSocket, remoteSocket = socket.socketpair()
+  trans = MagicMock()
+  trans.byteStream = ''
+  trans.getSocket.return_value = localSocket
+  yield trans
+  localSocket.close()
+  remoteSocket.close()
+
+
+def test_getEmpty(pool):
+  assert pool.get(KEY) is None
+  assert pool.getStats() == {'hits': 0, 'misses': 1, 'expired': 0, 'idle': 0}
+
+
+def test_putAndGet(pool, transport):
+  pool.put(KEY, transport, 30, 2)
+  assert pool.getStats()['idle'] == 1
+  # Only the same key gets the connection
+  assert pool.get(('dips://server:9135/Framework/Service', 'other proxy')) is None
+  assert pool.get(KEY) is transport
+  assert pool.get(KEY) is None
+  assert pool.getStats() == {'hits': 1, 'misses': 2, 'expired': 0, 'idle': 0}
+  transport.close.assert_not_called()
+
+
+def test_putTooShort(pool, transport):
+  pool.put(KEY, transport, ClientConnectionPool.expiryMargin, 2)
+  transport.close.assert_called_once_with()
+  assert pool.getStats()['idle'] == 0
+
+
+def test_putMaxIdle(pool, transport):
+  otherTransport = MagicMock()
+  pool.put(KEY, transport, 30, 1)
+  pool.put(KEY, otherTransport, 30, 1)
+  otherTransport.close.assert_called_once_with()
+  assert pool.getStats()['idle'] == 1
+
+
+def test_getExpired(pool, transport, mocker):
+  pool.put(KEY, transport, 30, 2)
+  mocker.patch('DIRAC.Core.DISET.private.ClientConnectionPool.time.time', return_value=time.time() + 30)
+  assert pool.get(KEY) is None
+  transport.close.assert_called_once_with()
+  assert pool.getStats() == {'hits': 0, 'misses': 1, 'expired': 1, 'idle': 0}
+
+
+def test_getClosedByServer(pool, transport):
+  """ Anything to read on an idle connection means it can't be used anymore
+  """
+  transport.byteStream = 'pending data'
+  pool.put(KEY, transport, 30, 2)
+  assert pool.get(KEY) is None
+  transport.close.assert_called_once_with()
+  assert pool.getStats()['expired'] == 1
+
+
+def test_purgeExpired(pool, transport, mocker):
+  otherTransport = MagicMock()
+  pool.put(KEY, transport, 30, 2)
+  pool.put(KEY, otherTransport, 60, 2)
+  mocker.patch('DIRAC.Core.DISET.private.ClientConnectionPool.time.time', return_value=time.time() + 30)
+  pool._ClientConnectionPool__purgeExpired()
+  transport.close.assert_called_once_with()
+  otherTransport.close.assert_not_called()
+  assert pool.getStats() == {'hits': 0, 'misses': 0, 'expired': 1, 'idle': 1}
+
+
+def test_concurrentStats(pool, transport):
+  """ Counters are consistent when the pool is used by several threads
+  """
+  nThreads = 4
+  nLoops = 500
+
+  def useConnection():
+    for _ in range(nLoops):
+      conn = pool.get(KEY)
+      if conn:
+        pool.put(KEY, conn, 30, 1)
+
+  pool.put(KEY, transport, 30, 1)
+  threads = [threading.Thread(target=useConnection) for _ in range(nThreads)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  stats = pool.getStats()
+  assert stats['hits'] + stats['misses'] == nThreads * nLoops
+  assert stats['expired'] == 0
+  assert stats['idle'] == 1
@@ -0,0 +1,161 @@
+""" Unit tests for the kept alive RPC connections of the DISET Service
+"""
+
+# pylint: disable=protected-access
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.GatewayService import GatewayService
+
+__RCSID__ = "$Id$"
+
+TRID = 'trid'
+
+
+def _proposal(action=('RPC', 'ping'), keepAlive=True):
+  """ Proposal tuple as sent by the clients, old clients don't send the options
+  """
+  proposal = (('Setup', 'group', 'vo'), action, 'extra')
+  if keepAlive is None:
+    return proposal
+  return proposal + ({'keepAliveRPC': keepAlive},)
+
+
+def _mockService(svc):
+  """ Service with the configuration asking for keep alive and a mocked transport pool
+  """
+  svc._cfg.getKeepAliveRPC.return_value = True
+  svc._cfg.getMaxKeepAliveConnections.return_value = 2
+  svc._cfg.getKeepAliveIdleTimeout.return_value = 30
+  svc._transportPool.send.return_value = S_OK()
+  svc._executeAction = MagicMock(return_value=S_OK('pong'))
+  return svc
+
+
+@pytest.fixture
+def serviceModule(mocker):
+  mocker.patch('DIRAC.Core.DISET.private.Service.ServiceConfiguration')
+  mocker.patch('DIRAC.Core.DISET.private.Service.AuthManager')
+  mocker.patch('DIRAC.Core.DISET.private.Service.PathFinder')
+  mocker.patch('DIRAC.Core.DISET.private.Service.getGlobalTransportPool')
+  mocker.patch('DIRAC.Core.DISET.private.Service.threading.Thread')
+
+
+@pytest.fixture
+def service(mocker, serviceModule):
+  return _mockService(Service({'modName': 'Framework/Test', 'loadName': 'Framework/Test', 'standalone': True}))
+
+
+@pytest.fixture
+def gateway(mocker, serviceModule):
+  return _mockService(GatewayService())
+
+
+def _keptAlive(service):
+  return service._Service__keepAliveConns
+
+
+def test_keepAliveGranted(service):
+  result = service._processProposal(TRID, _proposal(), None)
+
+  assert result['OK']
+  assert result['keepAliveRPC']
+  assert not result['closeTransport']
+  acceptance = service._transportPool.send.call_args[0][1]
+  assert acceptance['keepAliveRPC'] == 30
+  assert TRID in _keptAlive(service)
+
+
+@pytest.mark.parametrize('keepAlive, serviceOption', [(None, True), (False, True), (True, False)])
+def test_keepAliveNotGranted(service, keepAlive, serviceOption):
+  service._cfg.getKeepAliveRPC.return_value = serviceOption
+  result = service._processProposal(TRID, _proposal(keepAlive=keepAlive), None)
+
+  assert result['OK']
+  assert not result['keepAliveRPC']
+  assert result['closeTransport']
+  assert 'keepAliveRPC' not in service._transportPool.send.call_args[0][1]
+  assert not _keptAlive(service)
+
+
+def test_keepAliveMaxConnections(service):
+  for trid in ('trid1', 'trid2', 'trid3'):
+    service._processProposal(trid, _proposal(), None)
+
+  assert sorted(_keptAlive(service)) == ['trid1', 'trid2']
+  # A connection already kept alive is still served
+  assert service._processProposal('trid1', _proposal(), None)['keepAliveRPC']
+
+
+def test_keepAliveNonRPC(service):
+  """ A kept alive connection used for something else than an RPC is forgotten
+  """
+  service._processProposal(TRID, _proposal(), None)
+  assert TRID in _keptAlive(service)
+  result = service._processProposal(TRID, _proposal(action=('FileTransfer', 'FromClient')), None)
+
+  assert not result['keepAliveRPC']
+  assert result['closeTransport']
+  assert TRID not in _keptAlive(service)
+
+
+def test_serveProposalKeepAlive(service, mocker):
+  service._receiveAndCheckProposal = MagicMock(return_value=S_OK(_proposal()))
+  service._instantiateHandler = MagicMock(return_value=S_OK(MagicMock()))
+  parkKeepAlive = mocker.patch.object(service, '_Service__parkKeepAlive')
+
+  result = service._serveProposal(TRID, {'DN': '/DN'})
+
+  assert result['OK']
+  parkKeepAlive.assert_called_once_with(TRID, {'DN': '/DN'})
+  service._transportPool.close.assert_not_called()
+
+
+def test_serveProposalFailed(service):
+  service._processProposal(TRID, _proposal(), None)
+  service._receiveAndCheckProposal = MagicMock(return_value=S_ERROR('Bad proposal'))
+
+  assert service._serveProposal(TRID, {}) is None
+  assert TRID not in _keptAlive(service)
+  service._transportPool.sendAndClose.assert_called_once()
+
+
+def test_actionFailed(service):
+  service._receiveAndCheckProposal = MagicMock(return_value=S_OK(_proposal()))
+  service._instantiateHandler = MagicMock(return_value=S_OK(MagicMock()))
+  service._executeAction.return_value = S_ERROR('Failed')
+
+  assert not service._serveProposal(TRID, {})['OK']
+  assert TRID not in _keptAlive(service)
+  service._transportPool.close.assert_called_once_with(TRID)
+
+
+def test_processKeepAliveClosed(service):
+  """ The next proposal of a connection that has been closed meanwhile
+  """
+  service._processProposal(TRID, _proposal(), None)
+  service._lockManager = MagicMock()
+  service._transportPool.get.return_value = None
+
+  assert service._processKeepAliveInThread(TRID, {}) is None
+  assert TRID not in _keptAlive(service)
+
+
+def test_gatewayNoKeepAlive(gateway):
+  """ The Gateway closes forwarded connections, even if the configuration allows keep alive
+  """
+  gateway._receiveAndCheckProposal = MagicMock(return_value=S_OK(_proposal()))
+  gateway._GatewayService__getClientInitArgs = MagicMock(return_value=S_OK({}))
+  transport = MagicMock()
+  gateway._transportPool.add.return_value = TRID
+
+  result = gateway._processInThread(transport)
+
+  assert result['OK']
+  assert not result['keepAliveRPC']
+  assert 'keepAliveRPC' not in gateway._transportPool.send.call_args[0][1]
+  gateway._transportPool.close.assert_called_once_with(TRID)
+  assert not gateway._Service__keepAliveConns
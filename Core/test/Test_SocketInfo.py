@@ -0,0 +1,102 @@
+""" Unit tests for the client SSL context cache of SocketInfo
+"""
+
+# pylint: disable=protected-access
+
+from collections import OrderedDict
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.Transports.SSL.SocketInfo import SocketInfo
+
+__RCSID__ = "$Id$"
+
+
+@pytest.fixture
+def contextCache(mocker):
+  """ Empty context cache, with the context generation and the CA loading mocked
+  """
+  generated = []
+  caStore = {'generation': 1}
+
+  def generateClientContext(self):
+    self.sslContext = MagicMock()
+    self.setLocalCredentialsLocation(('/tmp/proxy', '/tmp/proxy'))
+    generated.append(self.sslContext)
+    return S_OK()
+
+  mocker.patch.object(SocketInfo, '_SocketInfo__cachedContexts', OrderedDict())
+  mocker.patch.object(SocketInfo, '_SocketInfo__cachedContextsStats', {'hits': 0, 'misses': 0})
+  mocker.patch.object(SocketInfo, '_SocketInfo__cachedContextsGeneration', 0)
+  mocker.patch.object(SocketInfo, '_SocketInfo__generateClientContext', generateClientContext)
+  mocker.patch.object(SocketInfo, '_SocketInfo__loadCAsCRLs', lambda self: S_OK(caStore['generation']))
+  return generated, caStore
+
+
+def _clientInfo(proxy='proxy', **kwargs):
+  infoDict = {'clientMode': True, 'proxyString': proxy}
+  infoDict.update(kwargs)
+  return SocketInfo(infoDict)
+
+
+def test_cacheHit(contextCache):
+  generated, _caStore = contextCache
+  first = _clientInfo()
+  second = _clientInfo()
+
+  assert len(generated) == 1
+  assert second.getSSLContext() is first.getSSLContext()
+  assert second.getLocalCredentialsLocation() == ('/tmp/proxy', '/tmp/proxy')
+  stats = SocketInfo.getContextCacheStats()
+  assert (stats['hits'], stats['misses'], stats['contexts']) == (1, 1, 1)
+
+
+def test_cacheMiss(contextCache):
+  generated, _caStore = contextCache
+  first = _clientInfo()
+  otherProxy = _clientInfo(proxy='other proxy')
+  noCACheck = _clientInfo(skipCACheck=True)
+
+  assert len(generated) == 3
+  assert otherProxy.getSSLContext() is not first.getSSLContext()
+  assert noCACheck.getSSLContext() is not first.getSSLContext()
+  stats = SocketInfo.getContextCacheStats()
+  assert (stats['hits'], stats['misses'], stats['contexts']) == (0, 3, 3)
+
+
+def test_cacheCAReload(contextCache):
+  generated, caStore = contextCache
+  first = _clientInfo()
+  _clientInfo(skipCACheck=True)
+  caStore['generation'] += 1
+  reloaded = _clientInfo()
+
+  assert len(generated) == 3
+  assert reloaded.getSSLContext() is not first.getSSLContext()
+  # Neither the older generation nor the context without CA check are kept
+  assert SocketInfo.getContextCacheStats()['contexts'] == 1
+
+
+def test_cacheBounded(contextCache, mocker):
+  generated, _caStore = contextCache
+  mocker.patch.object(SocketInfo, '_SocketInfo__maxCachedContexts', 2)
+  first = _clientInfo(proxy='first')
+  _clientInfo(proxy='second')
+  # Using the first context makes the second one the least recently used
+  _clientInfo(proxy='first')
+  _clientInfo(proxy='third')
+
+  assert SocketInfo.getContextCacheStats()['contexts'] == 2
+  assert _clientInfo(proxy='first').getSSLContext() is first.getSSLContext()
+  _clientInfo(proxy='second')
+  assert len(generated) == 4
+
+
+def test_sessionIdSetOnce(contextCache):
+  generated, _caStore = contextCache
+  _clientInfo()
+  _clientInfo()
+
+  generated[0].set_session_id.assert_called_once()
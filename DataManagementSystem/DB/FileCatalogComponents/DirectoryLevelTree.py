@@ -30,12 +30,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
     """  Find directory ID for the given path
     """
 
-    dpath = self.db._escapeString(os.path.normpath(path))
-    if not dpath['OK']:
-      return dpath
-    dpath = dpath['Value']
-    req = "SELECT DirID,Level from FC_DirectoryLevelTree WHERE DirName=%s" % dpath
-    result = self.db._query(req, connection)
+    req = "SELECT DirID,Level from FC_DirectoryLevelTree WHERE DirName=%s"
+    result = self.db._query(req, connection, params=(os.path.normpath(path),))
     if not result['OK']:
       return result
 
@@ -49,15 +45,11 @@ class DirectoryLevelTree(DirectoryTreeBase):
   def findDirs(self, paths, connection=False):
     """ Find DirIDs for the given path list
     """
-    dpathList = []
-    for path in paths:
-      dpath = self.db._escapeString(os.path.normpath(path))
-      if not dpath['OK']:
-        return dpath
-      dpathList.append(dpath['Value'])
-    dpaths = ','.join(dpathList)
-    req = "SELECT DirName,DirID from FC_DirectoryLevelTree WHERE DirName in (%s)" % dpaths
-    result = self.db._query(req, connection)
+    if not paths:
+      return S_OK({})
+    dpaths = [os.path.normpath(path) for path in paths]
+    req = "SELECT DirName,DirID from FC_DirectoryLevelTree WHERE DirName in (%s)" % ','.join(['%s'] * len(dpaths))
+    result = self.db._query(req, connection, params=dpaths)
     if not result['OK']:
       return result
     dirDict = {}
@@ -489,22 +489,33 @@ class DirectoryMetadata:
     result = self.__findSubdirByMeta(meta, 'Any', pathSelection)
     if not result['OK']:
       return result
-    dirList = result['Value']
+    # The difference is done here: a NOT IN query would be as long as the list of directories
+    dirSet = set(result['Value'])
     table = self.db.dtree.getTreeTable()
-    dirString = ','.join([str(x) for x in dirList])
-    if dirList:
-      req = 'SELECT DirID FROM %s WHERE DirID NOT IN ( %s )' % (table, dirString)
-    else:
-      req = 'SELECT DirID FROM %s' % table
-    result = self.db._query(req)
+    result = self.db._query('SELECT DirID FROM %s' % table)
     if not result['OK']:
       return result
-    if not result['Value']:
-      return S_OK([])
 
-    dirList = [x[0] for x in result['Value']]
+    dirList = [x[0] for x in result['Value'] if x[0] not in dirSet]
     return S_OK(dirList)
 
+  @staticmethod
+  def __getMetaSelectivityRank(value):
+    """ Rough estimate of how selective a metadata condition is, lower is more selective:
+        a single value, a list of values, comparisons, any value and missing metadata
+    """
+    if value == "Missing":
+      return 4
+    if value == "Any":
+      return 3
+    if isinstance(value, dict):
+      if set(value) <= set(['in', '=']):
+        return 1
+      return 2
+    if isinstance(value, list):
+      return 1
+    return 0
+
   def __expandMetaDictionary(self, metaDict, credDict):
     """ Expand the dictionary with metadata query
     """
@@ -600,25 +611,22 @@ class DirectoryMetadata:
         if not result['OK']:
           return result
         pathSelection = result['Value']
-      dirList = []
-      first = True
-      for meta, value in finalMetaDict.items():
+      # The most selective conditions first, so that we can stop as soon as nothing matches
+      dirSet = None
+      for meta, value in sorted(finalMetaDict.items(), key=lambda item: self.__getMetaSelectivityRank(item[1])):
         if value == "Missing":
           result = self.__findSubdirMissingMeta(meta, pathSelection)
         else:
           result = self.__findSubdirByMeta(meta, value, pathSelection)
         if not result['OK']:
           return result
-        mList = result['Value']
-        if first:
-          dirList = mList
-          first = False
+        if dirSet is None:
+          dirSet = set(result['Value'])
         else:
-          newList = []
-          for d in dirList:
-            if d in mList:
-              newList.append(d)
-          dirList = newList
+          dirSet.intersection_update(result['Value'])
+        if not dirSet:
+          break
+      dirList = list(dirSet)
     else:
       if pathDirID:
         result = self.db.dtree.getSubdirectoriesByID(pathDirID, includeParent=True)
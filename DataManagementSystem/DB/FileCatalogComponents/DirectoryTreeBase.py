@@ -1042,7 +1042,6 @@ class DirectoryTreeBase:
     gLogger.verbose( 'Starting rebuilding Directory Usage, number of visible directories %d' % len( dirIDs ) )
 
     insertFields = ['DirID', 'SEID', 'SESize', 'SEFiles', 'LastUpdate']
-    insertCount = 0
     insertValues = []
 
     count = 0
@@ -1062,16 +1061,7 @@ class DirectoryTreeBase:
         empty += 1
 
       for seSize, seFiles, seID in result['Value']:
-        insertValues = [dirID, seID, seSize, seFiles, 'UTC_TIMESTAMP()']
-        result = self.db.insertFields( 'FC_DirectoryUsage', insertFields, insertValues )
-        if not result['OK']:
-          if "Duplicate" in result['Message']:
-            req = "UPDATE FC_DirectoryUsage SET SESize=%d, SEFiles=%d, LastUpdate=UTC_TIMESTAMP()" % ( seSize, seFiles )
-            req += " WHERE DirID=%s AND SEID=%s" % ( dirID, seID )
-            result = self.db._update( req )
-            if not result['OK']:
-              return result
-          return result
+        insertValues.append( [dirID, seID, seSize, seFiles, 'UTC_TIMESTAMP()'] )
 
       # Get the logical size
       req = "SELECT SUM(Size),COUNT(Size) from FC_Files WHERE DirID=%d " % int( dirID )
@@ -1081,17 +1071,19 @@ class DirectoryTreeBase:
       if not result['Value']:
         return S_ERROR( 'Empty directory' )
       seSize, seFiles = result['Value'][0]
-      insertValues = [dirID, 0, seSize, seFiles, 'UTC_TIMESTAMP()']
-      result = self.db.insertFields( 'FC_DirectoryUsage', insertFields, insertValues )
-      if not result['OK']:
-        if "Duplicate" in result['Message']:
-          req = "UPDATE FC_DirectoryUsage SET SESize=%d, SEFiles=%d, LastUpdate=UTC_TIMESTAMP()" % ( seSize, seFiles )
-          req += " WHERE DirID=%s AND SEID=0" % dirID
-          result = self.db._update( req )
-          if not result['OK']:
-            return result
-        else:
+      insertValues.append( [dirID, 0, seSize, seFiles, 'UTC_TIMESTAMP()'] )
+
+      # Insert or update the usage of many directories at once
+      if len( insertValues ) >= 1000:
+        result = self.db.upsertFieldsBulk( 'FC_DirectoryUsage', insertFields, insertValues )
+        if not result['OK']:
           return result
+        insertValues = []
+
+    if insertValues:
+      result = self.db.upsertFieldsBulk( 'FC_DirectoryUsage', insertFields, insertValues )
+      if not result['OK']:
+        return result
 
     gLogger.verbose( "Processed %d directories, %d empty " % ( count, empty ) )
 
@@ -9,7 +9,7 @@ import os
 import stat
 
 from DIRAC import S_OK, S_ERROR, gLogger
-from DIRAC.Core.Utilities.List import intListToString
+from DIRAC.Core.Utilities.List import intListToString, getChunk
 from DIRAC.Core.Utilities.Pfn import pfnunparse
 
 
@@ -1351,3 +1351,18 @@ class FileManagerBase(object):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return S_ERROR("To be implemented on derived class")
+
+  def getSEDumpIter(self, seName, batchSize=1000):
+    """
+         Same as getSEDump, but the files are streamed from the DB when
+         the derived class supports it
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files per batch
+
+        :returns: S_OK with a generator of lists of tuples (lfn, checksum, size)
+    """
+    res = self.getSEDump(seName)
+    if not res['OK']:
+      return res
+    return S_OK(getChunk(res['Value'], batchSize))
@@ -937,3 +937,21 @@ class FileManagerPs(FileManagerBase):
     seID = res['Value']
 
     return self.db.executeStoredProcedureWithCursor('ps_get_se_dump', (seID,))
+
+  def getSEDumpIter(self, seName, batchSize=1000):
+    """
+         Same as getSEDump, but the files are streamed from the DB
+         with a server side cursor
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files per batch
+
+        :returns: S_OK with a generator of tuples of tuples (lfn, checksum, size)
+    """
+
+    res = self.db.seManager.findSE(seName)
+    if not res['OK']:
+      return res
+    seID = res['Value']
+
+    return self.db._queryIter("call ps_get_se_dump(%d);" % seID, batchSize=batchSize)
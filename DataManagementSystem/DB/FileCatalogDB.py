@@ -1186,3 +1186,15 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return self.fileManager.getSEDump(seName)
+
+  def getSEDumpIter(self, seName, batchSize=1000):
+    """
+         Same as getSEDump, but the files are returned in batches by a generator,
+         streamed from the DB when the FileManager supports it
+
+        :param seName: name of the StorageElement
+        :param int batchSize: maximum number of files per batch
+
+        :returns: S_OK with a generator of lists of tuples (lfn, checksum, size)
+    """
+    return self.fileManager.getSEDumpIter(seName, batchSize=batchSize)
@@ -104,6 +104,37 @@ def initializeFileCatalogHandler(serviceInfo):
   return res
 
 
+class CSVDataSource(object):
+  """ File like object giving batches of rows formatted as CSV with '|' separation,
+      the rows being formatted only when they are read
+  """
+
+  def __init__(self, rowBatches):
+    """
+        :param rowBatches: iterator over lists of rows
+    """
+    self.__rowBatches = iter(rowBatches)
+    self.__csvOutput = cStringIO.StringIO()
+    self.__writer = csv.writer(self.__csvOutput, delimiter='|')
+    self.__pending = ''
+
+  def read(self, size):
+    """ Read at most size bytes, an empty string meaning that all the rows were read
+    """
+    while len(self.__pending) < size:
+      try:
+        rows = next(self.__rowBatches)
+      except StopIteration:
+        break
+      self.__writer.writerows(rows)
+      self.__pending += self.__csvOutput.getvalue()
+      self.__csvOutput.seek(0)
+      self.__csvOutput.truncate()
+    data = self.__pending[:size]
+    self.__pending = self.__pending[size:]
+    return data
+
+
 class FileCatalogHandler(RequestHandler):
   """
   ..class:: FileCatalogHandler
@@ -744,6 +775,9 @@ class FileCatalogHandler(RequestHandler):
     """ This method used to transfer the SEDump to the client,
         formated as CSV with '|' separation
 
+        The dump is streamed from the DB and sent while it is formatted,
+        so that it is never held in memory
+
         :param seName: name of the se to dump
 
         :returns: the result of the FileHelper
@@ -751,21 +785,17 @@ class FileCatalogHandler(RequestHandler):
 
     """
 
-    retVal = self.getSEDump(seName)
+    retVal = gFileCatalogDB.getSEDumpIter(seName)
+    if not retVal['OK']:
+      fileHelper.sendError(retVal['Message'])
+      return retVal
+    fileBatches = retVal['Value']
 
     try:
-      csvOutput = cStringIO.StringIO()
-      writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
-
-      csvOutput.seek(0)
-
-      ret = fileHelper.DataSourceToNetwork(csvOutput)
-      return ret
+      return fileHelper.DataSourceToNetwork(CSVDataSource(fileBatches))
 
     except Exception as e:
       gLogger.exception("Exception while sending seDump", repr(e))
       return S_ERROR("Exception while sendind seDump: %s" % repr(e))
     finally:
-      csvOutput.close()
+      fileBatches.close()
@@ -0,0 +1,101 @@
+"""
+Asynchronous Handler
+"""
+
+__RCSID__ = "$Id$"
+
+import atexit
+import logging
+import Queue
+import threading
+import time
+
+
+class AsynchronousHandler(logging.Handler):
+  """
+  AsynchronousHandler is a custom handler from logging, wrapping the handler of a backend.
+
+  Its purpose is to prevent the threads creating log records from waiting for slow backends:
+  writing in a file, sending to ElasticSearch or to a message queue...
+  When a message must be emitted, it is only added to a queue: the records of the queue are formatted
+  and emitted by the wrapped handler in a dedicated thread.
+
+  If the queue is full, because the backend can't keep up, the new records are dropped rather than blocking
+  the threads creating them, and the number of dropped records is reported by a message of the backend.
+  """
+
+  def __init__(self, handler, queueSize=10000, flushTimeout=10):
+    """
+    Initialization of the AsynchronousHandler.
+
+    :params handler: handler of the backend, actually emitting the log records
+    :params queueSize: integer, maximum number of log records waiting to be emitted
+    :params flushTimeout: maximum time in seconds to wait for the records of the queue to be emitted when flushing
+    """
+    super(AsynchronousHandler, self).__init__()
+    self.handler = handler
+    self.__queue = Queue.Queue(queueSize)
+    self.__flushTimeout = flushTimeout
+    self.__droppedRecords = 0
+
+    self.__thread = threading.Thread(target=self.__emitRecords, name='AsynchronousHandler')
+    self.__thread.setDaemon(True)
+    self.__thread.start()
+    # emit the records still in the queue when the process exits
+    atexit.register(self.flush)
+
+  def emit(self, record):
+    """
+    Add the record to the queue.
+
+    :params record: log record object
+    """
+    # The stack trace must be formatted while it is available
+    if record.exc_info and not record.exc_text:
+      record.exc_text = logging.Formatter().formatException(record.exc_info)
+    try:
+      self.__queue.put_nowait(record)
+    except Queue.Full:
+      self.__droppedRecords += 1
+
+  def __emitRecords(self):
+    """
+    Emit the records of the queue with the wrapped handler
+    """
+    while True:
+      record = self.__queue.get()
+      try:
+        if self.__droppedRecords:
+          droppedRecords, self.__droppedRecords = self.__droppedRecords, 0
+          self.handler.handle(logging.makeLogRecord({'name': record.name,
+                                                     'levelno': logging.WARN,
+                                                     'levelname': logging.getLevelName(logging.WARN),
+                                                     'msg': '%d log records dropped, the queue was full',
+                                                     'args': (droppedRecords, ),
+                                                     'componentname': getattr(record, 'componentname', ''),
+                                                     'customname': getattr(record, 'customname', ''),
+                                                     'varmessage': '',
+                                                     'spacer': ''}))
+        self.handler.handle(record)
+      except Exception:  # pylint: disable=broad-except
+        self.handleError(record)
+      finally:
+        self.__queue.task_done()
+
+  def flush(self):
+    """
+    Wait for the records of the queue to be emitted, and flush the wrapped handler.
+    """
+    # Queue.join has no timeout, and the backend may be stuck
+    endTime = time.time() + self.__flushTimeout
+    while self.__queue.unfinished_tasks and time.time() < endTime:
+      time.sleep(0.01)
+    self.handler.flush()
+
+  def close(self):
+    """
+    Emit the records of the queue and close the wrapped handler.
+    """
+    self.flush()
+    self.handler.close()
+    super(AsynchronousHandler, self).close()
@@ -11,6 +11,9 @@ from DIRAC.FrameworkSystem.private.standardLogging.LogLevels import LogLevels
 from DIRAC.Core.Utilities.LockRing import LockRing
 from DIRAC.Resources.LogBackends.AbstractBackend import AbstractBackend
 
+# emit level of the Logging objects without backend: no message can be displayed
+_NO_EMIT_LEVEL = LogLevels.FATAL + 1
+
 
 class Logging(object):
   """
@@ -82,6 +85,9 @@ class Logging(object):
     self._levelModified = False
 
     self._backendsList = []
+    # lowest level of the messages that a backend of this Logging or of its parents can display:
+    # the messages below are dropped before taking any lock or formatting anything
+    self._emitLevel = self._parent._emitLevel if self._parent is not None else _NO_EMIT_LEVEL
 
     # name of the Logging
     self.name = str(name)
@@ -202,8 +208,12 @@ class Logging(object):
     :params backend: Backend object that has to be added
     :params backendOptions: a dictionary of different backend options.
                             example: {'FileName': '/tmp/log.txt'}
+                            with {'Asynchronous': True}, the records are emitted in a dedicated thread,
+                            at most 'QueueSize' (default 10000) records waiting to be emitted.
     """
     backend.createHandler(backendOptions)
+    if backendOptions and str(backendOptions.get('Asynchronous', False)).lower() in ('true', 'yes', 'y', '1'):
+      backend.setAsynchronous(int(backendOptions.get('QueueSize', 10000)))
 
     # lock to prevent that the level change before adding the new backend in the backendsList
     # and to prevent a change of the backendsList during the reading of the
@@ -215,6 +225,7 @@ class Logging(object):
       backend.setLevel(self._level)
       self._logger.addHandler(backend.getHandler())
       self._backendsList.append(backend)
+      self._updateEmitLevel()
     finally:
       self._lockLevel.release()
       self._lockOptions.release()
@@ -269,9 +280,26 @@ class Logging(object):
       # propagate in the children
       for child in self._children.itervalues():
         child._setLevel(level, directCall=False)  # pylint: disable=protected-access
+      if directCall:
+        self._updateEmitLevel()
     finally:
       self._lockLevel.release()
 
+  def _updateEmitLevel(self):
+    """
+    Compute the lowest level of the messages that can be displayed by the backends of this Logging
+    or of its parents, and propagate it to the children.
+    Must be called with the level lock.
+    """
+    emitLevel = self._parent._emitLevel if self._parent is not None else _NO_EMIT_LEVEL
+    for backend in self._backendsList:
+      # handlers without level (0) display all the messages
+      emitLevel = min(emitLevel, backend.getHandler().level)
+    # a single assignment, so that it is atomic for the threads reading it without lock
+    self._emitLevel = emitLevel
+    for child in self._children.itervalues():
+      child._updateEmitLevel()  # pylint: disable=protected-access
+
   def getLevel(self):
     """
     :return: the name of the level
@@ -286,15 +314,8 @@ class Logging(object):
 
     :return: boolean which give the answer
     """
-    # lock to prevent a level change
-    self._lockLevel.acquire()
-    try:
-      result = False
-      if levelName.upper() in LogLevels.getLevelNames():
-        result = self._level <= LogLevels.getLevelValue(levelName)
-      return result
-    finally:
-      self._lockLevel.release()
+    level = LogLevels.getLevelValue(levelName)
+    return level is not None and self._level <= level
 
   @classmethod
   def getName(cls):
@@ -329,47 +350,47 @@ class Logging(object):
     """
     return LogLevels.getLevelNames()
 
-  def always(self, sMsg, sVarMsg=''):
+  def always(self, sMsg, sVarMsg='', *args):
     """
     Always level
     """
-    return self._createLogRecord(LogLevels.ALWAYS, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.ALWAYS, sMsg, sVarMsg, args=args)
 
-  def notice(self, sMsg, sVarMsg=''):
+  def notice(self, sMsg, sVarMsg='', *args):
     """
     Notice level
     """
-    return self._createLogRecord(LogLevels.NOTICE, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.NOTICE, sMsg, sVarMsg, args=args)
 
-  def info(self, sMsg, sVarMsg=''):
+  def info(self, sMsg, sVarMsg='', *args):
     """
     Info level
     """
-    return self._createLogRecord(LogLevels.INFO, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.INFO, sMsg, sVarMsg, args=args)
 
-  def verbose(self, sMsg, sVarMsg=''):
+  def verbose(self, sMsg, sVarMsg='', *args):
     """
     Verbose level
     """
-    return self._createLogRecord(LogLevels.VERBOSE, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.VERBOSE, sMsg, sVarMsg, args=args)
 
-  def debug(self, sMsg, sVarMsg=''):
+  def debug(self, sMsg, sVarMsg='', *args):
     """
     Debug level
     """
-    return self._createLogRecord(LogLevels.DEBUG, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.DEBUG, sMsg, sVarMsg, args=args)
 
-  def warn(self, sMsg, sVarMsg=''):
+  def warn(self, sMsg, sVarMsg='', *args):
     """
     Warn
     """
-    return self._createLogRecord(LogLevels.WARN, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.WARN, sMsg, sVarMsg, args=args)
 
-  def error(self, sMsg, sVarMsg=''):
+  def error(self, sMsg, sVarMsg='', *args):
     """
     Error level
     """
-    return self._createLogRecord(LogLevels.ERROR, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.ERROR, sMsg, sVarMsg, args=args)
 
   def exception(self, sMsg="", sVarMsg='', lException=False, lExcInfo=False):
     """
@@ -379,15 +400,16 @@ class Logging(object):
     _ = lExcInfo
     return self._createLogRecord(LogLevels.ERROR, sMsg, sVarMsg, exc_info=True)
 
-  def fatal(self, sMsg, sVarMsg=''):
+  def fatal(self, sMsg, sVarMsg='', *args):
     """
     Fatal level
     """
-    return self._createLogRecord(LogLevels.FATAL, sMsg, sVarMsg)
+    return self._createLogRecord(LogLevels.FATAL, sMsg, sVarMsg, args=args)
 
-  def _createLogRecord(self, level, sMsg, sVarMsg, exc_info=False):
+  def _createLogRecord(self, level, sMsg, sVarMsg, exc_info=False, args=()):
     """
-    Create a log record according to the level of the message. The log record is always sent to the different backends
+    Create a log record according to the level of the message. The log record is sent to the different backends
+    unless none of them can display it.
     Backends have their own levels and can manage the display of the message or not according to the level.
     Nevertheless, backends and the logger have the same level value,
     so we can test if the message will be displayed or not.
@@ -396,30 +418,33 @@ class Logging(object):
     :params sMsg: string representing the message
     :params sVarMsg: string representing an optional message
     :params exc_info: boolean representing the stacktrace for the exception
+    :params args: arguments of the message, which are interpolated in sMsg ('%' operator) only if it is displayed,
+                  e.g. log.verbose("Query %s took %.1f s", "", cmd, duration)
 
     :return: boolean representing the result of the log record creation
     """
+    # test to know if the message is displayed or not
+    isSent = self._level <= level
+    # no backend can display the message: drop it without any lock nor formatting
+    if level < self._emitLevel:
+      return isSent
 
-    # lock to prevent a level change after that the log is sent.
-    self._lockLevel.acquire()
-    try:
-      # exc_info is only for exception to add the stack trace
-      # extra is a way to add extra attributes to the log record:
-      # - 'componentname': the system/component name
-      # - 'varmessage': the variable message
-      # - 'customname' : the name of the logger for the DIRAC usage: without 'root' and separated with '/'
-      # extras attributes are not camel case because log record attributes are
-      # not either.
-      extra = {'componentname': self._componentName,
-               'varmessage': sVarMsg,
-               'spacer': '' if not sVarMsg else ' ',
-               'customname': self._customName}
+    # exc_info is only for exception to add the stack trace
+    # extra is a way to add extra attributes to the log record:
+    # - 'componentname': the system/component name
+    # - 'varmessage': the variable message
+    # - 'customname' : the name of the logger for the DIRAC usage: without 'root' and separated with '/'
+    # extras attributes are not camel case because log record attributes are
+    # not either.
+    extra = {'componentname': self._componentName,
+             'varmessage': sVarMsg,
+             'spacer': '' if not sVarMsg else ' ',
+             'customname': self._customName}
+    if args:
+      self._logger.log(level, sMsg, *args, exc_info=exc_info, extra=extra)
+    else:
       self._logger.log(level, "%s", sMsg, exc_info=exc_info, extra=extra)
-      # test to know if the message is displayed or not
-      isSent = self._level <= level
-      return isSent
-    finally:
-      self._lockLevel.release()
+    return isSent
 
   def showStack(self):
     """
@@ -132,6 +132,11 @@ class LoggingRoot(Logging):
         # Remove the old backends
         for handler in handlersToRemove:
           self._logger.removeHandler(handler)
+        self._lockLevel.acquire()
+        try:
+          self._updateEmitLevel()
+        finally:
+          self._lockLevel.release()
 
         levelName = gConfig.getValue("%s/LogLevel" % cfgPath, None)
         if levelName is not None:
@@ -0,0 +1,94 @@
+"""
+Test the filtering of the messages before their creation, and their lazy formatting
+"""
+
+__RCSID__ = "$Id$"
+
+#pylint: disable=invalid-name,protected-access
+
+import logging
+import unittest
+from StringIO import StringIO
+
+from DIRAC.FrameworkSystem.private.standardLogging.Handler.AsynchronousHandler import AsynchronousHandler
+from DIRAC.FrameworkSystem.private.standardLogging.LogLevels import LogLevels
+from DIRAC.FrameworkSystem.test.testLogging.Test_Logging import Test_Logging, gLogger, cleaningLog
+
+
+class FormattingCounter(object):
+  """
+  Message argument counting how many times it is formatted
+  """
+
+  def __init__(self):
+    self.count = 0
+
+  def __str__(self):
+    self.count += 1
+    return "formatted"
+
+
+class Test_LazyFormatting(Test_Logging):
+  """
+  Test the lazy formatting of the message arguments
+  """
+
+  def test_00interpolation(self):
+    """
+    The arguments are interpolated in the message
+    """
+    self.log.info("message %s %d", "varmessage", "arg", 2)
+
+    self.assertEqual("UTCFramework/logINFO:messagearg2varmessage\n", cleaningLog(self.buffer.getvalue()))
+    self.buffer.truncate(0)
+
+  def test_01notFormatted(self):
+    """
+    The arguments of the messages which are not displayed are not formatted
+    """
+    counter = FormattingCounter()
+    gLogger.setLevel('notice')
+    self.assertEqual(self.log.verbose("message %s", "", counter), False)
+    self.assertEqual(self.log._emitLevel, LogLevels.NOTICE)
+    self.assertEqual(counter.count, 0)
+    self.assertEqual(self.buffer.getvalue(), "")
+
+    gLogger.setLevel('verbose')
+    self.assertEqual(self.log._emitLevel, LogLevels.VERBOSE)
+    self.assertEqual(self.log.verbose("message %s", "", counter), True)
+    self.assertEqual(counter.count, 1)
+    self.assertEqual("UTCFramework/logVERBOSE:messageformatted\n", cleaningLog(self.buffer.getvalue()))
+    self.buffer.truncate(0)
+
+  def test_02sublogger(self):
+    """
+    A sub logger with a lower level than its parent can't display more messages without its own backend
+    """
+    gLogger.setLevel('notice')
+    sublog = self.log.getSubLogger('lazySublog')
+    sublog.setLevel('debug')
+    self.assertEqual(sublog._emitLevel, LogLevels.NOTICE)
+    self.assertEqual(sublog.debug("message"), True)
+    self.assertEqual(self.buffer.getvalue(), "")
+
+
+class Test_AsynchronousHandler(unittest.TestCase):
+  """
+  Test the emission of the log records in a dedicated thread
+  """
+
+  def test_00emission(self):
+    """
+    The records are all emitted, in order, by the wrapped handler
+    """
+    stream = StringIO()
+    handler = AsynchronousHandler(logging.StreamHandler(stream))
+    handler.handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('asynchronousTest')
+    logger.propagate = False
+    logger.addHandler(handler)
+    for i in xrange(100):
+      logger.warning("message %d", i)
+    handler.flush()
+    self.assertEqual(stream.getvalue(), "".join("message %d\n" % i for i in xrange(100)))
+    logger.removeHandler(handler)
@@ -72,6 +72,7 @@ if __name__ == '__main__':
   from DIRAC.FrameworkSystem.test.testLogging.Test_LogRecordCreation import Test_LogRecordCreation
   from DIRAC.FrameworkSystem.test.testLogging.Test_SubLogger import Test_SubLogger
   from DIRAC.FrameworkSystem.test.testLogging.Test_ConfigForExternalLibs import Test_ConfigForExternalLibs
+  from DIRAC.FrameworkSystem.test.testLogging.Test_LazyFormatting import Test_LazyFormatting, Test_AsynchronousHandler
 
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(Test_Logging)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_DisplayOptions))
@@ -79,4 +80,6 @@ if __name__ == '__main__':
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_LogRecordCreation))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_SubLogger))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_ConfigForExternalLibs))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_LazyFormatting))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Test_AsynchronousHandler))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -88,6 +88,10 @@ class RequestExecutingAgent( AgentModule ):
   __requestClient = None
   # # Size of the bulk if use of getRequests. If 0, use getRequest
   __bulkRequest = 0
+  # # validity of the handlers and proxies kept by the working processes. If 0, no caching
+  __workerCacheTime = 0
+  # # number of requests processed by a working process before it is replaced. If 0, no limit
+  __maxTasksPerWorker = 0
 
   def __init__( self, *args, **kwargs ):
     """ c'tor """
@@ -108,6 +112,10 @@ class RequestExecutingAgent( AgentModule ):
     self.log.info( "ProcessPool sleep time = %d seconds" % self.__poolSleep )
     self.__bulkRequest = self.am_getOption( "BulkRequest", 0 )
     self.log.info( "Bulk request size = %d" % self.__bulkRequest )
+    self.__workerCacheTime = int( self.am_getOption( "WorkerCacheTime", self.__workerCacheTime ) )
+    self.log.info( "Worker cache time = %d seconds" % self.__workerCacheTime )
+    self.__maxTasksPerWorker = int( self.am_getOption( "MaxTasksPerWorker", self.__maxTasksPerWorker ) )
+    self.log.info( "Max tasks per worker = %d" % self.__maxTasksPerWorker )
 
     # # keep config path and agent name
     self.agentName = self.am_getModuleParam( "fullName" )
@@ -178,7 +186,8 @@ class RequestExecutingAgent( AgentModule ):
                                         maxProcess,
                                         queueSize,
                                         poolCallback = self.resultCallback,
-                                        poolExceptionCallback = self.exceptionCallback )
+                                        poolExceptionCallback = self.exceptionCallback,
+                                        maxTasksPerWorker = self.__maxTasksPerWorker )
       self.__processPool.daemonize()
     return self.__processPool
 
@@ -273,7 +282,9 @@ class RequestExecutingAgent( AgentModule ):
           break
         requestsToExecute = [getRequest["Value"] ]
       else:
-        numberOfRequest = min( self.__bulkRequest, self.__requestsPerCycle - taskCounter )
+        # # do not fetch more requests than what the pool can take right now
+        numberOfRequest = min( self.__bulkRequest, self.__requestsPerCycle - taskCounter,
+                               max( 1, self.processPool().getFreeSlots() ) )
         self.log.info( "execute: ask for %s requests" % numberOfRequest )
         getRequests = self.requestClient().getBulkRequests( numberOfRequest )
         if not getRequests["OK"]:
@@ -328,7 +339,8 @@ class RequestExecutingAgent( AgentModule ):
                                                              kwargs = { "requestJSON" : requestJSON,
                                                                         "handlersDict" : self.handlersDict,
                                                                         "csPath" : self.__configPath,
-                                                                        "agentName": self.agentName },
+                                                                        "agentName": self.agentName,
+                                                                        "cacheTime": self.__workerCacheTime },
                                                              taskID = taskID,
                                                              blocking = True,
                                                              usePoolCallbacks = True,
@@ -354,6 +366,11 @@ class RequestExecutingAgent( AgentModule ):
     if processed < 0:
       self.log.fatal("Results queue is screwed up")
       sys.exit(1)
+    stats = self.processPool().getStatistics()
+    self.log.info( "ProcessPool: %d tasks processed, queue latency %.1f s (max %.1f s), run time %.1f s" %
+                   ( stats["ProcessedTasks"], stats["MeanQueueLatency"],
+                     stats["MaxQueueLatency"], stats["MeanRunTime"] ) )
+    self.log.verbose( "ProcessPool run time histogram: %s" % stats["RunTimeHistogram"] )
     # # clean return
     return S_OK()
 
@@ -37,6 +37,7 @@ from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationDat
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.Core.Security import CS
+from DIRAC.Core.Utilities.DictCache import DictCache
 
 ########################################################################
 
@@ -46,7 +47,15 @@ class RequestTask(object):
   .. class:: RequestTask
 
   request's processing task
+
+  When created with a non zero `cacheTime`, the operation handlers (together with their
+  DataManager and FileCatalog clients), the shifter proxies and the request owner proxies
+  are kept for `cacheTime` seconds in caches shared by all the tasks executed in the same
+  process, so that a warm worker does not have to set them up again for every request.
   """
+  # # caches shared by all the tasks of a working process
+  __handlersCache = DictCache()
+  __proxiesCache = DictCache()
 
   def __init__(
           self,
@@ -55,14 +64,18 @@ class RequestTask(object):
           csPath,
           agentName,
           standalone=False,
-          requestClient=None):
+          requestClient=None,
+          cacheTime=0):
     """c'tor
 
     :param self: self reference
     :param str requestJSON: request serialized to JSON
     :param dict opHandlers: operation handlers
+    :param int cacheTime: validity in seconds of the handlers and proxies kept between tasks (0 = no caching)
     """
     self.request = Request(requestJSON)
+    # # handlers and proxies cache validity
+    self.cacheTime = cacheTime
     # # csPath
     self.csPath = csPath
     # # agent name
@@ -101,6 +114,11 @@ class RequestTask(object):
 
   def __setupManagerProxies(self):
     """ setup grid proxy for all defined managers """
+    if self.cacheTime:
+      managersDict = self.__proxiesCache.get("Shifters")
+      if managersDict is not None:
+        self.__managersDict = dict(managersDict)
+        return S_OK()
     oHelper = Operations()
     shifters = oHelper.getSections("Shifter")
     if not shifters["OK"]:
@@ -143,8 +161,25 @@ class RequestTask(object):
                                       "ShifterGroup": userGroup,
                                       "Chain": chain,
                                       "ProxyFile": fileName}
+    if self.cacheTime:
+      self.__proxiesCache.add("Shifters", self.__proxyCacheTime(self.__managersDict.values()),
+                              dict(self.__managersDict))
     return S_OK()
 
+  def __proxyCacheTime(self, credsList):
+    """ time for which proxies can be kept in the cache, so that they still have
+        at least 1200 seconds left when they are used
+
+    :param list credsList: list of dicts with the proxy "Chain"
+    """
+    cacheTime = self.cacheTime
+    for creds in credsList:
+      secsLeft = creds["Chain"].getRemainingSecs()
+      if not secsLeft["OK"]:
+        return 0
+      cacheTime = min(cacheTime, secsLeft["Value"] - 1200)
+    return max(cacheTime, 0)
+
   def setupProxy(self):
     """ download and dump request owner proxy to file and env
 
@@ -167,12 +202,17 @@ class RequestTask(object):
       return S_OK({"Shifter": isShifter, "ProxyFile": proxyFile})
 
     # # if we're here owner is not a shifter at all
-    ownerProxyFile = gProxyManager.downloadVOMSProxyToFile(ownerDN, ownerGroup)
-    if not ownerProxyFile["OK"] or not ownerProxyFile["Value"]:
-      reason = ownerProxyFile.get("Message", "No valid proxy found in ProxyManager.")
-      return S_ERROR("Change proxy error for '%s'@'%s': %s" % (ownerDN, ownerGroup, reason))
+    cacheKey = ("Owner", ownerDN, ownerGroup)
+    ownerProxyFile = self.__proxiesCache.get(cacheKey) if self.cacheTime else None
+    if not ownerProxyFile or not os.path.exists(ownerProxyFile):
+      ownerProxy = gProxyManager.downloadVOMSProxyToFile(ownerDN, ownerGroup)
+      if not ownerProxy["OK"] or not ownerProxy["Value"]:
+        reason = ownerProxy.get("Message", "No valid proxy found in ProxyManager.")
+        return S_ERROR("Change proxy error for '%s'@'%s': %s" % (ownerDN, ownerGroup, reason))
+      ownerProxyFile = ownerProxy["Value"]
+      if self.cacheTime:
+        self.__proxiesCache.add(cacheKey, self.__proxyCacheTime([{"Chain": ownerProxy["chain"]}]), ownerProxyFile)
 
-    ownerProxyFile = ownerProxyFile["Value"]
     os.environ["X509_USER_PROXY"] = ownerProxyFile
     return S_OK({"Shifter": isShifter, "ProxyFile": ownerProxyFile})
 
@@ -230,13 +270,22 @@ class RequestTask(object):
 
   def getHandler(self, operation):
     """ return instance of a handler for a given operation type on demand
-        all created handlers are kept in self.handlers dict for further use
+        all created handlers are kept in self.handlers dict for further use,
+        and in the process handlers cache for the next tasks if cacheTime is set
+
+    The handlers clients depend on the VO of the proxy in use, so the cached
+    handlers are kept per request owner group.
 
     :param ~Operation.Operation operation: Operation instance
     """
     if operation.Type not in self.handlersDict:
       return S_ERROR("handler for operation '%s' not set" % operation.Type)
     handler = self.handlers.get(operation.Type, None)
+    cacheKey = (operation.Type, self.handlersDict[operation.Type], self.request.OwnerGroup, self.csPath)
+    if not handler and self.cacheTime:
+      handler = self.__handlersCache.get(cacheKey)
+      if handler:
+        self.handlers[operation.Type] = handler
     if not handler:
       try:
         handlerCls = self.loadHandler(self.handlersDict[operation.Type])
@@ -246,6 +295,8 @@ class RequestTask(object):
       except (ImportError, TypeError) as error:
         self.log.exception("getHandler: %s" % str(error), lException=error)
         return S_ERROR(str(error))
+      if self.cacheTime:
+        self.__handlersCache.add(cacheKey, self.cacheTime, handler)
     # # set operation for this handler
     handler.setOperation(operation)
     # # and return
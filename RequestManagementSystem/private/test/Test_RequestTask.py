@@ -0,0 +1,79 @@
+""" Unit tests for the proxies set up by RequestTask
+"""
+
+# pylint: disable=protected-access
+
+import os
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.DictCache import DictCache
+from DIRAC.RequestManagementSystem.Client.Request import Request
+from DIRAC.RequestManagementSystem.private.RequestTask import RequestTask
+
+__RCSID__ = "$Id$"
+
+OWNER_DN = "/DC=org/DC=ugrid/O=people/CN=owner"
+OWNER_GROUP = "dirac_user"
+
+
+@pytest.fixture
+def proxyManager(mocker, tmpdir):
+  """ RequestTask module with no shifters and a proxy manager giving a proxy file with 1 day left
+  """
+  mocker.patch('DIRAC.RequestManagementSystem.private.RequestTask.gMonitor')
+  operations = mocker.patch('DIRAC.RequestManagementSystem.private.RequestTask.Operations')
+  operations.return_value.getSections.return_value = S_OK([])
+  mocker.patch.object(RequestTask, '_RequestTask__proxiesCache', DictCache())
+  proxyFile = tmpdir.join('owner.proxy')
+  proxyFile.write('proxy')
+  chain = MagicMock()
+  chain.getRemainingSecs.return_value = S_OK(86400)
+  proxyMgr = mocker.patch('DIRAC.RequestManagementSystem.private.RequestTask.gProxyManager')
+  proxyMgr.downloadVOMSProxyToFile.return_value = {'OK': True, 'Value': str(proxyFile), 'chain': chain}
+  mocker.patch.dict(os.environ)
+  return proxyMgr
+
+
+def _requestTask(cacheTime):
+  request = Request()
+  request.RequestName = "proxyTest"
+  request.OwnerDN = OWNER_DN
+  request.OwnerGroup = OWNER_GROUP
+  return RequestTask(request.toJSON()["Value"], {}, 'csPath', 'RequestManagement/RequestExecutingAgent',
+                     requestClient=MagicMock(), cacheTime=cacheTime)
+
+
+@pytest.mark.parametrize('cacheTime, downloads', [(0, 2), (3600, 1)])
+def test_setupProxy(proxyManager, cacheTime, downloads):
+  for _ in range(2):
+    result = _requestTask(cacheTime).setupProxy()
+    assert result['OK'], result
+    assert result['Value']['Shifter'] == []
+    assert result['Value']['ProxyFile'] == proxyManager.downloadVOMSProxyToFile.return_value['Value']
+    assert os.environ['X509_USER_PROXY'] == result['Value']['ProxyFile']
+
+  assert proxyManager.downloadVOMSProxyToFile.call_count == downloads
+  proxyManager.downloadVOMSProxyToFile.assert_called_with(OWNER_DN, OWNER_GROUP)
+
+
+def test_setupProxyShortLived(proxyManager):
+  """ A proxy without 1200 seconds left when the cache would expire is not cached
+  """
+  proxyManager.downloadVOMSProxyToFile.return_value['chain'].getRemainingSecs.return_value = S_OK(1000)
+  for _ in range(2):
+    assert _requestTask(3600).setupProxy()['OK']
+
+  assert proxyManager.downloadVOMSProxyToFile.call_count == 2
+
+
+def test_setupProxyRemovedFile(proxyManager):
+  """ A cached proxy file removed meanwhile is downloaded again
+  """
+  assert _requestTask(3600).setupProxy()['OK']
+  os.unlink(proxyManager.downloadVOMSProxyToFile.return_value['Value'])
+  assert _requestTask(3600).setupProxy()['OK']
+
+  assert proxyManager.downloadVOMSProxyToFile.call_count == 2
@@ -4,6 +4,8 @@ Backend wrapper
 
 __RCSID__ = "$Id$"
 
+from DIRAC.FrameworkSystem.private.standardLogging.Handler.AsynchronousHandler import AsynchronousHandler
+
 
 class AbstractBackend(object):
   """
@@ -38,6 +40,7 @@ class AbstractBackend(object):
     """
     self._handler = handler
     self._formatter = formatter
+    self._asynchronousHandler = None
 
   def createHandler(self, parameters=None):
     """
@@ -47,10 +50,22 @@ class AbstractBackend(object):
     """
     raise NotImplementedError("setParameter not implemented")
 
+  def setAsynchronous(self, queueSize=10000):
+    """
+    Emit the log records in a dedicated thread, so that the threads creating them never wait for the handler.
+    To be called after createHandler.
+
+    :params queueSize: integer, maximum number of log records waiting to be emitted
+    """
+    self._asynchronousHandler = AsynchronousHandler(self._handler, queueSize)
+    self._asynchronousHandler.setLevel(self._handler.level)
+
   def getHandler(self):
     """
-    :return: the handler
+    :return: the handler to attach to the logger
     """
+    if self._asynchronousHandler is not None:
+      return self._asynchronousHandler
     return self._handler
 
   def setFormat(self, fmt, datefmt, options):
@@ -71,6 +86,9 @@ class AbstractBackend(object):
     :params level: integer representing a level
     """
     self._handler.setLevel(level)
+    # filter the records before queuing them
+    if self._asynchronousHandler is not None:
+      self._asynchronousHandler.setLevel(level)
 
   @staticmethod
   def createFormat(options):
@@ -4,23 +4,23 @@
 import time
 import Queue
 import os
+import calendar
 import datetime
 import pickle
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
 from DIRAC.Core.Utilities.List import breakListIntoChunks, randomize
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
 
 __RCSID__ = "$Id$"
 
 AGENT_NAME = 'Transformation/TransformationAgent'
-gSynchro = Synchronizer()
 
 
 class TransformationAgent(AgentModule, TransformationAgentsUtilities):
@@ -87,7 +87,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     # clients
     self.transfClient = TransformationClient()
 
-    # for caching using a pickle file
+    # for caching using an SQLite database (pickle files of older versions are imported)
     self.workDirectory = self.am_getWorkDirectory()
     self.cacheFile = os.path.join(self.workDirectory, 'ReplicaCache.pkl')
     self.controlDirectory = self.am_getControlDirectory()
@@ -96,7 +96,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     self.lastFileOffset = {}
 
     # Validity of the cache
-    self.replicaCache = {}
+    self.replicaCache = ReplicaCache(os.path.join(self.workDirectory, 'ReplicaCache.db'))
     self.replicaCacheValidity = self.am_getOption('ReplicaCacheValidity', 2)
 
     self.noUnusedDelay = self.am_getOption('NoUnusedDelay', 6)
@@ -126,7 +126,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
       while self.transInThread:
         time.sleep(2)
       self._logInfo("Threads are empty, terminating the agent...", method=method)
-    self.__writeCache()
     return S_OK()
 
   def execute(self):
@@ -241,8 +240,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     if not transFiles['Value']:
       return S_OK()
 
-    if transID not in self.replicaCache:
-      self.__readCache(transID)
+    self.__readCache(transID)
     transFiles = transFiles['Value']
     unusedLfns = [f['LFN'] for f in transFiles]
     unusedFiles = len(unusedLfns)
@@ -445,21 +443,12 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     else:
       # If the cache needs to be cleaned
       self.__cleanCache(transID)
-    startTime = time.time()
-    dataReplicas = {}
     nLfns = len(lfns)
     self._logVerbose("Getting replicas for %d files" % nLfns, method=method, transID=transID)
-    cachedReplicaSets = self.replicaCache.get(transID, {})
-    cachedReplicas = {}
-    # Merge all sets of replicas
-    for replicas in cachedReplicaSets.itervalues():
-      cachedReplicas.update(replicas)
-    self._logInfo("Number of cached replicas: %d" % len(cachedReplicas), method=method, transID=transID)
-    setCached = set(cachedReplicas)
-    setLfns = set(lfns)
-    for lfn in setLfns & setCached:
-      dataReplicas[lfn] = cachedReplicas[lfn]
-    newLFNs = setLfns - setCached
+    self._logInfo("Number of cached replicas: %d" % self.replicaCache.filesInCache(transID),
+                  method=method, transID=transID)
+    dataReplicas = self.replicaCache.getReplicas(transID, lfns)
+    newLFNs = set(lfns) - set(dataReplicas)
     self._logInfo("ReplicaCache hit for %d out of %d LFNs" % (len(dataReplicas), nLfns),
                   method=method, transID=transID)
     if newLFNs:
@@ -472,7 +461,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         if res['OK']:
           reps = dict((lfn, ses) for lfn, ses in res['Value'].iteritems() if ses)
           newReplicas.update(reps)
-          self.__updateCache(transID, reps)
+          self.replicaCache.addReplicas(transID, reps)
         else:
           self._logWarn("Failed to get replicas for %d files" % len(chunk), res['Message'],
                         method=method, transID=transID)
@@ -482,7 +471,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                     method=method, transID=transID)
       dataReplicas.update(newReplicas)
       noReplicas = newLFNs - set(dataReplicas)
-      self.__writeCache(transID)
       if noReplicas:
         self._logWarn("Found %d files without replicas (or only in Failover)" % len(noReplicas),
                       method=method, transID=transID)
@@ -548,121 +536,53 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                          method=method, transID=transID)
     return S_OK(dataReplicas)
 
-  def __updateCache(self, transID, newReplicas):
-    """ Add replicas to the cache
-    """
-    self.replicaCache.setdefault(transID, {})[datetime.datetime.utcnow()] = newReplicas
-#    if len( newReplicas ) > 5000:
-#      self.__writeCache( transID )
-
   def __clearCacheForTrans(self, transID):
     """ Remove all replicas for a transformation
     """
-    self.replicaCache.pop(transID, None)
-
-  def __cleanReplicas(self, transID, lfns):
-    """ Remove cached replicas that are not in a list
-    """
-    cachedReplicas = set()
-    for replicas in self.replicaCache.get(transID, {}).itervalues():
-      cachedReplicas.update(replicas)
-    toRemove = cachedReplicas - set(lfns)
-    if toRemove:
-      self._logInfo("Remove %d files from cache" % len(toRemove), method='__cleanReplicas', transID=transID)
-      self.__removeFromCache(transID, toRemove)
+    self.replicaCache.clear(transID)
 
   def __cleanCache(self, transID):
     """ Cleans the cache
     """
     try:
-      if transID in self.replicaCache:
-        timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=self.replicaCacheValidity)
-        for updateTime in set(self.replicaCache[transID]):
-          nCache = len(self.replicaCache[transID][updateTime])
-          if updateTime < timeLimit or not nCache:
-            self._logInfo("Clear %s replicas for transformation %s, time %s" %
-                          ('%d cached' % nCache if nCache else 'empty cache', str(transID), str(updateTime)),
-                          transID=transID, method='__cleanCache')
-            del self.replicaCache[transID][updateTime]
-        # Remove empty transformations
-        if not self.replicaCache[transID]:
-          del self.replicaCache[transID]
+      removed = self.replicaCache.removeExpired(transID, self.replicaCacheValidity * 86400)
+      for updateTime, nCache in removed:
+        self._logInfo("Clear %s replicas for transformation %s, time %s" %
+                      ('%d cached' % nCache if nCache else 'empty cache', str(transID),
+                       str(datetime.datetime.utcfromtimestamp(updateTime))),
+                      transID=transID, method='__cleanCache')
     except Exception as x:
       self._logException("Exception when cleaning replica cache:", lException=x)
 
   def __removeFilesFromCache(self, transID, lfns):
-    removed = self.__removeFromCache(transID, lfns)
+    removed = self.replicaCache.removeFiles(transID, lfns)
     if removed:
       self._logInfo("Removed %d replicas from cache" % removed, method='__removeFilesFromCache', transID=transID)
-      self.__writeCache(transID)
-
-  def __removeFromCache(self, transID, lfns):
-    if transID not in self.replicaCache:
-      return
-    removed = 0
-    if self.replicaCache[transID] and lfns:
-      for lfn in lfns:
-        for timeKey in self.replicaCache[transID]:
-          if self.replicaCache[transID][timeKey].pop(lfn, None):
-            removed += 1
-    return removed
 
   def __cacheFile(self, transID):
     return self.cacheFile.replace('.pkl', '_%s.pkl' % str(transID))
 
-  @gSynchro
   def __readCache(self, transID):
-    """ Reads from the cache
+    """ Imports the pickle cache file written by older versions of the agent, if any
     """
-    if transID in self.replicaCache:
+    method = '__readCache'
+    fileName = self.__cacheFile(transID)
+    if not os.path.exists(fileName):
       return
     try:
-      method = '__readCache'
-      fileName = self.__cacheFile(transID)
-      if not os.path.exists(fileName):
-        self.replicaCache[transID] = {}
-      else:
-        with open(fileName, 'r') as cacheFile:
-          self.replicaCache[transID] = pickle.load(cacheFile)
-        self._logInfo("Successfully loaded replica cache from file %s (%d files)" %
-                      (fileName, self.__filesInCache(transID)),
-                      method=method, transID=transID)
+      with open(fileName, 'r') as cacheFile:
+        for updateTime, replicas in pickle.load(cacheFile).iteritems():
+          self.replicaCache.addReplicas(transID, replicas, updateTime=calendar.timegm(updateTime.utctimetuple()))
+      self._logInfo("Successfully imported replica cache from file %s (%d files)" %
+                    (fileName, self.replicaCache.filesInCache(transID)),
+                    method=method, transID=transID)
     except Exception as x:
-      self._logException("Failed to load replica cache from file %s" % fileName, lException=x,
+      self._logException("Failed to import replica cache from file %s" % fileName, lException=x,
                          method=method, transID=transID)
-      self.replicaCache[transID] = {}
-
-  def __filesInCache(self, transID):
-    cache = self.replicaCache.get(transID, {})
-    return sum(len(lfns) for lfns in cache.itervalues())
-
-  @gSynchro
-  def __writeCache(self, transID=None):
-    """ Writes the cache
-    """
-    method = '__writeCache'
     try:
-      startTime = time.time()
-      transList = [transID] if transID else set(self.replicaCache)
-      filesInCache = 0
-      nCache = 0
-      for t_id in transList:
-        # Protect the copy of the cache
-        filesInCache += self.__filesInCache(t_id)
-        # write to a temporary file in order to avoid corrupted files
-        cacheFile = self.__cacheFile(t_id)
-        tmpFile = cacheFile + '.tmp'
-        with open(tmpFile, 'w') as fd:
-          pickle.dump(self.replicaCache.get(t_id, {}), fd)
-        # Now rename the file as it shold
-        os.rename(tmpFile, cacheFile)
-        nCache += 1
-      self._logInfo("Successfully wrote %d replica cache file(s) (%d files) in %.1f seconds"
-                    % (nCache, filesInCache, time.time() - startTime),
-                    method=method, transID=transID if transID else None)
-    except Exception as x:
-      self._logException("Could not write replica cache file %s" % cacheFile, lException=x,
-                         method=method, transID=t_id)
+      os.remove(fileName)
+    except OSError:
+      pass
 
   def __generatePluginObject(self, plugin, clients):
     """ This simply instantiates the TransformationPlugin class with the relevant plugin name
@@ -689,9 +609,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     """
     if invalidateCache:
       try:
-        if transID in self.replicaCache:
-          self._logInfo("Removed cached replicas for transformation", method='pluginCallBack', transID=transID)
-          self.replicaCache.pop(transID)
-          self.__writeCache(transID)
+        self._logInfo("Removed cached replicas for transformation", method='pluginCallBack', transID=transID)
+        self.replicaCache.clear(transID)
       except:
         pass
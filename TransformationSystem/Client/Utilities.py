@@ -141,22 +141,16 @@ class PluginUtilities(object):
       self.logDebug("fileGroups set: ", seFiles)
 
       for replicaSE in sortSEs(seFiles):
-        lfns = seFiles[replicaSE]
+        # In case the file was at more than one site, it may already be in a task for another site
+        lfns = [lfn for lfn in seFiles[replicaSE] if lfn in files]
         if lfns:
           tasksLfns = breakListIntoChunks(lfns, self.groupSize)
-          lfnsInTasks = []
           for taskLfns in tasksLfns:
             if flush or (len(taskLfns) >= self.groupSize):
               tasks.append((replicaSE, taskLfns))
-              lfnsInTasks += taskLfns
-          # In case the file was at more than one site, remove it from the other sites' list
-          # Remove files from global list
-          for lfn in lfnsInTasks:
-            files.pop(lfn)
-          if not groupSE:
-            # Remove files from other SEs
-            for se in [se for se in seFiles if se != replicaSE]:
-              seFiles[se] = [lfn for lfn in seFiles[se] if lfn not in lfnsInTasks]
+              # Remove files from global list
+              for lfn in taskLfns:
+                files.pop(lfn)
       self.logVerbose(
           "groupByReplicas: %d tasks created (groupSE %s)" %
           (len(tasks) - nTasks, str(groupSE)), "%d files not included in tasks" %
@@ -237,7 +231,8 @@ class PluginUtilities(object):
       seFiles = getFileGroups(files, groupSE=groupSE)
 
       for replicaSE in sorted(seFiles) if groupSE else sortSEs(seFiles):
-        lfns = seFiles[replicaSE]
+        # Files at more than one SE may already be in a task for another SE
+        lfns = [lfn for lfn in seFiles[replicaSE] if lfn in files]
         newTasks = self.createTasksBySize(lfns, replicaSE, fileSizes=fileSizes, flush=flush)
         lfnsInTasks = []
         for task in newTasks:
@@ -246,10 +241,6 @@ class PluginUtilities(object):
 
         # Remove the selected files from the size cache
         self.clearCachedFileSize(lfnsInTasks)
-        if not groupSE:
-          # Remove files from other SEs
-          for se in [se for se in seFiles if se != replicaSE]:
-            seFiles[se] = [lfn for lfn in seFiles[se] if lfn not in lfnsInTasks]
         # Remove files from global list
         for lfn in lfnsInTasks:
           files.pop(lfn)
@@ -293,15 +284,19 @@ class PluginUtilities(object):
     #FIXME: have to fill the cachedLFNSize!
     """
     lfns = list(lfns)
-    cachedLFNSize = dict(self.cachedLFNSize)
 
     fileSizes = {}
-    for lfn in [lfn for lfn in lfns if lfn in cachedLFNSize]:
-      fileSizes[lfn] = cachedLFNSize[lfn]
+    notCached = []
+    for lfn in lfns:
+      size = self.cachedLFNSize.get(lfn)
+      if size is None:
+        notCached.append(lfn)
+      else:
+        fileSizes[lfn] = size
     self.logDebug(
         "Found cache hit for File size for %d files out of %d" %
         (len(fileSizes), len(lfns)))
-    lfns = [lfn for lfn in lfns if lfn not in cachedLFNSize]
+    lfns = notCached
     if lfns:
       fileSizes = self._getFileSizeFromCatalog(lfns, fileSizes)
       if not fileSizes['OK']:
@@ -332,8 +327,8 @@ class PluginUtilities(object):
   def clearCachedFileSize(self, lfns):
     """ Utility function
     """
-    for lfn in [lfn for lfn in lfns if lfn in self.cachedLFNSize]:
-      self.cachedLFNSize.pop(lfn)
+    for lfn in lfns:
+      self.cachedLFNSize.pop(lfn, None)
 
   def getPluginParam(self, name, default=None):
     """ Get plugin parameters using specific settings or settings defined in the CS
@@ -467,16 +462,22 @@ def getFileGroups(fileReplicas, groupSE=True):
   If groupSE == False, group by SE, in which case a file can be in more than one element
   """
   fileGroups = {}
-  for lfn, replicas in fileReplicas.items():
+  # Lists of the groups of each replica list, computed once per distinct list
+  groupLists = {}
+  for lfn, replicas in fileReplicas.iteritems():
     if not replicas:
       continue
-    replicas = sorted(list(set(replicas)))
-    if not groupSE or len(replicas) == 1:
-      for rep in replicas:
-        fileGroups.setdefault(rep, []).append(lfn)
-    else:
-      replicaSEs = ','.join(replicas)
-      fileGroups.setdefault(replicaSEs, []).append(lfn)
+    replicaKey = tuple(replicas)
+    lfnGroups = groupLists.get(replicaKey)
+    if lfnGroups is None:
+      replicas = sorted(set(replicas))
+      if not groupSE or len(replicas) == 1:
+        lfnGroups = [fileGroups.setdefault(rep, []) for rep in replicas]
+      else:
+        lfnGroups = [fileGroups.setdefault(','.join(replicas), [])]
+      groupLists[replicaKey] = lfnGroups
+    for group in lfnGroups:
+      group.append(lfn)
   return fileGroups
 
 
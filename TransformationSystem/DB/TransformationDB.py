@@ -19,7 +19,7 @@ from DIRAC.Core.Utilities.List import stringListToString, intListToString, break
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities.Subprocess import pythonCall
-from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaFilterIndex import MetaFilterIndex
 
 __RCSID__ = "$Id$"
 
@@ -47,6 +47,9 @@ class TransformationDB(DB):
 
     self.lock = threading.Lock()
     self.filters = []
+    # Version of the filters, and index of the filters with the version it was built from
+    self.__filtersVersion = 0
+    self.__filterIndex = (None, None)
     res = self.__updateFilters()
     if not res['OK']:
       gLogger.fatal("Failed to create filters")
@@ -176,6 +179,7 @@ class TransformationDB(DB):
     # If the transformation has an input data specification
     if fileMask:
       self.filters.append((transID, json.loads(fileMask)))
+      self.__filtersVersion += 1
 
     if inheritedFrom:
       res = self._getTransformationID(inheritedFrom, connection=connection)
@@ -383,8 +387,28 @@ class TransformationDB(DB):
       if mask:
         resultList.append((transID, json.loads(mask)))
     self.filters = resultList
+    self.__filtersVersion += 1
     return S_OK(resultList)
 
+  def __getFilterIndex(self):
+    """ Get the index of the current filters, compiling it if they changed since it was built
+    """
+    version, filterIndex = self.__filterIndex
+    if filterIndex is not None and version == self.__filtersVersion:
+      return S_OK(filterIndex)
+    version = self.__filtersVersion
+    filters = list(self.filters)
+    res = FileCatalog().getMetadataFields()
+    if not res['OK']:
+      return res
+    if not res['Value']:
+      return S_ERROR("No metadata fields defined")
+    typeDict = dict(res['Value']['FileMetaFields'])
+    typeDict.update(res['Value']['DirectoryMetaFields'])
+    filterIndex = MetaFilterIndex(filters, typeDict)
+    self.__filterIndex = (version, filterIndex)
+    return S_OK(filterIndex)
+
   def __filterFile(self, lfn, filters=None):
     """Pass the input file through a supplied filter or those currently active """
     result = []
@@ -577,6 +601,48 @@ class TransformationDB(DB):
     result['ParameterNames'] = ['LFN'] + self.TRANSFILEPARAMS
     return result
 
+  def getTransformationFilesIter(self, condDict=None, older=None, newer=None, timeStamp='LastUpdate',
+                                 orderAttribute=None, limit=None, offset=None, batchSize=1000):
+    """ Same as getTransformationFiles, but the files are streamed from the DB instead of being
+        loaded all at once. The LFNs are obtained in the same statement, as no other query can be
+        executed while the files are streamed.
+
+        :return: S_OK(generator) yielding lists of at most batchSize file dictionaries
+    """
+    lfnColumn = "(SELECT LFN FROM DataFiles WHERE DataFiles.FileID = TransformationFiles.FileID)"
+    req = "SELECT %s,%s FROM TransformationFiles" % (intListToString(self.TRANSFILEPARAMS), lfnColumn)
+    if condDict is None:
+      condDict = {}
+    if condDict or older or newer:
+      lfns = condDict.pop('LFN', None)
+      if lfns:
+        if isinstance(lfns, basestring):
+          lfns = [lfns]
+        res = self.__getFileIDsForLfns(lfns)
+        if not res['OK']:
+          return res
+        condDict['FileID'] = res['Value'][0].keys()
+
+      for val in condDict.itervalues():
+        if not val:
+          return S_OK(iter([]))
+
+      req = "%s %s" % (req, self.buildCondition(condDict, older, newer, timeStamp, orderAttribute, limit,
+                                                offset=offset))
+    res = self._queryIter(req, batchSize=batchSize)
+    if not res['OK']:
+      return res
+
+    def fileDicts(rowBatches):
+      for rows in rowBatches:
+        batch = []
+        for row in rows:
+          fDict = dict(zip(self.TRANSFILEPARAMS, row))
+          fDict['LFN'] = row[-1]
+          batch.append(fDict)
+        yield batch
+    return S_OK(fileDicts(res['Value']))
+
   def getFileSummary(self, lfns, connection=False):
     """ Get file status summary in all the transformations """
     connection = self.__getConnection(connection)
@@ -1427,7 +1493,7 @@ class TransformationDB(DB):
     catalog = FileCatalog()
 
     for lfn in fileDicts:
-      gLogger.info("addFile: Attempting to add file %s" % lfn)
+      gLogger.verbose("addFile: Attempting to add file %s" % lfn)
       res = catalog.getFileUserMetadata(lfn)
       if not res['OK']:
         gLogger.error("Failed to getFileUserMetadata for file", "%s: %s" % (lfn, res['Message']))
@@ -1435,9 +1501,9 @@ class TransformationDB(DB):
         continue
       else:
         metadatadict = res['Value']
-      gLogger.info('Filter file with metadata', metadatadict)
+      gLogger.verbose('Filter file with metadata', metadatadict)
       transIDs = self._filterFileByMetadata(metadatadict)
-      gLogger.info('Transformations passing the filter: %s' % transIDs)
+      gLogger.verbose('Transformations passing the filter: %s' % transIDs)
       if not (transIDs or force):  # not clear how force should be used for
         successful[lfn] = False  # True -> False bug fix: otherwise it is set to True even if transIDs is empty.
       else:
@@ -1447,17 +1513,17 @@ class TransformationDB(DB):
             transFiles[trans] = []
           transFiles[trans].append(lfn)
 
-      # Add the files to the transformations
-      gLogger.info('Files to add to transformations:', filesToAdd)
-      if filesToAdd:
-        for transID, lfns in transFiles.iteritems():
-          res = self.addFilesToTransformation(transID, lfns)
-          if not res['OK']:
-            gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res['Message']))
-            return res
-          else:
-            for lfn in lfns:
-              successful[lfn] = True
+    # Add the files to the transformations
+    gLogger.info('Files to add to transformations:', len(filesToAdd))
+    if filesToAdd:
+      for transID, lfns in transFiles.iteritems():
+        res = self.addFilesToTransformation(transID, lfns)
+        if not res['OK']:
+          gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res['Message']))
+          return res
+        else:
+          for lfn in lfns:
+            successful[lfn] = True
 
     res = S_OK({'Successful': successful, 'Failed': failed})
     return res
@@ -1586,32 +1652,12 @@ class TransformationDB(DB):
 
   def _filterFileByMetadata(self, metadatadict):
     """Pass the input metadatadict through those currently active"""
-    transIDs = []
-    queries = self.filters
-    catalog = FileCatalog()
-    gLogger.info('Filter file by queries', queries)
-    res = catalog.getMetadataFields()
-
+    res = self.__getFilterIndex()
     if not res['OK']:
-      gLogger.error("Error in getMetadataFields: %s" % res['Message'])
-      return res
-    if not res['Value']:
-      gLogger.error("Error: no metadata fields defined")
-      return res
-    typeDict = res['Value']['FileMetaFields']
-    typeDict.update(res['Value']['DirectoryMetaFields'])
-
-    for transID, query in queries:
-      mq = MetaQuery(query, typeDict)
-      gLogger.info("Apply query %s to metadata %s" % (mq.getMetaQuery(), metadatadict))
-      res = mq.applyQuery(metadatadict)
-      if not res['OK']:
-        gLogger.error("Error in applying query: %s" % res['Message'])
-        return res
-      elif res['Value']:
-        gLogger.info("Apply query result is True")
-        transIDs.append(transID)
-      else:
-        gLogger.info("Apply query result is False")
-
-    return transIDs
+      gLogger.error("Error in getting the filters index: %s" % res['Message'])
+      return []
+    res = res['Value'].match(metadatadict)
+    if not res['OK']:
+      gLogger.error("Error in applying query: %s" % res['Message'])
+      return []
+    return res['Value']
@@ -0,0 +1,121 @@
+"""
+Index of the input data filters of the transformations
+
+The input data queries of the transformations are compiled once into MetaQuery objects and
+indexed by the metadata values they require, so that the transformations a file goes to are
+found by applying only the queries that can match its metadata, instead of all of them.
+"""
+
+from DIRAC import gLogger, S_OK
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+
+__RCSID__ = "$Id$"
+
+
+def _indexKey(value, metaType):
+  """ Value of a metadata as compared by MetaQuery, or None if it can't be used as index key
+
+  :param value: metadata value, from a query or from the metadata of a file
+  :param str metaType: type of the metadata field
+  """
+  if isinstance(value, bool) or not isinstance(value, (basestring, int, long, float)):
+    return None
+  if isinstance(value, basestring) and value.lower() in ('any', 'missing'):
+    return None
+  metaType = metaType.lower()
+  if metaType.startswith('date'):
+    return None
+  try:
+    if metaType.startswith('int'):
+      return int(value)
+    if metaType.startswith('float'):
+      return float(value)
+  except ValueError:
+    return None
+  return value
+
+
+def _requiredValues(queryValue):
+  """ List of values one of which the metadata must be equal to for the query to match,
+      None if the query does not require any
+
+  :param queryValue: query for one metadata field
+  """
+  if isinstance(queryValue, list):
+    return queryValue
+  if isinstance(queryValue, dict):
+    for operation in ('=', 'in'):
+      if operation in queryValue:
+        operand = queryValue[operation]
+        return operand if isinstance(operand, list) else [operand]
+    return None
+  return [queryValue]
+
+
+class MetaFilterIndex(object):
+  """ Transformation filters compiled and indexed by required metadata values
+  """
+
+  def __init__(self, filters, typeDict):
+    """ c'tor
+
+    :param list filters: (transID, queryDict) tuples of the transformations input data queries
+    :param dict typeDict: type of the metadata fields
+    """
+    self.typeDict = typeDict
+    # (transID, MetaQuery) tuples, in the filters order
+    self.queries = []
+    # { meta : { value : set( query positions ) } }
+    self.index = {}
+    # positions of the queries to apply to all the files
+    self.unindexed = []
+
+    for transID, queryDict in filters:
+      unknownFields = [meta for meta in queryDict if meta not in typeDict]
+      if unknownFields:
+        gLogger.warn("Filter of transformation %s uses undefined metadata fields" % transID, unknownFields)
+        continue
+      position = len(self.queries)
+      self.queries.append((transID, MetaQuery(queryDict, typeDict)))
+
+      # Index the query on the field requiring the fewest values
+      bestKeys = None
+      for meta in sorted(queryDict):
+        values = _requiredValues(queryDict[meta])
+        if values is None:
+          continue
+        keys = [_indexKey(value, typeDict[meta]) for value in values]
+        if not keys or None in keys:
+          continue
+        if bestKeys is None or len(keys) < len(bestKeys[1]):
+          bestKeys = (meta, keys)
+      if bestKeys is None:
+        self.unindexed.append(position)
+        continue
+      meta, keys = bestKeys
+      metaIndex = self.index.setdefault(meta, {})
+      for key in keys:
+        metaIndex.setdefault(key, set()).add(position)
+
+  def match(self, metaDict):
+    """ Transformations whose filter is passed by a file
+
+    :param dict metaDict: metadata of the file
+    :return: S_OK with the list of transformation IDs, in the filters order
+    """
+    candidates = set(self.unindexed)
+    for meta, metaIndex in self.index.iteritems():
+      if meta in metaDict:
+        key = _indexKey(metaDict[meta], self.typeDict[meta])
+        if key is not None:
+          candidates.update(metaIndex.get(key, ()))
+
+    transIDs = []
+    for position in sorted(candidates):
+      transID, metaQuery = self.queries[position]
+      res = metaQuery.applyQuery(metaDict)
+      if not res['OK']:
+        return res
+      if res['Value']:
+        transIDs.append(transID)
+    return S_OK(transIDs)
@@ -0,0 +1,209 @@
+"""
+Replica cache of the TransformationAgent
+
+The replicas are kept per transformation as { updateTime : { lfn : seMask } } dictionaries, where the
+bits of the integer seMask are the IDs of the SEs holding a replica, the SE names being stored only once.
+
+The cache is persisted in an SQLite database, updated with the replicas added or removed rather than
+rewritten as a whole. The transformations are cached independently from each other, so that the agent
+threads, which never process the same transformation at the same time, don't wait for each other.
+"""
+
+import sqlite3
+import threading
+import time
+
+__RCSID__ = "$Id$"
+
+
+class ReplicaCache(object):
+  """ Replica cache of the transformations, persisted in an SQLite database
+  """
+
+  def __init__(self, fileName):
+    """ c'tor
+
+    :param str fileName: path of the SQLite database
+    """
+    self.fileName = fileName
+    # One connection per thread, as SQLite connections can't be shared between threads
+    self.__local = threading.local()
+    # SE ID <-> SE name, and SE mask -> SE names
+    self.__seLock = threading.Lock()
+    self.__seNames = {}
+    self.__seIDs = {}
+    self.__maskSEs = {}
+    # transID -> { updateTime : { lfn : seMask } }
+    self.__cache = {}
+    self.__transLocks = {}
+
+    connection = self.__getConnection()
+    with connection:
+      connection.execute("CREATE TABLE IF NOT EXISTS SEs (SEID INTEGER PRIMARY KEY, SEName TEXT UNIQUE NOT NULL)")
+      connection.execute("CREATE TABLE IF NOT EXISTS Replicas (TransID INTEGER NOT NULL, LFN TEXT NOT NULL, "
+                         "SEMask TEXT NOT NULL, UpdateTime INTEGER NOT NULL, PRIMARY KEY (TransID, LFN))")
+    for seID, seName in connection.execute("SELECT SEID, SEName FROM SEs"):
+      self.__seNames[seID] = seName
+      self.__seIDs[seName] = seID
+
+  def __getConnection(self):
+    """ SQLite connection of the current thread
+    """
+    connection = getattr(self.__local, 'connection', None)
+    if connection is None:
+      connection = sqlite3.connect(self.fileName, timeout=60)
+      connection.text_factory = str
+      connection.execute("PRAGMA journal_mode=WAL")
+      connection.execute("PRAGMA synchronous=NORMAL")
+      self.__local.connection = connection
+    return connection
+
+  def __getSEID(self, seName):
+    """ ID of an SE, registering it if needed
+    """
+    seID = self.__seIDs.get(seName)
+    if seID is None:
+      with self.__seLock:
+        seID = self.__seIDs.get(seName)
+        if seID is None:
+          connection = self.__getConnection()
+          with connection:
+            connection.execute("INSERT OR IGNORE INTO SEs (SEName) VALUES (?)", (seName,))
+          seID = connection.execute("SELECT SEID FROM SEs WHERE SEName = ?", (seName,)).fetchone()[0]
+          self.__seNames[seID] = seName
+          self.__seIDs[seName] = seID
+    return seID
+
+  def __getMask(self, seList):
+    """ SE mask of a list of SEs
+    """
+    mask = 0
+    for seName in seList:
+      mask |= 1 << self.__getSEID(seName)
+    return mask
+
+  def __getSEs(self, mask):
+    """ list of SEs of an SE mask
+    """
+    seTuple = self.__maskSEs.get(mask)
+    if seTuple is None:
+      seTuple = tuple(self.__seNames[seID] for seID in sorted(self.__seNames) if mask >> seID & 1)
+      self.__maskSEs[mask] = seTuple
+    return list(seTuple)
+
+  def __getTransLock(self, transID):
+    """ lock of the cache of a transformation
+    """
+    return self.__transLocks.setdefault(transID, threading.RLock())
+
+  def __getTransCache(self, transID):
+    """ cache of a transformation, loaded from the database if needed, to be called with its lock
+    """
+    transCache = self.__cache.get(transID)
+    if transCache is None:
+      transCache = {}
+      for lfn, mask, updateTime in self.__getConnection().execute(
+              "SELECT LFN, SEMask, UpdateTime FROM Replicas WHERE TransID = ?", (transID,)):
+        transCache.setdefault(updateTime, {})[lfn] = int(mask, 16)
+      self.__cache[transID] = transCache
+    return transCache
+
+  def getReplicas(self, transID, lfns):
+    """ Cached replicas of a list of files
+
+    :param int transID: transformation ID
+    :param list lfns: LFNs
+    :return: dict { lfn : [ SEs ] } of the LFNs found in the cache
+    """
+    lfnSet = set(lfns)
+    replicas = {}
+    with self.__getTransLock(transID):
+      for replicaMasks in self.__getTransCache(transID).itervalues():
+        if len(replicaMasks) < len(lfnSet):
+          cached = lfnSet.intersection(replicaMasks)
+        else:
+          cached = [lfn for lfn in lfnSet if lfn in replicaMasks]
+        for lfn in cached:
+          replicas[lfn] = self.__getSEs(replicaMasks[lfn])
+    return replicas
+
+  def addReplicas(self, transID, replicas, updateTime=None):
+    """ Add replicas to the cache
+
+    :param int transID: transformation ID
+    :param dict replicas: { lfn : [ SEs ] }
+    :param int updateTime: time of the update, in seconds since the epoch (default: now)
+    """
+    if not replicas:
+      return
+    if updateTime is None:
+      updateTime = int(time.time())
+    replicaMasks = dict((lfn, self.__getMask(seList)) for lfn, seList in replicas.iteritems())
+    with self.__getTransLock(transID):
+      transCache = self.__getTransCache(transID)
+      for otherMasks in transCache.itervalues():
+        for lfn in replicaMasks:
+          otherMasks.pop(lfn, None)
+      transCache.setdefault(updateTime, {}).update(replicaMasks)
+      connection = self.__getConnection()
+      with connection:
+        connection.executemany("INSERT OR REPLACE INTO Replicas (TransID, LFN, SEMask, UpdateTime) "
+                               "VALUES (?, ?, ?, ?)",
+                               ((transID, lfn, '%x' % mask, updateTime) for lfn, mask in replicaMasks.iteritems()))
+
+  def removeFiles(self, transID, lfns):
+    """ Remove files from the cache
+
+    :param int transID: transformation ID
+    :param list lfns: LFNs
+    :return: number of files removed
+    """
+    removed = []
+    with self.__getTransLock(transID):
+      for replicaMasks in self.__getTransCache(transID).itervalues():
+        removed += [lfn for lfn in lfns if replicaMasks.pop(lfn, None) is not None]
+      if removed:
+        connection = self.__getConnection()
+        with connection:
+          connection.executemany("DELETE FROM Replicas WHERE TransID = ? AND LFN = ?",
+                                 ((transID, lfn) for lfn in removed))
+    return len(removed)
+
+  def removeExpired(self, transID, validity):
+    """ Remove the replicas cached for too long, and empty updates
+
+    :param int transID: transformation ID
+    :param int validity: validity of the cached replicas, in seconds
+    :return: list of ( updateTime, number of files ) of the removed updates
+    """
+    timeLimit = int(time.time()) - validity
+    removed = []
+    with self.__getTransLock(transID):
+      transCache = self.__getTransCache(transID)
+      for updateTime in sorted(transCache):
+        if updateTime < timeLimit or not transCache[updateTime]:
+          removed.append((updateTime, len(transCache.pop(updateTime))))
+      if removed:
+        connection = self.__getConnection()
+        with connection:
+          connection.execute("DELETE FROM Replicas WHERE TransID = ? AND UpdateTime < ?", (transID, timeLimit))
+    return removed
+
+  def clear(self, transID):
+    """ Remove all the replicas of a transformation
+
+    :param int transID: transformation ID
+    """
+    with self.__getTransLock(transID):
+      self.__cache[transID] = {}
+      connection = self.__getConnection()
+      with connection:
+        connection.execute("DELETE FROM Replicas WHERE TransID = ?", (transID,))
+
+  def filesInCache(self, transID):
+    """ Number of files cached for a transformation
+
+    :param int transID: transformation ID
+    """
+    with self.__getTransLock(transID):
+      return sum(len(replicaMasks) for replicaMasks in self.__getTransCache(transID).itervalues())
@@ -0,0 +1,66 @@
+""" Test the index of the transformation input data filters """
+
+import random
+import unittest
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaFilterIndex import MetaFilterIndex
+
+__RCSID__ = "$Id$"
+
+TYPE_DICT = {'Year': 'INT',
+             'Config': 'VARCHAR(128)',
+             'Polarity': 'VARCHAR(32)',
+             'Energy': 'FLOAT'}
+
+FILTERS = [(1, {'Year': 2016, 'Config': 'Sim09'}),
+           (2, {'Year': [2016, 2017]}),
+           (3, {'Config': {'in': ['Sim09', 'Reco15']}, 'Polarity': 'MagUp'}),
+           (4, {'Year': {'>=': 2017}}),
+           (5, {'Polarity': {'!=': 'MagDown'}, 'Energy': {'=': 6.5}}),
+           (6, {'Config': 'Any', 'Year': '2018'}),
+           (7, {'Polarity': 'Missing'}),
+           (8, {'Unknown': 'value'})]
+
+
+def bruteForce(filters, metaDict):
+  """ transformations passing the filters, applying all the queries """
+  return [transID for transID, query in filters
+          if all(meta in TYPE_DICT for meta in query) and
+          MetaQuery(query, TYPE_DICT).applyQuery(metaDict)['Value']]
+
+
+class MetaFilterIndexSuccess(unittest.TestCase):
+
+  def setUp(self):
+    self.filterIndex = MetaFilterIndex(FILTERS, TYPE_DICT)
+
+  def test_indexed(self):
+    """ only the queries without required values are applied to all files """
+    self.assertEqual(sorted(self.filterIndex.index), ['Config', 'Energy', 'Polarity', 'Year'])
+    self.assertEqual([self.filterIndex.queries[pos][0] for pos in self.filterIndex.unindexed], [4, 7])
+
+  def test_match(self):
+    self.assertEqual(self.filterIndex.match({'Year': 2016, 'Config': 'Sim09'})['Value'], [1, 2, 7])
+    self.assertEqual(self.filterIndex.match({'Year': '2017', 'Config': 'Reco15', 'Polarity': 'MagUp'})['Value'],
+                     [2, 3, 4])
+    self.assertEqual(self.filterIndex.match({'Year': 2018, 'Config': 'Reco16'})['Value'], [4, 6, 7])
+    self.assertEqual(self.filterIndex.match({'Energy': '6.5', 'Polarity': 'MagUp'})['Value'], [5])
+    self.assertEqual(self.filterIndex.match({})['Value'], [7])
+
+  def test_matchRandom(self):
+    """ same results as applying all the queries """
+    for _ in xrange(1000):
+      metaDict = {}
+      for meta, values in (('Year', [2015, 2016, 2017, 2018, '2016']),
+                           ('Config', ['Sim09', 'Reco15', 'Reco16']),
+                           ('Polarity', ['MagUp', 'MagDown']),
+                           ('Energy', [6.5, 13., '6.5'])):
+        if random.random() < 0.8:
+          metaDict[meta] = random.choice(values)
+      self.assertEqual(self.filterIndex.match(metaDict)['Value'], bruteForce(FILTERS, metaDict))
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(MetaFilterIndexSuccess)
+  testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,87 @@
+""" Test the replica cache of the TransformationAgent """
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
+
+__RCSID__ = "$Id$"
+
+
+def sortedSEs(replicas):
+  """ replicas with the SEs in alphabetical order """
+  return dict((lfn, sorted(seList)) for lfn, seList in replicas.iteritems())
+
+
+class ReplicaCacheSuccess(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.fileName = os.path.join(self.tmpDir, 'ReplicaCache.db')
+    self.cache = ReplicaCache(self.fileName)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+  def test_addGet(self):
+    self.cache.addReplicas(1, {'/lfn/1': ['SE-A', 'SE-B'], '/lfn/2': ['SE-B']})
+    self.cache.addReplicas(2, {'/lfn/1': ['SE-C']})
+    self.assertEqual(sortedSEs(self.cache.getReplicas(1, ['/lfn/1', '/lfn/2', '/lfn/3'])),
+                     {'/lfn/1': ['SE-A', 'SE-B'], '/lfn/2': ['SE-B']})
+    self.assertEqual(self.cache.getReplicas(2, ['/lfn/1', '/lfn/2']), {'/lfn/1': ['SE-C']})
+    self.assertEqual(self.cache.filesInCache(1), 2)
+    self.assertEqual(self.cache.getReplicas(3, ['/lfn/1']), {})
+
+    # An update of a file replaces its replicas
+    self.cache.addReplicas(1, {'/lfn/1': ['SE-C']}, updateTime=int(time.time()) + 1)
+    self.assertEqual(self.cache.getReplicas(1, ['/lfn/1']), {'/lfn/1': ['SE-C']})
+    self.assertEqual(self.cache.filesInCache(1), 2)
+
+  def test_persistence(self):
+    self.cache.addReplicas(1, {'/lfn/1': ['SE-A', 'SE-B'], '/lfn/2': ['SE-B'], '/lfn/3': ['SE-A']})
+    self.cache.addReplicas(2, {'/lfn/1': ['SE-C']})
+    self.assertEqual(self.cache.removeFiles(1, ['/lfn/2', '/lfn/4']), 1)
+    self.cache.clear(2)
+
+    cache = ReplicaCache(self.fileName)
+    self.assertEqual(sortedSEs(cache.getReplicas(1, ['/lfn/1', '/lfn/2', '/lfn/3'])),
+                     {'/lfn/1': ['SE-A', 'SE-B'], '/lfn/3': ['SE-A']})
+    self.assertEqual(cache.getReplicas(2, ['/lfn/1']), {})
+    # New SEs get new IDs
+    cache.addReplicas(1, {'/lfn/4': ['SE-D', 'SE-A']})
+    self.assertEqual(sortedSEs(ReplicaCache(self.fileName).getReplicas(1, ['/lfn/4'])), {'/lfn/4': ['SE-A', 'SE-D']})
+
+  def test_removeExpired(self):
+    now = int(time.time())
+    self.cache.addReplicas(1, {'/lfn/1': ['SE-A']}, updateTime=now - 3 * 86400)
+    self.cache.addReplicas(1, {'/lfn/2': ['SE-A']}, updateTime=now - 3600)
+    self.assertEqual(self.cache.removeExpired(1, 2 * 86400), [(now - 3 * 86400, 1)])
+    self.assertEqual(self.cache.getReplicas(1, ['/lfn/1', '/lfn/2']), {'/lfn/2': ['SE-A']})
+    self.assertEqual(ReplicaCache(self.fileName).getReplicas(1, ['/lfn/1', '/lfn/2']), {'/lfn/2': ['SE-A']})
+
+  def test_threads(self):
+    """ transformations updated from several threads """
+    def fill(transID):
+      for i in xrange(20):
+        self.cache.addReplicas(transID, dict(('/lfn/%d/%d' % (i, j), ['SE-%d' % (j % 5)]) for j in xrange(50)))
+        self.cache.removeFiles(transID, ['/lfn/%d/0' % i])
+
+    threads = [threading.Thread(target=fill, args=(transID,)) for transID in xrange(5)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    cache = ReplicaCache(self.fileName)
+    for transID in xrange(5):
+      self.assertEqual(self.cache.filesInCache(transID), 20 * 49)
+      self.assertEqual(cache.filesInCache(transID), 20 * 49)
+    self.assertEqual(cache.getReplicas(0, ['/lfn/3/7']), {'/lfn/3/7': ['SE-2']})
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(ReplicaCacheSuccess)
+  testResult = unittest.TextTestRunner(verbosity=2).run(suite)
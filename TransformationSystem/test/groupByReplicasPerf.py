@@ -0,0 +1,115 @@
+""" Benchmark of the task building of the transformation plugins on synthetic replica distributions
+
+    Usage: python groupByReplicasPerf.py [maximum number of files] [maximum number of files for the legacy algorithm]
+
+    For each distribution of the replicas and each number of files, it prints the time taken
+    by groupByReplicas and groupBySize, and by the former list based groupByReplicas for comparison,
+    in a normal plugin cycle (no flush), where the files left over by the SE groups are grouped by SE.
+    The SEs are all taken as disk SEs, without contacting the StorageElement.
+"""
+
+__RCSID__ = "$Id$"
+
+import random
+import sys
+import time
+
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+from DIRAC.TransformationSystem.Client import Utilities
+from DIRAC.TransformationSystem.Client.Utilities import PluginUtilities, getFileGroups, sortSEs
+
+SES = ['SITE%02d-DST' % i for i in xrange(30)]
+
+
+class DiskStorageElement(object):
+  """ StorageElement replacement, all SEs are disk SEs """
+
+  def __init__(self, seName):
+    self.seName = seName
+
+  def status(self):
+    return {'DiskSE': True, 'TapeSE': False}
+
+
+def singleReplica(nFiles):
+  """ Each file at one SE """
+  return dict(('/lhcb/MC/2018/DST/%08d.dst' % i, [SES[i % len(SES)]]) for i in xrange(nFiles))
+
+
+def fewReplicas(nFiles):
+  """ Each file at 1 to 4 random SEs, most SE groups having too few files for a task """
+  rand = random.Random(12345)
+  return dict(('/lhcb/MC/2018/DST/%08d.dst' % i, rand.sample(SES, rand.randint(1, 4))) for i in xrange(nFiles))
+
+
+def everywhere(nFiles):
+  """ Most files at all SEs, some at a single one """
+  return dict(('/lhcb/MC/2018/DST/%08d.dst' % i, SES if i % 10 else [SES[i % len(SES)]]) for i in xrange(nFiles))
+
+
+DISTRIBUTIONS = [('single replica', singleReplica),
+                 ('1-4 replicas', fewReplicas),
+                 ('mostly everywhere', everywhere)]
+
+
+def legacyGroupByReplicas(files, groupSize, flush):
+  """ groupByReplicas as it was, removing the files in tasks from the lists of the other SEs """
+  tasks = []
+  files = dict(files)
+  for groupSE in (True, False):
+    if not files:
+      break
+    seFiles = getFileGroups(files, groupSE=groupSE)
+    for replicaSE in sortSEs(seFiles):
+      lfns = seFiles[replicaSE]
+      if lfns:
+        lfnsInTasks = []
+        for taskLfns in breakListIntoChunks(lfns, groupSize):
+          if flush or (len(taskLfns) >= groupSize):
+            tasks.append((replicaSE, taskLfns))
+            lfnsInTasks += taskLfns
+        for lfn in lfnsInTasks:
+          files.pop(lfn)
+        if not groupSE:
+          for se in [se for se in seFiles if se != replicaSE]:
+            seFiles[se] = [lfn for lfn in seFiles[se] if lfn not in lfnsInTasks]
+  return tasks
+
+
+def timeIt(func):
+  start = time.time()
+  result = func()
+  return time.time() - start, result
+
+
+def main(maxFiles, maxLegacyFiles):
+  Utilities.StorageElement = DiskStorageElement
+  util = PluginUtilities(transClient=object(), dataManager=object(), fc=object())
+  util.maxFiles = 100
+  print "%-20s %10s %8s %15s %15s %15s" % ('Distribution', 'Files', 'Tasks', 'ByReplicas (s)',
+                                           'BySize (s)', 'Legacy (s)')
+  for distName, distribution in DISTRIBUTIONS:
+    nFiles = 1000
+    while nFiles <= maxFiles:
+      files = distribution(nFiles)
+
+      util.groupSize = 100
+      replicasTime, tasks = timeIt(lambda: util.groupByReplicas(files, 'Active')['Value'])
+      legacyTime = None
+      if nFiles <= maxLegacyFiles:
+        legacyTime, legacyTasks = timeIt(lambda: legacyGroupByReplicas(files, 100, False))
+        assert tasks == legacyTasks
+
+      # 100 files of 1 GB per task, the sizes being cached as after a catalog query
+      util.groupSize = 100 * 1000 * 1000 * 1000
+      util.cachedLFNSize = dict.fromkeys(files, 1000 * 1000 * 1000)
+      sizeTime, _sizeTasks = timeIt(lambda: util.groupBySize(files, 'Active')['Value'])
+
+      print "%-20s %10d %8d %15.3f %15.3f %15s" % (distName, nFiles, len(tasks), replicasTime, sizeTime,
+                                                   '%.3f' % legacyTime if legacyTime is not None else '-')
+      nFiles *= 10
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+       int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
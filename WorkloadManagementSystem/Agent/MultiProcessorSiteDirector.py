@@ -333,6 +333,10 @@ class MultiProcessorSiteDirector(SiteDirector):
                                                                 bundleProxy=bundleProxy,
                                                                 jobExecDir=jobExecDir,
                                                                 processors=processors)
+          if not executable:
+            self.log.error('Failed to write the pilot wrapper for queue', queue)
+            self.failedQueues[queue] += 1
+            break
           result = ce.submitJob(executable, '', pilotSubmissionChunk, processors=processors)
           # ## FIXME: The condor thing only transfers the file with some
           # ## delay, so when we unlink here the script is gone
@@ -13,10 +13,12 @@ import sys
 import random
 import socket
 import hashlib
-from collections import defaultdict
+import threading
+import time
+from collections import defaultdict, deque
 
 import DIRAC
-from DIRAC import S_OK, gConfig
+from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Security import CS
 from DIRAC.Core.Utilities.SiteCEMapping import getSiteForCE
@@ -130,6 +132,15 @@ class SiteDirector(AgentModule):
 
     self.localhost = socket.getfqdn()
 
+    # concurrent treatment of the CEs
+    self.submissionThreads = 1
+    self.ceTimeout = 600
+    self.__lock = threading.Lock()
+    self.__busyCEs = set()
+    # pilot proxies of the cycle, per lifetime
+    self.__proxyLock = threading.Lock()
+    self.__pilotProxies = {}
+
   def initialize(self):
     """ Initial settings
     """
@@ -200,6 +211,8 @@ class SiteDirector(AgentModule):
     self.failedQueueCycleFactor = self.am_getOption('FailedQueueCycleFactor', self.failedQueueCycleFactor)
     self.pilotStatusUpdateCycleFactor = self.am_getOption('PilotStatusUpdateCycleFactor', 10)
     self.addPilotsToEmptySites = self.am_getOption('AddPilotsToEmptySites', False)
+    self.submissionThreads = self.am_getOption('SubmissionThreads', self.submissionThreads)
+    self.ceTimeout = self.am_getOption('CETimeout', self.ceTimeout)
 
     # Flags
     self.updateStatus = self.am_getOption('UpdatePilotStatus', self.updateStatus)
@@ -250,6 +263,7 @@ class SiteDirector(AgentModule):
 
     self.log.always('MaxPilotsToSubmit:', self.maxPilotsToSubmit)
     self.log.always('MaxJobsInFillMode:', self.maxJobsInFillMode)
+    self.log.always('SubmissionThreads:', self.submissionThreads)
 
     if self.firstPass:
       if self.queueDict:
@@ -424,6 +438,10 @@ class SiteDirector(AgentModule):
       self.log.warn('No site defined, exiting the cycle')
       return S_OK()
 
+    # the pilot proxies are renewed at each cycle
+    with self.__proxyLock:
+      self.__pilotProxies = {}
+
     # get list of usable sites within this cycle
     result = self.siteClient.getUsableSites()
     if not result['OK']:
@@ -458,6 +476,11 @@ class SiteDirector(AgentModule):
   def submitJobs(self):
     """ Go through defined computing elements and submit jobs if necessary and possible
 
+        The queues are first evaluated, getting the task queues they may serve from the Matcher,
+        then the waiting pilots of all these task queues are counted at once, and finally
+        the pilots are submitted. With SubmissionThreads > 1, the evaluation and the submission
+        run concurrently for different CEs, see _runPerCE.
+
         :return: S_OK/S_ERROR
     """
 
@@ -477,103 +500,266 @@ class SiteDirector(AgentModule):
     queueDictItems = list(self.queueDict.items())
     random.shuffle(queueDictItems)
 
-    for queueName, queueDictionary in queueDictItems:
-      # now submitting to the single queues
-      self.log.verbose("Evaluating queue %s" % queueName)
-
-      # are we going to submit pilots to this specific queue?
-      if not self._allowedToSubmit(queueName, anySite, jobSites, testSites):
-        continue
+    # are we going to submit pilots to these specific queues?
+    queues = [queueName for queueName, _queueDictionary in queueDictItems
+              if self._allowedToSubmit(queueName, anySite, jobSites, testSites)]
+
+    evaluations = {}
+    for queueName, result in self._runPerCE(self._evaluateQueue, queues).iteritems():
+      if result['OK'] and result['Value']:
+        evaluations[queueName] = result['Value']
+
+    # Get the number of already waiting pilots for all the task queues at once. The dict is
+    # the one of this cycle: threads abandoned in a previous cycle keep updating their own
+    waitingPilots = {}
+    if self.pilotWaitingFlag:
+      tqIDs = set()
+      for _ce, _queueCPUTime, _pilotsWeMayWantToSubmit, taskQueueDict in evaluations.itervalues():
+        tqIDs.update(taskQueueDict)
+      waitingPilots = self._countWaitingPilots(tqIDs)
+
+    # now submitting to the single queues
+    results = self._runPerCE(lambda queueName: self._submitToQueue(queueName, *evaluations[queueName],
+                                                                   waitingPilots=waitingPilots),
+                             [queueName for queueName in queues if queueName in evaluations])
 
-      if 'CPUTime' in queueDictionary['ParametersDict']:
-        queueCPUTime = int(queueDictionary['ParametersDict']['CPUTime'])
-      else:
-        self.log.warn('CPU time limit is not specified for queue %s, skipping...' % queueName)
-        continue
-      if queueCPUTime > self.maxQueueLength:
-        queueCPUTime = self.maxQueueLength
-
-      ce, ceDict = self._getCE(queueName)
+    self.log.info("%d pilots submitted in total in this cycle," % self.totalSubmittedPilots)
 
-      pilotsWeMayWantToSubmit, additionalInfo = self._getPilotsWeMayWantToSubmit(
-          ceDict)  # additionalInfo is normally taskQueueDict
-      self.log.verbose('%d pilotsWeMayWantToSubmit are eligible for %s queue' % (pilotsWeMayWantToSubmit, queueName))
-      if not pilotsWeMayWantToSubmit:
-        self.log.verbose('...so skipping %s' % queueName)
-        continue
+    for result in results.itervalues():
+      if not result['OK']:
+        return result
+    return S_OK()
 
-      # Get the number of already waiting pilots for the queue
-      totalWaitingPilots = 0
-      manyWaitingPilotsFlag = False
-      if self.pilotWaitingFlag:
-        tqIDList = additionalInfo.keys()
-        result = pilotAgentsDB.countPilots({'TaskQueueID': tqIDList,
-                                            'Status': WAITING_PILOT_STATUS},
-                                           None)
-        if not result['OK']:
-          self.log.error('Failed to get Number of Waiting pilots', result['Message'])
-          totalWaitingPilots = 0
-        else:
-          totalWaitingPilots = result['Value']
-          self.log.verbose('Waiting Pilots: %s' % totalWaitingPilots)
-      if totalWaitingPilots >= pilotsWeMayWantToSubmit:
-        self.log.verbose("%d pilots already waiting: possibly enough" % totalWaitingPilots)
-        manyWaitingPilotsFlag = True
-        if not self.addPilotsToEmptySites:
-          continue
+  def _evaluateQueue(self, queueName):
+    """ Evaluate the number of pilots that we may want to submit to a queue
 
-      self.log.verbose("%d waiting pilots for the total of %d eligible pilots for %s" %
-                       (totalWaitingPilots, pilotsWeMayWantToSubmit, queueName))
+        :param str queueName: the queue name
+        :return: S_OK( None ) if no pilot is to be submitted to the queue,
+                 S_OK( ( ce, queueCPUTime, pilotsWeMayWantToSubmit, taskQueueDict ) ) otherwise
+    """
+    self.log.verbose("Evaluating queue %s" % queueName)
+    queueDictionary = self.queueDict[queueName]
 
-      # Get the number of available slots on the target site/queue
-      totalSlots = self.getQueueSlots(queueName, manyWaitingPilotsFlag)
-      if totalSlots == 0:
-        self.log.debug('%s: No slots available' % queueName)
-        continue
+    if 'CPUTime' in queueDictionary['ParametersDict']:
+      queueCPUTime = int(queueDictionary['ParametersDict']['CPUTime'])
+    else:
+      self.log.warn('CPU time limit is not specified for queue %s, skipping...' % queueName)
+      return S_OK(None)
+    if queueCPUTime > self.maxQueueLength:
+      queueCPUTime = self.maxQueueLength
+
+    ce, ceDict = self._getCE(queueName)
+
+    result = self._getPilotsWeMayWantToSubmit(ceDict)
+    if isinstance(result, dict):
+      # S_ERROR from the Matcher, already reported
+      return S_OK(None)
+    pilotsWeMayWantToSubmit, additionalInfo = result  # additionalInfo is normally taskQueueDict
+    self.log.verbose('%d pilotsWeMayWantToSubmit are eligible for %s queue' % (pilotsWeMayWantToSubmit, queueName))
+    if not pilotsWeMayWantToSubmit:
+      self.log.verbose('...so skipping %s' % queueName)
+      return S_OK(None)
+
+    return S_OK((ce, queueCPUTime, pilotsWeMayWantToSubmit, additionalInfo))
+
+  def _submitToQueue(self, queueName, ce, queueCPUTime, pilotsWeMayWantToSubmit, taskQueueDict, waitingPilots=None):
+    """ Submit the pilots to a queue evaluated by _evaluateQueue, as far as its slots and
+        the pilots already waiting for its task queues allow.
+
+        :param dict waitingPilots: { tqID : number of waiting pilots } of the cycle, updated with
+                                   the pilots submitted
+        :return: S_OK/S_ERROR, only in case the pilot proxy can't be obtained
+    """
+    if waitingPilots is None:
+      waitingPilots = {}
+    # Get the number of already waiting pilots for the queue
+    totalWaitingPilots = 0
+    manyWaitingPilotsFlag = False
+    if self.pilotWaitingFlag:
+      with self.__lock:
+        totalWaitingPilots = sum(waitingPilots.get(tqID, 0) for tqID in taskQueueDict)
+      self.log.verbose('Waiting Pilots: %s' % totalWaitingPilots)
+    if totalWaitingPilots >= pilotsWeMayWantToSubmit:
+      self.log.verbose("%d pilots already waiting: possibly enough" % totalWaitingPilots)
+      manyWaitingPilotsFlag = True
+      if not self.addPilotsToEmptySites:
+        return S_OK()
+
+    self.log.verbose("%d waiting pilots for the total of %d eligible pilots for %s" %
+                     (totalWaitingPilots, pilotsWeMayWantToSubmit, queueName))
+
+    # Get the number of available slots on the target site/queue
+    totalSlots = self.getQueueSlots(queueName, manyWaitingPilotsFlag)
+    if totalSlots == 0:
+      self.log.debug('%s: No slots available' % queueName)
+      return S_OK()
 
-      if manyWaitingPilotsFlag:
-        # Throttle submission of extra pilots to empty sites
-        pilotsToSubmit = self.maxPilotsToSubmit / 10 + 1
-      else:
-        pilotsToSubmit = max(0, min(totalSlots, pilotsWeMayWantToSubmit - totalWaitingPilots))
-        self.log.info('%s: Slots=%d, TQ jobs(pilotsWeMayWantToSubmit)=%d, Pilots: waiting %d, to submit=%d' %
-                      (queueName, totalSlots, pilotsWeMayWantToSubmit, totalWaitingPilots, pilotsToSubmit))
+    if manyWaitingPilotsFlag:
+      # Throttle submission of extra pilots to empty sites
+      pilotsToSubmit = self.maxPilotsToSubmit / 10 + 1
+    else:
+      pilotsToSubmit = max(0, min(totalSlots, pilotsWeMayWantToSubmit - totalWaitingPilots))
+      self.log.info('%s: Slots=%d, TQ jobs(pilotsWeMayWantToSubmit)=%d, Pilots: waiting %d, to submit=%d' %
+                    (queueName, totalSlots, pilotsWeMayWantToSubmit, totalWaitingPilots, pilotsToSubmit))
 
-      # Limit the number of pilots to submit to MAX_PILOTS_TO_SUBMIT
-      pilotsToSubmit = min(self.maxPilotsToSubmit, pilotsToSubmit)
+    # Limit the number of pilots to submit to MAX_PILOTS_TO_SUBMIT
+    pilotsToSubmit = min(self.maxPilotsToSubmit, pilotsToSubmit)
 
-      # Get the working proxy
-      cpuTime = queueCPUTime + 86400
-      self.log.verbose("Getting pilot proxy for %s/%s %d long" % (self.pilotDN, self.pilotGroup, cpuTime))
-      result = gProxyManager.getPilotProxyFromDIRACGroup(self.pilotDN, self.pilotGroup, cpuTime)
-      if not result['OK']:
-        return result
-      self.proxy = result['Value']
-      # Check returned proxy lifetime
-      result = self.proxy.getRemainingSecs()  # pylint: disable=no-member
-      if not result['OK']:
-        return result
-      lifetime_secs = result['Value']
-      ce.setProxy(self.proxy, lifetime_secs)
+    # Get the working proxy
+    result = self._getPilotProxy(queueCPUTime + 86400)
+    if not result['OK']:
+      return result
+    proxy, lifetime_secs = result['Value']
+    ce.setProxy(proxy, lifetime_secs)
 
-      # now really submitting
+    # now really submitting
+    submissions = []
+    try:
       while pilotsToSubmit:  # a cycle because pilots are submitted in chunks
-        res = self._submitPilotsToQueue(
-            pilotsToSubmit, ce, queueName)
+        res = self._submitPilotsToQueue(pilotsToSubmit, ce, queueName)
         if not res['OK']:
           self.log.info("Won't try further %s because of failures" % queueName)
-          pilotsToSubmit = 0
-          pilotList = []
-          stampDict = {}
-        else:
-          pilotsToSubmit, pilotList, stampDict = res['Value']
+          break
+        pilotsToSubmit, pilotList, stampDict = res['Value']
+
+        tqPilots = self._assignPilotsToTaskQueues(taskQueueDict, pilotList)
+        with self.__lock:
+          for tqID, tqPilotList in tqPilots.iteritems():
+            waitingPilots[tqID] = waitingPilots.get(tqID, 0) + len(tqPilotList)
+        submissions.append((queueName, tqPilots, stampDict))
+    finally:
+      # the pilots of all the chunks are added to the pilotAgentsDB once the queue is treated,
+      # so that they are tracked even if the CE hangs on its next queue
+      self._recordPilots(submissions)
+    return S_OK()
 
-        # updating the pilotAgentsDB... done by default but maybe not strictly necessary
-        res = self._addPilotTQReference(queueName, additionalInfo, pilotList, stampDict)
+  def _runPerCE(self, function, queues):
+    """ Call function(queueName) for each of the queues, in sequence for the queues of the same CE.
 
-    self.log.info("%d pilots submitted in total in this cycle," % self.totalSubmittedPilots)
+        If SubmissionThreads > 1, different CEs are treated concurrently by as many threads. A CE still
+        being treated after CETimeout seconds is then abandoned: its thread is replaced, and the CE
+        is skipped by the next cycles until its thread is done, such that a CE not answering can't
+        stall the cycle.
+        The queues of a CE are not treated any further once the function returned an error for one of them.
 
-    return S_OK()
+        :param function: function called with the queue name, returning S_OK/S_ERROR
+        :param list queues: names of the queues, in the order they are treated when not concurrent
+        :return: dict { queueName : result of function } for the queues treated
+    """
+    ceNames = []
+    ceQueues = {}
+    for queueName in queues:
+      ceName = self.queueDict[queueName]['CEName']
+      if ceName not in ceQueues:
+        ceNames.append(ceName)
+        ceQueues[ceName] = []
+      ceQueues[ceName].append(queueName)
+    results = {}
+
+    def runCE(ceName):
+      """ Treat the queues of a CE """
+      for queueName in ceQueues[ceName]:
+        try:
+          result = function(queueName)
+        except Exception as excp:  # pylint: disable=broad-except
+          self.log.exception("Exception while treating queue", queueName, lException=excp)
+          result = S_ERROR("Exception while treating queue %s: %s" % (queueName, excp))
+        results[queueName] = result
+        if not result['OK']:
+          break
+
+    if self.submissionThreads <= 1:
+      for ceName in ceNames:
+        runCE(ceName)
+        if not all(results[queueName]['OK'] for queueName in ceQueues[ceName] if queueName in results):
+          break
+      return results
+
+    with self.__lock:
+      busyCEs = [ceName for ceName in ceNames if ceName in self.__busyCEs]
+    if busyCEs:
+      self.log.warn("CEs still busy since a previous cycle are skipped", ', '.join(busyCEs))
+    pending = deque(ceName for ceName in ceNames if ceName not in busyCEs)
+    startTimes = {}
+    abandonedCEs = set()
+
+    def worker():
+      """ Treat the pending CEs, until the current one is abandoned """
+      while True:
+        with self.__lock:
+          if not pending:
+            return
+          ceName = pending.popleft()
+          startTimes[ceName] = time.time()
+          self.__busyCEs.add(ceName)
+        try:
+          runCE(ceName)
+        finally:
+          with self.__lock:
+            self.__busyCEs.discard(ceName)
+            if ceName in abandonedCEs:
+              return
+
+    def startWorker():
+      """ Start a worker thread """
+      thread = threading.Thread(target=worker, name='SiteDirectorWorker')
+      thread.setDaemon(True)
+      thread.start()
+
+    for _ in xrange(min(self.submissionThreads, len(pending))):
+      startWorker()
+
+    while True:
+      with self.__lock:
+        running = [ceName for ceName in startTimes if ceName in self.__busyCEs and ceName not in abandonedCEs]
+        if not pending and not running:
+          break
+        now = time.time()
+        for ceName in running:
+          if now - startTimes[ceName] > self.ceTimeout:
+            self.log.error("CE not answering, abandoned for this cycle",
+                           "%s after %d seconds" % (ceName, now - startTimes[ceName]))
+            abandonedCEs.add(ceName)
+            startWorker()
+      time.sleep(0.1)
+
+    return dict(results)
+
+  def _getPilotProxy(self, lifetime):
+    """ Get a pilot proxy of the requested lifetime, once per cycle for each lifetime
+
+        :param int lifetime: requested lifetime in seconds
+        :return: S_OK( ( proxy, seconds left now for the proxy ) )/S_ERROR
+    """
+    with self.__proxyLock:
+      if lifetime not in self.__pilotProxies:
+        self.log.verbose("Getting pilot proxy for %s/%s %d long" % (self.pilotDN, self.pilotGroup, lifetime))
+        result = gProxyManager.getPilotProxyFromDIRACGroup(self.pilotDN, self.pilotGroup, lifetime)
+        if not result['OK']:
+          return result
+        self.__pilotProxies[lifetime] = result['Value']
+      proxy = self.__pilotProxies[lifetime]
+      self.proxy = proxy
+    # The proxy is used all along the cycle, so its lifetime is checked at each use
+    result = proxy.getRemainingSecs()  # pylint: disable=no-member
+    if not result['OK']:
+      return result
+    return S_OK((proxy, result['Value']))
+
+  def _countWaitingPilots(self, tqIDs):
+    """ Count the waiting pilots of task queues with a single query
+
+        :param tqIDs: task queue IDs
+        :return: dict { tqID : number of waiting pilots }, empty in case of error
+    """
+    if not tqIDs:
+      return {}
+    result = pilotAgentsDB.getCounters('PilotAgents', ['TaskQueueID'], {'TaskQueueID': list(tqIDs),
+                                                                          'Status': WAITING_PILOT_STATUS})
+    if not result['OK']:
+      self.log.error('Failed to get Number of Waiting pilots', result['Message'])
+      return {}
+    return dict((attrDict['TaskQueueID'], count) for attrDict, count in result['Value'])
 
   def _ifAndWhereToSubmit(self):
     """ Return a tuple that says if and where to submit pilots:
@@ -803,7 +989,11 @@ class SiteDirector(AgentModule):
     executable, pilotSubmissionChunk = self.getExecutable(queue, pilotsToSubmit,
                                                           bundleProxy=bundleProxy,
                                                           jobExecDir=jobExecDir,
-                                                          envVariables=envVariables)
+                                                          envVariables=envVariables,
+                                                          proxy=ce.proxy)
+    if not executable:
+      self.failedQueues[queue] += 1
+      return S_ERROR("Failed to write the pilot wrapper for queue %s" % queue)
 
     submitResult = ce.submitJob(executable, '', pilotSubmissionChunk)
     # FIXME: The condor thing only transfers the file with some
@@ -824,7 +1014,8 @@ class SiteDirector(AgentModule):
     # task queue priorities
     pilotList = submitResult['Value']
     self.queueSlots[queue]['AvailableSlots'] -= len(pilotList)
-    self.totalSubmittedPilots += len(pilotList)
+    with self.__lock:
+      self.totalSubmittedPilots += len(pilotList)
     self.log.info('Submitted %d pilots to %s@%s' % (len(pilotList),
                                                     self.queueDict[queue]['QueueName'],
                                                     self.queueDict[queue]['CEName']))
@@ -832,21 +1023,13 @@ class SiteDirector(AgentModule):
 
     return S_OK((pilotsToSubmit, pilotList, stampDict))
 
-  def _addPilotTQReference(self, queue, taskQueueDict, pilotList, stampDict):
-    """ Add to pilotAgentsDB the reference of for which TqID the pilots have been sent
-
-        :param queue: the queue name
-        :type queue: basestring
-        :param taskQueueDict: dict of task queues
-        :type taskQueueDict: dict
-        :param pilotList: list of pilots
-        :type pilotList: list
-        :param stampDict: dictionary of pilots timestamps
-        :type stampDict: dict
+  def _assignPilotsToTaskQueues(self, taskQueueDict, pilotList):
+    """ Assign pilots to the task queues, randomly and proportionally to the task queue priorities
 
-        :return: None
+        :param dict taskQueueDict: dict of task queues
+        :param list pilotList: list of pilots
+        :return: dict { tqID : list of pilots }
     """
-
     tqPriorityList = []
     sumPriority = 0.
     for tq in taskQueueDict:
@@ -862,20 +1045,34 @@ class SiteDirector(AgentModule):
       if tqID not in tqDict:
         tqDict[tqID] = []
       tqDict[tqID].append(pilotID)
+    return tqDict
+
+  def _recordPilots(self, submissions):
+    """ Add pilots to pilotAgentsDB, with one addPilotTQReference call per task queue and CE type
 
-    for tqID, pilotsList in tqDict.iteritems():
-      result = pilotAgentsDB.addPilotTQReference(pilotRef=pilotsList,
+        :param list submissions: list of ( queue name, { tqID : list of pilots }, stampDict )
+        :return: None
+    """
+    references = {}
+    for queue, tqDict, stampDict in submissions:
+      for tqID, pilotsList in tqDict.iteritems():
+        pilots, stamps = references.setdefault((tqID, self.queueDict[queue]['CEType']), ([], {}))
+        pilots.extend((pilot, queue) for pilot in pilotsList)
+        stamps.update((pilot, stampDict[pilot]) for pilot in pilotsList if pilot in stampDict)
+
+    for (tqID, gridType), (pilots, stamps) in references.iteritems():
+      result = pilotAgentsDB.addPilotTQReference(pilotRef=[pilot for pilot, _queue in pilots],
                                                  taskQueueID=tqID,
                                                  ownerDN=self.pilotDN,
                                                  ownerGroup=self.pilotGroup,
                                                  broker=self.localhost,
-                                                 gridType=self.queueDict[queue]['CEType'],
-                                                 pilotStampDict=stampDict)
+                                                 gridType=gridType,
+                                                 pilotStampDict=stamps)
       if not result['OK']:
         self.log.error(
             'Failed add pilots to the PilotAgentsDB: ', result['Message'])
         continue
-      for pilot in pilotsList:
+      for pilot, queue in pilots:
         result = pilotAgentsDB.setPilotStatus(pilotRef=pilot,
                                               status='Submitted',
                                               destination=self.queueDict[queue]['CEName'],
@@ -965,7 +1162,7 @@ class SiteDirector(AgentModule):
 
 #####################################################################################
   def getExecutable(self, queue, pilotsToSubmit,
-                    bundleProxy=True, jobExecDir='', envVariables=None,
+                    bundleProxy=True, jobExecDir='', envVariables=None, proxy=None,
                     **kwargs):
     """ Prepare the full executable for queue
 
@@ -977,14 +1174,18 @@ class SiteDirector(AgentModule):
     :type bundleProxy: bool
     :param queue: pilot execution dir (normally an empty string)
     :type queue: basestring
+    :param proxy: proxy to bundle, self.proxy by default
+    :type proxy: X509Chain
 
-    :returns: a string the options for the pilot
-    :rtype: basestring
+    :returns: tuple with the file name of the pilot wrapper (None if it could not be written)
+              and the number of pilots it is for
+    :rtype: tuple
     """
 
-    proxy = None
     if bundleProxy:
-      proxy = self.proxy
+      proxy = proxy or self.proxy
+    else:
+      proxy = None
     pilotOptions, pilotsSubmitted = self._getPilotOptions(queue, pilotsToSubmit, **kwargs)
     if not pilotOptions:
       self.log.warn("Pilots will be submitted without additional options")
@@ -1132,7 +1333,7 @@ class SiteDirector(AgentModule):
      :param pilotExecDir: pilot executing directory
      :type pilotExecDir: basestring
 
-     :returns: file name of the pilot wrapper created
+     :returns: file name of the pilot wrapper created, None if the pilot files could not be compressed
      :rtype: basestring
     """
 
@@ -1141,6 +1342,7 @@ class SiteDirector(AgentModule):
                                                                            proxy)
     except BaseException as be:
       self.log.exception("Exception during pilot modules files compression", lException=be)
+      return None
 
     localPilot = pilotWrapperScript(pilotFilesCompressedEncodedDict=pilotFilesCompressedEncodedDict,
                                     pilotOptions=pilotOptions,
@@ -1152,109 +1354,19 @@ class SiteDirector(AgentModule):
   def updatePilotStatus(self):
     """ Update status of pilots in transient states
     """
-    for queue in self.queueDict:
-      ce = self.queueDict[queue]['CE']
-      ceName = self.queueDict[queue]['CEName']
-      queueName = self.queueDict[queue]['QueueName']
-      ceType = self.queueDict[queue]['CEType']
-      siteName = self.queueDict[queue]['Site']
-      abortedPilots = 0
-
-      result = pilotAgentsDB.selectPilots({'DestinationSite': ceName,
-                                           'Queue': queueName,
-                                           'GridType': ceType,
-                                           'GridSite': siteName,
-                                           'Status': TRANSIENT_PILOT_STATUS,
-                                           'OwnerDN': self.pilotDN,
-                                           'OwnerGroup': self.pilotGroup})
-      if not result['OK']:
-        self.log.error('Failed to select pilots", ": %s' % result['Message'])
-        continue
-      pilotRefs = result['Value']
-      if not pilotRefs:
-        continue
-
-      result = pilotAgentsDB.getPilotInfo(pilotRefs)
-      if not result['OK']:
-        self.log.error('Failed to get pilots info from DB', result['Message'])
-        continue
-      pilotDict = result['Value']
-
-      stampedPilotRefs = []
-      for pRef in pilotDict:
-        if pilotDict[pRef]['PilotStamp']:
-          stampedPilotRefs.append(pRef + ":::" + pilotDict[pRef]['PilotStamp'])
-        else:
-          stampedPilotRefs = list(pilotRefs)
-          break
-
-      # This proxy is used for checking the pilot status and renewals
-      # We really need at least a few hours otherwise the renewed
-      # proxy may expire before we check again...
-      result = ce.isProxyValid(3 * 3600)
+    for result in self._runPerCE(self._updateQueuePilotStatus, list(self.queueDict)).itervalues():
       if not result['OK']:
-        result = gProxyManager.getPilotProxyFromDIRACGroup(self.pilotDN, self.pilotGroup, 23400)
-        if not result['OK']:
-          return result
-        self.proxy = result['Value']
-        ce.setProxy(self.proxy, 23300)
-
-      result = ce.getJobStatus(stampedPilotRefs)
-      if not result['OK']:
-        self.log.error('Failed to get pilots status from CE', '%s: %s' % (ceName, result['Message']))
-        continue
-      pilotCEDict = result['Value']
-
-      for pRef in pilotRefs:
-        newStatus = ''
-        oldStatus = pilotDict[pRef]['Status']
-        if pRef in pilotCEDict:
-          ceStatus = pilotCEDict[pRef]
-        else:
-          ceStatus = oldStatus
-        lastUpdateTime = pilotDict[pRef]['LastUpdateTime']
-        sinceLastUpdate = dateTime() - lastUpdateTime
-
-        if oldStatus == ceStatus and ceStatus != "Unknown":
-          # Normal status did not change, continue
-          continue
-        elif ceStatus == "Unknown" and oldStatus == "Unknown":
-          if sinceLastUpdate < 3600 * second:
-            # Allow 1 hour of Unknown status assuming temporary problems on the CE
-            continue
-          else:
-            newStatus = 'Aborted'
-        elif ceStatus == "Unknown" and oldStatus not in FINAL_PILOT_STATUS:
-          # Possible problems on the CE, let's keep the Unknown status for a while
-          newStatus = 'Unknown'
-        elif ceStatus != 'Unknown':
-          # Update the pilot status to the new value
-          newStatus = ceStatus
-
-        if newStatus:
-          self.log.info('Updating status to %s for pilot %s' % (newStatus, pRef))
-          result = pilotAgentsDB.setPilotStatus(pRef, newStatus, '', 'Updated by SiteDirector')
-          if newStatus == "Aborted":
-            abortedPilots += 1
-        # Retrieve the pilot output now
-        if newStatus in FINAL_PILOT_STATUS:
-          if pilotDict[pRef]['OutputReady'].lower() == 'false' and self.getOutput:
-            self._getPilotOutput(pRef, pilotDict, ce, ceName)
-
-      # If something wrong in the queue, make a pause for the job submission
-      if abortedPilots:
-        self.failedQueues[queue] += 1
+        return result
 
     # The pilot can be in Done state set by the job agent check if the output is retrieved
     for queue in self.queueDict:
       ce = self.queueDict[queue]['CE']
 
       if not ce.isProxyValid(120)['OK']:
-        result = gProxyManager.getPilotProxyFromDIRACGroup(self.pilotDN, self.pilotGroup, 1000)
+        result = self._getPilotProxy(1000)
         if not result['OK']:
           return result
-        self.proxy = result['Value']
-        ce.setProxy(self.proxy, 940)
+        ce.setProxy(result['Value'][0], 940)
 
       ceName = self.queueDict[queue]['CEName']
       queueName = self.queueDict[queue]['QueueName']
@@ -1308,6 +1420,105 @@ class SiteDirector(AgentModule):
 
     return S_OK()
 
+  def _updateQueuePilotStatus(self, queue):
+    """ Update status of the pilots of a queue in transient states
+
+        :param str queue: the queue name
+        :return: S_OK/S_ERROR, only in case the pilot proxy can't be obtained
+    """
+    ce = self.queueDict[queue]['CE']
+    ceName = self.queueDict[queue]['CEName']
+    queueName = self.queueDict[queue]['QueueName']
+    ceType = self.queueDict[queue]['CEType']
+    siteName = self.queueDict[queue]['Site']
+    abortedPilots = 0
+
+    result = pilotAgentsDB.selectPilots({'DestinationSite': ceName,
+                                         'Queue': queueName,
+                                         'GridType': ceType,
+                                         'GridSite': siteName,
+                                         'Status': TRANSIENT_PILOT_STATUS,
+                                         'OwnerDN': self.pilotDN,
+                                         'OwnerGroup': self.pilotGroup})
+    if not result['OK']:
+      self.log.error('Failed to select pilots", ": %s' % result['Message'])
+      return S_OK()
+    pilotRefs = result['Value']
+    if not pilotRefs:
+      return S_OK()
+
+    result = pilotAgentsDB.getPilotInfo(pilotRefs)
+    if not result['OK']:
+      self.log.error('Failed to get pilots info from DB', result['Message'])
+      return S_OK()
+    pilotDict = result['Value']
+
+    stampedPilotRefs = []
+    for pRef in pilotDict:
+      if pilotDict[pRef]['PilotStamp']:
+        stampedPilotRefs.append(pRef + ":::" + pilotDict[pRef]['PilotStamp'])
+      else:
+        stampedPilotRefs = list(pilotRefs)
+        break
+
+    # This proxy is used for checking the pilot status and renewals
+    # We really need at least a few hours otherwise the renewed
+    # proxy may expire before we check again...
+    result = ce.isProxyValid(3 * 3600)
+    if not result['OK']:
+      result = self._getPilotProxy(23400)
+      if not result['OK']:
+        return result
+      ce.setProxy(result['Value'][0], 23300)
+
+    result = ce.getJobStatus(stampedPilotRefs)
+    if not result['OK']:
+      self.log.error('Failed to get pilots status from CE', '%s: %s' % (ceName, result['Message']))
+      return S_OK()
+    pilotCEDict = result['Value']
+
+    for pRef in pilotRefs:
+      newStatus = ''
+      oldStatus = pilotDict[pRef]['Status']
+      if pRef in pilotCEDict:
+        ceStatus = pilotCEDict[pRef]
+      else:
+        ceStatus = oldStatus
+      lastUpdateTime = pilotDict[pRef]['LastUpdateTime']
+      sinceLastUpdate = dateTime() - lastUpdateTime
+
+      if oldStatus == ceStatus and ceStatus != "Unknown":
+        # Normal status did not change, continue
+        continue
+      elif ceStatus == "Unknown" and oldStatus == "Unknown":
+        if sinceLastUpdate < 3600 * second:
+          # Allow 1 hour of Unknown status assuming temporary problems on the CE
+          continue
+        else:
+          newStatus = 'Aborted'
+      elif ceStatus == "Unknown" and oldStatus not in FINAL_PILOT_STATUS:
+        # Possible problems on the CE, let's keep the Unknown status for a while
+        newStatus = 'Unknown'
+      elif ceStatus != 'Unknown':
+        # Update the pilot status to the new value
+        newStatus = ceStatus
+
+      if newStatus:
+        self.log.info('Updating status to %s for pilot %s' % (newStatus, pRef))
+        result = pilotAgentsDB.setPilotStatus(pRef, newStatus, '', 'Updated by SiteDirector')
+        if newStatus == "Aborted":
+          abortedPilots += 1
+      # Retrieve the pilot output now
+      if newStatus in FINAL_PILOT_STATUS:
+        if pilotDict[pRef]['OutputReady'].lower() == 'false' and self.getOutput:
+          self._getPilotOutput(pRef, pilotDict, ce, ceName)
+
+    # If something wrong in the queue, make a pause for the job submission
+    if abortedPilots:
+      self.failedQueues[queue] += 1
+
+    return S_OK()
+
   def _getPilotOutput(self, pRef, pilotDict, ce, ceName):
     """ Retrieves the pilot output for a pilot and stores it in the pilotAgentsDB
     """
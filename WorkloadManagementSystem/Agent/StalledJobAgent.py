@@ -14,6 +14,7 @@ from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Utilities.Time import fromString, toEpoch, dateTime, second
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.AccountingSystem.Client.Types.Job import Job
@@ -118,34 +119,37 @@ for the agent restart
   #############################################################################
   def _markStalledJobs(self, stalledTime):
     """ Identifies stalled jobs running without update longer than stalledTime.
+        The latest update of all the Running jobs is read with a single query, and the stalled ones
+        are marked in bulk.
 """
-    stalledCounter = 0
-    runningCounter = 0
-    result = self.jobDB.selectJobs({'Status': 'Running'})
+    result = self.jobDB.getJobsLastUpdate({'Status': 'Running'})
     if not result['OK']:
       return result
     if not result['Value']:
       return S_OK()
     jobs = result['Value']
     self.log.info('%s Running jobs will be checked for being stalled' % (len(jobs)))
-    jobs.sort()
-# jobs = jobs[:10] #for debugging
-    for job in jobs:
-      site = self.jobDB.getJobAttribute(job, 'site')['Value']
-      if site in self.stalledJobsTolerantSites:
-        result = self.__getStalledJob(job, stalledTime + self.stalledJobsToleranceTime)
-      else:
-        result = self.__getStalledJob(job, stalledTime)
-      if result['OK']:
-        self.log.verbose('Updating status to Stalled for job %s' % (job))
-        self.__updateJobStatus(job, 'Stalled')
-        stalledCounter += 1
-      else:
-        self.log.verbose(result['Message'])
-        runningCounter += 1
+
+    now = dateTime()
+    stalledBefore = now - stalledTime * second
+    tolerantStalledBefore = now - (stalledTime + self.stalledJobsToleranceTime) * second
+    tolerantSites = set(self.stalledJobsTolerantSites)
+    stalledJobs = []
+    for job, (site, latestUpdate) in sorted(jobs.items()):
+      if not latestUpdate:
+        self.log.verbose('LastUpdate and HeartBeat times are null for job %s', '', job)
+        continue
+      if latestUpdate < (tolerantStalledBefore if site in tolerantSites else stalledBefore):
+        self.log.info('Job %s is identified as stalled with last update at %s' % (job, latestUpdate))
+        stalledJobs.append(job)
+
+    if stalledJobs:
+      result = self.__updateJobsStatus(stalledJobs, 'Running', 'Stalled')
+      if not result['OK']:
+        return result
 
     self.log.info('Total jobs: %s, Stalled job count: %s, Running job count: %s' %
-                  (len(jobs), stalledCounter, runningCounter))
+                  (len(jobs), len(stalledJobs), len(jobs) - len(stalledJobs)))
     return S_OK()
 
   #############################################################################
@@ -243,26 +247,6 @@ for the agent restart
 
     return S_OK(pilotStatus)
 
-  #############################################################################
-  def __getStalledJob(self, job, stalledTime):
-    """ Compares the most recent of LastUpdateTime and HeartBeatTime against
-the stalledTime limit.
-"""
-    result = self.__getLatestUpdateTime(job)
-    if not result['OK']:
-      return result
-
-    currentTime = toEpoch()
-    lastUpdate = result['Value']
-
-    elapsedTime = currentTime - lastUpdate
-    self.log.verbose('(CurrentTime-LastUpdate) = %s secs' % (elapsedTime))
-    if elapsedTime > stalledTime:
-      self.log.info('Job %s is identified as stalled with last update > %s secs ago' % (job, elapsedTime))
-      return S_OK('Stalled')
-
-    return S_ERROR('Job %s is running and will be ignored' % job)
-
   #############################################################################
   def __getLatestUpdateTime(self, job):
     """ Returns the most recent of HeartBeatTime and LastUpdateTime
@@ -323,6 +307,34 @@ used to fail jobs due to the optimizer chain.
 
     return result
 
+  def __updateJobsStatus(self, jobs, fromStatus, status):
+    """ Same as __updateJobStatus for many jobs, keeping their minor status,
+        with one update and one insertion of logging records per chunk of jobs.
+        Only the jobs still in fromStatus are updated, as the others may have finished meanwhile.
+"""
+    for jobsChunk in breakListIntoChunks(jobs, 1000):
+      result = self.jobDB.getAttributesForJobList(jobsChunk, ['Status', 'MinorStatus'])
+      if not result['OK']:
+        return result
+      jobAttributes = result['Value']
+      jobsChunk = [job for job in jobsChunk if jobAttributes.get(job, {}).get('Status') == fromStatus]
+      if not jobsChunk:
+        continue
+
+      self.log.verbose('Setting the status of %d jobs to %s', '', len(jobsChunk), status)
+      if self.am_getOption('Enable', True):
+        result = self.jobDB.setJobAttributes(jobsChunk, ['Status'], [status], update=True)
+        if not result['OK']:
+          return result
+
+      # Retain last minor status for stalled jobs
+      result = self.logDB.addLoggingRecords([(job, status, jobAttributes[job]['MinorStatus'],
+                                              'idem', '', 'StalledJobAgent') for job in jobsChunk])
+      if not result['OK']:
+        self.log.warn(result)
+
+    return S_OK()
+
   def __getProcessingType(self, jobID):
     """ Get the Processing Type from the JDL, until it is promoted to a real Attribute
 """
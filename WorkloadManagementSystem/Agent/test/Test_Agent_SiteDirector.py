@@ -4,6 +4,8 @@
 # pylint: disable=protected-access
 
 # imports
+import threading
+
 import pytest
 from mock import MagicMock
 
@@ -134,8 +136,8 @@ def test__allowedToSubmit(mocker):
   assert submit is True
 
 
-def test__submitPilotsToQueue(mocker):
-  """ Testing SiteDirector()._submitPilotsToQueue()
+def _siteDirectorForSubmission(mocker):
+  """ SiteDirector with a queue to submit to
   """
   mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.AgentModule.__init__")
   mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.gConfig.getValue", side_effect=mockGCReply)
@@ -152,6 +154,7 @@ def test__submitPilotsToQueue(mocker):
                              'CEName': 'aCE',
                              'CEType': 'SSH',
                              'QueueName': 'aQueue',
+                             'BundleProxy': True,
                              'ParametersDict': {'CPUTime': 12345,
                                                 'Community': 'lhcb',
                                                 'OwnerGroup': ['lhcb_user'],
@@ -159,6 +162,190 @@ def test__submitPilotsToQueue(mocker):
                                                 'Site': 'LCG.CERN.cern',
                                                 'SubmitPool': ''}}}
   sd.queueSlots = {'aQueue': {'AvailableSlots': 10}}
-  res = sd._submitPilotsToQueue(1, MagicMock(), 'aQueue')
+  return sd
+
+
+def test__submitPilotsToQueue(mocker):
+  """ Testing SiteDirector()._submitPilotsToQueue()
+  """
+  sd = _siteDirectorForSubmission(mocker)
+  mockPilotFiles = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.getPilotFilesCompressedEncodedDict",
+                                return_value={})
+  # the proxy set on the CE by the thread submitting to it is the one bundled, not self.proxy
+  sd.proxy = MagicMock()
+  ce = MagicMock()
+  ce.proxy = MagicMock()
+  ce.submitJob.return_value = {'OK': True, 'Value': ['pilot1']}
+  res = sd._submitPilotsToQueue(1, ce, 'aQueue')
   assert res['OK'] is True
-  assert res['Value'][0] == 0
+  assert res['Value'] == (0, ['pilot1'], {})
+  assert mockPilotFiles.call_args[0][1] is ce.proxy
+  assert sd.queueSlots['aQueue']['AvailableSlots'] == 9
+  assert sd.totalSubmittedPilots == 1
+
+
+def test__submitPilotsToQueueFailedWrapper(mocker):
+  """ Testing SiteDirector()._submitPilotsToQueue() when the pilot wrapper can't be written
+  """
+  sd = _siteDirectorForSubmission(mocker)
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.getPilotFilesCompressedEncodedDict",
+               side_effect=IOError('No such file'))
+  ce = MagicMock()
+  res = sd._submitPilotsToQueue(1, ce, 'aQueue')
+  assert res['OK'] is False
+  assert not ce.submitJob.called
+  assert sd.failedQueues['aQueue'] == 1
+
+
+def _siteDirectorWithQueues(mocker, ceQueues):
+  """ SiteDirector serving the queues { queueName : ceName }
+  """
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.AgentModule.__init__")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.AgentModule", side_effect=mockAM)
+  sd = SiteDirector()
+  sd.log = gLogger
+  sd.am_getOption = mockAM
+  sd.queueDict = dict((queueName, {'CEName': ceName}) for queueName, ceName in ceQueues.iteritems())
+  return sd
+
+
+@pytest.mark.parametrize("submissionThreads", [1, 3])
+def test__runPerCE(mocker, submissionThreads):
+  """ Testing SiteDirector()._runPerCE()
+  """
+  sd = _siteDirectorWithQueues(mocker, {'q1': 'ce1', 'q2': 'ce1', 'q3': 'ce2', 'q4': 'ce3', 'q5': 'ce3'})
+  sd.submissionThreads = submissionThreads
+  treated = []
+
+  def treatQueue(queueName):
+    treated.append(queueName)
+    if queueName == 'q4':
+      return {'OK': False, 'Message': 'boh'}
+    if queueName == 'q3':
+      raise ValueError('boh')
+    return {'OK': True, 'Value': queueName}
+
+  results = sd._runPerCE(treatQueue, ['q1', 'q3', 'q2', 'q4', 'q5'])
+  # the queues of a CE are treated in order
+  assert [queueName for queueName in treated if sd.queueDict[queueName]['CEName'] == 'ce1'] == ['q1', 'q2']
+  assert results['q1'] == {'OK': True, 'Value': 'q1'}
+  assert not results['q3']['OK']
+  if submissionThreads == 1:
+    # stopped at the first CE in error
+    assert sorted(results) == ['q1', 'q2', 'q3']
+  else:
+    # no more queue of a CE after an error
+    assert sorted(results) == ['q1', 'q2', 'q3', 'q4']
+
+
+def test__runPerCETimeout(mocker):
+  """ Testing SiteDirector()._runPerCE() with a CE not answering
+  """
+  sd = _siteDirectorWithQueues(mocker, {'q1': 'ce1', 'q2': 'ce2', 'q3': 'ce3'})
+  sd.submissionThreads = 2
+  sd.ceTimeout = 0.2
+  hanging = threading.Event()
+
+  def treatQueue(queueName):
+    if queueName == 'q1':
+      hanging.wait(10)
+    return {'OK': True, 'Value': queueName}
+
+  results = sd._runPerCE(treatQueue, ['q1', 'q2', 'q3'])
+  assert sorted(results) == ['q2', 'q3']
+
+  # the CE is skipped until it is done
+  results = sd._runPerCE(treatQueue, ['q1', 'q2'])
+  assert sorted(results) == ['q2']
+  hanging.set()
+
+
+def test__getPilotProxy(mocker):
+  """ Testing SiteDirector()._getPilotProxy()
+  """
+  sd = _siteDirectorWithQueues(mocker, {})
+  proxy = MagicMock()
+  proxy.getRemainingSecs.return_value = {'OK': True, 'Value': 1000}
+  mockGetProxy = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector."
+                              "gProxyManager.getPilotProxyFromDIRACGroup",
+                              return_value={'OK': True, 'Value': proxy})
+  for secsLeft in (1000, 900, 800):
+    proxy.getRemainingSecs.return_value = {'OK': True, 'Value': secsLeft}
+    # the lifetime is the one left when the proxy is used
+    assert sd._getPilotProxy(1000) == {'OK': True, 'Value': (proxy, secsLeft)}
+  assert sd._getPilotProxy(2000)['OK']
+  assert sd.proxy is proxy
+  assert mockGetProxy.call_count == 2
+
+
+def test__countWaitingPilots(mocker):
+  """ Testing SiteDirector()._countWaitingPilots()
+  """
+  sd = _siteDirectorWithQueues(mocker, {})
+  mockPilotAgentsDB = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.pilotAgentsDB")
+  mockPilotAgentsDB.getCounters.return_value = {'OK': True, 'Value': [({'TaskQueueID': 1}, 3),
+                                                                      ({'TaskQueueID': 2}, 5)]}
+  assert sd._countWaitingPilots(set([1, 2, 3])) == {1: 3, 2: 5}
+  assert mockPilotAgentsDB.getCounters.call_count == 1
+
+  mockPilotAgentsDB.getCounters.return_value = {'OK': False, 'Message': 'boh'}
+  assert sd._countWaitingPilots([1]) == {}
+  assert sd._countWaitingPilots([]) == {}
+  assert mockPilotAgentsDB.getCounters.call_count == 2
+
+
+def test__submitToQueue(mocker):
+  """ Testing SiteDirector()._submitToQueue(): the pilots are recorded once the queue is treated
+  """
+  sd = _siteDirectorForSubmission(mocker)
+  sd.pilotWaitingFlag = True
+  sd.addPilotsToEmptySites = False
+  sd.maxPilotsToSubmit = 100
+  sd.pilotDN = '/CN=pilot'
+  sd.pilotGroup = 'lhcb_pilot'
+  sd.localhost = 'localhost'
+  mocker.patch.object(sd, 'getQueueSlots', return_value=10)
+  proxy = MagicMock()
+  proxy.getRemainingSecs.return_value = {'OK': True, 'Value': 5000}
+  mocker.patch.object(sd, '_getPilotProxy', return_value={'OK': True, 'Value': (proxy, 5000)})
+  # the pilots are submitted in two chunks
+  mocker.patch.object(sd, '_submitPilotsToQueue',
+                      side_effect=[{'OK': True, 'Value': (2, ['pilot1', 'pilot2'], {'pilot1': 'stamp1'})},
+                                   {'OK': True, 'Value': (0, ['pilot3', 'pilot4'], {})}])
+  mockPilotAgentsDB = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.SiteDirector.pilotAgentsDB")
+  mockPilotAgentsDB.addPilotTQReference.return_value = {'OK': True}
+  mockPilotAgentsDB.setPilotStatus.return_value = {'OK': True}
+  ce = MagicMock()
+  waitingPilots = {1: 2}
+
+  res = sd._submitToQueue('aQueue', ce, 12345, 6, {1: {'Priority': 1}}, waitingPilots=waitingPilots)
+
+  assert res['OK']
+  ce.setProxy.assert_called_once_with(proxy, 5000)
+  # 6 eligible, 2 waiting
+  assert sd._submitPilotsToQueue.call_args_list[0][0][0] == 4
+  assert waitingPilots == {1: 6}
+  # a single reference for the task queue, with the pilots of both chunks
+  mockPilotAgentsDB.addPilotTQReference.assert_called_once()
+  kwargs = mockPilotAgentsDB.addPilotTQReference.call_args[1]
+  assert kwargs['pilotRef'] == ['pilot1', 'pilot2', 'pilot3', 'pilot4']
+  assert kwargs['taskQueueID'] == 1
+  assert kwargs['pilotStampDict'] == {'pilot1': 'stamp1'}
+  assert mockPilotAgentsDB.setPilotStatus.call_count == 4
+
+
+def test__submitToQueueFailedChunk(mocker):
+  """ Testing SiteDirector()._submitToQueue(): the pilots submitted before an exception are recorded
+  """
+  sd = _siteDirectorForSubmission(mocker)
+  sd.pilotWaitingFlag = False
+  sd.maxPilotsToSubmit = 100
+  mocker.patch.object(sd, 'getQueueSlots', return_value=10)
+  mocker.patch.object(sd, '_getPilotProxy', return_value={'OK': True, 'Value': (MagicMock(), 5000)})
+  mocker.patch.object(sd, '_submitPilotsToQueue',
+                      side_effect=[{'OK': True, 'Value': (2, ['pilot1'], {})}, RuntimeError('CE gone')])
+  recordPilots = mocker.patch.object(sd, '_recordPilots')
+
+  with pytest.raises(RuntimeError):
+    sd._submitToQueue('aQueue', MagicMock(), 12345, 3, {1: {'Priority': 1}})
+  recordPilots.assert_called_once_with([('aQueue', {1: ['pilot1']}, {})])
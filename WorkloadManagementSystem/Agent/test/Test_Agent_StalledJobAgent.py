@@ -7,7 +7,8 @@ from mock import MagicMock
 
 # DIRAC Components
 from DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent import StalledJobAgent
-from DIRAC import gLogger
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities.Time import dateTime, second
 
 # Mock Objects
 mockAM = MagicMock()
@@ -120,3 +121,63 @@ def test__markStalledJobs(mocker):
   result = stalledJobAgent._markStalledJobs(0)
 
   assert not result['OK']
+
+
+def test__markStalledJobsBulk(mocker):
+  """ Testing StalledJobAgent()._markStalledJobs() with running jobs
+  """
+
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.AgentModule.__init__")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.AgentModule.am_getOption", side_effect=mockAM)
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.JobDB.__init__", side_effect=mockNone)
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.JobLoggingDB.__init__", side_effect=mockNone)
+
+  stalledJobAgent = StalledJobAgent()
+  stalledJobAgent._AgentModule__configDefaults = mockAM
+  stalledJobAgent.initialize()
+  stalledJobAgent.log = gLogger
+  stalledJobAgent.stalledJobsTolerantSites = ['Tolerant.Site.ch']
+  stalledJobAgent.stalledJobsToleranceTime = 3600
+
+  now = dateTime()
+  stalledJobAgent.jobDB.getJobsLastUpdate = MagicMock(return_value=S_OK({
+      1: ('Some.Site.ch', now),
+      2: ('Some.Site.ch', now - 2000 * second),
+      3: ('Tolerant.Site.ch', now - 2000 * second),
+      4: ('Tolerant.Site.ch', now - 5000 * second),
+      5: ('Some.Site.ch', None)}))
+  stalledJobAgent.jobDB.setJobAttributes = MagicMock(return_value=S_OK())
+  stalledJobAgent.jobDB.getAttributesForJobList = MagicMock(return_value=S_OK({
+      2: {'Status': 'Running', 'MinorStatus': 'Application'},
+      4: {'Status': 'Running', 'MinorStatus': 'Uploading'}}))
+  stalledJobAgent.logDB.addLoggingRecords = MagicMock(return_value=S_OK())
+
+  result = stalledJobAgent._markStalledJobs(1000)
+
+  assert result['OK']
+  stalledJobAgent.jobDB.getAttributesForJobList.assert_called_once_with([2, 4], ['Status', 'MinorStatus'])
+  stalledJobAgent.jobDB.setJobAttributes.assert_called_once_with([2, 4], ['Status'], ['Stalled'], update=True)
+  stalledJobAgent.logDB.addLoggingRecords.assert_called_once_with(
+      [(2, 'Stalled', 'Application', 'idem', '', 'StalledJobAgent'),
+       (4, 'Stalled', 'Uploading', 'idem', '', 'StalledJobAgent')])
+
+  # Jobs which finished since their last update was read are not marked as stalled
+  stalledJobAgent.jobDB.setJobAttributes.reset_mock()
+  stalledJobAgent.logDB.addLoggingRecords.reset_mock()
+  stalledJobAgent.jobDB.getAttributesForJobList.return_value = S_OK({
+      2: {'Status': 'Running', 'MinorStatus': 'Application'},
+      4: {'Status': 'Done', 'MinorStatus': 'Execution Complete'}})
+
+  result = stalledJobAgent._markStalledJobs(1000)
+
+  assert result['OK']
+  stalledJobAgent.jobDB.setJobAttributes.assert_called_once_with([2], ['Status'], ['Stalled'], update=True)
+  stalledJobAgent.logDB.addLoggingRecords.assert_called_once_with(
+      [(2, 'Stalled', 'Application', 'idem', '', 'StalledJobAgent')])
+
+  # Nothing to update when all the jobs finished
+  stalledJobAgent.jobDB.setJobAttributes.reset_mock()
+  stalledJobAgent.jobDB.getAttributesForJobList.return_value = S_OK({2: {'Status': 'Failed', 'MinorStatus': 'Killed'}})
+
+  assert stalledJobAgent._markStalledJobs(1000)['OK']
+  stalledJobAgent.jobDB.setJobAttributes.assert_not_called()
@@ -30,8 +30,10 @@ class Matcher(object):
   """ Logic for matching
   """
 
-  def __init__(self, pilotAgentsDB=None, jobDB=None, tqDB=None, jlDB=None, opsHelper=None):
+  def __init__(self, pilotAgentsDB=None, jobDB=None, tqDB=None, jlDB=None, opsHelper=None, tqIndex=None):
     """ c'tor
+
+        tqIndex is an optional TaskQueueIndex, used instead of tqDB to match jobs
     """
     if pilotAgentsDB:
       self.pilotAgentsDB = pilotAgentsDB
@@ -49,6 +51,7 @@ class Matcher(object):
       self.jlDB = jlDB
     else:
       self.jlDB = JobLoggingDB()
+    self.tqIndex = tqIndex
 
     if opsHelper:
       self.opsHelper = opsHelper
@@ -85,7 +88,10 @@ class Matcher(object):
     gLogger.info('Resource description for matching', printDict(toPrintDict))
 
     negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
-    result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
+    if self.tqIndex:
+      result = self.tqIndex.matchAndGetJob(resourceDict, negativeCond=negativeCond)
+    else:
+      result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
 
     if not result['OK']:
       raise RuntimeError(result['Message'])
@@ -146,6 +152,74 @@ class Matcher(object):
 
     return resultDict
 
+  def selectJobs(self, resourceDescription, credDict, maxJobs):
+    """ Select up to maxJobs jobs matching the resource capacity, for resources with many slots.
+        Unlike calling selectJob maxJobs times, the jobs are taken out of the task queues
+        and their attributes, JDL and optimizer parameters are retrieved with a few bulk queries
+
+        :return: list of dictionaries as returned by selectJob, empty if no job matched
+    """
+    startTime = time.time()
+
+    resourceDict = self._getResourceDict(resourceDescription, credDict)
+    gLogger.info('Resource description for matching %s jobs' % maxJobs, printDict(resourceDict))
+
+    negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
+    result = self.tqDB.matchAndGetJobs(resourceDict, maxJobs, negativeCond=negativeCond)
+    if not result['OK']:
+      raise RuntimeError(result['Message'])
+    result = result['Value']
+    if not result['matchFound']:
+      self.log.info("No match found")
+      return []
+
+    jobIDs = [jobID for jobID, _tqID in result['jobs']]
+    resAtt = self.jobDB.getAttributesForJobList(jobIDs, ['OwnerDN', 'OwnerGroup', 'Status'])
+    if not resAtt['OK']:
+      raise RuntimeError('Could not retrieve job attributes')
+    jobAttributes = resAtt['Value']
+    waitingJobIDs = []
+    for jobID in jobIDs:
+      if jobID not in jobAttributes:
+        self.log.error('No attributes returned for job', str(jobID))
+      elif jobAttributes[jobID]['Status'] != 'Waiting':
+        self.log.error('Job matched by the TQ is not in Waiting state', str(jobID))
+      else:
+        waitingJobIDs.append(jobID)
+    if not waitingJobIDs:
+      raise RuntimeError("Jobs %s are not in Waiting state" % ','.join([str(jobID) for jobID in jobIDs]))
+
+    self._reportStatus(resourceDict, waitingJobIDs)
+
+    result = self.jobDB.getJobsJDL(waitingJobIDs)
+    if not result['OK']:
+      raise RuntimeError("Failed to get the jobs JDL")
+    jobJDLs = result['Value']
+    resOpt = self.jobDB.getJobsOptParameters(waitingJobIDs)
+    jobOptParameters = resOpt['Value'] if resOpt['OK'] else {}
+
+    checkDelay = self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True)
+    resultList = []
+    for jobID in waitingJobIDs:
+      resultDict = {'JDL': jobJDLs.get(jobID, ''), 'JobID': jobID}
+      resultDict.update(jobOptParameters.get(jobID, {}))
+      resultDict['DN'] = jobAttributes[jobID]['OwnerDN']
+      resultDict['Group'] = jobAttributes[jobID]['OwnerGroup']
+      resultDict['PilotInfoReportedFlag'] = True
+      resultList.append(resultDict)
+      if checkDelay:
+        self.limiter.updateDelayCounters(resourceDict['Site'], jobID)
+      self._updatePilotJobMapping(resourceDict, jobID)
+
+    if not resourceDict.get('PilotInfoReportedFlag', False):
+      self._updatePilotInfo(resourceDict)
+
+    matchTime = time.time() - startTime
+    self.log.info("Match time for %s jobs: [%s]" % (len(resultList), str(matchTime)))
+    gMonitor.addMark("matchTime", matchTime)
+
+    return resultList
+
   def _getResourceDict(self, resourceDescription, credDict):
     """ from resourceDescription to resourceDict (just various mods)
     """
@@ -221,7 +295,7 @@ class Matcher(object):
     return resourceDict
 
   def _reportStatus(self, resourceDict, jobID):
-    """ Reports the status of the matched job in jobDB and jobLoggingDB
+    """ Reports the status of the matched job (or list of jobs) in jobDB and jobLoggingDB
 
         Do not fail if errors happen here
     """
@@ -234,10 +308,13 @@ class Matcher(object):
     else:
       self.log.verbose("Set job attributes for jobID %s" % jobID)
 
-    result = self.jlDB.addLoggingRecord(jobID,
-                                        status='Matched',
-                                        minor='Assigned',
-                                        source='Matcher')
+    if isinstance(jobID, list):
+      result = self.jlDB.addLoggingRecords([(jID, 'Matched', 'Assigned', 'idem', None, 'Matcher') for jID in jobID])
+    else:
+      result = self.jlDB.addLoggingRecord(jobID,
+                                          status='Matched',
+                                          minor='Assigned',
+                                          source='Matcher')
     if not result['OK']:
       self.log.error("Problem reporting job status",
                      "addLoggingRecord, jobID = %s: %s" % (jobID, result['Message']))
@@ -5,6 +5,8 @@
 __RCSID__ = "$Id$"
 
 import os
+import bz2
+import gzip
 import tarfile
 import hashlib
 import tempfile
@@ -18,8 +20,54 @@ from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.Core.Utilities.File import mkDir
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.Core.Utilities.ReturnValues import returnSingleResult
-from DIRAC.Core.Utilities.File import getGlobbedTotalSize
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOForGroup
+from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
+
+# file extension of the sandboxes for each compression
+SANDBOX_EXTENSIONS = {'none': 'tar', 'gz': 'tar.gz', 'bz2': 'tar.bz2'}
+DEFAULT_SANDBOX_COMPRESSION = 'bz2'
+
+
+class _HashingFile(object):
+  """ Write only file object computing the MD5 and the size of the data written to the file
+  """
+
+  def __init__(self, fd):
+    self.fd = fd
+    self.md5 = hashlib.md5()
+    self.size = 0
+
+  def write(self, data):
+    self.md5.update(data)
+    self.size += len(data)
+    self.fd.write(data)
+
+  def flush(self):
+    self.fd.flush()
+
+
+class _BZ2File(object):
+  """ Write only file object compressing in bzip2 format the data written to the file
+  """
+
+  def __init__(self, fd, compressLevel):
+    self.fd = fd
+    self.__compressor = bz2.BZ2Compressor(compressLevel)
+
+  def write(self, data):
+    self.fd.write(self.__compressor.compress(data))
+
+  def close(self):
+    self.fd.write(self.__compressor.flush())
+
+
+def _normalizeOwnership(tarInfo):
+  """ Filter for tarfile.add: the owner of the files is not kept in the archive,
+      such that the same files packed by different users give the same sandbox
+  """
+  tarInfo.uid = tarInfo.gid = 0
+  tarInfo.uname = tarInfo.gname = ''
+  return tarInfo
 
 
 class SandboxStoreClient(object):
@@ -89,6 +137,9 @@ class SandboxStoreClient(object):
 
         Parameters:
           - assignTo : Dict containing { 'Job:<jobid>' : '<sbType>', ... }
+
+        The files are packed with the compression defined by the JobDescription/SandboxCompression
+        option of the Operations section, and are not uploaded if the same sandbox is already stored.
     """
     errorFiles = []
     files2Upload = []
@@ -126,31 +177,36 @@ class SandboxStoreClient(object):
     except Exception as e:
       return S_ERROR("Cannot create temporary file: %s" % repr(e))
 
-    with tarfile.open(name=tmpFilePath, mode="w|bz2") as tf:
-      for sFile in files2Upload:
-        if isinstance(sFile, basestring):
-          tf.add(os.path.realpath(sFile), os.path.basename(sFile), recursive=True)
-        elif isinstance(sFile, StringIO.StringIO):
-          tarInfo = tarfile.TarInfo(name='jobDescription.xml')
-          tarInfo.size = len(sFile.buf)
-          tf.addfile(tarinfo=tarInfo, fileobj=sFile)
+    result = self.__packSandbox(files2Upload, tmpFilePath)
+    if not result['OK']:
+      result['SandboxFileName'] = tmpFilePath
+      return result
+    md5, sbSize, extension = result['Value']
 
     if sizeLimit > 0:
       # Evaluate the compressed size of the sandbox
-      if getGlobbedTotalSize(tmpFilePath) > sizeLimit:
+      if sbSize > sizeLimit:
         result = S_ERROR("Size over the limit")
         result['SandboxFileName'] = tmpFilePath
         return result
 
-    oMD5 = hashlib.md5()
-    with open(tmpFilePath, "rb") as fd:
-      bData = fd.read(10240)
-      while bData:
-        oMD5.update(bData)
-        bData = fd.read(10240)
-
-    transferClient = self.__getTransferClient()
-    result = transferClient.sendFile(tmpFilePath, ("%s.tar.bz2" % oMD5.hexdigest(), assignTo))
+    fileId = "%s.%s" % (md5, extension)
+    # There is no need to upload the sandbox again if it is already in the store
+    result = self.__getRPCClient().exists(fileId)
+    if result['OK'] and result['Value']:
+      sbURL = result['Value']
+      gLogger.verbose("Sandbox already stored, skipping upload", sbURL)
+      result = S_OK(sbURL)
+      if assignTo:
+        result = self.__getRPCClient().assignSandboxesToEntities(dict((key, [(sbURL, assignTo[key])])
+                                                                      for key in assignTo))
+        if result['OK']:
+          result = S_OK(sbURL)
+    else:
+      if not result['OK']:
+        gLogger.verbose("Cannot check if the sandbox is already stored", result['Message'])
+      transferClient = self.__getTransferClient()
+      result = transferClient.sendFile(tmpFilePath, (fileId, assignTo))
     result['SandboxFileName'] = tmpFilePath
     try:
       if result['OK']:
@@ -159,6 +215,56 @@ class SandboxStoreClient(object):
       pass
     return result
 
+  @staticmethod
+  def __getCompression():
+    """ Get the compression of the sandboxes, defined as "<none|gz|bz2>[:<level>]"
+
+        :return: ( compression, level )
+    """
+    compression = Operations().getValue('JobDescription/SandboxCompression', DEFAULT_SANDBOX_COMPRESSION)
+    compression, _, level = compression.lower().partition(':')
+    if compression not in SANDBOX_EXTENSIONS:
+      gLogger.warn("Unknown sandbox compression, using the default one", compression)
+      compression = DEFAULT_SANDBOX_COMPRESSION
+    try:
+      level = min(max(int(level), 1), 9) if level else 9
+    except ValueError:
+      gLogger.warn("Invalid sandbox compression level, using the default one", level)
+      level = 9
+    return compression, level
+
+  def __packSandbox(self, fileList, tarFileName):
+    """ Pack the files in a tar archive, compressing it and computing its MD5 on the fly
+
+        :param list fileList: file names and StringIO objects to pack
+        :param str tarFileName: name of the archive to write
+        :return: S_OK( ( MD5 of the archive, size of the archive, file extension ) )/S_ERROR
+    """
+    compression, level = self.__getCompression()
+    try:
+      with open(tarFileName, "wb") as fd:
+        hashingFile = _HashingFile(fd)
+        if compression == 'gz':
+          # no name nor time in the header, for the same files to give the same sandbox
+          tarStream = gzip.GzipFile(filename='', mode='wb', compresslevel=level, fileobj=hashingFile, mtime=0)
+        elif compression == 'bz2':
+          tarStream = _BZ2File(hashingFile, level)
+        else:
+          tarStream = hashingFile
+        with tarfile.open(mode="w|", fileobj=tarStream) as tf:
+          for sFile in fileList:
+            if isinstance(sFile, basestring):
+              tf.add(os.path.realpath(sFile), os.path.basename(sFile), recursive=True, filter=_normalizeOwnership)
+            elif isinstance(sFile, StringIO.StringIO):
+              tarInfo = tarfile.TarInfo(name='jobDescription.xml')
+              tarInfo.size = len(sFile.buf)
+              tf.addfile(tarinfo=tarInfo, fileobj=sFile)
+        if tarStream is not hashingFile:
+          tarStream.close()
+    except (IOError, OSError, tarfile.TarError) as e:
+      return S_ERROR("Cannot pack the sandbox: %s" % repr(e))
+    return S_OK((hashingFile.md5.hexdigest(), hashingFile.size, SANDBOX_EXTENSIONS[compression]))
+
   ##############
   # Download sandbox
 
@@ -0,0 +1,334 @@
+""" In memory index of the task queues, used by the Matcher service
+
+    The index keeps the definition of the task queues (owner, setup, CPU time, sites, platforms,
+    tags...), their priority and the number of jobs per job priority. It is refreshed periodically
+    from TaskQueueDB: only the definitions of the new task queues are loaded, as a task queue
+    definition never changes, while the priorities and the job counts come from two cheap queries.
+
+    Matching a resource is then done in memory: the task queues are selected and weighted by
+    priority as the SQL of TaskQueueDB.matchAndGetTaskQueue does, and so is the priority of the job
+    to run. MySQL is only used to take the job out of its task queue (TaskQueueDB.extractJob), which
+    keeps the extraction atomic between matchers.
+
+    Whenever the index can not give a reliable answer (it is too old, the request is not supported,
+    or the jobs of all the selected task queues were gone) the request goes through
+    TaskQueueDB.matchAndGetJob, as without the index.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import random
+import threading
+
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Security import Properties, CS
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import multiValueDefFields, \
+    multiValueMatchFields, \
+    tagMatchFields, \
+    bannedJobMatchFields, \
+    strictRequireMatchFields
+
+
+def _normalize(value):
+  """ Strings are compared as MySQL does with the default collation: case insensitive,
+      and ignoring trailing spaces
+  """
+  return str(value).rstrip().lower()
+
+
+def _asSet(value):
+  """ Normalized set of values from a single value or a list
+  """
+  if not isinstance(value, (list, tuple, set)):
+    value = [value]
+  return set(_normalize(v) for v in value)
+
+
+class TaskQueueIndex(object):
+  """ Task queues cache and matching logic, with the same interface as TaskQueueDB.matchAndGetJob
+  """
+
+  def __init__(self, tqDB, maxAge=60, fullRefreshPeriod=600):
+    """ c'tor
+
+        :param tqDB: TaskQueueDB instance
+        :param int maxAge: seconds after which the index is not used anymore if it could not be refreshed
+        :param int fullRefreshPeriod: seconds after which all the definitions are loaded again
+    """
+    self.tqDB = tqDB
+    self.maxAge = maxAge
+    self.fullRefreshPeriod = fullRefreshPeriod
+    self.log = gLogger.getSubLogger("TaskQueueIndex")
+    self.__lock = threading.Lock()
+    # ( task queues definitions, TQIds per setup, priorities, job counts ), replaced as a whole by refresh
+    self.__index = ({}, {}, {}, {})
+    self.__lastRefresh = 0
+    self.__lastFullRefresh = 0
+    self.__stats = {'matched': 0, 'notMatched': 0, 'fallback': 0}
+
+  def refresh(self):
+    """ Update the index from TaskQueueDB
+    """
+    result = self.tqDB.getTaskQueuesSummary()
+    if not result['OK']:
+      self.log.error("Cannot refresh the task queue index", result['Message'])
+      return result
+    tqSummary, jobsDict = result['Value']
+    now = time.time()
+    fullRefresh = now - self.__lastFullRefresh > self.fullRefreshPeriod
+
+    taskQueues = {}
+    if not fullRefresh:
+      taskQueues = dict((tqId, tqDef) for tqId, tqDef in self.__index[0].iteritems() if tqId in tqSummary)
+    # The definition of a task queue is complete once it has been enabled
+    newTQs = [tqId for tqId, (_priority, enabled) in tqSummary.iteritems()
+              if tqId not in taskQueues and enabled >= 1]
+    result = self.tqDB.getTaskQueueDefinitions(newTQs)
+    if not result['OK']:
+      self.log.error("Cannot refresh the task queue index", result['Message'])
+      return result
+    for tqId, tqDef in result['Value'].iteritems():
+      taskQueues[tqId] = self.__normalizeDefinition(tqDef)
+
+    setupIndex = {}
+    for tqId, tqDef in taskQueues.iteritems():
+      setupIndex.setdefault(tqDef['Setup'], set()).add(tqId)
+    priorities = dict((tqId, tqSummary[tqId][0]) for tqId in taskQueues)
+    jobs = dict((tqId, [list(jobGroup) for jobGroup in jobsDict[tqId]])
+                for tqId in taskQueues if tqId in jobsDict)
+
+    self.__lock.acquire()
+    try:
+      self.__index = (taskQueues, setupIndex, priorities, jobs)
+    finally:
+      self.__lock.release()
+    self.__lastRefresh = now
+    if fullRefresh:
+      self.__lastFullRefresh = now
+    self.log.verbose("Task queue index refreshed", "%s task queues (%s new), stats %s" % (len(taskQueues),
+                                                                                          len(newTQs),
+                                                                                          self.__stats))
+    return S_OK()
+
+  def getStats(self):
+    """ Number of requests matched and not matched in memory, and sent to TaskQueueDB
+    """
+    return dict(self.__stats)
+
+  @staticmethod
+  def __normalizeDefinition(tqDef):
+    """ Normalize the values of a definition coming from TaskQueueDB.getTaskQueueDefinitions
+    """
+    normDef = {'OwnerDN': tqDef['OwnerDN'],
+               'OwnerGroup': tqDef['OwnerGroup'],
+               'CPUTime': tqDef['CPUTime']}
+    normDef['Setup'] = _normalize(tqDef['Setup'])
+    normDef['NormOwnerDN'] = _normalize(tqDef['OwnerDN'])
+    normDef['NormOwnerGroup'] = _normalize(tqDef['OwnerGroup'])
+    for field in multiValueDefFields:
+      normDef[field] = _asSet(tqDef[field])
+    return normDef
+
+  def matchAndGetJob(self, tqMatchDict, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None):
+    """ Match a job, see TaskQueueDB.matchAndGetJob
+    """
+    match = None
+    if time.time() - self.__lastRefresh <= self.maxAge:
+      match = self.__prepareMatch(tqMatchDict, negativeCond)
+    if match is None:
+      self.__stats['fallback'] += 1
+      return self.tqDB.matchAndGetJob(tqMatchDict, numJobsPerTry=numJobsPerTry,
+                                      numQueuesPerTry=numQueuesPerTry, negativeCond=negativeCond)
+
+    taskQueues, setupIndex, priorities, jobs = self.__index
+    candidates = set()
+    for setup in match['Setup']:
+      candidates.update(setupIndex.get(setup, ()))
+    weightedTQs = []
+    for tqId in candidates:
+      if not [jobGroup for jobGroup in jobs.get(tqId, ()) if jobGroup[2] > 0]:
+        continue
+      if self.__matchTaskQueue(taskQueues[tqId], match):
+        priority = priorities[tqId]
+        # Same as ORDER BY RAND() / Priority
+        weightedTQs.append((random.random() / priority if priority > 0 else 0, tqId))
+    if not weightedTQs:
+      self.log.info("No TQ matches requirements")
+      self.__stats['notMatched'] += 1
+      return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
+
+    weightedTQs.sort()
+    for _weight, tqId in weightedTQs[:numQueuesPerTry]:
+      tqDef = taskQueues[tqId]
+      jobGroup = self.__chooseJobGroup(jobs[tqId])
+      if not jobGroup:
+        continue
+      self.log.info("Trying to extract jobs from TQ %s" % tqId)
+      result = self.tqDB.extractJob((tqId, tqDef['OwnerDN'], tqDef['OwnerGroup']), jobGroup[0],
+                                    numJobsPerTry=numJobsPerTry)
+      if not result['OK']:
+        return result
+      self.__lock.acquire()
+      try:
+        if result['Value']:
+          jobGroup[2] = max(jobGroup[2] - 1, 0)
+        else:
+          # The index was not up to date
+          jobGroup[2] = 0
+      finally:
+        self.__lock.release()
+      if result['Value']:
+        self.log.info("Extracted job %s with prio %s from TQ %s" % (result['Value'], jobGroup[0], tqId))
+        self.__stats['matched'] += 1
+        return S_OK({'matchFound': True, 'jobId': result['Value'], 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+
+    # None of the chosen task queues had the jobs the index expected, let TaskQueueDB decide
+    self.__stats['fallback'] += 1
+    return self.tqDB.matchAndGetJob(tqMatchDict, numJobsPerTry=numJobsPerTry,
+                                    numQueuesPerTry=numQueuesPerTry, negativeCond=negativeCond)
+
+  @staticmethod
+  def __chooseJobGroup(jobGroups):
+    """ Choose the priority of the job to extract. It is the same as choosing the job with
+        the lowest RAND() / RealPriority: the lowest of n random numbers follows 1 - U ^ ( 1 / n )
+
+        :param list jobGroups: [ Priority, RealPriority, number of jobs ]
+        :return: the chosen job group or None if there are no jobs
+    """
+    chosen = None
+    chosenWeight = None
+    for jobGroup in jobGroups:
+      _priority, realPriority, numJobs = jobGroup
+      if numJobs <= 0 or realPriority <= 0:
+        continue
+      weight = (1. - random.random() ** (1. / numJobs)) / realPriority
+      if chosen is None or weight < chosenWeight:
+        chosen = jobGroup
+        chosenWeight = weight
+    return chosen
+
+  def __prepareMatch(self, tqMatchDict, negativeCond):
+    """ Normalize the match request, see TaskQueueDB.__generateTQMatchSQL for the meaning of each field
+
+        :return: dict or None if the request has to be served by TaskQueueDB
+    """
+    # A specific job is requested, or a mandatory field is missing (to get the same error as TaskQueueDB)
+    if 'JobID' in tqMatchDict or 'Setup' not in tqMatchDict or 'CPUTime' not in tqMatchDict:
+      return None
+    cpuTimes = tqMatchDict['CPUTime']
+    if not isinstance(cpuTimes, (list, tuple)):
+      cpuTimes = [cpuTimes]
+    if not cpuTimes or [cpuTime for cpuTime in cpuTimes if not isinstance(cpuTime, (int, long))]:
+      return None
+    if tqMatchDict.get('Tag') == 'Any':
+      return None
+    match = {'Setup': _asSet(tqMatchDict['Setup']), 'CPUTime': max(cpuTimes)}
+
+    # Owners: OwnerGroup -> set of DNs or None if any DN is accepted
+    ownerGroups = None
+    ownerDNs = None
+    if 'OwnerGroup' in tqMatchDict:
+      groups = tqMatchDict['OwnerGroup']
+      if not isinstance(groups, (list, tuple)):
+        groups = [groups]
+      dns = None
+      if 'OwnerDN' in tqMatchDict:
+        dns = _asSet(tqMatchDict['OwnerDN'])
+      ownerGroups = {}
+      for group in groups:
+        if dns is None or Properties.JOB_SHARING in CS.getPropertiesForGroup(group):
+          ownerGroups[_normalize(group)] = None
+        else:
+          ownerGroups[_normalize(group)] = dns
+    elif 'OwnerDN' in tqMatchDict:
+      ownerDNs = _asSet(tqMatchDict['OwnerDN'])
+    match['OwnerGroup'] = ownerGroups
+    match['OwnerDN'] = ownerDNs
+
+    match['Multi'] = {}
+    match['Banned'] = {}
+    for field in multiValueMatchFields:
+      if tqMatchDict.get(field):
+        match['Multi'][field] = _asSet(tqMatchDict[field])
+      if tqMatchDict.get("Banned%s" % field):
+        match['Banned'][field] = _asSet(tqMatchDict["Banned%s" % field])
+    match['RequiredTag'] = None
+    if 'Tag' in match['Multi'] and tqMatchDict.get('RequiredTag'):
+      match['RequiredTag'] = _asSet(tqMatchDict['RequiredTag'])
+    match['Strict'] = [field for field in strictRequireMatchFields if field not in match['Multi']]
+
+    # List of ( multi value conditions, single value conditions ), a TQ matches if one of them is met
+    match['Negative'] = []
+    if negativeCond:
+      if isinstance(negativeCond, dict):
+        negativeCond = [negativeCond]
+      for condDict in negativeCond:
+        multiConds = []
+        singleConds = []
+        for field, values in condDict.iteritems():
+          if field in multiValueMatchFields:
+            multiConds.append(("%ss" % field, _asSet(values)))
+          elif field in ('OwnerDN', 'OwnerGroup', 'Setup'):
+            singleConds.append(("Norm%s" % field if field != 'Setup' else field, _asSet(values)))
+          elif field == 'CPUTime':
+            # Not a string, nothing the index should guess about
+            return None
+        match['Negative'].append((multiConds, singleConds))
+    return match
+
+  @staticmethod
+  def __matchTaskQueue(tqDef, match):
+    """ Whether a task queue definition matches a prepared request
+    """
+    if tqDef['CPUTime'] > match['CPUTime']:
+      return False
+    ownerGroups = match['OwnerGroup']
+    if ownerGroups is not None:
+      if tqDef['NormOwnerGroup'] not in ownerGroups:
+        return False
+      dns = ownerGroups[tqDef['NormOwnerGroup']]
+      if dns is not None and tqDef['NormOwnerDN'] not in dns:
+        return False
+    elif match['OwnerDN'] is not None and tqDef['NormOwnerDN'] not in match['OwnerDN']:
+      return False
+
+    for field, values in match['Multi'].iteritems():
+      tqValues = tqDef["%ss" % field]
+      if field in tagMatchFields:
+        # All the tags required by the jobs must be provided by the resource
+        if not tqValues <= values:
+          return False
+        requiredTags = match['RequiredTag']
+        if requiredTags and not requiredTags <= tqValues:
+          return False
+      elif tqValues and not tqValues & values:
+        return False
+      if field in bannedJobMatchFields and not values - tqDef["Banned%ss" % field]:
+        return False
+    for field, values in match['Banned'].iteritems():
+      if not values - tqDef["%ss" % field]:
+        return False
+    for field in match['Strict']:
+      if tqDef["%ss" % field]:
+        return False
+
+    if match['Negative']:
+      for multiConds, singleConds in match['Negative']:
+        if TaskQueueIndex.__negativeCondMet(tqDef, multiConds, singleConds):
+          break
+      else:
+        return False
+    return True
+
+  @staticmethod
+  def __negativeCondMet(tqDef, multiConds, singleConds):
+    """ Negative condition of one dict, see TaskQueueDB.__generateNotDictSQL
+    """
+    for tqField, values in multiConds:
+      if not values & tqDef[tqField]:
+        return True
+    for tqField, values in singleConds:
+      if values - set([tqDef[tqField]]):
+        return True
+    return False
@@ -3,16 +3,19 @@
 # pylint: disable=protected-access, missing-docstring, invalid-name, line-too-long
 
 import os
+import hashlib
+import tarfile
 import unittest
 import importlib
 import StringIO
 
-from mock import MagicMock
+from mock import MagicMock, patch
 
 from DIRAC.DataManagementSystem.Client.test.mock_DM import dm_mock
 from DIRAC import S_OK
 from DIRAC.WorkloadManagementSystem.Client.DownloadInputData import DownloadInputData
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
+from DIRAC.WorkloadManagementSystem.Client.TaskQueueIndex import TaskQueueIndex
 from DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient import SandboxStoreClient
 
 
@@ -147,6 +150,103 @@ class MatcherTestCase(ClientsTestCase):
 
     self.assertEqual(res, resExpected)
 
+  def test_selectJobs(self):
+
+    self.opsHelperMock.getValue.side_effect = lambda _option, default: default
+    self.matcher.siteClient = MagicMock()
+    self.matcher.siteClient.getUsableSites.return_value = S_OK(['DIRAC.Jenkins.ch'])
+    self.matcher.limiter = MagicMock()
+    self.matcher.limiter.getNegativeCondForSite.return_value = {}
+    self.tqDBMock.matchAndGetJobs.return_value = S_OK({'matchFound': True,
+                                                       'jobs': [(1, 10), (2, 10), (3, 11)]})
+    self.jobDBMock.getAttributesForJobList.return_value = S_OK({1: {'OwnerDN': '/DN/user', 'OwnerGroup': 'user',
+                                                                    'Status': 'Waiting'},
+                                                                2: {'OwnerDN': '/DN/user', 'OwnerGroup': 'user',
+                                                                    'Status': 'Running'},
+                                                                3: {'OwnerDN': '/DN/user', 'OwnerGroup': 'user',
+                                                                    'Status': 'Waiting'}})
+    self.jobDBMock.getJobsJDL.return_value = S_OK({1: '[JDL1]', 3: '[JDL3]'})
+    self.jobDBMock.getJobsOptParameters.return_value = S_OK({3: {'CPUTime': '100'}})
+
+    resourceDescription = {'CPUTime': 1080000,
+                           'DIRACVersion': 'v8r0p1',
+                           'Setup': 'LHCb-Certification',
+                           'Site': 'DIRAC.Jenkins.ch'}
+    credDict = {'DN': '/DN/user', 'group': 'user', 'properties': []}
+    res = self.matcher.selectJobs(resourceDescription, credDict, 3)
+
+    self.assertEqual([jobDict['JobID'] for jobDict in res], [1, 3])
+    self.assertEqual(res[0]['JDL'], '[JDL1]')
+    self.assertEqual(res[1]['CPUTime'], '100')
+    self.assertEqual(res[1]['DN'], '/DN/user')
+    self.jobDBMock.setJobAttributes.assert_called_once_with([1, 3], ['Status', 'MinorStatus', 'ApplicationStatus',
+                                                                     'Site'],
+                                                            ['Matched', 'Assigned', 'Unknown', 'DIRAC.Jenkins.ch'])
+    self.assertEqual(len(self.jlDBMock.addLoggingRecords.call_args[0][0]), 2)
+
+#############################################################################
+
+
+class TaskQueueIndexTestCase(ClientsTestCase):
+
+  def setUp(self):
+    super(TaskQueueIndexTestCase, self).setUp()
+
+    def tqDef(**kwargs):
+      definition = {'OwnerDN': '/DN/user1', 'OwnerGroup': 'group1', 'Setup': 'aSetup', 'CPUTime': 3600}
+      for field in ('Sites', 'GridCEs', 'GridMiddlewares', 'BannedSites',
+                    'Platforms', 'PilotTypes', 'SubmitPools', 'JobTypes', 'Tags'):
+        definition[field] = set()
+      definition.update(kwargs)
+      return definition
+
+    tqDefs = {1: tqDef(),
+              2: tqDef(Sites=set(['Site.B'])),
+              3: tqDef(Tags=set(['4Processors'])),
+              4: tqDef(OwnerGroup='group2', BannedSites=set(['Site.A'])),
+              5: tqDef(CPUTime=100000)}
+    self.tqDBMock.getTaskQueuesSummary.return_value = S_OK((dict((tqId, (1., 1)) for tqId in tqDefs),
+                                                            dict((tqId, [(1, 1., 1000)]) for tqId in tqDefs)))
+    self.tqDBMock.getTaskQueueDefinitions.return_value = S_OK(tqDefs)
+    self.tqDBMock.extractJob.side_effect = lambda tqInfo, _prio, numJobsPerTry: S_OK(tqInfo[0] * 100)
+    self.tqDBMock.matchAndGetJob.return_value = S_OK({'matchFound': False, 'fromDB': True})
+    self.tqIndex = TaskQueueIndex(self.tqDBMock)
+    self.assertTrue(self.tqIndex.refresh()['OK'])
+
+  def _matchedTQs(self, tqMatchDict, negativeCond=None):
+    matched = set()
+    for _ in xrange(100):
+      res = self.tqIndex.matchAndGetJob(dict(tqMatchDict), negativeCond=negativeCond)
+      self.assertTrue(res['OK'])
+      if res['Value']['matchFound']:
+        self.assertEqual(res['Value']['jobId'], res['Value']['taskQueueId'] * 100)
+        matched.add(res['Value']['taskQueueId'])
+    return matched
+
+  def test_match(self):
+    resourceDict = {'Setup': 'aSetup', 'CPUTime': 5000, 'Site': 'Site.A'}
+    self.assertEqual(self._matchedTQs(resourceDict), set([1]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, Site='site.b')), set([1, 2, 4]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, Tag=['4Processors', '2Processors'])), set([1, 3]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, Tag=['4Processors'], RequiredTag=['4Processors'])),
+                     set([3]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, Site='Site.C', OwnerGroup='group2')), set([4]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, CPUTime=200000), negativeCond={'Site': 'Site.B'}),
+                     set([1, 5]))
+    self.assertEqual(self._matchedTQs(dict(resourceDict, Setup='otherSetup')), set())
+    self.tqDBMock.matchAndGetJob.assert_not_called()
+
+  def test_fallback(self):
+    # A given job is requested
+    res = self.tqIndex.matchAndGetJob({'Setup': 'aSetup', 'CPUTime': 5000, 'JobID': 123})
+    self.assertTrue(res['Value']['fromDB'])
+    # The jobs are not in the TQ anymore
+    self.tqDBMock.extractJob.side_effect = None
+    self.tqDBMock.extractJob.return_value = S_OK(False)
+    res = self.tqIndex.matchAndGetJob({'Setup': 'aSetup', 'CPUTime': 5000, 'Site': 'Site.A'})
+    self.assertTrue(res['Value']['fromDB'])
+    self.assertEqual(self.tqIndex.getStats()['fallback'], 2)
+
 #############################################################################
 
 
@@ -161,6 +261,51 @@ class SandboxStoreTestCaseSuccess(ClientsTestCase):
     res = ssc.uploadFilesAsSandbox(fileList)
     print res
 
+  def test_uploadFilesAsSandboxPacking(self):
+
+    with open('1.txt', 'w') as fd:
+      fd.write('1' * 10000)
+    for compression, extension in (('none', 'tar'), ('gz:1', 'tar.gz'), ('bz2', 'tar.bz2')):
+      with patch('DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient.Operations') as opsMock:
+        opsMock.return_value.getValue.return_value = compression
+        rpcMock = MagicMock()
+        rpcMock.exists.return_value = S_OK(None)
+        transferMock = MagicMock()
+        transferMock.sendFile.return_value = {'OK': False, 'Message': 'boh'}
+        ssc = SandboxStoreClient(rpcClient=rpcMock, transferClient=transferMock)
+        fileIds = set()
+        for _ in range(2):
+          res = ssc.uploadFilesAsSandbox(['1.txt'], assignTo={'Job:1': 'Input'})
+          self.assertFalse(res['OK'])
+          tmpFilePath = res['SandboxFileName']
+          fileId, assignTo = transferMock.sendFile.call_args[0][1]
+          self.assertEqual(assignTo, {'Job:1': 'Input'})
+          # the hash computed on the fly is the one of the archive written
+          with open(tmpFilePath, 'rb') as fd:
+            self.assertEqual(fileId, '%s.%s' % (hashlib.md5(fd.read()).hexdigest(), extension))
+          with tarfile.open(tmpFilePath, 'r') as tf:
+            self.assertEqual(tf.getnames(), ['1.txt'])
+            self.assertEqual(tf.extractfile('1.txt').read(), '1' * 10000)
+          os.remove(tmpFilePath)
+          fileIds.add(fileId)
+      # the same files give the same sandbox
+      self.assertEqual(len(fileIds), 1)
+
+  def test_uploadFilesAsSandboxExists(self):
+
+    rpcMock = MagicMock()
+    rpcMock.exists.return_value = S_OK('SB:SandboxSE|/SandBox/a/a.user/123/456/123456.tar.bz2')
+    rpcMock.assignSandboxesToEntities.return_value = S_OK(1)
+    transferMock = MagicMock()
+    ssc = SandboxStoreClient(rpcClient=rpcMock, transferClient=transferMock)
+    res = ssc.uploadFilesAsSandbox([StringIO.StringIO('try')], assignTo={'Job:1': 'Input'})
+    self.assertTrue(res['OK'])
+    self.assertEqual(res['Value'], 'SB:SandboxSE|/SandBox/a/a.user/123/456/123456.tar.bz2')
+    self.assertFalse(os.path.exists(res['SandboxFileName']))
+    self.assertFalse(transferMock.sendFile.called)
+    rpcMock.assignSandboxesToEntities.assert_called_once_with(
+        {'Job:1': [('SB:SandboxSE|/SandBox/a/a.user/123/456/123456.tar.bz2', 'Input')]})
+
 
 #############################################################################
 # Test Suite run
@@ -169,6 +314,7 @@ class SandboxStoreTestCaseSuccess(ClientsTestCase):
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(ClientsTestCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MatcherTestCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TaskQueueIndexTestCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DownloadInputDataSuccess))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(SandboxStoreTestCaseSuccess))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -17,6 +17,8 @@
     getJobStatus()
 
     selectJobs()
+    selectJobsIter()
+    getJobsLastUpdate()
     selectJobsWithStatus()
 
     setJobAttribute()
@@ -373,33 +375,12 @@ class JobDB(DB):
         return an empty dictionary if matching job found
     """
 
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
-    if attrList:
-      attrNameList = []
-      for x in attrList:
-        ret = self._escapeString(x)
-        if not ret['OK']:
-          return ret
-        x = "`" + ret['Value'][1:-1] + "`"
-        attrNameList.append(x)
-      attrNames = ','.join(attrNameList)
-    else:
-      attrNameList = []
-      for x in self.jobAttributeNames:
-        ret = self._escapeString(x)
-        if not ret['OK']:
-          return ret
-        x = "`" + ret['Value'][1:-1] + "`"
-        attrNameList.append(x)
-      attrNames = ','.join(attrNameList)
+    # The job ID is passed as parameter of the query, so that it is escaped without contacting the server
+    attrNames = ','.join(["`%s`" % str(x).replace('`', '') for x in (attrList or self.jobAttributeNames)])
     self.log.debug('JobDB.getAllJobAttributes: Getting Attributes for job = %s.' % jobID)
 
-    cmd = 'SELECT %s FROM Jobs WHERE JobID=%s' % (attrNames, jobID)
-    res = self._query(cmd)
+    cmd = 'SELECT %s FROM Jobs WHERE JobID=%%s' % attrNames
+    res = self._query(cmd, params=(jobID,))
     if not res['OK']:
       return res
 
@@ -529,6 +510,36 @@ class JobDB(DB):
     else:
       return S_ERROR('JobDB.getJobOptParameters: failed to retrieve parameters')
 
+#############################################################################
+  def getJobsOptParameters(self, jobIDList, paramList=None):
+    """ Get optimizer parameters for several jobs with a single query
+
+        :param list jobIDList: job IDs
+        :param list paramList: names of the parameters, all the parameters if empty
+        :return: S_OK( { jobID: { name: value } } ), jobs without parameters are not included
+    """
+    if not jobIDList:
+      return S_OK({})
+    cmd = "SELECT JobID, Name, Value from OptimizerParameters WHERE JobID in (%s)" % \
+        ','.join([str(int(jobID)) for jobID in jobIDList])
+    if paramList:
+      ret = self._escapeValues(paramList)
+      if not ret['OK']:
+        return ret
+      cmd += " and Name in (%s)" % ','.join(ret['Value'])
+
+    result = self._query(cmd)
+    if not result['OK']:
+      return S_ERROR('JobDB.getJobsOptParameters: failed to retrieve parameters')
+    resultDict = {}
+    for jobID, name, value in result['Value']:
+      try:
+        value = value.tostring()
+      except BaseException:
+        pass
+      resultDict.setdefault(int(jobID), {})[name] = value
+    return S_OK(resultDict)
+
 #############################################################################
 
   def getInputData(self, jobID):
@@ -644,6 +655,42 @@ class JobDB(DB):
       return S_OK([])
     return S_OK([self._to_value(i) for i in res['Value']])
 
+  def selectJobsIter(self, condDict, older=None, newer=None, timeStamp='LastUpdateTime',
+                     orderAttribute=None, limit=None, batchSize=1000):
+    """ Same as selectJobs, but the job IDs are streamed from the DB instead of
+        being loaded all at once.
+
+        :return: S_OK(generator) yielding lists of at most batchSize job IDs. The DB
+                 connection of the thread is held until the generator is exhausted.
+    """
+
+    self.log.debug('JobDB.selectJobsIter: retrieving jobs.')
+
+    res = self.getFieldsIter('Jobs', ['JobID'], condDict=condDict, limit=limit,
+                             older=older, newer=newer, timeStamp=timeStamp, orderAttribute=orderAttribute,
+                             batchSize=batchSize)
+    if not res['OK']:
+      return res
+
+    return S_OK([self._to_value(i) for i in rows] for rows in res['Value'])
+
+  def getJobsLastUpdate(self, condDict):
+    """ Get the site and the time of the latest sign of life of the jobs matching the conditions,
+        that is the most recent of their HeartBeatTime and LastUpdateTime, with a single query.
+
+        :param dict condDict: required Key = Value pairs, as for selectJobs
+        :return: S_OK( { jobID : ( site, latest update as datetime, or None if both times are null ) } )
+    """
+    res = self.getFields('Jobs', ['JobID', 'Site', 'HeartBeatTime', 'LastUpdateTime'], condDict=condDict)
+    if not res['OK']:
+      return res
+
+    jobs = {}
+    for jobID, site, heartBeatTime, lastUpdateTime in res['Value']:
+      updateTimes = [updateTime for updateTime in (heartBeatTime, lastUpdateTime) if updateTime]
+      jobs[int(jobID)] = (site, max(updateTimes) if updateTimes else None)
+    return S_OK(jobs)
+
 #############################################################################
   def setJobAttribute(self, jobID, attrName, attrValue, update=False, myDate=None):
     """ Set an attribute value for job specified by jobID.
@@ -1048,6 +1095,23 @@ class JobDB(DB):
       return S_OK(result['Value'][0][0])
     return result
 
+#############################################################################
+  def getJobsJDL(self, jobIDList, original=False):
+    """ Get the JDL of several jobs with a single query, see getJobJDL
+
+        :param list jobIDList: job IDs
+        :param bool original: get the original JDL instead of the current one
+        :return: S_OK( { jobID: JDL } ), jobs without JDL are not included
+    """
+    if not jobIDList:
+      return S_OK({})
+    cmd = "SELECT JobID, %s FROM JobJDLs WHERE JobID in (%s)" % ('OriginalJDL' if original else 'JDL',
+                                                                 ','.join([str(int(jobID)) for jobID in jobIDList]))
+    result = self._query(cmd)
+    if not result['OK']:
+      return result
+    return S_OK(dict((int(jobID), jdl) for jobID, jdl in result['Value']))
+
 #############################################################################
   def insertNewJobIntoDB(self, jdl, owner, ownerDN, ownerGroup, diracSetup,
                          initialStatus="Received",
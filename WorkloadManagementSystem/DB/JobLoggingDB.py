@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -53,6 +54,41 @@ class JobLoggingDB(DB):
     event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
     self.gLogger.info("Adding record for job " + str(jobID) + ": '" + event + "' from " + source)
 
+    _date, time_order = self.__getStatusTime(date)
+
+    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
+        (int(jobID), status, minor, application[:255],
+         str(_date), time_order, source)
+
+    return self._update(cmd)
+
+  def addLoggingRecords(self, records):
+    """ Add several entries to the JobLoggingDB table with as few statements as possible
+
+        :param list records: tuples (jobID, status, minor, application, date, source),
+                             with the same meaning as the arguments of addLoggingRecord
+        :return: S_OK/S_ERROR
+    """
+    self.gLogger.info("Adding %d logging records for %d jobs" %
+                      (len(records), len(set(record[0] for record in records))))
+    rows = []
+    for jobID, status, minor, application, date, source in records:
+      self.gLogger.verbose("Adding record for job %s: 'status/minor/app=%s/%s/%s' from %s" %
+                           (jobID, status, minor, application, source))
+      _date, time_order = self.__getStatusTime(date)
+      rows.append((int(jobID), status, minor, application[:255], str(_date), time_order, source))
+
+    result = self.insertFieldsBulk('LoggingInfo', ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                                                   'StatusTime', 'StatusTimeOrder', 'StatusSource'], rows)
+    if not result['OK']:
+      return result
+    return S_OK()
+
+  def __getStatusTime(self, date):
+    """ Get the status time and its ordering value from the date of a logging record:
+        a string in UTC, a datetime object or nothing for the current time
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -80,13 +116,7 @@ class JobLoggingDB(DB):
         _date = Time.dateTime()
         epoc = time.mktime(_date.timetuple()) - MAGIC_EPOC_NUMBER
         time_order = round(epoc, 3)
-
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-        (int(jobID), status, minor, application[:255],
-         str(_date), time_order, source)
-
-    return self._update(cmd)
+    return _date, time_order
 
 #############################################################################
   def getJobLoggingInfo(self, jobID):
@@ -493,11 +493,17 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
     if not retVal['OK']:
       return S_ERROR("Can't connect to DB: %s" % retVal['Message'])
     connObj = retVal['Value']
-    preJobSQL = "SELECT `tq_Jobs`.JobId, `tq_Jobs`.TQId \
+    # The values are passed as parameters of the queries
+    jobSQL = "SELECT `tq_Jobs`.JobId \
 FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s"
     prioSQL = "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` \
 WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
-    postJobSQL = " ORDER BY `tq_Jobs`.JobId ASC LIMIT %s" % numJobsPerTry
+    jobSQLParams = ()
+    if 'JobID' in tqMatchDict:
+      jobSQL += " AND `tq_Jobs`.JobId = %s"
+      jobSQLParams = (tqMatchDict['JobID'],)
+    jobSQL += " ORDER BY `tq_Jobs`.JobId ASC LIMIT %s"
+    jobSQLParams += (int(numJobsPerTry),)
     for _ in xrange(self.__maxMatchRetry):
       noJobsFound = False
       if 'JobID' in tqMatchDict:
@@ -506,7 +512,6 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
                                            numQueuesToGet=0,
                                            skipMatchDictDef=True,
                                            connObj=connObj)
-        preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict['JobID'])
       else:
         retVal = self.matchAndGetTaskQueue(tqMatchDict,
                                            numQueuesToGet=numQueuesPerTry,
@@ -521,32 +526,20 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
       for tqId, tqOwnerDN, tqOwnerGroup in tqList:
         self.log.info("Trying to extract jobs from TQ %s" % tqId)
-        retVal = self._query(prioSQL % tqId, conn=connObj)
+        retVal = self._query(prioSQL, conn=connObj, params=(tqId,))
         if not retVal['OK']:
           return S_ERROR("Can't retrieve winning priority for matching job: %s" % retVal['Message'])
         if not retVal['Value']:
           noJobsFound = True
           continue
         prio = retVal['Value'][0][0]
-        retVal = self._query("%s %s" % (preJobSQL % (tqId, prio), postJobSQL), conn=connObj)
+        retVal = self.__extractJob(jobSQL, (tqId, prio) + jobSQLParams, (tqId, tqOwnerDN, tqOwnerGroup),
+                                   connObj=connObj)
         if not retVal['OK']:
-          return S_ERROR("Can't begin transaction for matching job: %s" % retVal['Message'])
-        jobTQList = [(row[0], row[1]) for row in retVal['Value']]
-        if not jobTQList:
-          gLogger.info("Task queue %s seems to be empty, triggering a cleaning" % tqId)
-          self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
-        while jobTQList:
-          jobId, tqId = jobTQList.pop(random.randint(0, len(jobTQList) - 1))
-          self.log.info("Trying to extract job %s from TQ %s" % (jobId, tqId))
-          retVal = self.deleteJob(jobId, connObj=connObj)
-          if not retVal['OK']:
-            msgFix = "Could not take job"
-            msgVar = " %s out from the TQ %s: %s" % (jobId, tqId, retVal['Message'])
-            self.log.error(msgFix, msgVar)
-            return S_ERROR(msgFix + msgVar)
-          if retVal['Value']:
-            self.log.info("Extracted job %s with prio %s from TQ %s" % (jobId, prio, tqId))
-            return S_OK({'matchFound': True, 'jobId': jobId, 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
+          return retVal
+        if retVal['Value']:
+          self.log.info("Extracted job %s with prio %s from TQ %s" % (retVal['Value'], prio, tqId))
+          return S_OK({'matchFound': True, 'jobId': retVal['Value'], 'taskQueueId': tqId, 'tqMatch': tqMatchDict})
         self.log.info("No jobs could be extracted from TQ %s" % tqId)
     if noJobsFound:
       return S_OK({'matchFound': False, 'tqMatch': tqMatchDict})
@@ -554,6 +547,175 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
     return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
 
+  def matchAndGetJobs(self, tqMatchDict, maxJobs, numQueuesPerTry=10, negativeCond=None):
+    """
+    Match several jobs at once, for resources with many slots. The jobs of each matching task queue
+    are taken out in a single transaction, the ones with the highest priority first
+      Returns S_OK( { 'matchFound': bool, 'jobs': [ ( jobId, tqId ) ], 'tqMatch': tqMatchDict } ) / S_ERROR
+    """
+    if 'JobID' in tqMatchDict:
+      # A certain JobID is required by the resource, there is only one job to get
+      retVal = self.matchAndGetJob(tqMatchDict)
+      if not retVal['OK'] or not retVal['Value']['matchFound']:
+        return retVal
+      matchDict = retVal['Value']
+      return S_OK({'matchFound': True, 'jobs': [(matchDict['jobId'], matchDict['taskQueueId'])],
+                   'tqMatch': matchDict['tqMatch']})
+    if negativeCond is None:
+      negativeCond = {}
+    # Make a copy to avoid modification of original if escaping needs to be done
+    tqMatchDict = dict(tqMatchDict)
+    retVal = self._checkMatchDefinition(tqMatchDict)
+    if not retVal['OK']:
+      self.log.error("TQ match request check failed", retVal['Message'])
+      return retVal
+    retVal = self._getConnection()
+    if not retVal['OK']:
+      return S_ERROR("Can't connect to DB: %s" % retVal['Message'])
+    connObj = retVal['Value']
+    retVal = self.matchAndGetTaskQueue(tqMatchDict,
+                                       numQueuesToGet=numQueuesPerTry,
+                                       skipMatchDictDef=True,
+                                       negativeCond=negativeCond,
+                                       connObj=connObj)
+    if not retVal['OK']:
+      return retVal
+    jobs = []
+    for tqId, tqOwnerDN, tqOwnerGroup in retVal['Value']:
+      self.log.info("Trying to extract %s jobs from TQ %s" % (maxJobs - len(jobs), tqId))
+      retVal = self.__extractJobs(tqId, maxJobs - len(jobs), connObj=connObj)
+      if not retVal['OK']:
+        if not jobs:
+          return retVal
+        # The jobs already taken out have to be given to the resource
+        self.log.error("Could not take jobs out from TQ %s" % tqId, retVal['Message'])
+        break
+      # Remove the task queue later if it is now empty
+      self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+      jobs.extend([(jobId, tqId) for jobId in retVal['Value']])
+      if len(jobs) >= maxJobs:
+        break
+    self.log.info("Extracted %s jobs" % len(jobs))
+    return S_OK({'matchFound': bool(jobs), 'jobs': jobs, 'tqMatch': tqMatchDict})
+
+  def __extractJobs(self, tqId, numJobs, connObj=False):
+    """ Take out up to numJobs jobs from a task queue in a transaction. The selected rows are locked,
+        so concurrent matchers wait and then get other jobs
+
+        :return: S_OK( list of jobIds ) / S_ERROR
+    """
+    retVal = self._query("START TRANSACTION", conn=connObj)
+    if not retVal['OK']:
+      return retVal
+    retVal = self._query("SELECT JobId FROM `tq_Jobs` WHERE TQId = %s \
+ORDER BY Priority DESC, JobId ASC LIMIT %s FOR UPDATE", conn=connObj, params=(tqId, int(numJobs)))
+    if retVal['OK']:
+      jobIds = [row[0] for row in retVal['Value']]
+      if jobIds:
+        retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId in ( %s )" %
+                              ", ".join([str(int(jobId)) for jobId in jobIds]), conn=connObj)
+    if not retVal['OK']:
+      self._query("ROLLBACK", conn=connObj)
+      return S_ERROR("Could not take jobs out from the TQ %s: %s" % (tqId, retVal['Message']))
+    retVal = self._query("COMMIT", conn=connObj)
+    if not retVal['OK']:
+      return S_ERROR("Could not take jobs out from the TQ %s: %s" % (tqId, retVal['Message']))
+    return S_OK(jobIds)
+
+  def __extractJob(self, jobSQL, jobSQLParams, tqInfo, connObj=False):
+    """ Take out of its TQ one of the jobs selected by jobSQL. Candidates are tried in random order
+        until one of them is actually deleted, so that concurrent matchers never get the same job
+
+        :param str jobSQL: query returning the JobId of the candidate jobs
+        :param tuple jobSQLParams: parameters of jobSQL
+        :param tuple tqInfo: TQId, OwnerDN and OwnerGroup of the task queue
+        :return: S_OK( jobId ) / S_OK( False ) if no job could be extracted / S_ERROR
+    """
+    tqId = tqInfo[0]
+    retVal = self._query(jobSQL, conn=connObj, params=jobSQLParams)
+    if not retVal['OK']:
+      return S_ERROR("Can't begin transaction for matching job: %s" % retVal['Message'])
+    jobList = [row[0] for row in retVal['Value']]
+    if not jobList:
+      gLogger.info("Task queue %s seems to be empty, triggering a cleaning" % tqId)
+      self.__deleteTQWithDelay.add(tqId, 300, tqInfo)
+    while jobList:
+      jobId = jobList.pop(random.randint(0, len(jobList) - 1))
+      self.log.info("Trying to extract job %s from TQ %s" % (jobId, tqId))
+      retVal = self.deleteJob(jobId, connObj=connObj)
+      if not retVal['OK']:
+        msgFix = "Could not take job"
+        msgVar = " %s out from the TQ %s: %s" % (jobId, tqId, retVal['Message'])
+        self.log.error(msgFix, msgVar)
+        return S_ERROR(msgFix + msgVar)
+      if retVal['Value']:
+        return S_OK(jobId)
+    return S_OK(False)
+
+  def extractJob(self, tqInfo, priority, numJobsPerTry=50):
+    """ Take out a job with the given priority from a task queue, used by the Matcher
+        when the task queue and the priority have already been chosen (see TaskQueueIndex)
+
+        :param tuple tqInfo: TQId, OwnerDN and OwnerGroup of the task queue
+        :param int priority: priority of the job to extract
+        :param int numJobsPerTry: maximum number of candidate jobs
+        :return: S_OK( jobId ) / S_OK( False ) if no job could be extracted / S_ERROR
+    """
+    jobSQL = "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s \
+ORDER BY `tq_Jobs`.JobId ASC LIMIT %s"
+    retVal = self._getConnection()
+    if not retVal['OK']:
+      return S_ERROR("Can't connect to DB: %s" % retVal['Message'])
+    return self.__extractJob(jobSQL, (tqInfo[0], priority, int(numJobsPerTry)), tuple(tqInfo),
+                             connObj=retVal['Value'])
+
+  def getTaskQueuesSummary(self):
+    """ Get the priority of all the task queues, and the number of jobs per task queue and priority
+
+        :return: S_OK( ( { tqId: ( Priority, Enabled ) }, { tqId: [ ( Priority, RealPriority, jobs ) ] } ) )
+    """
+    retVal = self._query("SELECT TQId, Priority, Enabled FROM `tq_TaskQueues`")
+    if not retVal['OK']:
+      return retVal
+    tqDict = dict((row[0], (row[1], row[2])) for row in retVal['Value'])
+    retVal = self._query("SELECT TQId, Priority, RealPriority, COUNT( JobId ) FROM `tq_Jobs` \
+GROUP BY TQId, Priority, RealPriority")
+    if not retVal['OK']:
+      return retVal
+    jobsDict = {}
+    for tqId, priority, realPriority, numJobs in retVal['Value']:
+      jobsDict.setdefault(tqId, []).append((priority, realPriority, numJobs))
+    return S_OK((tqDict, jobsDict))
+
+  def getTaskQueueDefinitions(self, tqIdList):
+    """ Get the definition of the given task queues, with unescaped values
+
+        :param list tqIdList: TQIds
+        :return: S_OK( { tqId: definition dict } ), the multi value fields contain sets
+    """
+    if not tqIdList:
+      return S_OK({})
+    tqIdString = ", ".join([str(int(tqId)) for tqId in tqIdList])
+    retVal = self._query("SELECT TQId, Priority, %s FROM `tq_TaskQueues` WHERE TQId in ( %s )" %
+                         (", ".join(singleValueDefFields), tqIdString))
+    if not retVal['OK']:
+      return retVal
+    tqDefs = {}
+    for row in retVal['Value']:
+      tqDef = dict(zip(singleValueDefFields, row[2:]))
+      tqDef['Priority'] = row[1]
+      for field in multiValueDefFields:
+        tqDef[field] = set()
+      tqDefs[row[0]] = tqDef
+    for field in multiValueDefFields:
+      retVal = self._query("SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId in ( %s )" % (field, tqIdString))
+      if not retVal['OK']:
+        return retVal
+      for tqId, value in retVal['Value']:
+        if tqId in tqDefs:
+          tqDefs[tqId][field].add(value)
+    return S_OK(tqDefs)
+
   def matchAndGetTaskQueue(self, tqMatchDict, numQueuesToGet=1, skipMatchDictDef=False,
                            negativeCond=None, connObj=False):
     """ Get a queue that matches the requirements
@@ -802,8 +964,8 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     retVal = self._query(
         "SELECT t.TQId, t.OwnerDN, t.OwnerGroup \
 FROM `tq_TaskQueues` t, `tq_Jobs` j \
-WHERE j.JobId = %s AND t.TQId = j.TQId" %
-        jobId, conn=connObj)
+WHERE j.JobId = %s AND t.TQId = j.TQId",
+        conn=connObj, params=(jobId,))
     if not retVal['OK']:
       return S_ERROR("Could not get job from task queue %s: %s" % (jobId, retVal['Message']))
     data = retVal['Value']
@@ -811,7 +973,7 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       return S_OK(False)
     tqId, tqOwnerDN, tqOwnerGroup = data[0]
     self.log.info("Deleting job %s" % jobId)
-    retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId = %s" % jobId, conn=connObj)
+    retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId = %s", conn=connObj, params=(jobId,))
     if not retVal['OK']:
       return S_ERROR("Could not delete job from task queue %s: %s" % (jobId, retVal['Message']))
     if retVal['Value'] == 0:
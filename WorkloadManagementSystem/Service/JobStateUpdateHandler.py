@@ -229,6 +229,7 @@ class JobStateUpdateHandler(RequestHandler):
       result = jobDB.setStartExecTime(jobID, startDate)
 
     # Update the JobLoggingDB records
+    records = []
     for date in dates:
       sDict = statusDict[date]
       status = sDict['Status']
@@ -241,7 +242,9 @@ class JobStateUpdateHandler(RequestHandler):
       if not application:
         application = 'idem'
       source = sDict['Source']
-      result = logDB.addLoggingRecord(jobID, status, minor, application, date, source)
+      records.append((jobID, status, minor, application, date, source))
+    if records:
+      result = logDB.addLoggingRecords(records)
       if not result['OK']:
         return result
 
@@ -9,7 +9,7 @@ __RCSID__ = "$Id$"
 from DIRAC import gLogger, S_OK, S_ERROR
 
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
@@ -20,10 +20,12 @@ from DIRAC.WorkloadManagementSystem.DB.PilotAgentsDB import PilotAgentsDB
 
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
 from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
+from DIRAC.WorkloadManagementSystem.Client.TaskQueueIndex import TaskQueueIndex
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
 gJobDB = False
 gTaskQueueDB = False
+gTaskQueueIndex = None
 
 
 def initializeMatcherHandler(serviceInfo):
@@ -32,6 +34,7 @@ def initializeMatcherHandler(serviceInfo):
 
   global gJobDB
   global gTaskQueueDB
+  global gTaskQueueIndex
   global jlDB
   global pilotAgentsDB
 
@@ -55,6 +58,13 @@ def initializeMatcherHandler(serviceInfo):
 
   sendNumTaskQueues()
 
+  # Optionally match the jobs in memory, see TaskQueueIndex
+  if getServiceOption(serviceInfo, 'UseTaskQueueIndex', False):
+    refreshPeriod = getServiceOption(serviceInfo, 'TaskQueueIndexRefreshPeriod', 10)
+    gTaskQueueIndex = TaskQueueIndex(gTaskQueueDB, maxAge=6 * refreshPeriod)
+    gTaskQueueIndex.refresh()
+    gThreadScheduler.addPeriodicTask(refreshPeriod, gTaskQueueIndex.refresh)
+
   return S_OK()
 
 
@@ -88,7 +98,8 @@ class MatcherHandler(RequestHandler):
                         jobDB=gJobDB,
                         tqDB=gTaskQueueDB,
                         jlDB=jlDB,
-                        opsHelper=opsHelper)
+                        opsHelper=opsHelper,
+                        tqIndex=gTaskQueueIndex)
       result = matcher.selectJob(resourceDescription, credDict)
     except RuntimeError as rte:
       self.log.error("Error requesting job: ", rte)
@@ -102,6 +113,42 @@ class MatcherHandler(RequestHandler):
     # FIXME: This is correctly interpreted by the JobAgent, but DErrno should be used instead
     return S_ERROR("No match found")
 
+##############################################################################
+  types_requestJobs = [[basestring, dict], (int, long)]
+
+  def export_requestJobs(self, resourceDescription, maxJobs):
+    """ Serve up to maxJobs jobs at once to an agent with several slots,
+        see export_requestJob. The value is a list of job descriptions
+
+        maxJobs is limited by JobScheduling/MaxJobsPerRequest. The jobs are matched by
+        TaskQueueDB.matchAndGetJobs, which takes them out of each task queue in a single
+        transaction: the TaskQueueIndex only matches one job at a time, so it is not used here
+    """
+    if maxJobs < 1:
+      return S_ERROR("The number of jobs to match has to be positive")
+
+    resourceDescription['Setup'] = self.serviceInfoDict['clientSetup']
+    credDict = self.getRemoteCredentials()
+
+    try:
+      opsHelper = Operations(group=credDict['group'])
+      maxJobs = min(maxJobs, opsHelper.getValue("JobScheduling/MaxJobsPerRequest", 100))
+      matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
+                        jobDB=gJobDB,
+                        tqDB=gTaskQueueDB,
+                        jlDB=jlDB,
+                        opsHelper=opsHelper)
+      result = matcher.selectJobs(resourceDescription, credDict, maxJobs)
+    except RuntimeError as rte:
+      self.log.error("Error requesting jobs: ", rte)
+      return S_ERROR("Error requesting jobs")
+
+    gMonitor.addMark("matchesDone")
+    if result:
+      gMonitor.addMark("matchesOK", len(result))
+      return S_OK(result)
+    return S_ERROR("No match found")
+
 ##############################################################################
   types_getActiveTaskQueues = []
 
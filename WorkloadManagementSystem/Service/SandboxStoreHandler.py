@@ -48,6 +48,8 @@ class SandboxStoreHandler(RequestHandler):
       self.__useLocalStorage = False
       self.__externalSEName = self.__backend
       self.__seNameToUse = self.__backend
+    # Store the sandboxes with the same content once, whoever uploaded them
+    self.__contentAddressed = self.__useLocalStorage and self.getCSOption("ContentAddressedStorage", False)
     # Execute the purge once every 1000 calls
     SandboxStoreHandler.__purgeCount += 1
     if SandboxStoreHandler.__purgeCount > self.getCSOption("QueriesBeforePurge", 1000):
@@ -69,6 +71,44 @@ class SandboxStoreHandler(RequestHandler):
     pathItems.extend([md5[0:3], md5[3:6], md5])
     return os.path.join(*pathItems)
 
+  @staticmethod
+  def __getContentPath(md5):
+    """ Generate the path of the sandbox content, shared by all the users,
+        in the store-wide content-addressed layout
+    """
+    return os.path.join("/", "SandBox", "Content", md5[0:3], md5[3:6], md5)
+
+  @staticmethod
+  def __splitFileId(fileId):
+    """ Split the file id of a sandbox into its hash and extension
+    """
+    extPos = fileId.find(".tar")
+    if extPos > -1:
+      return fileId[:extPos], fileId[extPos + 1:]
+    return fileId, ""
+
+  types_exists = [basestring]
+
+  def export_exists(self, fileId):
+    """ Check if a sandbox is already stored and accessible by the requester,
+        such that there is no need to upload it
+
+        :param str fileId: "<hash>.<extension>", as for its upload
+        :return: S_OK( sandbox URL ), S_OK( None ) if it doesn't exist
+    """
+    aHash, extension = self.__splitFileId(fileId)
+    sbPath = self.__getSandboxPath("%s.%s" % (aHash, extension))
+    result = self.__generateLocation(sbPath)
+    if not result['OK']:
+      return result
+    seName, sePFN = result['Value']
+    credDict = self.getRemoteCredentials()
+    result = sandboxDB.getSandboxId(seName, sePFN, credDict['username'], credDict['group'])
+    if not result['OK']:
+      return S_OK(None)
+    sandboxDB.accessedSandboxById(result['Value'])
+    return S_OK("SB:%s|%s" % (seName, sePFN))
+
   def transfer_fromClient(self, fileId, token, fileSize, fileHelper):
     """
     Receive a file as a sandbox
@@ -87,13 +127,7 @@ class SandboxStoreHandler(RequestHandler):
     else:
       assignTo = {}
 
-    extPos = fileId.find(".tar")
-    if extPos > -1:
-      extension = fileId[extPos + 1:]
-      aHash = fileId[:extPos]
-    else:
-      extension = ""
-      aHash = fileId
+    aHash, extension = self.__splitFileId(fileId)
     gLogger.info("Upload requested for %s [%s]" % (aHash, extension))
 
     credDict = self.getRemoteCredentials()
@@ -131,6 +165,8 @@ class SandboxStoreHandler(RequestHandler):
       self.__secureUnlinkFile(hdPath)
       gLogger.error("Hashes don't match! Client defined hash is different with received data hash!")
       return S_ERROR("Hashes don't match!")
+    if self.__contentAddressed:
+      self.__shareContent(hdPath, sbPath)
     # If using remote storage, copy there!
     if not self.__useLocalStorage:
       gLogger.info("Uploading sandbox to external storage")
@@ -255,6 +291,23 @@ class SandboxStoreHandler(RequestHandler):
       return result
     return S_OK(destFileName)
 
+  def __shareContent(self, hdPath, sbPath):
+    """ Make the sandbox file and its content in the content-addressed layout the same file,
+        such that the sandboxes uploaded by different users are stored once
+    """
+    contentPath = self.__sbToHDPath(self.__getContentPath(os.path.basename(sbPath)))
+    try:
+      if not os.path.isfile(contentPath):
+        mkDir(os.path.dirname(contentPath))
+        os.link(hdPath, contentPath)
+      elif not os.path.samefile(contentPath, hdPath):
+        # Replace the sandbox by a link to the already stored content
+        tmpPath = "%s.link" % hdPath
+        os.link(contentPath, tmpPath)
+        os.rename(tmpPath, hdPath)
+    except OSError as e:
+      gLogger.warn("Cannot share the sandbox content", "%s: %s" % (hdPath, repr(e).replace(',)', ')')))
+
   def __secureUnlinkFile(self, filePath):
     try:
       os.unlink(filePath)
@@ -459,22 +512,35 @@ class SandboxStoreHandler(RequestHandler):
         os.unlink(hdPath)
       except Exception as e:
         gLogger.error("Cannot delete local sandbox", "%s : %s" % (hdPath, repr(e).replace(',)', ')')))
-      while hdPath:
-        hdPath = os.path.dirname(hdPath)
-        gLogger.info("Checking if dir %s is empty" % hdPath)
-        try:
-          if not os.path.isdir(hdPath):
-            break
-          if os.listdir(hdPath):
-            break
-          gLogger.info("Trying to clean dir %s" % hdPath)
-          # Empty dir!
-          os.rmdir(hdPath)
-        except Exception as e:
-          gLogger.error("Cannot clean directory", "%s : %s" % (hdPath, repr(e).replace(',)', ')')))
-          break
+      self.__cleanEmptyDirs(hdPath)
+      # Delete the content in the content-addressed layout once no sandbox refers to it anymore
+      contentPath = self.__sbToHDPath(self.__getContentPath(os.path.basename(SEPFN)))
+      try:
+        if os.path.isfile(contentPath) and os.stat(contentPath).st_nlink == 1:
+          os.unlink(contentPath)
+          self.__cleanEmptyDirs(contentPath)
+      except OSError as e:
+        gLogger.error("Cannot delete sandbox content", "%s : %s" % (contentPath, repr(e).replace(',)', ')')))
     return S_OK()
 
+  def __cleanEmptyDirs(self, hdPath):
+    """ Remove the parent directories of a deleted file, as long as they are empty
+    """
+    while hdPath:
+      hdPath = os.path.dirname(hdPath)
+      gLogger.info("Checking if dir %s is empty" % hdPath)
+      try:
+        if not os.path.isdir(hdPath):
+          break
+        if os.listdir(hdPath):
+          break
+        gLogger.info("Trying to clean dir %s" % hdPath)
+        # Empty dir!
+        os.rmdir(hdPath)
+      except Exception as e:
+        gLogger.error("Cannot clean directory", "%s : %s" % (hdPath, repr(e).replace(',)', ')')))
+        break
+
   def __deleteSandboxFromExternalBackend(self, SEName, SEPFN):
     if self.getCSOption("DelayedExternalDeletion", True):
       gLogger.info("Setting deletion request")
@@ -0,0 +1,50 @@
+""" Unit tests for the bulk matching of the MatcherHandler
+"""
+
+# pylint: disable=protected-access
+
+import pytest
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.Service.MatcherHandler import MatcherHandler
+
+__RCSID__ = "$Id$"
+
+
+@pytest.fixture
+def matcher(mocker):
+  """ Matcher class as used by the handler, matching a single job whatever the request
+  """
+  for dbName in ('jlDB', 'pilotAgentsDB'):
+    # Only set by initializeMatcherHandler
+    mocker.patch('DIRAC.WorkloadManagementSystem.Service.MatcherHandler.%s' % dbName, create=True)
+  mocker.patch('DIRAC.WorkloadManagementSystem.Service.MatcherHandler.gMonitor')
+  operations = mocker.patch('DIRAC.WorkloadManagementSystem.Service.MatcherHandler.Operations')
+  operations.return_value.getValue.side_effect = lambda optName, default=None: {
+      'JobScheduling/MaxJobsPerRequest': 10}.get(optName, default)
+  matcherClass = mocker.patch('DIRAC.WorkloadManagementSystem.Service.MatcherHandler.Matcher')
+  matcherClass.return_value.selectJobs.return_value = [{'JobID': 1}]
+  return matcherClass
+
+
+def _handler(mocker):
+  handler = MatcherHandler.__new__(MatcherHandler)
+  handler.serviceInfoDict = {'clientSetup': 'Test'}
+  mocker.patch.object(handler, 'getRemoteCredentials', return_value={'group': 'dirac_pilot'})
+  return handler
+
+
+@pytest.mark.parametrize('maxJobs, matched', [(5, 5), (10, 10), (500, 10)])
+def test_requestJobs(mocker, matcher, maxJobs, matched):
+  result = _handler(mocker).export_requestJobs({'Site': 'DIRAC.Site.org'}, maxJobs)
+
+  assert result == S_OK([{'JobID': 1}])
+  resourceDescription, credDict, maxJobs = matcher.return_value.selectJobs.call_args[0]
+  assert resourceDescription == {'Site': 'DIRAC.Site.org', 'Setup': 'Test'}
+  assert credDict == {'group': 'dirac_pilot'}
+  assert maxJobs == matched
+
+
+def test_requestJobsNotPositive(mocker, matcher):
+  assert not _handler(mocker).export_requestJobs({}, 0)['OK']
+  matcher.assert_not_called()
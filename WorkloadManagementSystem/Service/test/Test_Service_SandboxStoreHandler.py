@@ -0,0 +1,185 @@
+""" Unit tests for the content-addressed storage of the SandboxStoreHandler
+"""
+
+# pylint: disable=protected-access
+
+import os
+import hashlib
+
+import pytest
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.Service.SandboxStoreHandler import SandboxStoreHandler
+
+__RCSID__ = "$Id$"
+
+SB_DATA = "sandbox content"
+SB_HASH = hashlib.md5(SB_DATA).hexdigest()
+SB_FILEID = "%s.tar.bz2" % SB_HASH
+
+
+class FakeSandboxDB(object):
+  """ Sandboxes registered by owner, in memory
+  """
+
+  def __init__(self):
+    self.sandboxes = {}
+    # Owners of the sandboxes reported as unused
+    self.purgeOwners = []
+
+  def getSandboxId(self, seName, sePFN, owner, group):
+    sbId = self.sandboxes.get((seName, sePFN, owner, group))
+    if sbId is None:
+      return S_ERROR("No sandbox matches the requirements")
+    return S_OK(sbId)
+
+  def registerAndGetSandbox(self, owner, _ownerDN, group, seName, sePFN, _size):
+    sbId = len(self.sandboxes) + 1
+    self.sandboxes[(seName, sePFN, owner, group)] = sbId
+    return S_OK((sbId, True))
+
+  def accessedSandboxById(self, _sbId):
+    return S_OK()
+
+  def assignSandboxesToEntities(self, *_args):
+    return S_OK()
+
+  def getUnusedSandboxes(self):
+    return S_OK([(sbId, key[0], key[1]) for key, sbId in self.sandboxes.items() if key[2] in self.purgeOwners])
+
+  def deleteSandboxes(self, sbIds):
+    for key, sbId in self.sandboxes.items():
+      if sbId in sbIds:
+        del self.sandboxes[key]
+    return S_OK()
+
+
+class FakeFileHelper(object):
+  """ Transfer of some data, as received from the client
+  """
+
+  def __init__(self, data):
+    self.data = data
+
+  def networkToDataSink(self, fd, maxFileSize=0):
+    fd.write(self.data)
+    return S_OK()
+
+  def getHash(self):
+    return hashlib.md5(self.data).hexdigest()
+
+  def getTransferedBytes(self):
+    return len(self.data)
+
+  def markAsTransferred(self):
+    pass
+
+
+@pytest.fixture
+def sandboxDB(mocker):
+  return mocker.patch('DIRAC.WorkloadManagementSystem.Service.SandboxStoreHandler.sandboxDB', FakeSandboxDB())
+
+
+@pytest.fixture
+def basePath(tmpdir, mocker, sandboxDB):
+  """ Sandbox store on a temporary directory, with a marker so that it is never empty
+  """
+  # No purge started by initialize
+  mocker.patch.object(SandboxStoreHandler, '_SandboxStoreHandler__purgeCount', 1)
+  tmpdir.join('marker').write('')
+  return str(tmpdir)
+
+
+@pytest.fixture
+def handlerFor(basePath, mocker):
+  """ Build handlers serving the given user
+  """
+  options = {'BasePath': basePath, 'ContentAddressedStorage': True}
+
+  def _handlerFor(userName):
+    handler = SandboxStoreHandler.__new__(SandboxStoreHandler)
+    handler.serviceInfoDict = {'clientSetup': 'Test'}
+    mocker.patch.object(handler, 'getCSOption', side_effect=lambda optName, default=None: options.get(optName, default))
+    mocker.patch.object(handler, 'getRemoteCredentials',
+                        return_value={'username': userName, 'group': 'dirac_user', 'DN': '/CN=%s' % userName,
+                                      'properties': []})
+    handler.initialize()
+    return handler
+
+  return _handlerFor
+
+
+def _sbPath(basePath, userName):
+  idField = "%s.dirac_user" % userName
+  return os.path.join(basePath, "SandBox", idField[0], idField, SB_HASH[0:3], SB_HASH[3:6], SB_FILEID)
+
+
+def _contentPath(basePath):
+  return os.path.join(basePath, "SandBox", "Content", SB_HASH[0:3], SB_HASH[3:6], SB_FILEID)
+
+
+def _upload(handler):
+  result = handler.transfer_fromClient(SB_FILEID, "token", len(SB_DATA), FakeFileHelper(SB_DATA))
+  assert result['OK'], result
+  return result['Value']
+
+
+def test_firstUpload(basePath, handlerFor):
+  sbURL = _upload(handlerFor('alice'))
+
+  sbPath = _sbPath(basePath, 'alice')
+  assert sbURL == "SB:SandboxSE|%s" % sbPath[len(basePath):]
+  assert open(sbPath).read() == SB_DATA
+  assert os.path.samefile(sbPath, _contentPath(basePath))
+  assert os.stat(sbPath).st_nlink == 2
+
+
+def test_sameContentUpload(basePath, handlerFor):
+  _upload(handlerFor('alice'))
+  _upload(handlerFor('bob'))
+
+  contentPath = _contentPath(basePath)
+  assert os.path.samefile(_sbPath(basePath, 'bob'), contentPath)
+  assert os.path.samefile(_sbPath(basePath, 'alice'), contentPath)
+  assert os.stat(contentPath).st_nlink == 3
+  assert open(_sbPath(basePath, 'bob')).read() == SB_DATA
+  # No temporary link left behind
+  assert os.listdir(os.path.dirname(_sbPath(basePath, 'bob'))) == [SB_FILEID]
+
+
+def test_purgeOneOwner(basePath, handlerFor, sandboxDB):
+  handler = handlerFor('alice')
+  _upload(handler)
+  _upload(handlerFor('bob'))
+  sandboxDB.purgeOwners = ['alice']
+
+  assert handler.purgeUnusedSandboxes()['OK']
+
+  assert not os.path.exists(_sbPath(basePath, 'alice'))
+  assert not os.path.exists(os.path.join(basePath, "SandBox", "a"))
+  assert open(_sbPath(basePath, 'bob')).read() == SB_DATA
+  assert os.path.samefile(_sbPath(basePath, 'bob'), _contentPath(basePath))
+  assert os.stat(_contentPath(basePath)).st_nlink == 2
+
+
+def test_purgeLastOwner(basePath, handlerFor, sandboxDB):
+  handler = handlerFor('alice')
+  _upload(handler)
+  _upload(handlerFor('bob'))
+  sandboxDB.purgeOwners = ['alice']
+  assert handler.purgeUnusedSandboxes()['OK']
+  sandboxDB.purgeOwners = ['bob']
+  assert handler.purgeUnusedSandboxes()['OK']
+
+  assert not sandboxDB.sandboxes
+  assert not os.path.exists(_contentPath(basePath))
+  # All the directories emptied by the purge are removed
+  assert os.listdir(basePath) == ['marker']
+
+
+def test_exists(basePath, handlerFor):
+  sbURL = _upload(handlerFor('alice'))
+
+  assert handlerFor('alice').export_exists(SB_FILEID) == S_OK(sbURL)
+  assert handlerFor('bob').export_exists(SB_FILEID) == S_OK(None)
+  assert handlerFor('alice').export_exists("%s.tar.gz" % SB_HASH) == S_OK(None)
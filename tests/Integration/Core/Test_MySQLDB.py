@@ -89,6 +89,25 @@ try:
   assert RESULT['OK']
   assert len( RESULT['Value'] ) == 10
 
+  RESULT = TESTDB._queryIter( 'SELECT `Count` FROM `%s` ORDER BY `Count`' % NAME, batchSize = 30 )
+  assert RESULT['OK']
+  BATCHES = list( RESULT['Value'] )
+  assert [len( batch ) for batch in BATCHES] == [30, 30, 30, 10]
+  assert [row[0] for batch in BATCHES for row in batch] == range( 100 )
+
+  RESULT = TESTDB.getFieldsIter( NAME, ['Count'], COND10, orderAttribute = 'Count:DESC', batchSize = 4 )
+  assert RESULT['OK']
+  assert next( RESULT['Value'] ) == ( ( 9, ), ( 8, ), ( 7, ), ( 6, ) )
+  # The rows left are discarded and the connection can be used again
+  RESULT['Value'].close()
+
+  RESULT = TESTDB.getFields( NAME, ['Count'], orderAttribute = 'Count:DESC', limit = 1 )
+  assert RESULT['OK']
+  assert RESULT['Value'] == ( ( 99, ), )
+
+  RESULT = TESTDB._queryIter( 'SELECT `NotAField` FROM `%s`' % NAME )
+  assert not RESULT['OK']
+
   RESULT = TESTDB.getFields( NAME, limit = 1 )
   assert RESULT['OK']
   assert len( RESULT['Value'] ) == 1
@@ -161,6 +180,38 @@ try:
   assert RESULT['OK']
   assert RESULT['Value'] == 2
 
+  print 'Bulk inserting'
+
+  RESULT = TESTDB.insertFieldsBulk( NAME, ['ID', 'Name', 'Count'], [[J + 1, 'Name"%d' % J, J] for J in range( 1000 )] )
+  assert RESULT['OK']
+  assert sum( RESULT['Value'] ) == 1000
+
+  RESULT = TESTDB.getFields( NAME, ['Name'], {'Count': 999} )
+  assert RESULT['OK']
+  assert RESULT['Value'] == ( ( 'Name"999', ), )
+
+  RESULT = TESTDB.upsertFieldsBulk( NAME, ['ID', 'Surname'], inDict = {'Count': [0, 1000]},
+                                    inValues = [[1, 'Surn2'], [1001, 'Surn3']], updateFields = ['Surname'] )
+  assert RESULT['OK']
+  # 2 for the updated row, 1 for the inserted one
+  assert RESULT['Value'] == [3]
+
+  RESULT = TESTDB.getCounters( NAME, ['Surname'], COND0 )
+  assert RESULT['OK']
+  assert sorted( RESULT['Value'] ) == [( {'Surname': 'Surn2'}, 1L ), ( {'Surname': 'Surn3'}, 1L ),
+                                       ( {'Surname': 'Tu'}, 999L )]
+
+  RESULT = TESTDB.upsertFieldsBulk( NAME, ['ID', 'Count'], [[1, 5], [2, 5]], incrementFields = ['Count'] )
+  assert RESULT['OK']
+
+  RESULT = TESTDB.getFields( NAME, ['Count'], {'ID': [1, 2]}, orderAttribute = 'ID' )
+  assert RESULT['OK']
+  assert RESULT['Value'] == ( ( 5, ), ( 6, ) )
+
+  RESULT = TESTDB.deleteEntries( NAME )
+  assert RESULT['OK']
+  assert RESULT['Value'] == 1001
+
   print 'OK'
 
 except AssertionError:
@@ -102,6 +102,27 @@ class JobRescheduleCase(JobDBTestCase):
     self.assertEqual(result['Value'], 'Job Rescheduled')
 
 
+class JobsLastUpdateCase(JobDBTestCase):
+
+  def test_getJobsLastUpdate(self):
+
+    res = self.jobDB.insertNewJobIntoDB(jdl, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup')
+    self.assertTrue(res['OK'])
+    jobID = res['JobID']
+
+    res = self.jobDB.getJobsLastUpdate({'JobID': jobID})
+    self.assertTrue(res['OK'])
+    site, lastUpdate = res['Value'][jobID]
+    self.assertEqual(site, 'ANY')
+    self.assertTrue(lastUpdate)
+
+    res = self.jobDB.setHeartBeatData(jobID, {}, {'CPUConsumed': 1.})
+    self.assertTrue(res['OK'])
+    res = self.jobDB.getJobsLastUpdate({'Status': 'Running', 'JobID': jobID})
+    self.assertTrue(res['OK'])
+    self.assertTrue(res['Value'][jobID][1] >= lastUpdate)
+
+
 class CountJobsCase(JobDBTestCase):
 
   def test_getCounters(self):
@@ -114,5 +135,6 @@ if __name__ == '__main__':
 
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(JobSubmissionCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(JobRescheduleCase))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(JobsLastUpdateCase))
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CountJobsCase))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -56,6 +56,18 @@ class JobLoggingCase(JobLoggingDBTestCase):
 
     self.jlogDB.deleteJob(1)
 
+  def test_bulkLoggingRecords(self):
+
+    records = [(2, 'testing', 'Bulk %d' % i, 'idem', '2006-04-25 14:20:%02d' % i, 'Unittest')
+               for i in range(10)]
+    result = self.jlogDB.addLoggingRecords(records)
+    self.assertTrue(result['OK'])
+    result = self.jlogDB.getJobLoggingInfo(2)
+    self.assertTrue(result['OK'])
+    self.assertEqual([row[1] for row in result['Value']], ['Bulk %d' % i for i in range(10)])
+
+    self.jlogDB.deleteJob(2)
+
 
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(JobLoggingCase)
@@ -144,6 +144,32 @@ class TQTests(TQDBTestCase):
     result = self.tqDB.deleteTaskQueueIfEmpty(tq)
     self.assertTrue(result['OK'])
 
+  def test_matchAndGetJobs(self):
+    """ several jobs at once
+    """
+    tqDefDict = {'OwnerDN': '/my/DN', 'OwnerGroup': 'myGroup', 'Setup': 'aSetup', 'CPUTime': 50000}
+    for jobId, priority in ((201, 1), (202, 5), (203, 1)):
+      result = self.tqDB.insertJob(jobId, tqDefDict, priority)
+      self.assertTrue(result['OK'])
+
+    result = self.tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 300000}, 2)
+    self.assertTrue(result['OK'])
+    self.assertTrue(result['Value']['matchFound'])
+    # The highest priority first
+    self.assertEqual([jobId for jobId, _tq in result['Value']['jobs']], [202, 201])
+
+    result = self.tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 300000}, 2)
+    self.assertTrue(result['OK'])
+    self.assertEqual([jobId for jobId, _tq in result['Value']['jobs']], [203])
+    tq = result['Value']['jobs'][0][1]
+
+    result = self.tqDB.matchAndGetJobs({'Setup': 'aSetup', 'CPUTime': 300000}, 2)
+    self.assertTrue(result['OK'])
+    self.assertFalse(result['Value']['matchFound'])
+
+    result = self.tqDB.deleteTaskQueueIfEmpty(tq)
+    self.assertTrue(result['OK'])
+
 
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(TQDBTestCase)
@@ -0,0 +1,74 @@
+""" Micro benchmark comparing DEncode and BDEncode on payloads typical of DIRAC RPCs
+
+    Usage: python encodingPerf.py [number of repetitions]
+
+    For each payload, it prints the size of the encoded data and the best time
+    out of the repetitions for encoding and decoding with each codec.
+"""
+
+__RCSID__ = "$Id$"
+
+import sys
+import timeit
+import datetime
+
+from DIRAC.Core.Utilities import DEncode, BDEncode
+
+
+def bulkJobStatus(nJobs=10000):
+  """ Like the result of JobMonitoring.getJobsStatus / getJobsSummary
+  """
+  now = datetime.datetime.utcnow()
+  return {'OK': True,
+          'Value': dict((jobID, {'Status': 'Running',
+                                 'MinorStatus': 'Application',
+                                 'Site': 'LCG.CERN.cern',
+                                 'LastUpdateTime': now,
+                                 'CPUTime': 1234.5})
+                        for jobID in xrange(nJobs))}
+
+
+def replicaDict(nLFNs=100000):
+  """ Like the result of FileCatalog.getReplicas
+  """
+  ses = ['CERN-DST', 'CNAF-DST', 'GRIDKA-DST', 'IN2P3-DST']
+  successful = {}
+  for i in xrange(nLFNs):
+    lfn = '/lhcb/MC/2018/ALLSTREAMS.DST/00012345/0000/00012345_%08d_1.allstreams.dst' % i
+    successful[lfn] = dict((se, 'srm://%s.example.org:8443/srm/managerv2?SFN=/castor%s' % (se.lower(), lfn))
+                           for se in ses[:1 + i % len(ses)])
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': {}}}
+
+
+def rpcArguments():
+  """ Small proposal/arguments exchange, like a heartbeat
+  """
+  return {'OK': True, 'Value': (1234567, {'CPUConsumed': 123.4, 'MemoryUsed': 2048, 'LoadAverage': 0.5},
+                                {'Vsize': 1024L * 1024 * 1024}, [])}
+
+
+PAYLOADS = [('small RPC arguments', rpcArguments()),
+            ('10k job status', bulkJobStatus()),
+            ('100k LFN replicas', replicaDict())]
+
+CODECS = [('DEncode', DEncode), ('BDEncode', BDEncode)]
+
+
+def measure(func, repetitions):
+  return min(timeit.repeat(func, number=1, repeat=repetitions))
+
+
+def main(repetitions):
+  print "%-20s %-10s %12s %12s %12s" % ('Payload', 'Codec', 'Size (B)', 'Encode (ms)', 'Decode (ms)')
+  for payloadName, payload in PAYLOADS:
+    for codecName, codec in CODECS:
+      encoded = codec.encode(payload)
+      assert codec.decode(encoded)[0] == payload
+      encodeTime = measure(lambda: codec.encode(payload), repetitions)
+      decodeTime = measure(lambda: codec.decode(encoded), repetitions)
+      print "%-20s %-10s %12d %12.3f %12.3f" % (payloadName, codecName, len(encoded),
+                                                 encodeTime * 1000, decodeTime * 1000)
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
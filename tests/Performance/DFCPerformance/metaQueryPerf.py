@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+""" This script instantiate a DFC client against a given service,
+    and hammers it with metadata queries (findDirectoriesByMetadata) combining several
+    metadata keys, for a given time.
+    It produces two files : time.txt and clock.txt which contain time measurement,
+    using time.time and time.clock (see respective doc)
+    It assumes that the DB has been filled with the scripts in generateDB
+
+    When called with the 'setup' argument, it first defines the metadata fields and
+    tags the directories at depth metaDepth (this is to be done only once):
+
+      python metaQueryPerf.py setup
+
+    Tunable parameters:
+      * maxDuration : time it will run. Cannot be too long, otherwise job
+                      is killed because staled
+      * port: list of ports on which we can find a service (assumes all the service running on one machine)
+      * hostname: name of the host hosting the service
+      * metaDepth: depth of the directories that get the metadata
+      * subDirs: number of subdirectories per directory used when generating the db
+
+The depths are to be put in relation with the depths you used to generate the db
+"""
+
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+import os
+import sys
+import time
+import random
+import itertools
+
+from DIRAC.Resources.Catalog.FileCatalogClient import FileCatalogClient
+
+port = random.choice([9196, 9197, 9198, 9199])
+hostname = 'yourmachine.somewhere.something'
+servAddress = 'dips://%s:%s/DataManagement/FileCatalog' % (hostname, port)
+
+maxDuration = 1800  # 30mn
+
+# Between 0 and 3 because in generate we have 4 subdirs per dir. Adapt :-)
+subDirs = 4
+metaDepth = 3
+
+# Metadata fields with their type and the values they take
+metaFields = {'PerfYear': ('INT', range(2010, 2018)),
+              'PerfConfig': ('VARCHAR(128)', ['Sim09a', 'Sim09b', 'Sim09c', 'Reco15', 'Reco16']),
+              'PerfPolarity': ('VARCHAR(128)', ['MagUp', 'MagDown']),
+              'PerfEvtType': ('INT', range(10000000, 10000050))}
+
+fc = FileCatalogClient(servAddress)
+
+
+def metaForPath(digits):
+  """ Metadata values of a directory, derived from its path so that it can be regenerated
+  """
+  seed = int(''.join(map(str, digits)), subDirs)
+  return dict((meta, values[(seed * (i + 1)) % len(values)])
+              for i, (meta, (_type, values)) in enumerate(sorted(metaFields.items())))
+
+
+def setup():
+  """ Define the metadata fields and set them on the directories at depth metaDepth
+  """
+  for meta, (metaType, _values) in metaFields.items():
+    res = fc.addMetadataField(meta, metaType)
+    if not res['OK']:
+      print "Cannot add metadata field %s: %s" % (meta, res['Message'])
+  for digits in itertools.product(range(subDirs), repeat=metaDepth):
+    dirPath = '/' + '/'.join(map(str, digits))
+    res = fc.setMetadata(dirPath, metaForPath(digits))
+    if not res['OK']:
+      print "Cannot set metadata for %s: %s" % (dirPath, res['Message'])
+
+
+def randomQuery():
+  """ Query on 2 to 4 metadata keys, mixing single values, lists and comparisons
+  """
+  metaDict = metaForPath([random.randint(0, subDirs - 1) for _ in xrange(metaDepth)])
+  queryDict = {}
+  for meta in random.sample(sorted(metaDict), random.randint(2, len(metaDict))):
+    kind = random.randint(0, 2)
+    if kind == 0:
+      queryDict[meta] = metaDict[meta]
+    elif kind == 1:
+      queryDict[meta] = random.sample(metaFields[meta][1], 2) + [metaDict[meta]]
+    elif isinstance(metaDict[meta], int):
+      queryDict[meta] = {'>=': metaDict[meta]}
+    else:
+      queryDict[meta] = {'in': [metaDict[meta]]}
+  return queryDict
+
+
+if len(sys.argv) > 1 and sys.argv[1] == 'setup':
+  setup()
+
+f = open('time.txt', 'w')
+f2 = open('clock.txt', 'w')
+f.write("QueryStart\tQueryEnd\tQueryTime\textra(port %s)\n" % port)
+f2.write("QueryStart\tQueryEnd\tQueryClock\textra(port %s)\n" % port)
+
+start = time.time()
+
+done = False
+
+while not done:
+  queryDict = randomQuery()
+  before = time.time()
+  beforeC = time.clock()
+  res = fc.findDirectoriesByMetadata(queryDict, '/')
+  afterC = time.clock()
+  after = time.time()
+  queryTime = after - before
+  queryTimeC = afterC - beforeC
+  if not res['OK']:
+    extra = res['Message']
+  else:
+    extra = "%s %s" % (len(queryDict), len(res['Value']))
+
+  f.write("%s\t%s\t%s\t%s\n" % (before, after, queryTime, extra))
+  f.flush()
+  os.fsync(f)
+  f2.write("%s\t%s\t%s\t%s\n" % (beforeC, afterC, queryTimeC, extra))
+  f2.flush()
+  os.fsync(f2)
+  if (time.time() - start > maxDuration):
+    done = True
+
+f.close()
+f2.close()
@@ -0,0 +1,103 @@
+""" Micro benchmark comparing queries built with _escapeString and string formatting
+    to parameterized queries, as done by the hot queries of JobDB, TaskQueueDB and
+    the FileCatalog directory tree
+
+    Usage: python queryPerf.py <host> <user> <password> <db> [number of queries]
+
+    The database must exist, a table PerfTestTable is created in it and removed at the end.
+    For each kind of query, it prints the time per query in microseconds.
+"""
+
+__RCSID__ = "$Id$"
+
+import sys
+import time
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+TABLE = 'PerfTestTable'
+TABLEDICT = {TABLE: {'Fields': {'ID': 'INTEGER NOT NULL AUTO_INCREMENT',
+                                'Name': 'VARCHAR(255) NOT NULL',
+                                'Status': "VARCHAR(32) NOT NULL DEFAULT 'Waiting'",
+                                'Site': "VARCHAR(100) NOT NULL DEFAULT 'ANY'",
+                                'Owner': "VARCHAR(32) NOT NULL DEFAULT 'Unknown'"},
+                     'PrimaryKey': 'ID',
+                     'Indexes': {'Name': ['Name']}}}
+FIELDS = ['ID', 'Name', 'Status', 'Site', 'Owner']
+
+
+def escapedByName(db, name):
+  """ Like DirectoryLevelTree.findDir before using parameters
+  """
+  result = db._escapeString(name)
+  if not result['OK']:
+    return result
+  return db._query("SELECT ID FROM %s WHERE Name=%s" % (TABLE, result['Value']))
+
+
+def parameterizedByName(db, name):
+  return db._query("SELECT ID FROM %s WHERE Name=%%s" % TABLE, params=(name,))
+
+
+def escapedAttributes(db, rowID):
+  """ Like JobDB.getJobAttributes before using parameters: the row ID and the
+      names of the fields are escaped
+  """
+  result = db._escapeString(rowID)
+  if not result['OK']:
+    return result
+  rowID = result['Value']
+  names = []
+  for field in FIELDS:
+    result = db._escapeString(field)
+    if not result['OK']:
+      return result
+    names.append("`%s`" % result['Value'][1:-1])
+  return db._query("SELECT %s FROM %s WHERE ID=%s" % (','.join(names), TABLE, rowID))
+
+
+def parameterizedAttributes(db, rowID):
+  names = ','.join(["`%s`" % field for field in FIELDS])
+  return db._query("SELECT %s FROM %s WHERE ID=%%s" % (names, TABLE), params=(rowID,))
+
+
+QUERIES = [('by name, escaped', escapedByName, lambda i: '/vo/data/dir_%d' % i),
+           ('by name, parameters', parameterizedByName, lambda i: '/vo/data/dir_%d' % i),
+           ('attributes, escaped', escapedAttributes, lambda i: i + 1),
+           ('attributes, parameters', parameterizedAttributes, lambda i: i + 1)]
+
+
+def main(host, user, password, dbName, nQueries):
+  db = MySQL(host, user, password, dbName)
+  result = db._createTables(TABLEDICT, force=True)
+  if not result['OK']:
+    print result['Message']
+    return 1
+  try:
+    result = db.insertFieldsBulk(TABLE, ['Name'], [['/vo/data/dir_%d' % i] for i in xrange(nQueries)])
+    if not result['OK']:
+      print result['Message']
+      return 1
+    print "%-25s %15s" % ('Query', 'Time (us)')
+    for queryName, query, argument in QUERIES:
+      start = time.time()
+      for i in xrange(nQueries):
+        result = query(db, argument(i))
+        if not result['OK']:
+          print result['Message']
+          return 1
+      print "%-25s %15.1f" % (queryName, (time.time() - start) * 1e6 / nQueries)
+  finally:
+    db._update('DROP TABLE %s' % TABLE)
+  return 0
+
+
+if __name__ == "__main__":
+  if len(sys.argv) < 5:
+    print __doc__
+    sys.exit(1)
+  sys.exit(main(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4],
+                int(sys.argv[5]) if len(sys.argv) > 5 else 10000))
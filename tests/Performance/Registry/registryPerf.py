@@ -0,0 +1,118 @@
+""" Micro benchmark of the Registry lookups done by the AuthManager for each authenticated RPC
+
+    Usage: python registryPerf.py [number of users] [number of lookups]
+
+    It loads a synthetic /Registry section in the local configuration, and measures the
+    average cost of the sequence of lookups done to authorize a user credential, with the
+    Registry helper (indexed per configuration version) and with a scan of the
+    configuration sections through gConfig (which is what the helper used to do).
+"""
+
+__RCSID__ = "$Id$"
+
+import sys
+import time
+import random
+
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+N_GROUPS = 50
+N_HOSTS = 200
+
+
+def userDN(i):
+  return '/DC=ch/DC=cern/OU=Organic Units/OU=Users/CN=user%d/CN=%d/CN=Some User' % (i, i)
+
+
+def buildRegistry(nUsers):
+  """ Registry with nUsers users, each of them being in 1 to 3 groups
+  """
+  users = dict(('user%d' % i, {'DN': userDN(i)}) for i in xrange(nUsers))
+  groups = dict(('group_%d' % g, {'Users': [],
+                                  'Properties': ['NormalUser', 'PrivateLimitedDelegation'],
+                                  'VO': 'vo%d' % (g % 3)})
+                for g in xrange(N_GROUPS))
+  for username in users:
+    for g in random.sample(xrange(N_GROUPS), random.randint(1, 3)):
+      groups['group_%d' % g]['Users'].append(username)
+  hosts = dict(('host%d' % h, {'DN': '/DC=ch/DC=cern/OU=computers/CN=host%d.cern.ch' % h,
+                               'Properties': 'TrustedHost'})
+               for h in xrange(N_HOSTS))
+  return CFG().loadFromDict({'Registry': {'DefaultGroup': 'group_0',
+                                          'Users': users,
+                                          'Groups': groups,
+                                          'Hosts': hosts}})
+
+
+def scanUsernameForDN(dn, usersList=False):
+  if not usersList:
+    usersList = gConfig.getSections('/Registry/Users')['Value']
+  for username in usersList:
+    if dn in gConfig.getValue('/Registry/Users/%s/DN' % username, []):
+      return username
+  return None
+
+
+def scanHostnameForDN(dn):
+  for hostname in gConfig.getSections('/Registry/Hosts')['Value']:
+    if dn in gConfig.getValue('/Registry/Hosts/%s/DN' % hostname, []):
+      return hostname
+  return None
+
+
+def scanGroupsForUser(username):
+  return sorted(group for group in gConfig.getSections('/Registry/Groups')['Value']
+                if username in gConfig.getValue('/Registry/Groups/%s/Users' % group, []))
+
+
+def scanAuthorize(dn):
+  """ Lookups of AuthManager for a user credential, scanning the configuration
+  """
+  scanHostnameForDN(dn)
+  username = scanUsernameForDN(dn)
+  groups = scanGroupsForUser(username)
+  group = 'group_0' if 'group_0' in groups else groups[0]
+  usersInGroup = gConfig.getValue('/Registry/Groups/%s/Users' % group, [])
+  scanUsernameForDN(dn, usersInGroup)
+  return gConfig.getValue('/Registry/Groups/%s/Properties' % group, [])
+
+
+def indexedAuthorize(dn):
+  """ Same lookups with the Registry helper
+  """
+  Registry.getHostnameForDN(dn)
+  group = Registry.findDefaultGroupForDN(dn)['Value']
+  Registry.getUsernameForDN(dn, Registry.getUsersInGroup(group))
+  return Registry.getPropertiesForGroup(group)
+
+
+def measure(func, dnList):
+  start = time.time()
+  for dn in dnList:
+    func(dn)
+  return (time.time() - start) / len(dnList)
+
+
+def main(nUsers, nLookups):
+  gConfigurationData.localCFG = buildRegistry(nUsers)
+  gConfigurationData.sync()
+  dnList = [userDN(random.randrange(nUsers)) for _ in xrange(nLookups)]
+
+  start = time.time()
+  indexedAuthorize(dnList[0])
+  print "Index built in %.3f ms for %d users" % ((time.time() - start) * 1000, nUsers)
+
+  for dn in dnList[:100]:
+    assert indexedAuthorize(dn) == scanAuthorize(dn)
+
+  print "%-10s %20s" % ('Lookup', 'Per auth (ms)')
+  print "%-10s %20.4f" % ('Indexed', measure(indexedAuthorize, dnList) * 1000)
+  print "%-10s %20.4f" % ('Scan', measure(scanAuthorize, dnList[:max(1, nLookups / 100)]) * 1000)
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+       int(sys.argv[2]) if len(sys.argv) > 2 else 10000)